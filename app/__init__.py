@@ -40,6 +40,9 @@ def create_app(config_class=Config):
     # Registrar blueprints
     register_blueprints(app)
     
+    # Registrar comandos de la CLI de Flask
+    register_commands(app)
+    
     # Crear carpetas necesarias
     create_directories(app)
     
@@ -48,8 +51,21 @@ def create_app(config_class=Config):
 
 def init_extensions(app):
     """Inicializar extensiones Flask"""
-    # Base de datos
+    # Base de datos (con SQLite: WAL, busy_timeout y PRAGMA en cada conexión)
+    from app.utils import sqlite_profile, db_routing
+    sqlite_profile.init_app(app)
+    db_routing.init_app(app)
     db.init_app(app)
+    sqlite_profile.init_engines(app, db)
+    db_routing.init_engines(app, db)
+    
+    # Contadores de versión del calendario (ETag de la API mensual)
+    from app.utils.calendar_versions import register_listeners
+    register_listeners()
+    
+    # Registro de cambios del calendario para el stream de eventos
+    from app.utils import calendar_events
+    calendar_events.register_listeners()
     
     # Configuración específica para MySQL
     if 'mysql' in app.config.get('SQLALCHEMY_DATABASE_URI', ''):
@@ -74,6 +90,10 @@ def init_extensions(app):
     @login_manager.user_loader
     def load_user(user_id):
         return User.query.get(int(user_id))
+    
+    # Backups programados (BACKUP_SCHEDULE_HOURS)
+    from app.utils import db_backup
+    db_backup.init_app(app)
 
 
 def register_filters(app):
@@ -97,6 +117,12 @@ def register_filters(app):
             return text.replace('\n', '<br>')
         return ''
 
+    @app.template_filter('filesize')
+    def filesize_filter(size):
+        """Filtro Jinja2 para mostrar un tamaño en bytes (KB, MB...)"""
+        from app.utils.db_stats import format_bytes
+        return format_bytes(size)
+
     @app.template_filter('time_elapsed')
     def time_elapsed_filter(datetime_obj):
         """Filtro Jinja2 para mostrar tiempo transcurrido"""
@@ -128,6 +154,18 @@ def register_filters(app):
 def register_middleware(app):
     """Registrar middleware de la aplicación"""
     
+    # Tiempos por petición (total, SQL y plantillas); va primero para medir también el resto
+    from app.utils import request_metrics
+    request_metrics.init_app(app)
+    
+    # Consultas lentas agrupadas por huella (gestor de base de datos)
+    from app.utils import slow_queries
+    slow_queries.init_app(app)
+    
+    # Métricas Prometheus (/metrics)
+    from app.utils import metrics
+    metrics.init_app(app)
+    
     @app.before_request
     def check_maintenance_mode():
         """Middleware para verificar modo mantenimiento"""
@@ -138,6 +176,7 @@ def register_middleware(app):
             'admin.toggle_maintenance',
             'admin.update_system',
             'admin.check_updates',
+            'metrics',
             'auth.login',  # Permitir acceso al login durante mantenimiento
             'auth.logout'
         ]
@@ -195,6 +234,111 @@ def register_blueprints(app):
     app.register_blueprint(users_bp, url_prefix='/users')
 
 
+def register_commands(app):
+    """Registrar comandos personalizados de la CLI (flask <comando>)"""
+    import click
+    
+    @app.cli.command('backfill-time-rollups')
+    @click.option('--start', 'start_date', default=None, help='Fecha inicial YYYY-MM-DD (se amplía al mes completo)')
+    @click.option('--end', 'end_date', default=None, help='Fecha final YYYY-MM-DD (se amplía al mes completo)')
+    def backfill_time_rollups(start_date, end_date):
+        """Reconstruir los totales diarios y mensuales de horas desde el histórico"""
+        from datetime import datetime
+        from app.utils.time_rollups import TimeRollupService
+        
+        start = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+        end = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+        
+        result = TimeRollupService.backfill(start, end)
+        click.echo(f"Totales reconstruidos: {result['daily']} diarios, {result['monthly']} mensuales")
+    
+    @app.cli.command('backfill-orders')
+    def backfill_orders():
+        """Crear los datos estructurados de las notas de pedidos WooCommerce anteriores"""
+        from app.utils.woocommerce_orders import WooOrderService
+        
+        result = WooOrderService.backfill_legacy_notes()
+        click.echo(f"Pedidos creados: {result['created']} (notas omitidas: {result['skipped']})")
+    
+    @app.cli.command('backup-database')
+    def backup_database():
+        """Crear un backup de la base de datos en primer plano (para cron)"""
+        from app.utils import db_backup
+        
+        job = db_backup.run_backup(app, trigger='cli')
+        if job.status != 'done':
+            raise click.ClickException(f"Backup fallido: {job.error}")
+        click.echo(f"Backup creado: {job.path} ({job.size} bytes, método: {job.method})")
+        for name in job.removed or []:
+            click.echo(f"Eliminado por rotación: {name}")
+    
+    @app.cli.command('export-data')
+    @click.argument('folder')
+    @click.option('--database-url', default=None, help='Base de origen (por defecto, la de la aplicación)')
+    @click.option('--chunk-rows', type=int, default=None, help='Filas por fichero de bloque')
+    @click.option('--no-compress', is_flag=True, help='Bloques NDJSON sin comprimir')
+    def export_data(folder, database_url, chunk_rows, no_compress):
+        """Exportar todas las tablas por bloques NDJSON (reanudable)"""
+        from sqlalchemy import create_engine
+        from app.utils import data_transfer
+        
+        engine = create_engine(database_url) if database_url else db.engine
+        try:
+            manifest = data_transfer.export_tables(
+                engine, folder,
+                chunk_rows=chunk_rows or app.config.get('DATA_TRANSFER_CHUNK_ROWS', data_transfer.CHUNK_ROWS),
+                compress=not no_compress,
+                progress=lambda table, rows: click.echo(f"  {table}: {rows} filas")
+            )
+        except data_transfer.TransferError as e:
+            raise click.ClickException(str(e))
+        finally:
+            if database_url:
+                engine.dispose()
+        total = sum(table['rows'] for table in manifest['tables'])
+        click.echo(f"Exportadas {len(manifest['tables'])} tablas ({total} filas) en {folder}")
+    
+    @app.cli.command('import-data')
+    @click.argument('folder')
+    @click.option('--database-url', default=None, help='Base de destino (por defecto, la de la aplicación)')
+    @click.option('--batch-rows', type=int, default=None, help='Filas por executemany')
+    @click.option('--truncate', is_flag=True, help='Vaciar las tablas de destino y empezar desde el principio')
+    def import_data(folder, database_url, batch_rows, truncate):
+        """Importar una exportación por bloques con inserciones por lotes (reanudable)"""
+        from sqlalchemy import create_engine
+        from app.utils import data_transfer
+        
+        engine = create_engine(database_url) if database_url else db.engine
+        try:
+            checkpoint = data_transfer.import_tables(
+                engine, folder,
+                batch_rows=batch_rows or app.config.get('DATA_TRANSFER_BATCH_ROWS', data_transfer.BATCH_ROWS),
+                truncate=truncate,
+                progress=lambda table, rows: click.echo(f"  {table}: {rows} filas")
+            )
+        except data_transfer.TransferError as e:
+            raise click.ClickException(str(e))
+        finally:
+            if database_url:
+                engine.dispose()
+        total = sum(table['rows'] for table in checkpoint['tables'].values())
+        click.echo(f"Importadas {total} filas desde {folder}")
+        for name, table in checkpoint['tables'].items():
+            if table.get('skipped_columns'):
+                click.echo(f"Columnas sin equivalente en {name}: {', '.join(table['skipped_columns'])}")
+    
+    @app.cli.command('search-index')
+    def search_index():
+        """Reconstruir el índice de búsqueda de notas y pedidos (lo crea flask db upgrade)"""
+        from app.utils.note_search import NoteSearchService
+        
+        mode = NoteSearchService.rebuild_index()
+        if mode == 'like':
+            click.echo("No hay índice de búsqueda: ejecuta 'flask db upgrade' (mientras tanto se busca con LIKE)")
+        else:
+            click.echo(f"Índice de búsqueda listo (modo: {mode})")
+
+
 def create_directories(app):
     """Crear directorios necesarios"""
     directories = [
@@ -2,15 +2,19 @@
 Rutas administrativas: gestión de documentos de todos los usuarios
 """
 
-from flask import render_template, request, redirect, url_for, flash, send_file, jsonify, abort, current_app
+from flask import render_template, request, redirect, url_for, flash, send_file, jsonify, abort, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from datetime import datetime, timedelta
 import os
 import subprocess
 import sys
 import json
-from sqlalchemy import text
+from sqlalchemy import text, func
+from sqlalchemy.orm import joinedload
 from app.models import UserDocument, User, MaintenanceMode, UpdateLog, db
+from app.utils.zip_stream import stream_zip
+from app.utils.pagination import keyset_paginate, wants_json
+from app.utils import request_metrics, db_backup, sql_console, db_stats, slow_queries
 from . import bp
 import subprocess
 import sys
@@ -57,23 +61,25 @@ def admin_documents():
     end_date = request.args.get('end_date')
     
     # Construir query
-    query = UserDocument.query
+    query = filter_documents_query(UserDocument.query, user_id, document_type, start_date, end_date)
     
-    if user_id:
-        query = query.filter(UserDocument.user_id == user_id)
-    
-    if document_type:
-        query = query.filter(UserDocument.document_type == document_type)
+    # Documentos ordenados por fecha, paginados por cursor
+    page = keyset_paginate(
+        query.options(joinedload(UserDocument.user)),
+        [UserDocument.uploaded_at, UserDocument.id],
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        per_page=current_app.config.get('LIST_PAGE_SIZE', 50)
+    )
     
-    if start_date:
-        query = query.filter(UserDocument.uploaded_at >= datetime.strptime(start_date, '%Y-%m-%d'))
+    if wants_json(request):
+        return jsonify(page.to_dict(serialize_document))
     
-    if end_date:
-        end_datetime = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-        query = query.filter(UserDocument.uploaded_at < end_datetime)
-    
-    # Obtener documentos ordenados por fecha
-    documents = query.order_by(UserDocument.uploaded_at.desc()).all()
+    # Recuento por tipo sobre todo el filtro (no solo la página)
+    type_counts = dict(
+        query.with_entities(UserDocument.document_type, func.count(UserDocument.id))
+        .group_by(UserDocument.document_type)
+    )
     
     # Obtener usuarios activos para el filtro (excluir usuario de emergencia)
     users = User.query.filter(User.is_active == True, User.username != 'superadmin').all()
@@ -89,7 +95,10 @@ def admin_documents():
     ]
     
     return render_template('admin_documents.html',
-                         documents=documents,
+                         documents=page.items,
+                         page=page,
+                         type_counts=type_counts,
+                         total_documents=sum(type_counts.values()),
                          users=users,
                          document_types=document_types,
                          selected_user_id=user_id,
@@ -97,6 +106,21 @@ def admin_documents():
                          start_date=start_date,
                          end_date=end_date)
 
+def serialize_document(document):
+    """Datos de un documento para el listado JSON"""
+    return {
+        'id': document.id,
+        'user_id': document.user_id,
+        'username': document.user.username if document.user else None,
+        'filename': document.original_filename,
+        'file_type': document.file_type,
+        'document_type': document.document_type,
+        'description': document.description,
+        'date_related': document.date_related.isoformat() if document.date_related else None,
+        'uploaded_at': document.uploaded_at.isoformat() if document.uploaded_at else None,
+        'uploaded_by': document.uploaded_by,
+    }
+
 @bp.route('/admin_download_document/<int:doc_id>')
 @login_required
 def admin_download_document(doc_id):
@@ -117,6 +141,45 @@ def admin_download_document(doc_id):
         flash('El archivo no existe en el servidor', 'error')
         return redirect(url_for('admin.admin_documents'))
 
+@bp.route('/admin_export_documents')
+@login_required
+def admin_export_documents():
+    """Descargar en un ZIP los documentos filtrados - solo admin"""
+    if not current_user.is_admin:
+        flash('No tienes permisos para descargar documentos', 'error')
+        return redirect(url_for('documents.my_documents'))
+    
+    # Mismos filtros que admin_documents
+    user_id = request.args.get('user_id', type=int)
+    document_type = request.args.get('document_type')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    
+    try:
+        query = db.session.query(
+            UserDocument.filename,
+            UserDocument.file_path,
+            User.username
+        ).join(User, UserDocument.user_id == User.id)
+        query = filter_documents_query(query, user_id, document_type, start_date, end_date)
+    except ValueError:
+        flash('Fecha inválida en los filtros', 'error')
+        return redirect(url_for('admin.admin_documents'))
+    
+    # Solo se leen las columnas necesarias, por lotes, mientras se genera el ZIP
+    rows = query.order_by(UserDocument.uploaded_at.desc()).execution_options(yield_per=100)
+    entries = ((f"{row.username}/{row.filename}", row.file_path) for row in rows)
+    
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return Response(
+        stream_with_context(stream_zip(entries)),
+        mimetype='application/zip',
+        headers={
+            'Content-Disposition': f'attachment; filename=documentos_{timestamp}.zip',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @bp.route('/admin_delete_document/<int:doc_id>', methods=['POST'])
 @login_required
 def admin_delete_document(doc_id):
@@ -162,7 +225,25 @@ def super_admin_panel():
     return render_template('super_admin_panel.html', 
                          maintenance=maintenance,
                          recent_updates=recent_updates,
-                         git_info=git_info)
+                         git_info=git_info,
+                         request_stats=request_metrics.stats.snapshot(),
+                         stats_window=request_metrics.ROLLING_WINDOW)
+
+@bp.route('/request_stats')
+@login_required
+@require_super_admin
+def request_stats():
+    """Estadísticas de rendimiento por endpoint (JSON)"""
+    return jsonify({'window': request_metrics.ROLLING_WINDOW, 'endpoints': request_metrics.stats.snapshot()})
+
+@bp.route('/request_stats/reset', methods=['POST'])
+@login_required
+@require_super_admin
+def reset_request_stats():
+    """Vaciar la tabla de rendimiento por endpoint"""
+    request_metrics.stats.reset()
+    flash('Estadísticas de rendimiento reiniciadas', 'success')
+    return redirect(url_for('admin.super_admin_panel'))
 
 @bp.route('/toggle_maintenance', methods=['POST'])
 @login_required
@@ -182,6 +263,16 @@ def toggle_maintenance():
     
     return redirect(url_for('admin.super_admin_panel'))
 
+def mark_update_failed(update_log, error_message):
+    """Marca el log de actualización como fallido sin interrumpir la respuesta"""
+    if not update_log:
+        return
+    try:
+        db.session.refresh(update_log)
+        update_log.mark_failed(error_message)
+    except Exception:
+        db.session.rollback()
+
 @bp.route('/update_system', methods=['POST'])
 @login_required
 @require_super_admin
@@ -190,167 +281,49 @@ def update_system():
     update_log = None
     
     try:
-        # Intentar crear log de actualización con múltiples intentos
-        log_created = False
-        for attempt in range(3):  # 3 intentos
-            try:
-                # Limpiar cualquier transacción pendiente
-                try:
-                    db.session.rollback()
-                    db.session.close()  # Cerrar conexión para forzar nueva
-                except:
-                    pass
-                
-                # Esperar un momento entre intentos
-                if attempt > 0:
-                    import time
-                    time.sleep(0.5)
-                
-                update_log = UpdateLog(
-                    started_by=current_user.username,
-                    git_commit_before=get_current_git_commit()
-                )
-                db.session.add(update_log)
-                db.session.commit()
-                log_created = True
-                break
-                
-            except Exception as db_error:
-                if "database is locked" in str(db_error).lower() or "readonly" in str(db_error).lower():
-                    # Error de BD bloqueada/solo lectura, intentar de nuevo
-                    try:
-                        db.session.rollback()
-                        db.session.close()
-                    except:
-                        pass
-                    
-                    if attempt == 2:  # Último intento
-                        flash(f'Warning: Base de datos bloqueada, continuando sin log: {str(db_error)}', 'warning')
-                        update_log = None
-                        break
-                else:
-                    # Otro tipo de error, no reintentar
-                    flash(f'Warning: No se pudo crear log de actualización: {str(db_error)}', 'warning')
-                    update_log = None
-                    try:
-                        db.session.rollback()
-                        db.session.close()
-                    except:
-                        pass
-                    break
-        
-        # Activar modo mantenimiento automáticamente con reintentos
-        maintenance_activated = False
-        for attempt in range(3):
-            try:
-                maintenance = MaintenanceMode.get_current()
-                if not maintenance.is_active:
-                    maintenance.activate(current_user, 'Actualizando sistema...', 15)
-                    maintenance_activated = True
-                break
-            except Exception as maintenance_error:
-                if "database is locked" in str(maintenance_error).lower():
-                    try:
-                        db.session.rollback()
-                        db.session.close()
-                    except:
-                        pass
-                    
-                    if attempt < 2:  # No es el último intento
-                        import time
-                        time.sleep(0.5)
-                        continue
-                
-                flash(f'Warning: No se pudo activar modo mantenimiento: {str(maintenance_error)}', 'warning')
-                break
+        # Crear log de actualización (SQLite espera busy_timeout si hay otro escritor)
+        try:
+            update_log = UpdateLog(
+                started_by=current_user.username,
+                git_commit_before=get_current_git_commit()
+            )
+            db.session.add(update_log)
+            db.session.commit()
+        except Exception as db_error:
+            db.session.rollback()
+            update_log = None
+            flash(f'Warning: No se pudo crear log de actualización: {str(db_error)}', 'warning')
+        
+        # Activar modo mantenimiento automáticamente
+        try:
+            maintenance = MaintenanceMode.get_current()
+            if not maintenance.is_active:
+                maintenance.activate(current_user, 'Actualizando sistema...', 15)
+        except Exception as maintenance_error:
+            db.session.rollback()
+            flash(f'Warning: No se pudo activar modo mantenimiento: {str(maintenance_error)}', 'warning')
         
         # Ejecutar actualización (esta es la parte crítica)
         result = perform_system_update(update_log)
         
         if result['success']:
-            # Intentar actualizar el log si existe con reintentos
             if update_log:
-                log_updated = False
-                for attempt in range(3):
-                    try:
-                        # Asegurar que tenemos una sesión limpia
-                        db.session.refresh(update_log)
-                        update_log.mark_completed(result.get('commit_after'))
-                        db.session.commit()
-                        log_updated = True
-                        break
-                    except Exception as log_error:
-                        if "database is locked" in str(log_error).lower():
-                            try:
-                                db.session.rollback()
-                                db.session.close()
-                            except:
-                                pass
-                            
-                            if attempt < 2:  # No es el último intento
-                                import time
-                                time.sleep(0.5)
-                                continue
-                        
-                        # Log falló pero actualización fue exitosa
-                        try:
-                            db.session.rollback()
-                            db.session.close()
-                        except:
-                            pass
-                        break
-                
-                if log_updated:
+                try:
+                    db.session.refresh(update_log)
+                    update_log.mark_completed(result.get('commit_after'))
                     flash('Sistema actualizado correctamente', 'success')
-                else:
-                    flash('Sistema actualizado correctamente (Warning: Log no actualizado por BD bloqueada)', 'success')
+                except Exception:
+                    # Log falló pero actualización fue exitosa
+                    db.session.rollback()
+                    flash('Sistema actualizado correctamente (Warning: Log no actualizado)', 'success')
             else:
                 flash('Sistema actualizado correctamente (sin log)', 'success')
         else:
-            # Intentar marcar log como fallido si existe con reintentos
-            if update_log:
-                for attempt in range(3):
-                    try:
-                        db.session.refresh(update_log)
-                        update_log.mark_failed(result['error'])
-                        db.session.commit()
-                        break
-                    except Exception:
-                        if attempt < 2:  # No es el último intento
-                            try:
-                                db.session.rollback()
-                                db.session.close()
-                            except:
-                                pass
-                        import time
-                        time.sleep(0.5)
+            mark_update_failed(update_log, result['error'])
             flash(f'Error en la actualización: {result["error"]}', 'error')
             
     except Exception as e:
-        # Intentar marcar log como fallido si existe con reintentos
-        if update_log:
-            for attempt in range(3):
-                try:
-                    db.session.refresh(update_log)
-                    update_log.mark_failed(f'Error inesperado: {str(e)}')
-                    db.session.commit()
-                    break
-                except Exception:
-                    if attempt < 2:  # No es el último intento
-                        try:
-                            db.session.rollback()
-                            db.session.close()
-                        except:
-                            pass
-                        import time
-                        time.sleep(0.5)
-                    else:
-                        try:
-                            db.session.rollback()
-                            db.session.close()
-                        except:
-                            pass
-        
+        mark_update_failed(update_log, f'Error inesperado: {str(e)}')
         flash(f'Error inesperado durante la actualización: {str(e)}', 'error')
     
     finally:
@@ -398,6 +371,23 @@ def view_update_log(log_id):
 # FUNCIONES AUXILIARES
 # ===============================================
 
+def filter_documents_query(query, user_id=None, document_type=None, start_date=None, end_date=None):
+    """Aplicar los filtros de la gestión de documentos a una consulta sobre UserDocument"""
+    if user_id:
+        query = query.filter(UserDocument.user_id == user_id)
+    
+    if document_type:
+        query = query.filter(UserDocument.document_type == document_type)
+    
+    if start_date:
+        query = query.filter(UserDocument.uploaded_at >= datetime.strptime(start_date, '%Y-%m-%d'))
+    
+    if end_date:
+        end_datetime = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+        query = query.filter(UserDocument.uploaded_at < end_datetime)
+    
+    return query
+
 def get_git_info():
     """Obtener información del repositorio git"""
     try:
@@ -730,70 +720,41 @@ def test_database_connection():
 @login_required
 @require_super_admin
 def backup_database():
-    """Crear backup de la base de datos actual"""
+    """Crear backup de la base de datos actual (en segundo plano)"""
     try:
-        from datetime import datetime
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        current_db_uri = current_app.config.get('SQLALCHEMY_DATABASE_URI', '')
-        
-        if 'sqlite' in current_db_uri.lower():
-            # Backup SQLite
-            if current_db_uri.startswith('sqlite:///'):
-                source_file = current_db_uri.replace('sqlite:///', '')
-                if os.path.exists(source_file):
-                    backup_file = f"backups/sqlite_backup_{timestamp}.db"
-                    os.makedirs('backups', exist_ok=True)
-                    
-                    import shutil
-                    shutil.copy2(source_file, backup_file)
-                    
-                    flash(f'Backup SQLite creado: {backup_file}', 'success')
-                else:
-                    flash('Archivo SQLite no encontrado', 'error')
-            else:
-                flash('Formato SQLite no soportado para backup', 'error')
-                
-        elif 'mysql' in current_db_uri.lower():
-            # Backup MySQL usando mysqldump
-            import re
-            match = re.match(r'mysql\+pymysql://([^:]+):([^@]+)@([^:]+):(\d+)/([^?]+)', current_db_uri)
-            if match:
-                user, password, host, port, database = match.groups()
-                backup_file = f"backups/mysql_backup_{timestamp}.sql"
-                os.makedirs('backups', exist_ok=True)
-                
-                # Intentar usar mysqldump
-                try:
-                    result = subprocess.run([
-                        'mysqldump',
-                        f'--host={host}',
-                        f'--port={port}',
-                        f'--user={user}',
-                        f'--password={password}',
-                        database
-                    ], capture_output=True, text=True, cwd=os.getcwd())
-                    
-                    if result.returncode == 0:
-                        with open(backup_file, 'w', encoding='utf-8') as f:
-                            f.write(result.stdout)
-                        flash(f'Backup MySQL creado: {backup_file}', 'success')
-                    else:
-                        flash(f'Error en mysqldump: {result.stderr}', 'error')
-                        
-                except FileNotFoundError:
-                    flash('mysqldump no encontrado. Instala MySQL client tools.', 'error')
-            else:
-                flash('No se pudo parsear la URI de MySQL', 'error')
-        else:
-            flash('Tipo de base de datos no soportado para backup', 'error')
-            
+        # SQLite: API de backup en línea; MySQL: mysqldump en streaming o volcado en Python
+        job = db_backup.start_backup(current_app._get_current_object(), trigger='manual')
+    except db_backup.BackupInProgress as e:
+        if wants_json(request):
+            return jsonify({'error': str(e)}), 409
+        flash(str(e), 'warning')
     except Exception as e:
+        if wants_json(request):
+            return jsonify({'error': f'Error creando backup: {str(e)}'}), 500
         flash(f'Error creando backup: {str(e)}', 'error')
+    else:
+        if wants_json(request):
+            return jsonify(job.to_dict()), 202
+        flash(f'Backup {job.kind} iniciado en segundo plano', 'info')
     
     return redirect(url_for('admin.database_config'))
 
 
+@bp.route('/backup_status')
+@login_required
+@require_super_admin
+def backup_status():
+    """Estado del último backup y backups disponibles (JSON)"""
+    folder = db_backup.backup_folder(current_app)
+    return jsonify({
+        'job': db_backup.read_status(folder),
+        'backups': [
+            {'name': backup['name'], 'size': backup['size'], 'created_at': backup['created_at'].isoformat()}
+            for backup in db_backup.list_backups(folder)
+        ],
+    })
+
+
 @bp.route('/admin_console')
 @login_required
 @require_super_admin
@@ -863,46 +824,35 @@ def database_manager():
             'stats': {}
         }
         
-        # Obtener información de tablas
-        inspector = db.inspect(db.engine)
-        tables = inspector.get_table_names()
-        
-        for table_name in tables:
-            columns = inspector.get_columns(table_name)
-            indexes = inspector.get_indexes(table_name)
-            
-            # Contar registros
-            try:
-                count_result = db.session.execute(text(f"SELECT COUNT(*) FROM {table_name}"))
-                record_count = count_result.scalar()
-            except:
-                record_count = 0
-            
-            table_info = {
-                'name': table_name,
-                'columns': len(columns),
-                'indexes': len(indexes),
-                'records': record_count,
-                'column_details': [
-                    {
-                        'name': col['name'],
-                        'type': str(col['type']),
-                        'nullable': col['nullable'],
-                        'default': str(col.get('default', '')) if col.get('default') is not None else None
-                    }
-                    for col in columns
-                ]
-            }
-            db_info['tables'].append(table_info)
+        # Reflexión cacheada hasta la próxima migración y recuentos del catálogo (sin COUNT(*))
+        db_info['tables'] = db_stats.table_overview(
+            db.engine,
+            max_age=current_app.config.get('DB_STATS_CACHE_SECONDS', 300),
+            refresh=request.args.get('refresh') == '1'
+        )
+        db_info['indexes'] = [
+            {**index, 'table': table['name']}
+            for table in db_info['tables'] for index in table['index_details']
+        ]
         
         # Estadísticas generales
         db_info['stats'] = {
-            'total_tables': len(tables),
-            'total_records': sum(table['records'] for table in db_info['tables']),
+            'total_tables': len(db_info['tables']),
+            'total_records': sum(table['records'] or 0 for table in db_info['tables']),
+            'data_size': db_stats.format_bytes(sum(table['data_bytes'] or 0 for table in db_info['tables'])),
+            'index_size': db_stats.format_bytes(sum(table['index_bytes'] or 0 for table in db_info['tables'])),
             'connection_pool_size': getattr(db.engine.pool, 'size', 'N/A'),
             'connection_pool_checked_out': getattr(db.engine.pool, 'checkedout', 'N/A')
         }
         
+        # Consultas lentas con su plan y los índices que faltan según los modelos
+        db_info['slow_queries'] = slow_queries.report(
+            db.engine, db.metadata,
+            top=current_app.config.get('SLOW_QUERY_REPORT_TOP', 20),
+            explain_top=current_app.config.get('SLOW_QUERY_EXPLAIN_TOP', 5)
+        )
+        db_info['slow_query_threshold_ms'] = current_app.config.get('SLOW_QUERY_THRESHOLD_MS', 200)
+        
         return render_template('database_manager.html', db_info=db_info)
         
     except Exception as e:
@@ -910,62 +860,88 @@ def database_manager():
         return redirect(url_for('admin.super_admin_panel'))
 
 
+@bp.route('/database_manager/count', methods=['POST'])
+@login_required
+@require_super_admin
+def database_table_count():
+    """Recuento exacto (COUNT(*)) de una tabla, a petición"""
+    table_name = request.form.get('table', '').strip()
+    try:
+        count = db_stats.exact_count(db.engine, table_name,
+                                     timeout=current_app.config.get('SQL_CONSOLE_TIMEOUT_SECONDS', 30))
+    except sql_console.QueryTimeout as e:
+        return jsonify({'error': str(e), 'table': table_name}), 504
+    except Exception as e:
+        return jsonify({'error': str(e), 'table': table_name}), 500
+    
+    if count is None:
+        return jsonify({'error': 'Tabla no encontrada', 'table': table_name}), 404
+    return jsonify({'table': table_name, 'records': count})
+
+
+@bp.route('/slow_queries')
+@login_required
+@require_super_admin
+def slow_query_report():
+    """Consultas lentas por huella con plan e índices propuestos (JSON)"""
+    return jsonify({
+        'threshold_ms': current_app.config.get('SLOW_QUERY_THRESHOLD_MS', 200),
+        'queries': slow_queries.report(
+            db.engine, db.metadata,
+            top=current_app.config.get('SLOW_QUERY_REPORT_TOP', 20),
+            explain_top=current_app.config.get('SLOW_QUERY_EXPLAIN_TOP', 5)
+        )
+    })
+
+
+@bp.route('/slow_queries/reset', methods=['POST'])
+@login_required
+@require_super_admin
+def reset_slow_queries():
+    """Vaciar el registro de consultas lentas"""
+    slow_queries.log.reset()
+    flash('Registro de consultas lentas reiniciado', 'success')
+    return redirect(url_for('admin.database_manager'))
+
+
 @bp.route('/execute_sql', methods=['POST'])
 @login_required
 @require_super_admin
 def execute_sql():
-    """Ejecutar consulta SQL - SIN RESTRICCIONES"""
+    """Ejecutar consulta SQL - SIN RESTRICCIONES (paginada y con límite de tiempo)"""
+    sql_query = request.form.get('sql_query', '').strip()
+    
+    if not sql_query:
+        return jsonify({'error': 'Consulta SQL vacía'})
+    
+    # SIN RESTRICCIONES - Acceso completo para uso interno de la empresa
+    # Permitir cualquier tipo de consulta SQL (SELECT, INSERT, UPDATE, DELETE, CREATE, DROP, etc.)
     try:
-        sql_query = request.form.get('sql_query', '').strip()
-        
-        if not sql_query:
-            return jsonify({'error': 'Consulta SQL vacía'})
-        
-        # SIN RESTRICCIONES - Acceso completo para uso interno de la empresa
-        # Permitir cualquier tipo de consulta SQL (SELECT, INSERT, UPDATE, DELETE, CREATE, DROP, etc.)
-        
-        # Ejecutar consulta
-        result = db.session.execute(text(sql_query))
-        
-        # Para consultas que modifican datos, hacer commit
-        if any(sql_query.upper().strip().startswith(cmd) for cmd in ['INSERT', 'UPDATE', 'DELETE', 'CREATE', 'DROP', 'ALTER']):
-            db.session.commit()
-        
-        # Procesar resultados
-        if result.returns_rows:
-            columns = list(result.keys())
-            rows = []
-            for row in result:
-                rows.append([str(val) if val is not None else 'NULL' for val in row])
-            
-            return jsonify({
-                'success': True,
-                'columns': columns,
-                'rows': rows,
-                'row_count': len(rows),
-                'query': sql_query
-            })
-        else:
-            # Para consultas sin resultados (INSERT, UPDATE, DELETE, etc.)
-            affected_rows = result.rowcount if hasattr(result, 'rowcount') else 0
-            return jsonify({
-                'success': True,
-                'message': f'Consulta ejecutada correctamente. Filas afectadas: {affected_rows}',
-                'affected_rows': affected_rows,
-                'query': sql_query
-            })
-            
+        offset = int(request.form.get('offset', 0))
+    except ValueError:
+        return jsonify({'error': 'Offset inválido', 'query': sql_query})
+    
+    try:
+        result = sql_console.run_query(
+            db.engine, sql_query,
+            offset=offset,
+            page_size=current_app.config.get('SQL_CONSOLE_PAGE_SIZE', 500),
+            max_rows=current_app.config.get('SQL_CONSOLE_MAX_ROWS', 5000),
+            timeout=current_app.config.get('SQL_CONSOLE_TIMEOUT_SECONDS', 30),
+            with_explain=request.form.get('explain') in ('1', 'true', 'on'),
+        )
+    except sql_console.QueryTimeout as e:
+        return jsonify({'error': str(e), 'query': sql_query})
     except Exception as e:
-        # Rollback en caso de error
-        try:
-            db.session.rollback()
-        except:
-            pass
-        
         return jsonify({
             'error': f'Error ejecutando SQL: {str(e)}',
             'query': sql_query
         })
+    
+    if 'rows' not in result:
+        # Para consultas sin resultados (INSERT, UPDATE, DELETE, etc.)
+        result['message'] = f"Consulta ejecutada correctamente. Filas afectadas: {result['affected_rows']}"
+    return jsonify({'success': True, **result})
 
 
 @bp.route('/database_optimize', methods=['POST'])
@@ -1010,6 +986,9 @@ def database_optimize():
                 flash('ANALYZE ejecutado en SQLite', 'success')
         else:
             flash(f'Optimización no soportada para {db.engine.dialect.name}', 'warning')
+        
+        # ANALYZE/OPTIMIZE cambian las estadísticas del catálogo
+        db_stats.clear_cache(db.engine)
             
     except Exception as e:
         flash(f'Error durante optimización: {str(e)}', 'error')
@@ -2,7 +2,7 @@
 Rutas del calendario: página principal, vista de días, subida y gestión de fotos
 """
 
-from flask import render_template, request, redirect, url_for, flash, abort, jsonify
+from flask import render_template, request, redirect, url_for, flash, abort, jsonify, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 from datetime import datetime, date, timedelta
@@ -11,9 +11,19 @@ import os
 import json
 import requests
 from PIL import Image
-from app.models import Photo, db
+from sqlalchemy.orm import selectinload
+from app.models import Photo, CalendarOrder, db
 from app.models.user import ApiIntegration, ApiData, CalendarNote, User
 from app.utils.api_service import ApiIntegrationService
+from app.utils.calendar_summary import CalendarSummaryService, NOTES_RANGE_MAX_DAYS
+from app.utils.calendar_versions import bump_dates, month_version
+from app.utils.calendar_events import event_stream, prune_changes, record_bulk_change
+from app.utils.note_search import NoteSearchService, DEFAULT_SEARCH_LIMIT
+from app.utils.woocommerce_orders import WooOrderService, SYNC_PAGE_SIZE, SYNC_MAX_PAGES
+from app.utils.route_sheet import RouteSheetService, CSV_HEADER as ROUTE_SHEET_CSV_HEADER
+from app.utils.report_export import stream_csv
+from app.utils import metrics
+from app.utils.demand_forecast import DemandForecastService, DEFAULT_FORECAST_DAYS, MAX_FORECAST_DAYS
 from . import bp
 
 def requires_privilege(privilege_name):
@@ -134,8 +144,10 @@ def view_day(date_str):
             ApiData.date_for == date_obj
         ).all()
         
-        # Obtener notas para esta fecha
-        notes = CalendarNote.query.filter(
+        # Obtener notas para esta fecha (con el pedido y sus productos para display_content)
+        notes = CalendarNote.query.options(
+            selectinload(CalendarNote.order).selectinload(CalendarOrder.items)
+        ).filter(
             CalendarNote.date_for == date_obj
         ).order_by(CalendarNote.created_at.desc()).all()
         
@@ -149,6 +161,40 @@ def view_day(date_str):
         flash('Fecha inválida', 'error')
         return redirect(url_for('calendar.index'))
 
+@bp.route('/day/<date_str>/deliveries')
+@login_required
+@requires_privilege('can_view_calendar')
+def route_sheet(date_str):
+    """Hoja de ruta del día agrupada por código postal (HTML imprimible, CSV o JSON)"""
+    try:
+        date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
+    except ValueError:
+        flash('Fecha inválida', 'error')
+        return redirect(url_for('calendar.index'))
+    
+    export_format = request.args.get('format', 'html')
+    sheet = RouteSheetService.route_sheet(date_obj)
+    
+    if export_format == 'csv':
+        return Response(
+            stream_with_context(stream_csv(ROUTE_SHEET_CSV_HEADER, RouteSheetService.csv_rows(sheet))),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename=hoja_ruta_{date_str}.csv'}
+        )
+    
+    if export_format == 'json':
+        # Mismo contador que la API mensual: 304 mientras no cambie ningún pedido del mes
+        etag = f'route-{date_str}-v{sheet["version"]}'
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = jsonify(sheet)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    
+    return render_template('route_sheet.html', date=date_obj, date_str=date_str, sheet=sheet)
+
 @bp.route('/upload/<date_str>', methods=['GET', 'POST'])
 @login_required
 @requires_privilege('can_upload_photos')
@@ -170,41 +216,46 @@ def upload_photo(date_str):
         files = request.files.getlist('file')
         uploaded_count = 0
         
-        for file in files:
-            if file.filename == '':
-                continue
+        # Ficheros recibidos y aún sin terminar de procesar (profundidad de la cola de subidas)
+        metrics.uploads_in_progress.inc(len(files))
+        try:
+            for file in files:
+                if file.filename == '':
+                    continue
                 
-            if file and allowed_file(file.filename, current_app.config['ALLOWED_EXTENSIONS']):
-                # Crear carpeta para la fecha
-                date_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], date_str)
-                os.makedirs(date_folder, exist_ok=True)
+                if file and allowed_file(file.filename, current_app.config['ALLOWED_EXTENSIONS']):
+                    # Crear carpeta para la fecha
+                    date_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], date_str)
+                    os.makedirs(date_folder, exist_ok=True)
                 
-                # Generar nombre único
-                filename = secure_filename(file.filename)
-                timestamp = datetime.now().strftime('%H%M%S')
-                name, ext = os.path.splitext(filename)
-                new_filename = f"{name}_{timestamp}{ext}"
+                    # Generar nombre único
+                    filename = secure_filename(file.filename)
+                    timestamp = datetime.now().strftime('%H%M%S')
+                    name, ext = os.path.splitext(filename)
+                    new_filename = f"{name}_{timestamp}{ext}"
                 
-                file_path = os.path.join(date_folder, new_filename)
-                file.save(file_path)
+                    file_path = os.path.join(date_folder, new_filename)
+                    file.save(file_path)
                 
-                # Redimensionar si es imagen
-                if ext.lower() in ['.jpg', '.jpeg', '.png', '.gif']:
-                    resize_image(file_path)
+                    # Redimensionar si es imagen
+                    if ext.lower() in ['.jpg', '.jpeg', '.png', '.gif']:
+                        resize_image(file_path)
                 
-                # Guardar en base de datos
-                photo = Photo(
-                    filename=new_filename,
-                    original_filename=file.filename,
-                    file_path=f'uploads/{date_str}/{new_filename}',
-                    date_taken=date_obj,
-                    uploaded_by=current_user.username
-                )
+                    # Guardar en base de datos
+                    photo = Photo(
+                        filename=new_filename,
+                        original_filename=file.filename,
+                        file_path=f'uploads/{date_str}/{new_filename}',
+                        date_taken=date_obj,
+                        uploaded_by=current_user.username
+                    )
                 
-                db.session.add(photo)
-                uploaded_count += 1
-            else:
-                flash(f'Archivo no válido: {file.filename}', 'error')
+                    db.session.add(photo)
+                    uploaded_count += 1
+                else:
+                    flash(f'Archivo no válido: {file.filename}', 'error')
+        finally:
+            metrics.uploads_in_progress.dec(len(files))
         
         if uploaded_count > 0:
             db.session.commit()
@@ -473,7 +524,11 @@ def delete_api_integration(integration_id):
     integration = ApiIntegration.query.get_or_404(integration_id)
     
     try:
-        # Eliminar datos asociados
+        # Eliminar datos asociados (borrado masivo: invalidar los meses a mano)
+        affected_dates = [day for (day,) in db.session.query(ApiData.date_for).filter_by(
+            integration_id=integration_id).distinct()]
+        bump_dates(affected_dates)
+        record_bulk_change(affected_dates, 'api')
         ApiData.query.filter_by(integration_id=integration_id).delete()
         
         # Eliminar integración
@@ -586,10 +641,11 @@ def view_notes(date_str):
         date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
         
         # Filtrar notas según permisos
+        with_order = CalendarNote.query.options(selectinload(CalendarNote.order).selectinload(CalendarOrder.items))
         if current_user.is_admin or current_user.is_super_admin:
-            notes = CalendarNote.query.filter_by(date_for=date_obj).order_by(CalendarNote.priority.desc(), CalendarNote.created_at.desc()).all()
+            notes = with_order.filter_by(date_for=date_obj).order_by(CalendarNote.priority.desc(), CalendarNote.created_at.desc()).all()
         else:
-            notes = CalendarNote.query.filter(
+            notes = with_order.filter(
                 CalendarNote.date_for == date_obj,
                 (CalendarNote.is_private == False) | 
                 (CalendarNote.created_by == current_user.id)
@@ -707,21 +763,17 @@ def api_get_notes(date_str):
         date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
         
         # Filtrar notas según permisos
-        if current_user.is_admin or current_user.is_super_admin:
-            notes = CalendarNote.query.filter_by(date_for=date_obj).all()
-        else:
-            notes = CalendarNote.query.filter(
-                CalendarNote.date_for == date_obj,
-                (CalendarNote.is_private == False) | 
-                (CalendarNote.created_by == current_user.id)
-            ).all()
+        notes = CalendarSummaryService.visible_notes(
+            CalendarNote.query.options(selectinload(CalendarNote.order).selectinload(CalendarOrder.items))
+            .filter_by(date_for=date_obj), current_user
+        ).all()
         
         notes_data = []
         for note in notes:
             notes_data.append({
                 'id': note.id,
                 'title': note.title,
-                'content': note.content,
+                'content': note.display_content,
                 'color': note.color,
                 'priority': note.priority,
                 'is_private': note.is_private,
@@ -736,6 +788,72 @@ def api_get_notes(date_str):
     except ValueError:
         return jsonify({'error': 'Fecha inválida'}), 400
 
+@bp.route('/api/notes', methods=['GET'])
+@login_required
+def api_get_notes_range():
+    """API para obtener las notas de un rango de fechas agrupadas por día (JSON)"""
+    try:
+        start = datetime.strptime(request.args.get('from', ''), '%Y-%m-%d').date()
+        end = datetime.strptime(request.args.get('to', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Parámetros from/to inválidos. Use YYYY-MM-DD'}), 400
+    
+    if end < start:
+        return jsonify({'error': 'La fecha final es anterior a la inicial'}), 400
+    if (end - start).days >= NOTES_RANGE_MAX_DAYS:
+        return jsonify({'error': f'El rango no puede superar {NOTES_RANGE_MAX_DAYS} días'}), 400
+    
+    try:
+        fields = CalendarSummaryService.parse_note_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'fields': fields,
+        'notes': CalendarSummaryService.notes_by_date(start, end, current_user, fields)
+    })
+
+def parse_search_args(args):
+    """Lee q, from y to de la búsqueda; las fechas inválidas se ignoran"""
+    def parse_date(value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+        except ValueError:
+            return None
+    
+    return args.get('q', '').strip(), parse_date(args.get('from')), parse_date(args.get('to'))
+
+@bp.route('/search')
+@login_required
+@requires_privilege('can_view_calendar')
+def search_notes():
+    """Buscar en notas y pedidos (cliente, teléfono, destinatario, dedicatoria...)"""
+    query_text, start, end = parse_search_args(request.args)
+    results = NoteSearchService.search(query_text, current_user, start, end) if query_text else []
+    
+    return render_template('search.html',
+                         query=query_text,
+                         start_date=start,
+                         end_date=end,
+                         results=results)
+
+@bp.route('/api/search/notes')
+@login_required
+@requires_privilege('can_view_calendar')
+def api_search_notes():
+    """API de búsqueda en notas y pedidos, ordenada por relevancia (JSON)"""
+    query_text, start, end = parse_search_args(request.args)
+    if not query_text:
+        return jsonify({'error': 'Parámetro q requerido'}), 400
+    
+    limit = request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int)
+    offset = max(0, request.args.get('offset', 0, type=int))
+    results = NoteSearchService.search(query_text, current_user, start, end, limit=limit, offset=offset)
+    
+    return jsonify({'query': query_text, 'results': results, 'offset': offset})
+
 
 # API ENDPOINTS PARA GESTIÓN DE NOTAS
 # =============================================================================
@@ -801,7 +919,7 @@ def api_create_note():
                 'id': note.id,
                 'date_for': note.date_for.strftime('%Y-%m-%d'),
                 'title': note.title,
-                'content': note.content,
+                'content': note.display_content,
                 'color': note.color,
                 'priority': note.priority,
                 'is_private': note.is_private,
@@ -874,7 +992,7 @@ def api_update_note(note_id):
                 'id': note.id,
                 'date_for': note.date_for.strftime('%Y-%m-%d'),
                 'title': note.title,
-                'content': note.content,
+                'content': note.display_content,
                 'color': note.color,
                 'priority': note.priority,
                 'is_private': note.is_private,
@@ -957,7 +1075,7 @@ def api_quick_note(date_str):
                 'id': note.id,
                 'date_for': note.date_for.strftime('%Y-%m-%d'),
                 'title': note.title,
-                'content': note.content,
+                'content': note.display_content,
                 'color': note.color,
                 'priority': note.priority,
                 'creator': current_user.full_name or current_user.username
@@ -978,14 +1096,9 @@ def api_check_notes(date_str):
         date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
         
         # Contar notas según permisos
-        if current_user.is_admin or current_user.is_super_admin:
-            note_count = CalendarNote.query.filter_by(date_for=date_obj).count()
-        else:
-            note_count = CalendarNote.query.filter(
-                CalendarNote.date_for == date_obj,
-                (CalendarNote.is_private == False) | 
-                (CalendarNote.created_by == current_user.id)
-            ).count()
+        note_count = CalendarSummaryService.visible_notes(
+            CalendarNote.query.filter_by(date_for=date_obj), current_user
+        ).count()
         
         return jsonify({
             'date': date_str,
@@ -1000,6 +1113,75 @@ def api_check_notes(date_str):
 # WEBHOOKS Y INTEGRACIONES AUTOMÁTICAS
 # =============================================================================
 
+@bp.route('/api/calendar/<int:year>/<int:month>', methods=['GET'])
+@login_required
+@requires_privilege('can_view_calendar')
+def api_calendar_month(year, month):
+    """API: resumen compacto por día de un mes, con ETag y respuesta 304"""
+    if not 1 <= month <= 12 or not 1 <= year <= 9999:
+        return jsonify({'error': 'Mes inválido'}), 400
+    
+    # El ETag depende solo del contador del mes y de qué notas puede ver el usuario
+    version = month_version(year, month)
+    scope = CalendarSummaryService.visibility_scope(current_user)
+    etag = f'cal-{year}-{month:02d}-v{version}-{scope}'
+    
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify({
+            'year': year,
+            'month': month,
+            'version': version,
+            'days': CalendarSummaryService.month_summary(year, month, current_user)
+        })
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@bp.route('/api/forecast', methods=['GET'])
+@login_required
+@requires_privilege('can_view_calendar')
+def api_demand_forecast():
+    """API: previsión de unidades por producto para los próximos días (?start=&days=)"""
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else date.today()
+    except ValueError:
+        return jsonify({'error': 'Fecha inválida'}), 400
+    days = request.args.get('days', DEFAULT_FORECAST_DAYS, type=int)
+    if not 1 <= days <= MAX_FORECAST_DAYS:
+        return jsonify({'error': f'days debe estar entre 1 y {MAX_FORECAST_DAYS}'}), 400
+    
+    return jsonify({
+        'start': start.isoformat(),
+        'days': days,
+        'forecast': DemandForecastService.forecast(start, days)
+    })
+
+@bp.route('/api/calendar/events', methods=['GET'])
+@login_required
+@requires_privilege('can_view_calendar')
+def api_calendar_events():
+    """Stream SSE con los cambios del calendario (fecha, tipo e id)"""
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = request.args.get('last_id', type=int)
+    
+    prune_changes(timedelta(hours=current_app.config.get('CALENDAR_EVENTS_RETENTION_HOURS', 24)))
+    
+    stream = event_stream(
+        current_user.id,
+        current_user.is_admin or current_user.is_super_admin,
+        last_id=last_id,
+        duration=current_app.config.get('CALENDAR_EVENTS_STREAM_SECONDS', 55),
+        poll_interval=current_app.config.get('CALENDAR_EVENTS_POLL_SECONDS', 2)
+    )
+    response = Response(stream_with_context(stream), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Sin buffer en nginx
+    return response
+
 @bp.route('/webhook/woocommerce', methods=['POST'])
 def woocommerce_webhook():
     """
@@ -1008,18 +1190,21 @@ def woocommerce_webhook():
     try:
         # Verificar que es una petición POST con JSON
         if not request.is_json:
+            metrics.woocommerce_webhooks.inc(outcome='invalid')
             return jsonify({'error': 'Content-Type debe ser application/json'}), 400
         
         data = request.get_json()
         
         # Verificar datos mínimos requeridos
         if not data or 'id' not in data or 'status' not in data:
+            metrics.woocommerce_webhooks.inc(outcome='invalid')
             return jsonify({'error': 'Datos de pedido incompletos'}), 400
         
         # Procesar el pedido usando la función centralizada
         result = process_woocommerce_order(data)
         
         if result['success']:
+            metrics.woocommerce_webhooks.inc(outcome='processed')
             return jsonify({
                 'success': True,
                 'message': result['message'],
@@ -1029,14 +1214,15 @@ def woocommerce_webhook():
                 'action': result['action']
             }), 200
         else:
+            metrics.woocommerce_webhooks.inc(outcome='failed')
             return jsonify({
                 'error': 'Error procesando pedido',
                 'message': result['error']
             }), 500
         
     except Exception as e:
-        # Log del error para debugging
-        print(f"Error procesando webhook WooCommerce: {str(e)}")
+        metrics.woocommerce_webhooks.inc(outcome='error')
+        current_app.logger.exception('Error procesando webhook WooCommerce')
         
         return jsonify({
             'error': 'Error interno del servidor',
@@ -1136,129 +1322,16 @@ def manual_woocommerce_sync():
                 'message': 'Configure primero una integración de WooCommerce'
             }), 400
         
-        # Obtener pedidos reales de WooCommerce usando la integración configurada
+        # Medir la sincronización como las demás integraciones
         try:
-            # Hacer petición directa a WooCommerce API
-            headers = {'User-Agent': 'Floristeria-Calendar/1.0'}
-            if woocommerce_integration.headers:
-                headers.update(json.loads(woocommerce_integration.headers))
-            
-            # Construir URL con parámetros de fecha
-            api_url = woocommerce_integration.url
-            if not api_url.endswith('/'):
-                api_url += '/'
-            
-            # Añadir filtros de fecha para WooCommerce
-            params = {
-                'after': f"{start_date}T00:00:00",
-                'before': f"{end_date}T23:59:59",
-                'per_page': 100,  # Máximo 100 pedidos
-                'status': 'any'   # Todos los estados
-            }
-            
-            print(f"🔄 Obteniendo pedidos de WooCommerce desde: {api_url}")
-            print(f"📅 Rango: {start_date} a {end_date}")
-            
-            response = requests.get(
-                api_url,
-                headers=headers,
-                params=params,
-                timeout=30,
-                auth=(woocommerce_integration.api_key or '', woocommerce_integration.request_body or '') if woocommerce_integration.api_key else None
-            )
-            
-            if response.status_code == 200:
-                woocommerce_orders = response.json()
-                print(f"✅ Pedidos obtenidos de WooCommerce: {len(woocommerce_orders)}")
-                
-                # Filtrar pedidos adicional por fecha (por si el filtro de API no funcionó perfectamente)
-                filtered_orders = []
-                start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-                end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-                
-                for order in woocommerce_orders:
-                    try:
-                        order_date_str = order.get('date_created', '')
-                        if 'T' in order_date_str:
-                            order_date = datetime.fromisoformat(order_date_str.replace('Z', '+00:00')).date()
-                        else:
-                            order_date = datetime.strptime(order_date_str[:10], '%Y-%m-%d').date()
-                        
-                        if start_date_obj <= order_date <= end_date_obj:
-                            filtered_orders.append(order)
-                    except:
-                        # Si no se puede parsear la fecha, incluir el pedido de todas formas
-                        filtered_orders.append(order)
-                
-                print(f"📊 Pedidos filtrados por fecha: {len(filtered_orders)}")
-            else:
-                print(f"⚠️ Error de API WooCommerce: {response.status_code} - {response.text[:200]}")
-                raise Exception(f"Error de API: {response.status_code}")
-                
-        except Exception as e:
-            print(f"❌ Error obteniendo datos de WooCommerce: {str(e)}")
-            # Fallback a datos simulados si hay error
-            filtered_orders = [
-                {
-                    "id": 9001,
-                    "status": "processing",
-                    "total": "125.50",
-                    "currency": "EUR",
-                    "date_created": start_date + "T10:30:00",
-                    "billing": {
-                        "first_name": "María",
-                        "last_name": "González (Simulado)",
-                        "email": "maria.gonzalez@email.com",
-                        "phone": "+34 666 111 222"
-                    },
-                    "line_items": [
-                        {"name": "Ramo de novia clásico (Simulado)", "quantity": 1},
-                        {"name": "Boutonniere (Simulado)", "quantity": 2}
-                    ]
-                }
-            ]
-            print("⚠️ Usando datos simulados debido al error")
-        
-        synced_count = 0
-        updated_count = 0
-        error_count = 0
-        
-        for order_data in filtered_orders:
-            try:
-                # Procesar cada pedido usando la misma lógica del webhook
-                result = process_woocommerce_order(order_data)
-                
-                if result['success']:
-                    if result['action'] == 'creado':
-                        synced_count += 1
-                    else:
-                        updated_count += 1
-                else:
-                    error_count += 1
-                    
-            except Exception as e:
-                error_count += 1
-                print(f"Error procesando pedido {order_data.get('id', 'unknown')}: {str(e)}")
-        
-        # Actualizar estado de la integración
-        woocommerce_integration.last_sync = datetime.utcnow()
-        woocommerce_integration.last_sync_status = 'success' if error_count == 0 else 'partial'
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': f'Sincronización completada: {synced_count} nuevos, {updated_count} actualizados, {error_count} errores',
-            'details': {
-                'start_date': start_date,
-                'end_date': end_date,
-                'synced_orders': synced_count,
-                'updated_orders': updated_count,
-                'errors': error_count,
-                'total_processed': synced_count + updated_count + error_count,
-                'total_found': len(filtered_orders),
-                'data_source': 'WooCommerce API' if 'filtered_orders' in locals() and len(filtered_orders) > 1 else 'Datos simulados'
-            }
-        }), 200
+            with metrics.integration_sync_duration.time(api_type='woocommerce'):
+                result, status = sync_woocommerce_orders(woocommerce_integration, start_date, end_date)
+        except Exception:
+            metrics.integration_sync_errors.inc(api_type='woocommerce')
+            raise
+        if status != 200 or result.get('partial'):
+            metrics.integration_sync_errors.inc(api_type='woocommerce')
+        return jsonify(result), status
         
     except Exception as e:
         return jsonify({
@@ -1267,235 +1340,162 @@ def manual_woocommerce_sync():
         }), 500
 
 
-def process_woocommerce_order(order_data):
+def sync_woocommerce_orders(integration, start_date, end_date):
     """
-    Procesa un pedido de WooCommerce y lo convierte en nota del calendario
-    Extrae información detallada incluyendo dedicatoria, entrega y productos
+    Descarga de la API de WooCommerce los pedidos entre ``start_date`` y
+    ``end_date`` y los guarda en el calendario. Devuelve el cuerpo de la
+    respuesta y el código HTTP.
     """
-    try:
-        # Extraer información básica del pedido
-        order_id = order_data.get('id')
-        order_status = order_data.get('status')
-        order_date = order_data.get('date_created', datetime.now().isoformat())
-        
-        # Información del cliente (facturación)
-        billing = order_data.get('billing', {})
-        customer_name = f"{billing.get('first_name', '')} {billing.get('last_name', '')}".strip()
-        if not customer_name:
-            customer_name = billing.get('email', 'Cliente sin nombre')
-        
-        # Información de entrega
-        shipping = order_data.get('shipping', {})
-        delivery_name = f"{shipping.get('first_name', '')} {shipping.get('last_name', '')}".strip()
-        delivery_address = []
-        if shipping.get('address_1'):
-            delivery_address.append(shipping['address_1'])
-        if shipping.get('address_2'):
-            delivery_address.append(shipping['address_2'])
-        if shipping.get('city'):
-            delivery_address.append(shipping['city'])
-        if shipping.get('postcode'):
-            delivery_address.append(shipping['postcode'])
-        
-        # Información financiera
-        total = order_data.get('total', '0')
-        currency = order_data.get('currency', 'EUR')
-        
-        # Buscar fecha de entrega preferida en meta_data
-        delivery_date = None
-        meta_data = order_data.get('meta_data', [])
-        for meta in meta_data:
-            if meta.get('key') == 'ywcdd_order_delivery_date':
-                delivery_date = meta.get('value')
-                break
-        
-        # Procesar productos y extraer dedicatorias
-        line_items = order_data.get('line_items', [])
-        products_info = []
-        dedication_messages = []
-        
-        for item in line_items:
-            product_name = item.get('name', 'Producto')
-            quantity = item.get('quantity', 1)
-            price = item.get('total', '0')
-            
-            # Información básica del producto
-            product_info = f"{product_name} (x{quantity}) - {price}€"
-            
-            # Buscar configuraciones adicionales en meta_data
-            item_meta = item.get('meta_data', [])
-            config_parts = []
-            
-            for meta in item_meta:
-                key = meta.get('display_key', meta.get('key', ''))
-                value = meta.get('display_value', meta.get('value', ''))
-                
-                # Extraer dedicatoria
-                if 'dedicatoria' in key.lower() and isinstance(value, str) and len(value) > 10:
-                    # Limpiar saltos de línea de Windows
-                    clean_dedication = value.replace('\r\n', '\n').replace('\r', '\n')
-                    if clean_dedication not in dedication_messages:
-                        dedication_messages.append(clean_dedication)
-                
-                # Otras configuraciones del producto
-                elif key and value and key != 'Dedicatoria' and not key.startswith('_'):
-                    if isinstance(value, str) and 'Dedicatoria' not in value:
-                        config_parts.append(f"{key}: {value}")
+    # Obtener pedidos reales de WooCommerce usando la integración configurada
+    headers = {'User-Agent': 'Floristeria-Calendar/1.0'}
+    if integration.headers:
+        headers.update(json.loads(integration.headers))
+    
+    # Construir URL con parámetros de fecha
+    api_url = integration.url
+    if not api_url.endswith('/'):
+        api_url += '/'
+    
+    # Añadir filtros de fecha para WooCommerce
+    params = {
+        'after': f"{start_date}T00:00:00",
+        'before': f"{end_date}T23:59:59",
+        'per_page': SYNC_PAGE_SIZE,
+        'status': 'any'   # Todos los estados
+    }
+    auth = (integration.api_key or '', integration.request_body or '') \
+        if integration.api_key else None
+    
+    current_app.logger.info('Sincronización WooCommerce desde %s (%s a %s)', api_url, start_date, end_date)
+    
+    # Recorrer todas las páginas (WooCommerce indica el total en X-WP-TotalPages).
+    # Si una página falla se procesan las ya leídas y la sincronización queda como parcial.
+    woocommerce_orders = []
+    pages_fetched = 0
+    fetch_error = None
+    page = 1
+    while True:
+        try:
+            response = requests.get(api_url, headers=headers, params=dict(params, page=page),
+                                    timeout=30, auth=auth)
+        except requests.RequestException as e:
+            fetch_error = f'Error de conexión en la página {page}: {e}'
+            break
+        if response.status_code != 200:
+            fetch_error = f'Error de API en la página {page}: {response.status_code} - {response.text[:200]}'
+            break
+        
+        batch = response.json()
+        woocommerce_orders.extend(batch)
+        pages_fetched = page
+        total_pages = int(response.headers.get('X-WP-TotalPages') or 1)
+        if not batch or page >= min(total_pages, SYNC_MAX_PAGES):
+            break
+        page += 1
+    
+    if fetch_error:
+        current_app.logger.warning('Sincronización WooCommerce: %s', fetch_error)
+    if pages_fetched == 0:
+        integration.last_sync = datetime.utcnow()
+        integration.last_sync_status = 'error'
+        integration.last_error = fetch_error
+        db.session.commit()
+        return {
+            'error': 'No se pudieron obtener pedidos de WooCommerce',
+            'message': fetch_error
+        }, 502
+    
+    current_app.logger.info('Pedidos obtenidos de WooCommerce: %d (%d páginas)',
+                            len(woocommerce_orders), pages_fetched)
+    
+    # Filtrar pedidos adicional por fecha (por si el filtro de API no funcionó perfectamente)
+    filtered_orders = []
+    start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
+    end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
+    
+    for order in woocommerce_orders:
+        try:
+            order_date_str = order.get('date_created', '')
+            if 'T' in order_date_str:
+                order_date = datetime.fromisoformat(order_date_str.replace('Z', '+00:00')).date()
+            else:
+                order_date = datetime.strptime(order_date_str[:10], '%Y-%m-%d').date()
             
-            # Añadir configuraciones al producto si las hay
-            if config_parts:
-                product_info += f" ({', '.join(config_parts)})"
+            if start_date_obj <= order_date <= end_date_obj:
+                filtered_orders.append(order)
+        except (TypeError, ValueError):
+            # Si no se puede parsear la fecha, incluir el pedido de todas formas
+            filtered_orders.append(order)
+    
+    synced_count = 0
+    updated_count = 0
+    error_count = 0
+    
+    for order_data in filtered_orders:
+        try:
+            # Procesar cada pedido usando la misma lógica del webhook
+            result = process_woocommerce_order(order_data)
             
-            products_info.append(product_info)
-        
-        # Determinar fecha para el calendario
-        calendar_date = None
-        
-        # Prioridad: fecha de entrega > fecha del pedido
-        if delivery_date:
-            try:
-                calendar_date = datetime.strptime(delivery_date, '%Y-%m-%d').date()
-            except:
-                pass
-        
-        if not calendar_date:
-            try:
-                if 'T' in order_date:
-                    order_datetime = datetime.fromisoformat(order_date.replace('Z', '+00:00'))
+            if result['success']:
+                if result['action'] == 'creado':
+                    synced_count += 1
                 else:
-                    order_datetime = datetime.strptime(order_date, '%Y-%m-%d')
-                calendar_date = order_datetime.date()
-            except:
-                calendar_date = date.today()
-        
-        # Configuración de colores y prioridades
-        status_config = {
-            'pending': {'color': '#ffc107', 'priority': 'normal'},
-            'processing': {'color': '#007bff', 'priority': 'high'},
-            'on-hold': {'color': '#fd7e14', 'priority': 'high'},
-            'completed': {'color': '#28a745', 'priority': 'normal'},
-            'cancelled': {'color': '#dc3545', 'priority': 'low'},
-            'refunded': {'color': '#6c757d', 'priority': 'low'},
-            'failed': {'color': '#dc3545', 'priority': 'normal'}
+                    updated_count += 1
+            else:
+                error_count += 1
+                
+        except Exception:
+            error_count += 1
+            current_app.logger.exception('Error procesando pedido %s', order_data.get('id', 'unknown'))
+    
+    # Actualizar estado de la integración
+    partial = fetch_error is not None or error_count > 0
+    integration.last_sync = datetime.utcnow()
+    integration.last_sync_status = 'partial' if partial else 'success'
+    integration.last_error = fetch_error
+    db.session.commit()
+    
+    message = f'Sincronización completada: {synced_count} nuevos, {updated_count} actualizados, {error_count} errores'
+    if fetch_error:
+        message = f'Sincronización parcial ({pages_fetched} páginas leídas): ' + message.split(': ', 1)[1]
+    
+    return {
+        'success': True,
+        'partial': partial,
+        'message': message,
+        'details': {
+            'start_date': start_date,
+            'end_date': end_date,
+            'synced_orders': synced_count,
+            'updated_orders': updated_count,
+            'errors': error_count,
+            'total_processed': synced_count + updated_count + error_count,
+            'total_found': len(filtered_orders),
+            'pages_fetched': pages_fetched,
+            'fetch_error': fetch_error,
+            'data_source': 'WooCommerce API'
         }
+    }, 200
+
+
+def process_woocommerce_order(order_data):
+    """
+    Procesa un pedido de WooCommerce y lo convierte en nota del calendario
+    Guarda cliente, entrega, productos y dedicatoria como datos estructurados
+    """
+    try:
+        order_id = order_data.get('id')
         
-        config = status_config.get(order_status, {'color': '#ffc107', 'priority': 'normal'})
-        
-        # Traducir estados
-        status_text = {
-            'pending': 'Pendiente',
-            'processing': 'Procesando',
-            'on-hold': 'En espera',
-            'completed': 'Completado',
-            'cancelled': 'Cancelado',
-            'refunded': 'Reembolsado',
-            'failed': 'Fallido'
-        }.get(order_status, order_status.title())
-        
-        # Crear título de la nota
-        if delivery_name and delivery_name != customer_name:
-            title = f"🌹 Pedido #{order_id} - {customer_name} → {delivery_name}"
-        else:
-            title = f"🌹 Pedido #{order_id} - {customer_name}"
-        
-        # Construir contenido detallado
-        content_parts = [
-            f"📋 ESTADO: {status_text}",
-            f"💰 TOTAL: {total} {currency}",
-            ""
-        ]
-        
-        # Información del cliente
-        content_parts.append("👤 CLIENTE:")
-        content_parts.append(f"   • Nombre: {customer_name}")
-        if billing.get('email'):
-            content_parts.append(f"   • Email: {billing['email']}")
-        if billing.get('phone'):
-            content_parts.append(f"   • Teléfono: {billing['phone']}")
-        
-        # Información de entrega
-        if delivery_name or delivery_address:
-            content_parts.append("")
-            content_parts.append("🚚 ENTREGA:")
-            if delivery_name:
-                content_parts.append(f"   • Destinatario: {delivery_name}")
-            if shipping.get('phone') and shipping['phone'] != billing.get('phone'):
-                content_parts.append(f"   • Teléfono entrega: {shipping['phone']}")
-            if delivery_address:
-                content_parts.append(f"   • Dirección: {', '.join(delivery_address)}")
-            if delivery_date:
-                content_parts.append(f"   • Fecha entrega: {delivery_date}")
-        
-        # Productos
-        if products_info:
-            content_parts.append("")
-            content_parts.append("🌺 PRODUCTOS:")
-            for product in products_info:
-                content_parts.append(f"   • {product}")
-        
-        # Dedicatorias (¡MUY IMPORTANTE para floristerías!)
-        if dedication_messages:
-            content_parts.append("")
-            content_parts.append("💌 DEDICATORIA:")
-            for i, dedication in enumerate(dedication_messages):
-                if i > 0:
-                    content_parts.append("")
-                # Añadir la dedicatoria con formato especial
-                for line in dedication.split('\n'):
-                    if line.strip():
-                        content_parts.append(f"   📝 {line.strip()}")
-        
-        content = "\n".join(content_parts)
-        
-        # Buscar si ya existe una nota para este pedido
-        existing_note = CalendarNote.query.filter(
-            CalendarNote.title.contains(f"Pedido #{order_id}"),
-            CalendarNote.date_for == calendar_date
-        ).first()
-        
-        if existing_note:
-            # Actualizar nota existente
-            existing_note.content = content
-            existing_note.color = config['color']
-            existing_note.priority = config['priority']
-            existing_note.updated_at = datetime.utcnow()
-            action = 'actualizado'
-        else:
-            # Crear nueva nota
-            admin_user = db.session.query(User).filter_by(is_admin=True).first()
-            if not admin_user:
-                admin_user = db.session.query(User).filter_by(active=True).first()
-            
-            if not admin_user:
-                return {
-                    'success': False,
-                    'error': 'No se encontró usuario para asignar la nota'
-                }
-            
-            new_note = CalendarNote(
-                date_for=calendar_date,
-                title=title,
-                content=content,
-                color=config['color'],
-                priority=config['priority'],
-                is_private=False,
-                is_reminder=False,
-                created_by=admin_user.id
-            )
-            
-            db.session.add(new_note)
-            action = 'creado'
-        
-        # Guardar cambios
-        db.session.commit()
+        # Guardar cambios (el propietario solo se busca si hay que crear la nota)
+        result = WooOrderService.store(order_data)
         
         return {
             'success': True,
-            'message': f'Pedido #{order_id} {action} en el calendario',
-            'date': calendar_date.strftime('%Y-%m-%d'),
+            'message': f'Pedido #{order_id} {result["action"]} en el calendario',
+            'date': result['date'].strftime('%Y-%m-%d'),
             'order_id': order_id,
-            'status': order_status,
-            'action': action
+            'status': order_data.get('status'),
+            'action': result['action']
         }
         
     except Exception as e:
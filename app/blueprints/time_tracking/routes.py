@@ -2,12 +2,17 @@
 Rutas de control horario: fichaje de entrada/salida, descansos, reportes personales
 """
 
-from flask import render_template, request, redirect, url_for, flash, make_response, abort
+from flask import render_template, request, redirect, url_for, flash, abort, current_app, Response, stream_with_context, jsonify
 from flask_login import login_required, current_user
 from datetime import datetime, date, timedelta
-import csv
-import io
 from app.models import TimeEntry, User, db
+from app.utils.time_reports import TimeReportService, REPORT_PERIODS
+from app.utils.time_rollups import TimeRollupService
+from app.utils.time_clock import (
+    TimeClockService, CLOCK_OK, CLOCK_NOT_CLOCKED_IN, CLOCK_NO_BREAK, CLOCK_CLOCKED_OUT
+)
+from app.utils.pagination import wants_json
+from app.utils.report_export import stream_csv, stream_xlsx, xlsx_available, XLSX_MIMETYPE
 from . import bp
 
 def requires_privilege(privilege_name):
@@ -56,9 +61,13 @@ def time_tracking():
         TimeEntry.date >= start_date
     ).order_by(TimeEntry.date.desc()).all()
     
+    # Resumen del mes en curso (una fila de la tabla materializada)
+    month_summary = TimeRollupService.monthly_summary(current_user.id, today.year, today.month)
+    
     return render_template('time_tracking.html',
                          today_entry=today_entry,
                          recent_entries=recent_entries,
+                         month_summary=month_summary,
                          today=today)
 
 @bp.route('/clock_in')
@@ -68,23 +77,14 @@ def clock_in():
     """Fichar entrada"""
     today = date.today()
     
-    # Buscar entrada existente para hoy
-    time_entry = TimeEntry.query.filter_by(
-        user_id=current_user.id,
-        date=today
-    ).first()
-    
-    if time_entry and time_entry.entry_time:
-        flash('Ya has fichado la entrada hoy', 'warning')
-    else:
-        if not time_entry:
-            time_entry = TimeEntry(user_id=current_user.id, date=today)
-        
-        time_entry.entry_time = datetime.now()
-        time_entry.status = 'active'
-        db.session.add(time_entry)
+    result = TimeClockService.clock_in(current_user.id, today)
+    if result == CLOCK_OK:
+        TimeRollupService.refresh(current_user.id, today)
         db.session.commit()
         flash('Entrada registrada correctamente', 'success')
+    else:
+        db.session.rollback()
+        flash('Ya has fichado la entrada hoy', 'warning')
     
     return redirect(url_for('time_tracking.time_tracking'))
 
@@ -95,21 +95,17 @@ def clock_out():
     """Fichar salida"""
     today = date.today()
     
-    time_entry = TimeEntry.query.filter_by(
-        user_id=current_user.id,
-        date=today
-    ).first()
-    
-    if not time_entry or not time_entry.entry_time:
-        flash('Debes fichar la entrada primero', 'error')
-    elif time_entry.exit_time:
-        flash('Ya has fichado la salida hoy', 'warning')
-    else:
-        time_entry.exit_time = datetime.now()
-        time_entry.status = 'completed'
-        time_entry.calculate_total_hours()
+    result = TimeClockService.clock_out(current_user.id, today)
+    if result == CLOCK_OK:
+        TimeRollupService.refresh(current_user.id, today)
         db.session.commit()
         flash('Salida registrada correctamente', 'success')
+    elif result == CLOCK_NOT_CLOCKED_IN:
+        db.session.rollback()
+        flash('Debes fichar la entrada primero', 'error')
+    else:
+        db.session.rollback()
+        flash('Ya has fichado la salida hoy', 'warning')
     
     return redirect(url_for('time_tracking.time_tracking'))
 
@@ -120,21 +116,19 @@ def break_start():
     """Iniciar descanso"""
     today = date.today()
     
-    time_entry = TimeEntry.query.filter_by(
-        user_id=current_user.id,
-        date=today
-    ).first()
-    
-    if not time_entry or not time_entry.entry_time:
-        flash('Debes fichar la entrada primero', 'error')
-    elif time_entry.break_start and not time_entry.break_end:
-        flash('Ya has iniciado el descanso', 'warning')
-    else:
-        
-        time_entry.break_start = datetime.now()
-        time_entry.break_end = None  # Resetear fin de descanso
+    result = TimeClockService.break_start(current_user.id, today)
+    if result == CLOCK_OK:
         db.session.commit()
         flash('Descanso iniciado', 'success')
+    elif result == CLOCK_NOT_CLOCKED_IN:
+        db.session.rollback()
+        flash('Debes fichar la entrada primero', 'error')
+    elif result == CLOCK_CLOCKED_OUT:
+        db.session.rollback()
+        flash('Ya has fichado la salida hoy', 'warning')
+    else:
+        db.session.rollback()
+        flash('Ya has iniciado el descanso', 'warning')
     
     return redirect(url_for('time_tracking.time_tracking'))
 
@@ -145,20 +139,17 @@ def break_end():
     """Finalizar descanso"""
     today = date.today()
     
-    time_entry = TimeEntry.query.filter_by(
-        user_id=current_user.id,
-        date=today
-    ).first()
-    
-    if not time_entry or not time_entry.break_start:
-        flash('Debes iniciar el descanso primero', 'error')
-    elif time_entry.break_end:
-        flash('Ya has finalizado el descanso', 'warning')
-    else:
-        time_entry.break_end = datetime.now()
-        time_entry.calculate_total_hours()
+    result = TimeClockService.break_end(current_user.id, today)
+    if result == CLOCK_OK:
+        TimeRollupService.refresh(current_user.id, today)
         db.session.commit()
         flash('Descanso finalizado', 'success')
+    elif result == CLOCK_NO_BREAK:
+        db.session.rollback()
+        flash('Debes iniciar el descanso primero', 'error')
+    else:
+        db.session.rollback()
+        flash('Ya has finalizado el descanso', 'warning')
     
     return redirect(url_for('time_tracking.time_tracking'))
 
@@ -186,22 +177,34 @@ def time_reports():
     if not end_date:
         end_date = date.today().strftime('%Y-%m-%d')
     
-    # Construir query
-    query = TimeEntry.query
+    start = datetime.strptime(start_date, '%Y-%m-%d').date()
+    end = datetime.strptime(end_date, '%Y-%m-%d').date()
     
     # Si solo puede ver sus propios reportes, filtrar por usuario actual
     if not can_view_all and can_view_own:
-        query = query.filter(TimeEntry.user_id == current_user.id)
         user_id = current_user.id  # Forzar para que no pueda cambiar el filtro
-    elif user_id:
-        query = query.filter(TimeEntry.user_id == user_id)
     
-    query = query.filter(
-        TimeEntry.date >= datetime.strptime(start_date, '%Y-%m-%d').date(),
-        TimeEntry.date <= datetime.strptime(end_date, '%Y-%m-%d').date()
+    # Agrupación del desglose por periodo
+    group_by = request.args.get('group_by', 'day')
+    if group_by not in REPORT_PERIODS:
+        group_by = 'day'
+    
+    # Registros detallados paginados por cursor
+    pagination = TimeReportService.detail_page(
+        start, end, user_id,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        per_page=current_app.config.get('TIME_REPORT_PAGE_SIZE', 50)
     )
     
-    entries = query.order_by(TimeEntry.date.desc()).all()
+    if wants_json(request):
+        return jsonify(pagination.to_dict(serialize_time_entry))
+    
+    # Totales calculados en SQL
+    target_hours = current_app.config.get('TIME_REPORT_DAILY_TARGET_HOURS', 8.0)
+    summary = TimeReportService.user_totals(start, end, user_id, target_hours)
+    totals = TimeReportService.grand_totals(summary)
+    period_totals = TimeReportService.period_totals(start, end, group_by, user_id, target_hours)
     
     # Solo mostrar usuarios si puede ver reportes de todos
     if can_view_all:
@@ -210,22 +213,43 @@ def time_reports():
         users = [current_user]  # Solo mostrar el usuario actual
     
     return render_template('time_reports.html',
-                         entries=entries,
+                         entries=pagination.items,
+                         pagination=pagination,
+                         summary=summary,
+                         totals=totals,
+                         period_totals=period_totals,
+                         group_by=group_by,
+                         target_hours=target_hours,
                          users=users,
                          selected_user_id=user_id,
                          start_date=start_date,
                          end_date=end_date,
                          can_view_all=can_view_all)
 
+def serialize_time_entry(entry):
+    """Datos de un registro de horario para el listado JSON"""
+    return {
+        'id': entry.id,
+        'user_id': entry.user_id,
+        'username': entry.user.username,
+        'date': entry.date.isoformat(),
+        'entry_time': entry.entry_time.isoformat() if entry.entry_time else None,
+        'exit_time': entry.exit_time.isoformat() if entry.exit_time else None,
+        'break_hours': entry.break_hours,
+        'total_hours': entry.total_hours,
+        'status': entry.status,
+    }
+
 @bp.route('/export_time_report')
 @login_required
 @requires_privilege('can_export_data')
 def export_time_report():
-    """Exportar reporte de horarios a CSV"""
+    """Exportar reporte de horarios a CSV (o XLSX con format=xlsx)"""
     # Obtener los mismos filtros que en time_reports
     user_id = request.args.get('user_id', type=int)
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
+    export_format = request.args.get('format', 'csv')
     
     # Configurar fechas por defecto (último mes)
     if not start_date:
@@ -233,48 +257,49 @@ def export_time_report():
     if not end_date:
         end_date = date.today().strftime('%Y-%m-%d')
     
-    # Construir query
-    query = TimeEntry.query
+    start = datetime.strptime(start_date, '%Y-%m-%d').date()
+    end = datetime.strptime(end_date, '%Y-%m-%d').date()
     
-    if user_id:
-        query = query.filter(TimeEntry.user_id == user_id)
+    header = ['Usuario', 'Fecha', 'Entrada', 'Salida', 'Horas Totales', 'Estado']
+    filename = f'reporte_horarios_{start_date}_a_{end_date}'
     
-    query = query.filter(
-        TimeEntry.date >= datetime.strptime(start_date, '%Y-%m-%d').date(),
-        TimeEntry.date <= datetime.strptime(end_date, '%Y-%m-%d').date()
-    )
+    # Filas leídas por lotes y escritas directamente en la respuesta
+    rows = (format_export_row(row, export_format) for row in TimeReportService.export_rows(start, end, user_id))
     
-    entries = query.order_by(TimeEntry.date.desc()).all()
-    
-    # Crear CSV en memoria
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Escribir cabeceras
-    writer.writerow(['Usuario', 'Fecha', 'Entrada', 'Salida', 'Horas Totales', 'Estado'])
-    
-    # Escribir datos
-    for entry in entries:
-        entry_time = entry.entry_time.strftime('%H:%M') if entry.entry_time else '-'
-        exit_time = entry.exit_time.strftime('%H:%M') if entry.exit_time else '-'
-        total_hours = f"{entry.total_hours:.2f}h" if entry.total_hours else '-'
-        
-        writer.writerow([
-            entry.user.username,
-            entry.date.strftime('%d/%m/%Y'),
-            entry_time,
-            exit_time,
-            total_hours,
-            entry.status.title() if entry.status else 'Activo'
-        ])
-    
-    # Crear respuesta
-    output.seek(0)
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'text/csv'
-    response.headers['Content-Disposition'] = f'attachment; filename=reporte_horarios_{start_date}_a_{end_date}.csv'
-    
-    return response
+    if export_format == 'xlsx':
+        if not xlsx_available():
+            flash('La exportación a Excel requiere XlsxWriter (pip install XlsxWriter)', 'error')
+            return redirect(url_for('time_tracking.time_reports', **request.args.to_dict()))
+        body = stream_xlsx(header, rows, sheet_name='Horarios')
+        mimetype = XLSX_MIMETYPE
+        filename += '.xlsx'
+    else:
+        body = stream_csv(header, rows)
+        mimetype = 'text/csv'
+        filename += '.csv'
+    
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
+def format_export_row(row, export_format='csv'):
+    """Formatear una fila de exportación (en XLSX las horas se dejan numéricas)"""
+    if export_format == 'xlsx':
+        total_hours = round(row.total_hours, 2) if row.total_hours else None
+    else:
+        total_hours = f"{row.total_hours:.2f}h" if row.total_hours else '-'
+    
+    return [
+        row.username,
+        row.date.strftime('%d/%m/%Y'),
+        row.entry_time.strftime('%H:%M') if row.entry_time else '-',
+        row.exit_time.strftime('%H:%M') if row.exit_time else '-',
+        total_hours,
+        row.status.title() if row.status else 'Activo'
+    ]
 
 
 @bp.route('/create_time_entry', methods=['GET', 'POST'])
@@ -327,6 +352,7 @@ def create_time_entry():
             entry.calculate_total_hours()
             
             db.session.add(entry)
+            TimeRollupService.refresh(entry.user_id, entry.date)
             db.session.commit()
             
             flash('Registro creado correctamente', 'success')
@@ -392,6 +418,7 @@ def edit_time_entry(entry_id):
             
             # Recalcular horas totales
             entry.calculate_total_hours()
+            TimeRollupService.refresh(entry.user_id, entry.date)
             
             db.session.commit()
             flash('Registro actualizado correctamente', 'success')
@@ -414,7 +441,9 @@ def delete_time_entry(entry_id):
     entry = TimeEntry.query.get_or_404(entry_id)
     
     try:
+        user_id, entry_date = entry.user_id, entry.date
         db.session.delete(entry)
+        TimeRollupService.refresh(user_id, entry_date)
         db.session.commit()
         flash('Registro eliminado correctamente', 'success')
     except Exception as e:
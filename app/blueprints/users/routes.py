@@ -2,10 +2,11 @@
 Rutas de gestión de usuarios: crear, editar, eliminar usuarios y cambio de contraseñas
 """
 
-from flask import render_template, request, redirect, url_for, flash
+from flask import render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_login import login_required, current_user
 from datetime import datetime
 from app.models import User, db
+from app.utils.pagination import keyset_paginate, wants_json
 from . import bp
 
 @bp.route('/manage_users')
@@ -17,8 +18,31 @@ def manage_users():
         return redirect(url_for('calendar.index'))
     
     # Excluir el usuario de emergencia de la gestión normal
-    users = User.query.filter(User.username != 'superadmin').all()
-    return render_template('manage_users.html', users=users)
+    page = keyset_paginate(
+        User.query.filter(User.username != 'superadmin'),
+        [User.id],
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        per_page=current_app.config.get('LIST_PAGE_SIZE', 50)
+    )
+    
+    if wants_json(request):
+        return jsonify(page.to_dict(serialize_user))
+    
+    return render_template('manage_users.html', users=page.items, page=page)
+
+
+def serialize_user(user):
+    """Datos públicos de un usuario para el listado JSON"""
+    return {
+        'id': user.id,
+        'username': user.username,
+        'full_name': user.full_name,
+        'email': user.email,
+        'is_admin': user.is_admin,
+        'is_active': user.is_active,
+        'created_at': user.created_at.isoformat() if user.created_at else None,
+    }
 
 @bp.route('/register', methods=['GET', 'POST'])
 @login_required
@@ -2,15 +2,23 @@
 Modelos de la aplicación
 """
 
-from .user import db, User, TimeEntry, UserDocument, Photo, MaintenanceMode, UpdateLog
+from .user import (db, User, TimeEntry, TimeEntryDailyRollup, TimeEntryMonthlyRollup,
+                   UserDocument, Photo, MaintenanceMode, UpdateLog, CalendarMonthVersion,
+                   CalendarChange, CalendarOrder, CalendarOrderItem)
 
 # Exportar todo lo necesario
 __all__ = [
     'db',
     'User', 
     'TimeEntry', 
+    'TimeEntryDailyRollup',
+    'TimeEntryMonthlyRollup',
     'UserDocument', 
     'Photo', 
     'MaintenanceMode', 
-    'UpdateLog'
+    'UpdateLog',
+    'CalendarMonthVersion',
+    'CalendarChange',
+    'CalendarOrder',
+    'CalendarOrderItem'
 ]
@@ -2,8 +2,10 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
+from app.utils.db_routing import RoutingSession
 
-db = SQLAlchemy()
+# La sesión enruta las lecturas a la réplica si hay una configurada
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -43,6 +45,8 @@ class User(UserMixin, db.Model):
     
     # Relaciones
     time_entries = db.relationship('TimeEntry', backref='user', lazy=True, cascade='all, delete-orphan')
+    daily_rollups = db.relationship('TimeEntryDailyRollup', lazy=True, cascade='all, delete-orphan')
+    monthly_rollups = db.relationship('TimeEntryMonthlyRollup', lazy=True, cascade='all, delete-orphan')
     documents = db.relationship('UserDocument', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
@@ -99,6 +103,12 @@ class User(UserMixin, db.Model):
 
 class TimeEntry(db.Model):
     __tablename__ = 'time_entries'
+    __table_args__ = (
+        # Un único registro por usuario y día: los fichajes se apoyan en esta clave
+        db.UniqueConstraint('user_id', 'date', name='uq_time_entries_user_date'),
+        # Paginación por cursor de los reportes (fecha, id) descendente
+        db.Index('ix_time_entries_date_id', 'date', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -140,8 +150,50 @@ class TimeEntry(db.Model):
     def __repr__(self):
         return f'<TimeEntry {self.user.username} - {self.date}>'
 
+class TimeEntryDailyRollup(db.Model):
+    """Totales diarios de horas por usuario, mantenidos al modificar TimeEntry"""
+    __tablename__ = 'time_rollup_daily'
+    __table_args__ = (
+        db.Index('ix_time_rollup_daily_user_month', 'user_id', 'year', 'month'),
+    )
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    total_hours = db.Column(db.Float, default=0.0)      # Horas trabajadas
+    break_hours = db.Column(db.Float, default=0.0)      # Horas de descanso
+    overtime_hours = db.Column(db.Float, default=0.0)   # Horas por encima de la jornada objetivo
+    days_present = db.Column(db.Integer, default=0)     # 1 si hubo fichaje de entrada
+    entries = db.Column(db.Integer, default=0)          # Registros de TimeEntry del día
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<TimeEntryDailyRollup {self.user_id} - {self.date}>'
+
+class TimeEntryMonthlyRollup(db.Model):
+    """Totales mensuales de horas por usuario, derivados de los totales diarios"""
+    __tablename__ = 'time_rollup_monthly'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    total_hours = db.Column(db.Float, default=0.0)
+    break_hours = db.Column(db.Float, default=0.0)
+    overtime_hours = db.Column(db.Float, default=0.0)
+    days_present = db.Column(db.Integer, default=0)
+    entries = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<TimeEntryMonthlyRollup {self.user_id} - {self.year}/{self.month:02d}>'
+
 class UserDocument(db.Model):
     __tablename__ = 'user_documents'
+    __table_args__ = (
+        # Paginación por cursor del listado de documentos (fecha de subida, id)
+        db.Index('ix_user_documents_uploaded_at_id', 'uploaded_at', 'id'),
+    )
     
     id                  = db.Column(db.Integer, primary_key=True)
     user_id             = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -152,7 +204,7 @@ class UserDocument(db.Model):
     document_type       = db.Column(db.String(50), nullable=False)  # justificante, contrato, nomina, etc.
     description         = db.Column(db.Text, nullable=True)
     date_related        = db.Column(db.Date, nullable=True)  # Fecha relacionada con el documento
-    uploaded_at         = db.Column(db.DateTime, default=datetime.utcnow)
+    uploaded_at         = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     uploaded_by         = db.Column(db.String(80), nullable=False)  # Usuario que subió el documento
     
     def get_document_type_display(self):
@@ -211,22 +263,7 @@ class MaintenanceMode(db.Model):
         if not maintenance:
             maintenance = cls(is_active=False)
             db.session.add(maintenance)
-            
-            # Intentar commit con reintentos para evitar database lock
-            for attempt in range(3):
-                try:
-                    db.session.commit()
-                    break
-                except Exception as e:
-                    if "database is locked" in str(e).lower() and attempt < 2:
-                        try:
-                            db.session.rollback()
-                        except:
-                            pass
-                        import time
-                        time.sleep(0.5)
-                    else:
-                        raise
+            db.session.commit()
         return maintenance
     
     def activate(self, user, message=None, estimated_minutes=30):
@@ -239,21 +276,7 @@ class MaintenanceMode(db.Model):
         if message:
             self.message = message
         
-        # Intentar commit con reintentos para evitar database lock
-        for attempt in range(3):
-            try:
-                db.session.commit()
-                break
-            except Exception as e:
-                if "database is locked" in str(e).lower() and attempt < 2:
-                    try:
-                        db.session.rollback()
-                    except:
-                        pass
-                    import time
-                    time.sleep(0.5)
-                else:
-                    raise
+        db.session.commit()
     
     def deactivate(self):
         """Desactiva el modo mantenimiento"""
@@ -262,21 +285,7 @@ class MaintenanceMode(db.Model):
         self.started_at = None
         self.estimated_end = None
         
-        # Intentar commit con reintentos para evitar database lock
-        for attempt in range(3):
-            try:
-                db.session.commit()
-                break
-            except Exception as e:
-                if "database is locked" in str(e).lower() and attempt < 2:
-                    try:
-                        db.session.rollback()
-                    except:
-                        pass
-                    import time
-                    time.sleep(0.5)
-                else:
-                    raise
+        db.session.commit()
     
     def __repr__(self):
         return f'<MaintenanceMode {self.is_active}>'
@@ -302,21 +311,7 @@ class UpdateLog(db.Model):
         if commit_after:
             self.git_commit_after = commit_after
         
-        # Intentar commit con reintentos para evitar database lock
-        for attempt in range(3):
-            try:
-                db.session.commit()
-                break
-            except Exception as e:
-                if "database is locked" in str(e).lower() and attempt < 2:
-                    try:
-                        db.session.rollback()
-                    except:
-                        pass
-                    import time
-                    time.sleep(0.5)
-                else:
-                    raise
+        db.session.commit()
     
     def mark_failed(self, error_message):
         """Marca la actualización como fallida"""
@@ -324,21 +319,7 @@ class UpdateLog(db.Model):
         self.completed_at = datetime.utcnow()
         self.error_message = error_message
         
-        # Intentar commit con reintentos para evitar database lock
-        for attempt in range(3):
-            try:
-                db.session.commit()
-                break
-            except Exception as e:
-                if "database is locked" in str(e).lower() and attempt < 2:
-                    try:
-                        db.session.rollback()
-                    except:
-                        pass
-                    import time
-                    time.sleep(0.5)
-                else:
-                    raise
+        db.session.commit()
     
     def __repr__(self):
         return f'<UpdateLog {self.started_by} - {self.status}>'
@@ -615,6 +596,16 @@ class CalendarNote(db.Model):
     
     # Relación con el creador
     creator = db.relationship('User', backref='calendar_notes')
+    # Datos estructurados si la nota es un pedido de WooCommerce
+    order = db.relationship('CalendarOrder', backref='note', uselist=False, cascade='all, delete-orphan')
+    
+    @property
+    def display_content(self):
+        """Texto a mostrar: el pedido se renderiza al vuelo y se añaden las notas manuales"""
+        if self.order is None:
+            return self.content
+        rendered = self.order.render_content()
+        return f"{rendered}\n\n{self.content}" if self.content else rendered
     
     def get_priority_display(self):
         priority_map = {
@@ -636,3 +627,147 @@ class CalendarNote(db.Model):
     
     def __repr__(self):
         return f'<CalendarNote {self.title} - {self.date_for}>'
+
+class CalendarOrder(db.Model):
+    """Pedido de WooCommerce asociado a una nota del calendario"""
+    __tablename__ = 'calendar_orders'
+    __table_args__ = (
+        db.Index('ix_calendar_orders_delivery', 'delivery_date', 'delivery_postcode', 'delivery_city'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    note_id = db.Column(db.Integer, db.ForeignKey('calendar_notes.id'), nullable=False, unique=True)
+    wc_order_id = db.Column(db.Integer, nullable=False, unique=True)  # Id del pedido en WooCommerce
+    status = db.Column(db.String(20), nullable=True, index=True)  # pending, processing, completed...
+    total = db.Column(db.Numeric(10, 2), nullable=True)
+    currency = db.Column(db.String(3), nullable=True)
+    ordered_at = db.Column(db.DateTime, nullable=True)  # date_created del pedido
+    
+    # Cliente (facturación)
+    customer_name = db.Column(db.String(200), nullable=True)
+    customer_email = db.Column(db.String(120), nullable=True)
+    customer_phone = db.Column(db.String(30), nullable=True)
+    
+    # Entrega
+    delivery_name = db.Column(db.String(200), nullable=True)
+    delivery_phone = db.Column(db.String(30), nullable=True)
+    delivery_address = db.Column(db.String(300), nullable=True)  # address_1 y address_2
+    delivery_city = db.Column(db.String(100), nullable=True)
+    delivery_postcode = db.Column(db.String(10), nullable=True)
+    delivery_date = db.Column(db.Date, nullable=True)  # Fecha de entrega elegida por el cliente
+    
+    dedication = db.Column(db.Text, nullable=True)  # Dedicatorias separadas por línea en blanco
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    items = db.relationship('CalendarOrderItem', backref='order', cascade='all, delete-orphan',
+                            order_by='CalendarOrderItem.id')
+    
+    def get_status_display(self):
+        status_map = {
+            'pending': 'Pendiente',
+            'processing': 'Procesando',
+            'on-hold': 'En espera',
+            'completed': 'Completado',
+            'cancelled': 'Cancelado',
+            'refunded': 'Reembolsado',
+            'failed': 'Fallido'
+        }
+        return status_map.get(self.status, (self.status or '').title())
+    
+    def render_content(self):
+        """Texto detallado del pedido para las vistas del calendario"""
+        lines = [
+            f"📋 ESTADO: {self.get_status_display()}",
+            f"💰 TOTAL: {self.total if self.total is not None else '0'} {self.currency or 'EUR'}",
+            "",
+            "👤 CLIENTE:",
+            f"   • Nombre: {self.customer_name}",
+        ]
+        if self.customer_email:
+            lines.append(f"   • Email: {self.customer_email}")
+        if self.customer_phone:
+            lines.append(f"   • Teléfono: {self.customer_phone}")
+        
+        address = [part for part in (self.delivery_address, self.delivery_city, self.delivery_postcode) if part]
+        if self.delivery_name or address:
+            lines += ["", "🚚 ENTREGA:"]
+            if self.delivery_name:
+                lines.append(f"   • Destinatario: {self.delivery_name}")
+            if self.delivery_phone and self.delivery_phone != self.customer_phone:
+                lines.append(f"   • Teléfono entrega: {self.delivery_phone}")
+            if address:
+                lines.append(f"   • Dirección: {', '.join(address)}")
+            if self.delivery_date:
+                lines.append(f"   • Fecha entrega: {self.delivery_date.isoformat()}")
+        
+        if self.items:
+            lines += ["", "🌺 PRODUCTOS:"]
+            lines += [f"   • {item.render()}" for item in self.items]
+        
+        if self.dedication:
+            lines += ["", "💌 DEDICATORIA:"]
+            for index, dedication in enumerate(self.dedication.split('\n\n')):
+                if index > 0:
+                    lines.append("")
+                lines += [f"   📝 {line.strip()}" for line in dedication.split('\n') if line.strip()]
+        
+        return "\n".join(lines)
+    
+    def __repr__(self):
+        return f'<CalendarOrder #{self.wc_order_id} - {self.delivery_date}>'
+
+class CalendarOrderItem(db.Model):
+    """Línea de producto de un pedido de WooCommerce"""
+    __tablename__ = 'calendar_order_items'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('calendar_orders.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, nullable=True)  # Id del producto en WooCommerce
+    product_name = db.Column(db.String(200), nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    total = db.Column(db.Numeric(10, 2), nullable=True)
+    options = db.Column(db.Text, nullable=True)  # Configuración elegida ("Tamaño: Grande, Color: Rojo")
+    
+    def render(self):
+        text = f"{self.product_name} (x{self.quantity}) - {self.total if self.total is not None else '0'}€"
+        return f"{text} ({self.options})" if self.options else text
+    
+    def __repr__(self):
+        return f'<CalendarOrderItem {self.product_name} x{self.quantity}>'
+
+class CalendarMonthVersion(db.Model):
+    """Contador de versión por mes del calendario (base del ETag de la API mensual)"""
+    __tablename__ = 'calendar_month_versions'
+    
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)  # Se incrementa con cada cambio del mes
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CalendarMonthVersion {self.year}-{self.month:02d} v{self.version}>'
+
+class CalendarChange(db.Model):
+    """Registro de cambios del calendario para el stream de eventos (SSE) entre workers"""
+    __tablename__ = 'calendar_changes'
+    
+    id = db.Column(db.Integer, primary_key=True)  # Orden global de eventos (Last-Event-ID)
+    date_for = db.Column(db.Date, nullable=False)  # Día afectado
+    kind = db.Column(db.String(20), nullable=False)  # note, order, photo, api
+    object_id = db.Column(db.Integer, nullable=True)  # Id del objeto (None en cambios masivos)
+    action = db.Column(db.String(10), nullable=False, default='updated')  # created, updated, deleted
+    visible_to = db.Column(db.Integer, nullable=True)  # Solo este usuario (notas privadas); None = todos
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def to_event(self):
+        return {
+            'change': self.id,  # Para descartar repetidos al releer la ventana reciente
+            'date': self.date_for.isoformat(),
+            'kind': self.kind,
+            'id': self.object_id,
+            'action': self.action,
+        }
+    
+    def __repr__(self):
+        return f'<CalendarChange {self.kind} {self.object_id} - {self.date_for}>'
@@ -7,6 +7,9 @@ import json
 from datetime import datetime, date, timedelta
 from typing import Dict, List, Any, Optional
 from app.models.user import db, ApiIntegration, ApiData
+from app.utils.calendar_versions import bump_dates
+from app.utils.calendar_events import record_bulk_change
+from app.utils import metrics
 import logging
 
 logger = logging.getLogger(__name__)
@@ -59,7 +62,16 @@ class ApiIntegrationService:
 
     @staticmethod
     def fetch_api_data(integration: ApiIntegration) -> Dict[str, Any]:
-        """Obtiene datos de una API y los mapea según la configuración"""
+        """Obtiene datos de una API y los mapea según la configuración (mide duración y errores)"""
+        api_type = integration.api_type or 'custom'
+        with metrics.integration_sync_duration.time(api_type=api_type):
+            result = ApiIntegrationService._fetch_api_data(integration)
+        if not result.get('success'):
+            metrics.integration_sync_errors.inc(api_type=api_type)
+        return result
+
+    @staticmethod
+    def _fetch_api_data(integration: ApiIntegration) -> Dict[str, Any]:
         try:
             # Preparar headers
             headers = {'User-Agent': 'Floristeria-Calendar/1.0'}
@@ -523,6 +535,8 @@ class ApiIntegrationService:
                 integration_id=integration.id,
                 date_for=target_date
             ).delete()
+            bump_dates([target_date])
+            record_bulk_change([target_date], 'api')
             
             # Procesar cada item según el tipo
             items_created = 0
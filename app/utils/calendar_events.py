@@ -0,0 +1,255 @@
+"""
+Eventos en vivo del calendario
+==============================
+
+Cada cambio confirmado en notas (incluidos los pedidos de WooCommerce), fotos o
+datos de APIs deja una fila ligera en calendar_changes (fecha, tipo, id) dentro
+de la misma transacción. El endpoint SSE lee esa tabla, así que funciona igual
+con varios workers de gunicorn: el worker que confirma el cambio despierta al
+instante a sus propios streams mediante un pub/sub en memoria, y los streams de
+los demás workers lo ven en su siguiente consulta periódica.
+
+El id autoincremental se asigna al insertar, no al confirmar: con dos
+transacciones concurrentes el id 11 puede ser visible antes que el 10. Por eso
+cada stream vuelve a leer desde un umbral inferior (el último id anterior a los
+cambios de los últimos ``REORDER_GRACE`` segundos) y descarta los ids que ya
+envió. Al reconectar se reenvía esa ventana reciente; el cliente descarta los
+ids repetidos.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Optional
+from sqlalchemy import event, func, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from app.models import db, Photo, CalendarChange
+from app.models.user import ApiData, CalendarNote
+
+# Tipo de evento y columna de fecha de cada modelo seguido
+TRACKED_MODELS = {
+    CalendarNote: 'date_for',
+    Photo: 'date_taken',
+    ApiData: 'date_for',
+}
+
+# Clave en session.info que indica cambios pendientes de notificar
+_PENDING_KEY = 'calendar_changes_pending'
+
+# Frecuencia máxima de limpieza del registro por proceso (segundos)
+PRUNE_INTERVAL = 3600
+
+# Segundos durante los que un cambio puede aparecer con un id menor que otro ya visible
+REORDER_GRACE = 10
+_last_prune = 0.0
+
+
+class ChangeBroker:
+    """Pub/sub en memoria: despierta a los streams del proceso al confirmar cambios"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._sequence = 0
+
+    @property
+    def sequence(self) -> int:
+        return self._sequence
+
+    def publish(self):
+        with self._condition:
+            self._sequence += 1
+            self._condition.notify_all()
+
+    def wait(self, seen_sequence: int, timeout: float) -> int:
+        """Espera una publicación posterior a ``seen_sequence`` o hasta ``timeout``"""
+        with self._condition:
+            if self._sequence == seen_sequence:
+                self._condition.wait(timeout)
+            return self._sequence
+
+
+broker = ChangeBroker()
+
+
+def _event_kind(obj) -> str:
+    if isinstance(obj, CalendarNote):
+        # Los pedidos de WooCommerce son notas con su fila en calendar_orders
+        return 'order' if obj.order is not None else 'note'
+    if isinstance(obj, Photo):
+        return 'photo'
+    return 'api'
+
+
+def _change_rows(obj, action: str) -> List[dict]:
+    attribute = TRACKED_MODELS[type(obj)]
+    history = get_history(obj, attribute)
+    dates = set(history.added or []) | set(history.deleted or [])
+    if not dates:
+        dates = {getattr(obj, attribute, None)}
+
+    visible_to = None
+    if isinstance(obj, CalendarNote) and obj.is_private:
+        visible_to = obj.created_by
+
+    return [{
+        'date_for': day,
+        'kind': _event_kind(obj),
+        'object_id': obj.id,
+        'action': action,
+        'visible_to': visible_to,
+        'created_at': datetime.utcnow(),
+    } for day in dates if day is not None]
+
+
+def _after_flush(session, flush_context):
+    rows = []
+    for obj in session.new:
+        if type(obj) in TRACKED_MODELS:
+            rows += _change_rows(obj, 'created')
+    for obj in session.dirty:
+        if type(obj) in TRACKED_MODELS and session.is_modified(obj, include_collections=False):
+            rows += _change_rows(obj, 'updated')
+    for obj in session.deleted:
+        if type(obj) in TRACKED_MODELS:
+            rows += _change_rows(obj, 'deleted')
+
+    if rows:
+        session.connection().execute(insert(CalendarChange.__table__), rows)
+        session.info[_PENDING_KEY] = True
+
+
+def _after_commit(session):
+    if session.info.pop(_PENDING_KEY, False):
+        broker.publish()
+
+
+def _after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def register_listeners():
+    """Activa el registro automático de cambios (idempotente)"""
+    for name, listener in (('after_flush', _after_flush),
+                           ('after_commit', _after_commit),
+                           ('after_rollback', _after_rollback)):
+        if not event.contains(Session, name, listener):
+            event.listen(Session, name, listener)
+
+
+def record_bulk_change(dates: Iterable, kind: str):
+    """Registra cambios hechos con borrados o updates masivos, que no pasan por el flush"""
+    rows = [{
+        'date_for': day,
+        'kind': kind,
+        'object_id': None,
+        'action': 'updated',
+        'visible_to': None,
+        'created_at': datetime.utcnow(),
+    } for day in set(dates) if day is not None]
+    if rows:
+        db.session.execute(insert(CalendarChange.__table__), rows)
+        db.session.info[_PENDING_KEY] = True
+
+
+def latest_change_id() -> int:
+    return db.session.query(func.max(CalendarChange.id)).scalar() or 0
+
+
+def settled_change_id(last_id: int, grace: float = REORDER_GRACE) -> int:
+    """
+    Umbral desde el que releer: ``last_id`` o, si es menor, el id anterior al
+    primer cambio de los últimos ``grace`` segundos (aún pueden llegar ids menores)
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=grace)
+    first_recent = db.session.query(func.min(CalendarChange.id)).filter(
+        CalendarChange.created_at >= cutoff
+    ).scalar()
+    if first_recent is None:
+        return last_id
+    return min(last_id, first_recent - 1)
+
+
+def changes_since(last_id: int, user_id: int, see_all: bool, limit: int = 200,
+                  exclude: Iterable[int] = ()) -> List[CalendarChange]:
+    """Cambios posteriores a ``last_id`` visibles para el usuario, salvo los ids de ``exclude``"""
+    query = CalendarChange.query.filter(CalendarChange.id > last_id)
+    exclude = list(exclude)
+    if exclude:
+        query = query.filter(CalendarChange.id.notin_(exclude))
+    if not see_all:
+        query = query.filter((CalendarChange.visible_to.is_(None)) | (CalendarChange.visible_to == user_id))
+    return query.order_by(CalendarChange.id).limit(limit).all()
+
+
+def prune_changes(retention: timedelta, force: bool = False):
+    """Elimina del registro los cambios más antiguos que ``retention`` (como mucho una vez por hora)"""
+    global _last_prune
+    if not force and time.monotonic() - _last_prune < PRUNE_INTERVAL:
+        return
+    _last_prune = time.monotonic()
+    CalendarChange.query.filter(
+        CalendarChange.created_at < datetime.utcnow() - retention
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def event_stream(user_id: int, see_all: bool, last_id: Optional[int] = None,
+                 duration: float = 55, poll_interval: float = 2,
+                 heartbeat: float = 15, grace: float = REORDER_GRACE) -> Iterator[str]:
+    """
+    Genera el stream SSE.
+
+    Termina tras ``duration`` segundos para no retener un worker indefinidamente;
+    EventSource se reconecta solo y continúa desde el Last-Event-ID enviado
+    (el mayor id enviado), releyendo los cambios de los últimos ``grace`` segundos.
+    """
+    # Ids ya enviados por encima del umbral, con su fecha de creación
+    sent = {}
+    if last_id is None:
+        last_id = latest_change_id()
+        floor = settled_change_id(last_id, grace)
+        # Lo confirmado antes de abrir el stream no se envía
+        sent = {change.id: change.created_at
+                for change in changes_since(floor, user_id, see_all=True, limit=None)
+                if change.id <= last_id}
+    else:
+        floor = settled_change_id(last_id, grace)
+    db.session.close()
+
+    yield f'retry: 2000\nid: {last_id}\nevent: ready\ndata: {{}}\n\n'
+
+    deadline = time.monotonic() + duration
+    last_sent = time.monotonic()
+    sequence = broker.sequence
+
+    while True:
+        # Consultar siempre: otros workers escriben en la tabla sin avisar a este proceso
+        changes = changes_since(floor, user_id, see_all, exclude=sent)
+        db.session.close()
+
+        for change in changes:
+            sent[change.id] = change.created_at
+            last_id = max(last_id, change.id)
+            yield f'id: {last_id}\nevent: change\ndata: {json.dumps(change.to_event())}\n\n'
+            last_sent = time.monotonic()
+
+        # Los cambios enviados con más de ``grace`` segundos ya no pueden tener ids
+        # menores pendientes: el umbral avanza hasta ellos
+        cutoff = datetime.utcnow() - timedelta(seconds=grace)
+        settled = [change_id for change_id, created_at in sent.items()
+                   if created_at is not None and created_at < cutoff]
+        if settled:
+            floor = max(floor, max(settled))
+            sent = {change_id: created_at for change_id, created_at in sent.items() if change_id > floor}
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+
+        if time.monotonic() - last_sent >= heartbeat:
+            yield ': keepalive\n\n'
+            last_sent = time.monotonic()
+
+        sequence = broker.wait(sequence, min(poll_interval, remaining))
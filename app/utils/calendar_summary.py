@@ -0,0 +1,161 @@
+"""
+Resumen mensual del calendario
+==============================
+
+Calcula para un mes completo los contadores que muestra cada celda del
+calendario (notas por prioridad, fotos por estado e insignias de APIs) con una
+consulta agrupada por tipo de dato, en lugar de varias consultas por día.
+"""
+
+import calendar
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+from app.models import db, Photo, User, CalendarOrder
+from app.models.user import ApiData, CalendarNote
+
+# Insignias de APIs incluidas por día (el resto solo se cuenta)
+API_BADGES_PER_DAY = 3
+
+# Campos de nota que se pueden pedir en la API por rango (?fields=)
+NOTE_FIELDS = {
+    'id': CalendarNote.id,
+    'title': CalendarNote.title,
+    'content': CalendarNote.content,
+    'color': CalendarNote.color,
+    'priority': CalendarNote.priority,
+    'is_private': CalendarNote.is_private,
+    'is_reminder': CalendarNote.is_reminder,
+    'reminder_time': CalendarNote.reminder_time,
+    'created_at': CalendarNote.created_at,
+}
+# 'creator' se resuelve con un join a users
+DEFAULT_NOTE_FIELDS = tuple(NOTE_FIELDS) + ('creator',)
+
+# Máximo de días por consulta de rango
+NOTES_RANGE_MAX_DAYS = 366
+
+
+class CalendarSummaryService:
+    """Resúmenes compactos por día para la API del calendario"""
+
+    @staticmethod
+    def visible_notes(query, user):
+        """Aplica las reglas de privacidad: los admins ven todo, el resto las públicas y las suyas"""
+        if user.is_admin or user.is_super_admin:
+            return query
+        return query.filter(
+            (CalendarNote.is_private == False) |
+            (CalendarNote.created_by == user.id)
+        )
+
+    @staticmethod
+    def visibility_scope(user) -> str:
+        """Identifica qué notas ve el usuario (parte del ETag)"""
+        if user.is_admin or user.is_super_admin:
+            return 'all'
+        return f'u{user.id}'
+
+    @staticmethod
+    def month_bounds(year: int, month: int):
+        return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+    @staticmethod
+    def month_summary(year: int, month: int, user) -> Dict[str, Any]:
+        """Resumen por día del mes; solo aparecen los días con contenido"""
+        start, end = CalendarSummaryService.month_bounds(year, month)
+        days: Dict[str, Dict[str, Any]] = {}
+
+        def day_entry(value: date) -> Dict[str, Any]:
+            return days.setdefault(value.isoformat(), {'notes': {}, 'photos': {}, 'api': {'count': 0, 'badges': []}})
+
+        # Notas por prioridad
+        notes_query = db.session.query(
+            CalendarNote.date_for, CalendarNote.priority, func.count(CalendarNote.id)
+        ).filter(CalendarNote.date_for >= start, CalendarNote.date_for <= end)
+        notes_query = CalendarSummaryService.visible_notes(notes_query, user)
+        for day, priority, count in notes_query.group_by(CalendarNote.date_for, CalendarNote.priority):
+            day_entry(day)['notes'][priority or 'normal'] = count
+
+        # Fotos por estado
+        photos_query = db.session.query(
+            Photo.date_taken, Photo.status, func.count(Photo.id)
+        ).filter(Photo.date_taken >= start, Photo.date_taken <= end)
+        for day, status, count in photos_query.group_by(Photo.date_taken, Photo.status):
+            day_entry(day)['photos'][status or 'pendiente'] = count
+
+        # Insignias de APIs (sin cargar descripción ni JSON original)
+        api_query = db.session.query(
+            ApiData.date_for, ApiData.title, ApiData.icon, ApiData.color
+        ).filter(
+            ApiData.date_for >= start, ApiData.date_for <= end, ApiData.is_visible == True
+        ).order_by(ApiData.date_for, ApiData.id)
+        for day, title, icon, color in api_query:
+            api = day_entry(day)['api']
+            api['count'] += 1
+            if len(api['badges']) < API_BADGES_PER_DAY:
+                api['badges'].append({'title': title, 'icon': icon, 'color': color})
+
+        return days
+
+    @staticmethod
+    def parse_note_fields(fields: Optional[str]) -> List[str]:
+        """Valida la lista ``fields=a,b,c``; lanza ValueError con campos desconocidos"""
+        if not fields:
+            return list(DEFAULT_NOTE_FIELDS)
+        requested = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = [field for field in requested if field not in DEFAULT_NOTE_FIELDS]
+        if unknown:
+            raise ValueError(f"Campos no soportados: {', '.join(unknown)}")
+        if 'id' not in requested:
+            requested.insert(0, 'id')
+        return requested
+
+    @staticmethod
+    def notes_by_date(start: date, end: date, user, fields: Sequence[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Notas visibles del rango agrupadas por fecha, en una sola consulta.
+
+        Solo se leen las columnas pedidas, de modo que las vistas de lista pueden
+        omitir ``content``. Si se pide, el de los pedidos se renderiza desde
+        calendar_orders con una consulta adicional para todo el rango.
+        """
+        columns = [CalendarNote.date_for] + [NOTE_FIELDS[f].label(f) for f in fields if f in NOTE_FIELDS]
+        with_creator = 'creator' in fields
+        if with_creator:
+            columns += [User.full_name.label('creator_full_name'), User.username.label('creator_username')]
+
+        query = db.session.query(*columns).filter(
+            CalendarNote.date_for >= start, CalendarNote.date_for <= end
+        )
+        if with_creator:
+            query = query.join(User, CalendarNote.created_by == User.id)
+        query = CalendarSummaryService.visible_notes(query, user)
+        query = query.order_by(CalendarNote.date_for, CalendarNote.created_at, CalendarNote.id)
+
+        notes: Dict[str, List[Dict[str, Any]]] = {}
+        by_id: Dict[int, Dict[str, Any]] = {}
+        for row in query:
+            note = {}
+            for field in fields:
+                if field == 'creator':
+                    note['creator'] = row.creator_full_name or row.creator_username
+                    continue
+                value = getattr(row, field)
+                if field == 'reminder_time' and value is not None:
+                    value = value.strftime('%H:%M')
+                elif field == 'created_at' and value is not None:
+                    value = value.isoformat()
+                note[field] = value
+            notes.setdefault(row.date_for.isoformat(), []).append(note)
+            by_id[row.id] = note
+
+        if 'content' in fields and by_id:
+            orders = CalendarOrder.query.options(selectinload(CalendarOrder.items)) \
+                .filter(CalendarOrder.note_id.in_(list(by_id)))
+            for order in orders:
+                note = by_id[order.note_id]
+                rendered = order.render_content()
+                note['content'] = f"{rendered}\n\n{note['content']}" if note['content'] else rendered
+        return notes
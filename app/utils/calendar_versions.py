@@ -0,0 +1,105 @@
+"""
+Versiones por mes del calendario
+================================
+
+Cada cambio en notas, pedidos, fotos o datos de APIs incrementa el contador del mes de
+la fecha afectada (tabla calendar_month_versions). La API mensual del calendario
+construye su ETag con ese contador, así que los clientes que sondean reciben un
+304 sin que el servidor recalcule el resumen mientras el mes no cambie.
+
+Los cambios hechos con la sesión del ORM se detectan solos en ``after_flush``;
+los borrados masivos (``query.delete()``) deben llamar a ``bump_dates``.
+"""
+
+from datetime import date
+from typing import Iterable, Set, Tuple
+from sqlalchemy import event, insert, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from app.models import db, Photo, CalendarMonthVersion, CalendarOrder
+from app.models.user import ApiData, CalendarNote
+
+# Modelos del calendario y la columna de fecha que determina su mes
+TRACKED_DATE_COLUMNS = {
+    CalendarNote: 'date_for',
+    Photo: 'date_taken',
+    ApiData: 'date_for',
+    CalendarOrder: 'delivery_date',
+}
+
+
+def _months_for(obj) -> Set[Tuple[int, int]]:
+    """Meses afectados por un objeto, incluido el anterior si cambió de fecha"""
+    attribute = TRACKED_DATE_COLUMNS[type(obj)]
+    history = get_history(obj, attribute)
+    values = list(history.added or []) + list(history.deleted or []) + list(history.unchanged or [])
+    if not values:
+        values = [getattr(obj, attribute, None)]
+    return {(value.year, value.month) for value in values if isinstance(value, date)}
+
+
+def _increment_statement(dialect_name: str, year: int, month: int):
+    """Sentencia única que crea o incrementa el contador del mes"""
+    table = CalendarMonthVersion.__table__
+    values = {'year': year, 'month': month, 'version': 1}
+
+    if dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        stmt = sqlite_insert(table).values(**values)
+        return stmt.on_conflict_do_update(index_elements=['year', 'month'],
+                                          set_={'version': table.c.version + 1})
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        stmt = pg_insert(table).values(**values)
+        return stmt.on_conflict_do_update(index_elements=['year', 'month'],
+                                          set_={'version': table.c.version + 1})
+    if dialect_name == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(table).values(**values)
+        return stmt.on_duplicate_key_update(version=table.c.version + 1)
+    return None
+
+
+def _bump(connection, months: Iterable[Tuple[int, int]]):
+    table = CalendarMonthVersion.__table__
+    dialect_name = connection.dialect.name
+    for year, month in sorted(set(months)):
+        stmt = _increment_statement(dialect_name, year, month)
+        if stmt is not None:
+            connection.execute(stmt)
+            continue
+        # Dialectos sin upsert: incrementar y crear la fila si no existía
+        result = connection.execute(update(table).where(table.c.year == year, table.c.month == month)
+                                    .values(version=table.c.version + 1))
+        if not result.rowcount:
+            connection.execute(insert(table).values(year=year, month=month, version=1))
+
+
+def _after_flush(session, flush_context):
+    months = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if type(obj) in TRACKED_DATE_COLUMNS:
+            if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+                continue
+            months |= _months_for(obj)
+    if months:
+        _bump(session.connection(), months)
+
+
+def register_listeners():
+    """Activa el seguimiento automático de cambios (idempotente)"""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+
+
+def bump_dates(dates: Iterable[date]):
+    """Incrementa los meses de las fechas dadas (para borrados o updates masivos)"""
+    months = {(value.year, value.month) for value in dates if value}
+    if months:
+        _bump(db.session.connection(), months)
+
+
+def month_version(year: int, month: int) -> int:
+    """Versión actual del mes (0 si nunca ha cambiado)"""
+    version = db.session.query(CalendarMonthVersion.version).filter_by(year=year, month=month).scalar()
+    return version or 0
@@ -0,0 +1,381 @@
+"""
+Exportación e importación de datos por bloques (SQLite ↔ MySQL)
+===============================================================
+
+Sustituye a ``scripts/export_sqlite_data.py`` + ``import_to_mysql.py`` (un
+``fetchall()`` por tabla, un único JSON con ``indent=2`` y altas de una en
+una por el ORM) para mover la base de datos de producción entre motores:
+
+- ``export_tables`` lee cada tabla por rangos de la clave primaria
+  (``WHERE pk > último ORDER BY pk LIMIT n``) y escribe cada bloque en un
+  fichero NDJSON comprimido con gzip (``<tabla>/000001.ndjson.gz``, una fila
+  por línea como lista de valores). Las columnas y el progreso de cada tabla
+  se guardan en ``manifest.json`` tras cada bloque.
+- ``import_tables`` lee los bloques en orden de dependencias y los inserta
+  con ``executemany`` en lotes de ``batch_rows`` dentro de una transacción
+  por bloque, con las claves foráneas desactivadas durante la carga. El
+  progreso se guarda en ``import_checkpoint.json``.
+
+Las dos operaciones son reanudables: si se interrumpen, al volver a lanzarlas
+continúan desde el último bloque completado. El primer bloque tras un punto
+de control se borra antes de insertarse por su rango de clave, por si llegó a
+confirmarse antes de guardar el punto de control.
+
+Las tablas virtuales de SQLite (el índice FTS5 de búsqueda de notas) no se
+exportan: en el destino se recrean con las migraciones y se rellenan con
+``flask search-index``.
+
+La exportación no es una instantánea si la aplicación sigue escribiendo:
+para una migración conviene activar antes el modo mantenimiento.
+"""
+
+import base64
+import gzip
+import json
+import os
+from contextlib import contextmanager
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+from sqlalchemy import MetaData, Table, and_, select, text, tuple_
+from sqlalchemy.sql import sqltypes
+
+FORMAT = 'ndjson'
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+IMPORT_CHECKPOINT = 'import_checkpoint.json'
+# Filas por fichero de bloque y por executemany
+CHUNK_ROWS = 5000
+BATCH_ROWS = 1000
+# gzip rápido: el cuello de botella debe ser la base de datos, no la compresión
+COMPRESS_LEVEL = 3
+# Tablas internas que no se migran
+SKIP_TABLES = ('alembic_version', 'sqlite_sequence', 'sqlite_stat1')
+# Sufijos de las tablas internas de las tablas virtuales FTS5 de SQLite
+FTS_SHADOW_SUFFIXES = ('_config', '_content', '_data', '_docsize', '_idx')
+
+Progress = Optional[Callable[[str, int], None]]
+
+
+class TransferError(Exception):
+    """Error de exportación o importación de datos"""
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    temporary = path + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as handle:
+        json.dump(data, handle, ensure_ascii=False, indent=1, default=str)
+    os.replace(temporary, path)
+
+
+def read_manifest(folder: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(folder, MANIFEST), encoding='utf-8') as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+def _is_binary(column_type) -> bool:
+    return isinstance(column_type, sqltypes._Binary)
+
+
+def _encode(value: Any, binary: bool) -> Any:
+    if value is None:
+        return None
+    if binary:
+        return base64.b64encode(bytes(value)).decode('ascii')
+    if isinstance(value, (datetime, date, dt_time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode('ascii')
+    return value
+
+
+def _decoder(column_type, binary: bool) -> Callable[[Any], Any]:
+    """Conversión del valor JSON al tipo de la columna de destino"""
+    if binary or _is_binary(column_type):
+        return base64.b64decode
+    if isinstance(column_type, sqltypes.DateTime):
+        return datetime.fromisoformat
+    if isinstance(column_type, sqltypes.Date):
+        return lambda value: date.fromisoformat(value[:10])
+    if isinstance(column_type, sqltypes.Time):
+        return dt_time.fromisoformat
+    if isinstance(column_type, sqltypes.Float):
+        return float
+    if isinstance(column_type, sqltypes.Numeric):
+        return lambda value: Decimal(str(value))
+    return lambda value: value
+
+
+def _chunk_path(folder: str, table_name: str, number: int, compress: bool) -> str:
+    return os.path.join(folder, table_name, f'{number:06d}.{FORMAT}' + ('.gz' if compress else ''))
+
+
+def _open_chunk(path: str, mode: str, compress: bool):
+    if compress:
+        options = {'compresslevel': COMPRESS_LEVEL} if mode == 'w' else {}
+        return gzip.open(path, mode + 't', encoding='utf-8', **options)
+    return open(path, mode, encoding='utf-8')
+
+
+def _key_after(columns: Sequence, last: Sequence):
+    if len(columns) == 1:
+        return columns[0] > last[0]
+    return tuple_(*columns) > tuple_(*last)
+
+
+def _read_chunks(conn, table: Table, chunk_rows: int, last_key: Optional[List], rows_done: int) -> Iterator:
+    """Bloques de filas a partir del punto de control (clave o número de filas)"""
+    key_columns = list(table.primary_key.columns)
+    if not key_columns:
+        # Sin clave primaria: se lee en streaming y se saltan por posición las filas ya exportadas
+        result = conn.execute(select(table).offset(rows_done).execution_options(stream_results=True,
+                                                                                  yield_per=chunk_rows))
+        yield from result.partitions(chunk_rows)
+        return
+
+    while True:
+        query = select(table).order_by(*key_columns).limit(chunk_rows)
+        if last_key is not None:
+            query = query.where(_key_after(key_columns, last_key))
+        rows = conn.execute(query).all()
+        if rows:
+            yield rows
+        if len(rows) < chunk_rows:
+            return
+        last_key = [rows[-1]._mapping[column.name] for column in key_columns]
+
+
+def _virtual_tables(engine) -> set:
+    """
+    Tablas virtuales de SQLite (el índice FTS5 de búsqueda) y sus tablas
+    internas: no se migran, el índice se reconstruye en el destino con
+    ``flask search-index``.
+    """
+    if engine.dialect.name != 'sqlite':
+        return set()
+    with engine.connect() as conn:
+        virtual = conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND sql LIKE 'CREATE VIRTUAL TABLE%'"
+        )).scalars().all()
+    return {name + suffix for name in virtual for suffix in ('',) + FTS_SHADOW_SUFFIXES}
+
+
+def _new_manifest(engine, metadata: MetaData, chunk_rows: int, compress: bool) -> Dict[str, Any]:
+    tables = []
+    skipped = _virtual_tables(engine)
+    for table in metadata.sorted_tables:
+        if table.name in SKIP_TABLES or table.name in skipped:
+            continue
+        tables.append({
+            'name': table.name,
+            'columns': [column.name for column in table.columns],
+            'binary': [column.name for column in table.columns if _is_binary(column.type)],
+            'primary_key': [column.name for column in table.primary_key.columns],
+            'status': 'pending',
+            'rows': 0,
+            'chunks': 0,
+            'last_key': None,
+        })
+    return {
+        'format': FORMAT,
+        'version': FORMAT_VERSION,
+        'source': engine.url.render_as_string(hide_password=True),
+        'dialect': engine.dialect.name,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'chunk_rows': chunk_rows,
+        'compress': compress,
+        'status': 'running',
+        'tables': tables,
+    }
+
+
+def export_tables(engine, folder: str, chunk_rows: int = CHUNK_ROWS, compress: bool = True,
+                  progress: Progress = None) -> Dict[str, Any]:
+    """
+    Exporta todas las tablas de ``engine`` a ``folder`` por bloques. Si en la
+    carpeta hay una exportación sin terminar, la continúa. Devuelve el manifiesto.
+    """
+    os.makedirs(folder, exist_ok=True)
+    manifest_path = os.path.join(folder, MANIFEST)
+    metadata = MetaData()
+    metadata.reflect(bind=engine)
+
+    manifest = read_manifest(folder)
+    if manifest is None:
+        manifest = _new_manifest(engine, metadata, chunk_rows, compress)
+        _write_json(manifest_path, manifest)
+    elif manifest['status'] == 'done':
+        raise TransferError(f'La carpeta {folder} ya contiene una exportación completa')
+    chunk_rows, compress = manifest['chunk_rows'], manifest['compress']
+
+    with engine.connect() as conn:
+        for entry in manifest['tables']:
+            if entry['status'] == 'done':
+                continue
+            table = metadata.tables.get(entry['name'])
+            if table is None:
+                raise TransferError(f"La tabla {entry['name']} ya no existe en el origen")
+            binary = set(entry['binary'])
+            flags = [column.name in binary for column in table.columns]
+            os.makedirs(os.path.join(folder, table.name), exist_ok=True)
+
+            entry['status'] = 'running'
+            last_key = None
+            if entry['last_key'] is not None:
+                last_key = [_decoder(table.columns[name].type, False)(value)
+                            for name, value in zip(entry['primary_key'], entry['last_key'])]
+            for rows in _read_chunks(conn, table, chunk_rows, last_key, entry['rows']):
+                number = entry['chunks'] + 1
+                path = _chunk_path(folder, table.name, number, compress)
+                with _open_chunk(path + '.partial', 'w', compress) as handle:
+                    for row in rows:
+                        handle.write(json.dumps([_encode(value, flag) for value, flag in zip(row, flags)],
+                                                ensure_ascii=False, separators=(',', ':')))
+                        handle.write('\n')
+                os.replace(path + '.partial', path)
+
+                entry['chunks'] = number
+                entry['rows'] += len(rows)
+                if entry['primary_key']:
+                    entry['last_key'] = [_encode(rows[-1]._mapping[name], False) for name in entry['primary_key']]
+                _write_json(manifest_path, manifest)
+                if progress:
+                    progress(table.name, entry['rows'])
+                if entry['primary_key']:
+                    # Cada bloque es una consulta: no dejar abierta una transacción larga
+                    conn.rollback()
+
+            entry['status'] = 'done'
+            _write_json(manifest_path, manifest)
+
+    manifest['status'] = 'done'
+    manifest['finished_at'] = datetime.now().isoformat(timespec='seconds')
+    _write_json(manifest_path, manifest)
+    return manifest
+
+
+def read_chunk(path: str) -> Iterator[List[Any]]:
+    """Filas (listas de valores) de un fichero de bloque"""
+    with _open_chunk(path, 'r', path.endswith('.gz')) as handle:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+
+@contextmanager
+def _foreign_keys_disabled(conn):
+    """Carga sin comprobar claves foráneas; se restauran al salir (la conexión vuelve al pool)"""
+    if conn.dialect.name == 'sqlite':
+        enabled = conn.exec_driver_sql('PRAGMA foreign_keys').scalar()
+        conn.exec_driver_sql('PRAGMA foreign_keys=OFF')
+        restore = f'PRAGMA foreign_keys={"ON" if enabled else "OFF"}'
+    elif conn.dialect.name == 'mysql':
+        conn.exec_driver_sql('SET FOREIGN_KEY_CHECKS=0')
+        restore = 'SET FOREIGN_KEY_CHECKS=1'
+    else:
+        restore = None
+    conn.commit()
+    try:
+        yield
+    finally:
+        conn.rollback()
+        if restore:
+            conn.exec_driver_sql(restore)
+            conn.commit()
+
+
+def _delete_key_range(conn, table: Table, key_names: List[str], first: List, last: List) -> None:
+    columns = [table.columns[name] for name in key_names]
+    if len(columns) == 1:
+        condition = and_(columns[0] >= first[0], columns[0] <= last[0])
+    else:
+        condition = and_(tuple_(*columns) >= tuple_(*first), tuple_(*columns) <= tuple_(*last))
+    conn.execute(table.delete().where(condition))
+
+
+def import_tables(engine, folder: str, batch_rows: int = BATCH_ROWS, truncate: bool = False,
+                  progress: Progress = None) -> Dict[str, Any]:
+    """
+    Importa en ``engine`` (con las tablas ya creadas) una exportación completa
+    de ``folder``. Continúa desde ``import_checkpoint.json`` si existe; con
+    ``truncate`` vacía antes las tablas de destino. Devuelve el punto de control.
+    """
+    manifest = read_manifest(folder)
+    if manifest is None or manifest.get('format') != FORMAT:
+        raise TransferError(f'No hay una exportación válida en {folder}')
+    if manifest['status'] != 'done':
+        raise TransferError('La exportación no está terminada: vuelve a lanzarla para completarla')
+
+    checkpoint_path = os.path.join(folder, IMPORT_CHECKPOINT)
+    target = engine.url.render_as_string(hide_password=True)
+    try:
+        with open(checkpoint_path, encoding='utf-8') as handle:
+            checkpoint = json.load(handle)
+    except FileNotFoundError:
+        checkpoint = None
+    if checkpoint is not None and (checkpoint['target'] != target or truncate):
+        checkpoint = None
+    resuming = checkpoint is not None
+    if checkpoint is None:
+        checkpoint = {'target': target, 'status': 'running', 'tables': {}}
+
+    metadata = MetaData()
+    metadata.reflect(bind=engine)
+    missing = [entry['name'] for entry in manifest['tables'] if entry['name'] not in metadata.tables]
+    if missing:
+        raise TransferError('Faltan tablas en el destino (ejecuta antes las migraciones): ' + ', '.join(missing))
+
+    with engine.connect() as conn, _foreign_keys_disabled(conn):
+        if not resuming:
+            for entry in reversed(manifest['tables']):
+                table = metadata.tables[entry['name']]
+                if truncate:
+                    conn.execute(table.delete())
+                elif conn.execute(select(table).limit(1)).first() is not None:
+                    raise TransferError(f'La tabla {table.name} del destino no está vacía (usa --truncate)')
+            conn.commit()
+            _write_json(checkpoint_path, checkpoint)
+
+        # Al continuar, el primer bloque pendiente pudo confirmarse sin llegar a
+        # guardar el punto de control (también el primero de una tabla)
+        replay = resuming
+        for entry in manifest['tables']:
+            state = checkpoint['tables'].setdefault(entry['name'], {'chunks': 0, 'rows': 0})
+            if state['chunks'] >= entry['chunks']:
+                continue
+            table = metadata.tables[entry['name']]
+            # Columnas del origen que existen en el destino, con su conversión
+            binary = set(entry['binary'])
+            positions = [(index, name, _decoder(table.columns[name].type, name in binary))
+                         for index, name in enumerate(entry['columns']) if name in table.columns]
+            state['skipped_columns'] = [name for name in entry['columns'] if name not in table.columns]
+
+            for number in range(state['chunks'] + 1, entry['chunks'] + 1):
+                path = _chunk_path(folder, entry['name'], number, manifest['compress'])
+                records = [
+                    {name: None if row[index] is None else decode(row[index]) for index, name, decode in positions}
+                    for row in read_chunk(path)
+                ]
+                if replay and records and entry['primary_key']:
+                    first = [records[0][name] for name in entry['primary_key']]
+                    last = [records[-1][name] for name in entry['primary_key']]
+                    _delete_key_range(conn, table, entry['primary_key'], first, last)
+                replay = False
+                for start in range(0, len(records), batch_rows):
+                    conn.execute(table.insert(), records[start:start + batch_rows])
+                conn.commit()
+
+                state['chunks'] = number
+                state['rows'] += len(records)
+                _write_json(checkpoint_path, checkpoint)
+                if progress:
+                    progress(entry['name'], state['rows'])
+
+    checkpoint['status'] = 'done'
+    _write_json(checkpoint_path, checkpoint)
+    return checkpoint
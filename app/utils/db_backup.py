@@ -0,0 +1,713 @@
+"""
+Backups de la base de datos en segundo plano
+============================================
+
+El backup de SQLite usa la API de backup en línea de SQLite
+(``sqlite3.Connection.backup``) en lugar de copiar el fichero: el resultado
+es siempre una base coherente aunque haya escrituras en curso, y la copia se
+hace en pasos de ``BACKUP_PAGES_PER_STEP`` páginas con una pausa entre pasos
+para que los escritores no esperen a que termine todo el backup.
+
+Si otra conexión escribe durante la copia, SQLite la reinicia desde el
+principio. Tras ``BACKUP_MAX_RESTARTS`` reinicios se copia el resto en un
+único paso; con WAL ese paso solo toma un bloqueo de lectura.
+
+El backup se comprime en streaming (gzip, o zstd si ``zstandard`` está
+instalado), se rota según ``BACKUP_KEEP_LAST`` y ``BACKUP_MAX_AGE_DAYS`` y su
+progreso se guarda en ``backup_status.json`` dentro de la carpeta de backups,
+de modo que cualquier worker de gunicorn puede consultarlo.
+
+Con MySQL la salida de ``mysqldump`` (``--single-transaction --quick``) se
+lee de la tubería por bloques y se comprime directamente en el fichero, sin
+pasar entera por la memoria del worker; la contraseña va en un fichero de
+opciones temporal y no en la línea de comandos. Si ``mysqldump`` no está
+instalado, ``dump_tables`` genera el volcado en Python leyendo cada tabla
+por rangos de la clave primaria dentro de una única transacción.
+
+Formas de lanzarlo:
+
+- Botón "Crear Backup" del panel de base de datos (hilo en segundo plano).
+- ``flask backup-database`` (en primer plano, para cron).
+- ``BACKUP_SCHEDULE_HOURS`` > 0: un hilo de la app lanza uno cuando el último
+  backup es más antiguo que ese intervalo.
+"""
+
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+from sqlalchemy import MetaData, func, select, text
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+logger = logging.getLogger(__name__)
+
+STATUS_FILE = 'backup_status.json'
+# Bloqueo del sistema operativo (flock, o msvcrt en Windows) sobre este fichero:
+# el núcleo lo libera si el proceso muere, así que no caduca ni se borra
+LOCK_FILE = 'backup.lock'
+
+# Tamaño de los bloques al comprimir y al leer de mysqldump (1 MB)
+COMPRESS_CHUNK_SIZE = 1024 * 1024
+
+# Filas por INSERT (y por consulta) en el volcado en Python
+DUMP_CHUNK_ROWS = 1000
+
+COMPRESSION_EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst', 'none': ''}
+
+BACKUP_NAME = re.compile(r'^(?P<kind>[a-z]+)_backup_(?P<stamp>\d{8}_\d{6})\.')
+
+# Parte del progreso total que corresponde a la copia (el resto, a comprimir)
+COPY_SHARE = 0.8
+
+
+class BackupError(Exception):
+    """Error al preparar o ejecutar un backup"""
+
+
+class BackupInProgress(BackupError):
+    """Ya hay un backup en marcha (en este u otro proceso)"""
+
+
+def zstd_available() -> bool:
+    """Indica si zstandard está instalado"""
+    try:
+        import zstandard  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def compression_method(config) -> str:
+    method = str(config.get('BACKUP_COMPRESSION', 'gzip')).lower()
+    if method not in COMPRESSION_EXTENSIONS:
+        raise BackupError(f'BACKUP_COMPRESSION no válido: {method}')
+    if method == 'zstd' and not zstd_available():
+        logger.warning('zstandard no está instalado; los backups se comprimen con gzip')
+        return 'gzip'
+    return method
+
+
+def open_compressed(path: str, method: str, level: int):
+    """Fichero de escritura que comprime en streaming con el método indicado"""
+    if method == 'gzip':
+        return gzip.open(path, 'wb', compresslevel=level)
+    if method == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=level).stream_writer(open(path, 'wb'))
+    return open(path, 'wb')
+
+
+@dataclass
+class BackupJob:
+    """Estado de un backup; se guarda como JSON en la carpeta de backups"""
+    id: str
+    kind: str
+    trigger: str = 'manual'
+    status: str = 'pending'  # pending, running, done, failed
+    phase: str = 'pending'  # pending, copy, verify, compress, dump, rotate
+    method: Optional[str] = None  # online (SQLite), mysqldump o python
+    progress: float = 0.0
+    pages_total: int = 0
+    pages_done: int = 0
+    restarts: int = 0
+    bytes_written: int = 0
+    rows_done: int = 0
+    source: Optional[str] = None
+    path: Optional[str] = None
+    size: Optional[int] = None
+    removed: Optional[List[str]] = None
+    error: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class _StatusWriter:
+    """Guarda el estado del trabajo, como mucho una vez por punto porcentual"""
+
+    def __init__(self, folder: str, job: BackupJob):
+        self.path = os.path.join(folder, STATUS_FILE)
+        self.job = job
+        self._last = None
+
+    def update(self, force: bool = False, **changes):
+        for key, value in changes.items():
+            setattr(self.job, key, value)
+        mark = (self.job.status, self.job.phase, int(self.job.progress * 100))
+        if force or mark != self._last:
+            self._last = mark
+            temporary = self.path + '.tmp'
+            with open(temporary, 'w', encoding='utf-8') as handle:
+                json.dump(self.job.to_dict(), handle)
+            os.replace(temporary, self.path)
+
+
+def read_status(folder: str) -> Optional[Dict[str, Any]]:
+    """
+    Estado del último backup lanzado, o None si no hay ninguno. Un trabajo en
+    curso sin bloqueo vigente (su proceso murió) se devuelve como fallido.
+    """
+    try:
+        with open(os.path.join(folder, STATUS_FILE), encoding='utf-8') as handle:
+            status = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if status.get('status') in ('pending', 'running'):
+        try:
+            lock = _acquire_lock(folder)
+        except BackupInProgress:
+            return status
+        # Nadie tiene el bloqueo: el proceso del trabajo murió
+        try:
+            return _fail_interrupted_job(folder, status)
+        finally:
+            _release_lock(lock)
+    return status
+
+
+def list_backups(folder: str) -> List[Dict[str, Any]]:
+    """Backups de la carpeta, del más reciente al más antiguo"""
+    if not os.path.isdir(folder):
+        return []
+    result = []
+    for name in os.listdir(folder):
+        match = BACKUP_NAME.match(name)
+        if not match or name.endswith('.partial'):
+            continue
+        path = os.path.join(folder, name)
+        result.append({
+            'name': name,
+            'kind': match.group('kind'),
+            'created_at': datetime.strptime(match.group('stamp'), '%Y%m%d_%H%M%S'),
+            'size': os.path.getsize(path),
+            'path': path,
+        })
+    result.sort(key=lambda backup: backup['created_at'], reverse=True)
+    return result
+
+
+def rotate(folder: str, keep_last: int, max_age_days: int, now: Optional[datetime] = None) -> List[str]:
+    """
+    Borra los backups que sobran: más allá de los ``keep_last`` más recientes
+    o más antiguos que ``max_age_days`` (0 = sin límite). El más reciente no
+    se borra nunca.
+    """
+    now = now or datetime.now()
+    backups = list_backups(folder)
+    removed = []
+    for index, backup in enumerate(backups):
+        if index == 0:
+            continue
+        too_many = keep_last and index >= keep_last
+        too_old = max_age_days and now - backup['created_at'] > timedelta(days=max_age_days)
+        if too_many or too_old:
+            os.remove(backup['path'])
+            removed.append(backup['name'])
+    return removed
+
+
+def _fail_interrupted_job(folder: str, previous: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Guarda como fallido el trabajo cuyo proceso murió sin terminarlo y lo devuelve"""
+    if not previous or previous.get('status') not in ('pending', 'running'):
+        return previous
+    logger.warning('El backup %s quedó interrumpido', previous.get('id'))
+    job = BackupJob(**{key: value for key, value in previous.items() if key in BackupJob.__dataclass_fields__})
+    _StatusWriter(folder, job).update(force=True, status='failed', finished_at=datetime.now().isoformat(),
+                                      error='Interrumpido: el proceso del backup terminó sin completarlo')
+    return job.to_dict()
+
+
+def _remove_partial_files(folder: str) -> None:
+    """Borra los restos de un backup interrumpido (solo con el bloqueo tomado)"""
+    for name in os.listdir(folder):
+        if name.endswith('.partial'):
+            try:
+                os.remove(os.path.join(folder, name))
+            except OSError:
+                pass
+
+
+def _acquire_lock(folder: str):
+    """
+    Toma sin esperar el bloqueo de la carpeta y devuelve el fichero abierto que
+    lo mantiene. El fichero no se borra nunca: borrarlo permitiría que otro
+    proceso bloqueara un fichero nuevo con el mismo nombre.
+    """
+    handle = open(os.path.join(folder, LOCK_FILE), 'a+', encoding='utf-8')
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        handle.close()
+        raise BackupInProgress('Ya hay un backup en curso')
+    # El pid solo es informativo
+    handle.seek(0)
+    handle.truncate()
+    handle.write(str(os.getpid()))
+    handle.flush()
+    return handle
+
+
+def _release_lock(handle) -> None:
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+    except OSError:
+        pass
+    finally:
+        handle.close()
+
+
+def sqlite_online_backup(source_path: str, dest_path: str, pages: int = 256, pause: float = 0.005,
+                         max_restarts: int = 3, busy_timeout: float = 5.0,
+                         progress: Optional[Callable[[int, int, int], None]] = None) -> Dict[str, int]:
+    """
+    Copia ``source_path`` en ``dest_path`` con la API de backup en línea.
+
+    ``progress(pages_done, pages_total, restarts)`` se llama tras cada paso.
+    """
+    state = {'remaining': None, 'restarts': 0, 'total': 0}
+
+    class _TooManyRestarts(Exception):
+        pass
+
+    def on_step(status, remaining, total):
+        # Si quedan más páginas que en el paso anterior, SQLite ha reiniciado la copia
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+        state['remaining'] = remaining
+        state['total'] = total
+        if progress:
+            progress(total - remaining, total, state['restarts'])
+        if state['restarts'] > max_restarts:
+            raise _TooManyRestarts()
+        if pause and remaining:
+            time.sleep(pause)
+
+    source = sqlite3.connect(source_path, timeout=busy_timeout)
+    try:
+        dest = sqlite3.connect(dest_path)
+        try:
+            try:
+                source.backup(dest, pages=pages, progress=on_step)
+            except _TooManyRestarts:
+                # Demasiada actividad: copiar el resto en un solo paso
+                source.backup(dest, pages=-1)
+                if progress:
+                    progress(state['total'], state['total'], state['restarts'])
+        finally:
+            dest.close()
+    finally:
+        source.close()
+    return {'pages': state['total'], 'restarts': state['restarts']}
+
+
+def compress_file(source_path: str, dest_path: str, method: str = 'gzip', level: int = 6,
+                  progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """Comprime ``source_path`` por bloques; devuelve el tamaño del resultado"""
+    total = os.path.getsize(source_path)
+    done = 0
+    with open(source_path, 'rb') as source, open_compressed(dest_path, method, level) as dest:
+        while True:
+            chunk = source.read(COMPRESS_CHUNK_SIZE)
+            if not chunk:
+                break
+            dest.write(chunk)
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+    return os.path.getsize(dest_path)
+
+
+def sql_literal(value: Any, backslash_escapes: bool = True) -> str:
+    """Valor como literal SQL (``backslash_escapes`` para MySQL)"""
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "X'" + bytes(value).hex() + "'"
+    if isinstance(value, datetime):
+        value = value.isoformat(sep=' ')
+    elif isinstance(value, (date, dt_time)):
+        value = value.isoformat()
+    literal = str(value)
+    if backslash_escapes:
+        literal = literal.replace('\\', '\\\\').replace('\0', '\\0')
+    return "'" + literal.replace("'", "''") + "'"
+
+
+def _table_chunks(conn, table, chunk_size: int) -> Iterator[Sequence]:
+    """Filas de la tabla en bloques, por rangos de la clave primaria si es simple"""
+    primary_key = list(table.primary_key.columns)
+    if len(primary_key) != 1:
+        result = conn.execute(select(table).execution_options(stream_results=True, yield_per=chunk_size))
+        yield from result.partitions(chunk_size)
+        return
+
+    column = primary_key[0]
+    last = None
+    while True:
+        query = select(table).order_by(column).limit(chunk_size)
+        if last is not None:
+            query = query.where(column > last)
+        rows = conn.execute(query).all()
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]._mapping[column.name]
+
+
+def _create_statements(conn, table) -> List[str]:
+    if conn.dialect.name == 'mysql':
+        quoted = conn.dialect.identifier_preparer.quote(table.name)
+        return [conn.execute(text(f'SHOW CREATE TABLE {quoted}')).fetchone()[1]]
+    statements = [str(CreateTable(table).compile(dialect=conn.dialect)).strip()]
+    statements += [str(CreateIndex(index).compile(dialect=conn.dialect)).strip()
+                   for index in sorted(table.indexes, key=lambda index: index.name or '')]
+    return statements
+
+
+def dump_tables(engine, dest, chunk_size: int = DUMP_CHUNK_ROWS,
+                progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    Volcado SQL en Python para cuando no hay ``mysqldump``: la estructura de
+    cada tabla y sus filas en INSERT de ``chunk_size`` filas. Todo se lee en
+    una sola transacción (instantánea coherente en InnoDB) y se escribe en
+    ``dest`` (binario) por bloques. Devuelve el número de filas volcadas.
+    """
+    mysql = engine.dialect.name == 'mysql'
+    quote = engine.dialect.identifier_preparer.quote
+    metadata = MetaData()
+    metadata.reflect(bind=engine)
+
+    def write(data: str):
+        dest.write(data.encode('utf-8'))
+
+    done = 0
+    with engine.connect() as conn:
+        if mysql:
+            conn = conn.execution_options(isolation_level='REPEATABLE READ')
+        with conn.begin():
+            tables = metadata.sorted_tables
+            total = sum(conn.execute(select(func.count()).select_from(table)).scalar() for table in tables)
+
+            write(f'-- Volcado generado el {datetime.now().isoformat(sep=" ", timespec="seconds")}\n')
+            write('SET NAMES utf8mb4;\nSET FOREIGN_KEY_CHECKS=0;\n\n' if mysql else 'PRAGMA foreign_keys=OFF;\nBEGIN;\n\n')
+            for table in tables:
+                write(f'DROP TABLE IF EXISTS {quote(table.name)};\n')
+                for statement in _create_statements(conn, table):
+                    write(statement + ';\n')
+                columns = ', '.join(quote(column.name) for column in table.columns)
+                for rows in _table_chunks(conn, table, chunk_size):
+                    values = ',\n'.join('(' + ', '.join(sql_literal(value, mysql) for value in row) + ')'
+                                        for row in rows)
+                    write(f'INSERT INTO {quote(table.name)} ({columns}) VALUES\n{values};\n')
+                    done += len(rows)
+                    if progress:
+                        progress(done, total)
+                write('\n')
+            write('SET FOREIGN_KEY_CHECKS=1;\n' if mysql else 'COMMIT;\n')
+    return done
+
+
+def write_defaults_file(folder: str, url) -> str:
+    """Fichero de opciones de cliente con la contraseña (solo legible por el usuario)"""
+    fd, path = tempfile.mkstemp(prefix='mysqldump_', suffix='.cnf', dir=folder)
+    password = (url.password or '').replace('\\', '\\\\').replace('"', '\\"')
+    with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+        handle.write(f'[client]\npassword="{password}"\n')
+    os.chmod(path, 0o600)
+    return path
+
+
+def mysqldump_command(url, executable: str, defaults_file: str, charset: str = 'utf8mb4') -> List[str]:
+    """Argumentos de mysqldump; la contraseña está en ``defaults_file``, no en argv"""
+    return [
+        executable,
+        # Tiene que ser la primera opción
+        f'--defaults-extra-file={defaults_file}',
+        '--single-transaction', '--quick', '--routines', '--triggers', '--hex-blob',
+        f'--default-character-set={charset}',
+        f'--host={url.host or "localhost"}',
+        f'--port={url.port or 3306}',
+        f'--user={url.username}',
+        url.database,
+    ]
+
+
+def stream_command(command: List[str], dest, progress: Optional[Callable[[int], None]] = None,
+                   chunk_size: int = COMPRESS_CHUNK_SIZE) -> int:
+    """Copia la salida de ``command`` en ``dest`` por bloques; devuelve los bytes copiados"""
+    copied = 0
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr)
+        try:
+            for chunk in iter(partial(process.stdout.read, chunk_size), b''):
+                dest.write(chunk)
+                copied += len(chunk)
+                if progress:
+                    progress(copied)
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            process.stdout.close()
+            returncode = process.wait()
+        if returncode != 0:
+            stderr.seek(0)
+            message = stderr.read()[-2000:].decode('utf-8', 'replace').strip()
+            raise BackupError(f'{os.path.basename(command[0])} terminó con código {returncode}: {message}')
+    return copied
+
+
+def _database_url(app):
+    from app.models import db
+    with app.app_context():
+        return db.engine.url
+
+
+def _sqlite_path(url) -> str:
+    from app.utils.sqlite_profile import is_memory
+    if is_memory(str(url)):
+        raise BackupError('Una base de datos SQLite en memoria no se puede respaldar')
+    return os.path.abspath(url.database)
+
+
+def backup_folder(app) -> str:
+    return os.path.abspath(app.config.get('BACKUP_FOLDER') or 'backups')
+
+
+def run_sqlite_backup(app, job: BackupJob) -> BackupJob:
+    """Ejecuta el backup de SQLite descrito por ``job`` (en el hilo actual)"""
+    config = app.config
+    folder = backup_folder(app)
+    status = _StatusWriter(folder, job)
+    method = compression_method(config)
+    final_path = os.path.join(folder, f'sqlite_backup_{job.id}.db{COMPRESSION_EXTENSIONS[method]}')
+    copy_path = os.path.join(folder, f'sqlite_backup_{job.id}.db.partial')
+    compressed_path = final_path + '.partial'
+
+    def on_copy(done, total, restarts):
+        status.update(pages_done=done, pages_total=total, restarts=restarts,
+                      progress=COPY_SHARE * done / total if total else 0.0)
+
+    def on_compress(done, total):
+        status.update(progress=COPY_SHARE + (1 - COPY_SHARE) * done / total if total else 1.0)
+
+    try:
+        status.update(force=True, status='running', phase='copy', method='online',
+                      started_at=datetime.now().isoformat())
+        sqlite_online_backup(
+            job.source, copy_path,
+            pages=int(config.get('BACKUP_PAGES_PER_STEP', 256)),
+            pause=config.get('BACKUP_STEP_PAUSE_MS', 5) / 1000,
+            max_restarts=int(config.get('BACKUP_MAX_RESTARTS', 3)),
+            busy_timeout=config.get('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000,
+            progress=on_copy,
+        )
+
+        status.update(phase='verify')
+        check = sqlite3.connect(copy_path)
+        try:
+            result = check.execute('PRAGMA quick_check').fetchone()[0]
+        finally:
+            check.close()
+        if result != 'ok':
+            raise BackupError(f'La copia no supera quick_check: {result}')
+
+        status.update(phase='compress')
+        if method == 'none':
+            os.replace(copy_path, final_path)
+            size = os.path.getsize(final_path)
+        else:
+            size = compress_file(copy_path, compressed_path, method,
+                                 int(config.get('BACKUP_COMPRESSION_LEVEL', 6)), on_compress)
+            os.replace(compressed_path, final_path)
+
+        status.update(phase='rotate', path=final_path, size=size, progress=1.0)
+        removed = rotate(folder, int(config.get('BACKUP_KEEP_LAST', 14)), int(config.get('BACKUP_MAX_AGE_DAYS', 30)))
+        status.update(force=True, status='done', removed=removed, finished_at=datetime.now().isoformat())
+        logger.info('Backup SQLite creado: %s (%d bytes)', final_path, size)
+    except Exception as e:
+        logger.exception('Error creando el backup de SQLite')
+        status.update(force=True, status='failed', error=str(e), finished_at=datetime.now().isoformat())
+    finally:
+        for path in (copy_path, compressed_path):
+            if os.path.exists(path):
+                os.remove(path)
+    return job
+
+
+def _mysql_size_estimate(engine) -> int:
+    """Tamaño aproximado de los datos según information_schema (para el progreso)"""
+    try:
+        with engine.connect() as conn:
+            return int(conn.execute(text(
+                'SELECT COALESCE(SUM(data_length), 0) FROM information_schema.tables WHERE table_schema = DATABASE()'
+            )).scalar() or 0)
+    except Exception:
+        return 0
+
+
+def run_mysql_backup(app, job: BackupJob) -> BackupJob:
+    """Ejecuta el volcado lógico de MySQL descrito por ``job`` (en el hilo actual)"""
+    from app.models import db
+    config = app.config
+    folder = backup_folder(app)
+    status = _StatusWriter(folder, job)
+    method = compression_method(config)
+    final_path = os.path.join(folder, f'mysql_backup_{job.id}.sql{COMPRESSION_EXTENSIONS[method]}')
+    partial_path = final_path + '.partial'
+    with app.app_context():
+        engine = db.engine
+    executable = shutil.which(config.get('MYSQLDUMP_PATH') or 'mysqldump')
+    estimate = _mysql_size_estimate(engine) if executable else 0
+
+    def on_bytes(copied):
+        status.update(bytes_written=copied, progress=min(0.99, copied / estimate) if estimate else 0.0)
+
+    def on_rows(done, total):
+        status.update(rows_done=done, progress=min(0.99, done / total) if total else 0.0)
+
+    try:
+        status.update(force=True, status='running', phase='dump', method='mysqldump' if executable else 'python',
+                      started_at=datetime.now().isoformat())
+        with open_compressed(partial_path, method, int(config.get('BACKUP_COMPRESSION_LEVEL', 6))) as dest:
+            if executable:
+                defaults_file = write_defaults_file(folder, engine.url)
+                try:
+                    command = mysqldump_command(engine.url, executable, defaults_file,
+                                                config.get('MYSQL_CHARSET', 'utf8mb4'))
+                    stream_command(command, dest, on_bytes)
+                finally:
+                    os.remove(defaults_file)
+            else:
+                logger.info('mysqldump no encontrado; volcado en Python por rangos de clave primaria')
+                dump_tables(engine, dest, int(config.get('BACKUP_DUMP_CHUNK_ROWS', DUMP_CHUNK_ROWS)), on_rows)
+        os.replace(partial_path, final_path)
+        size = os.path.getsize(final_path)
+
+        status.update(phase='rotate', path=final_path, size=size, progress=1.0)
+        removed = rotate(folder, int(config.get('BACKUP_KEEP_LAST', 14)), int(config.get('BACKUP_MAX_AGE_DAYS', 30)))
+        status.update(force=True, status='done', removed=removed, finished_at=datetime.now().isoformat())
+        logger.info('Backup MySQL creado: %s (%d bytes)', final_path, size)
+    except Exception as e:
+        logger.exception('Error creando el backup de MySQL')
+        status.update(force=True, status='failed', error=str(e), finished_at=datetime.now().isoformat())
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    return job
+
+
+RUNNERS = {'sqlite': run_sqlite_backup, 'mysql': run_mysql_backup}
+
+
+def prepare_backup(app, trigger: str = 'manual'):
+    """Crea el trabajo de backup y toma el bloqueo de la carpeta; devuelve (trabajo, bloqueo)"""
+    url = _database_url(app)
+    kind = url.get_backend_name()
+    if kind == 'sqlite':
+        source = _sqlite_path(url)
+    elif kind in ('mysql', 'mariadb'):
+        kind = 'mysql'
+        source = url.render_as_string(hide_password=True)
+    else:
+        raise BackupError(f'Tipo de base de datos no soportado para backup: {kind}')
+
+    folder = backup_folder(app)
+    os.makedirs(folder, exist_ok=True)
+    lock = _acquire_lock(folder)
+    try:
+        # Con el bloqueo tomado, un trabajo pendiente o en curso es de un proceso que murió
+        _fail_interrupted_job(folder, read_status(folder))
+        _remove_partial_files(folder)
+        job = BackupJob(id=datetime.now().strftime('%Y%m%d_%H%M%S'), kind=kind, trigger=trigger, source=source)
+        _StatusWriter(folder, job).update(force=True)
+    except BaseException:
+        _release_lock(lock)
+        raise
+    return job, lock
+
+
+def _run_and_release(app, job: BackupJob, lock) -> BackupJob:
+    try:
+        return RUNNERS[job.kind](app, job)
+    finally:
+        _release_lock(lock)
+
+
+def run_backup(app, trigger: str = 'cli') -> BackupJob:
+    """Backup completo en el hilo actual"""
+    return _run_and_release(app, *prepare_backup(app, trigger))
+
+
+def start_backup(app, trigger: str = 'manual') -> BackupJob:
+    """Lanza el backup en un hilo y devuelve el trabajo sin esperar"""
+    job, lock = prepare_backup(app, trigger)
+    thread = threading.Thread(target=_run_and_release, args=(app, job, lock), name=f'backup-{job.id}', daemon=True)
+    thread.start()
+    return job
+
+
+def backup_due(app, now: Optional[datetime] = None) -> bool:
+    """Indica si el último backup es más antiguo que BACKUP_SCHEDULE_HOURS"""
+    hours = float(app.config.get('BACKUP_SCHEDULE_HOURS') or 0)
+    if hours <= 0:
+        return False
+    backups = list_backups(backup_folder(app))
+    now = now or datetime.now()
+    return not backups or now - backups[0]['created_at'] >= timedelta(hours=hours)
+
+
+def _schedule_loop(app, interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            if backup_due(app):
+                run_backup(app, trigger='scheduled')
+        except BackupInProgress:
+            pass
+        except Exception:
+            logger.exception('Error en el backup programado')
+
+
+def init_app(app):
+    """Arranca el hilo de backups programados si BACKUP_SCHEDULE_HOURS > 0"""
+    if app.testing or float(app.config.get('BACKUP_SCHEDULE_HOURS') or 0) <= 0:
+        return
+    if not app.config.get('SQLALCHEMY_DATABASE_URI', '').startswith(('sqlite', 'mysql')):
+        return
+    # Se comprueba cada pocos minutos; el bloqueo evita que dos workers lo lancen a la vez
+    interval = float(app.config.get('BACKUP_SCHEDULE_CHECK_SECONDS', 300))
+    thread = threading.Thread(target=_schedule_loop, args=(app, interval), name='backup-scheduler', daemon=True)
+    thread.start()
@@ -0,0 +1,129 @@
+"""
+Réplica de lectura opcional
+===========================
+
+Si ``SQLALCHEMY_REPLICA_URI`` está definida, la réplica se registra como el
+bind ``replica`` de Flask-SQLAlchemy y la sesión (``RoutingSession``) decide
+en cada consulta a qué engine va:
+
+- Las peticiones GET/HEAD a los endpoints de ``REPLICA_READ_ENDPOINTS`` leen
+  de la réplica.
+- Todo lo demás (escrituras, flush, peticiones POST, CLI y tareas en segundo
+  plano) va a la base principal.
+- En cuanto una petición escribe, el resto de la petición usa la principal.
+
+Lectura de lo propio: la réplica puede ir unos segundos por detrás, así que
+cuando un usuario escribe se guarda en su sesión de Flask un plazo
+(``REPLICA_READ_YOUR_WRITES_SECONDS``) durante el que todas sus lecturas van
+a la principal. Los demás usuarios siguen leyendo de la réplica.
+
+Con dos ficheros SQLite se puede probar en local::
+
+    DEV_DATABASE_URL=sqlite:///principal.db
+    DATABASE_REPLICA_URL=sqlite:///replica.db
+"""
+
+import time
+from flask import current_app, g, has_request_context, request, session
+from flask_login import current_user
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+
+REPLICA_BIND = 'replica'
+# Clave de la sesión de Flask con el instante hasta el que se lee de la principal
+PRIMARY_UNTIL_KEY = 'db_primary_until'
+
+# Endpoints de solo lectura que pueden servirse desde la réplica
+DEFAULT_READ_ENDPOINTS = frozenset({
+    'calendar.index',
+    'calendar.view_day',
+    'calendar.route_sheet',
+    'calendar.view_notes',
+    'calendar.api_get_notes',
+    'calendar.api_get_notes_range',
+    'calendar.search_notes',
+    'calendar.api_search_notes',
+    'calendar.api_calendar_month',
+    'calendar.api_demand_forecast',
+    'time_tracking.time_reports',
+    'time_tracking.export_time_report',
+    'admin.admin_documents',
+    'admin.admin_export_documents',
+    'documents.my_documents',
+})
+
+_READ_ONLY_METHODS = ('GET', 'HEAD')
+_READ_ONLY_SQL = ('SELECT', 'WITH', 'EXPLAIN')
+
+
+def read_endpoints(config) -> frozenset:
+    endpoints = config.get('REPLICA_READ_ENDPOINTS')
+    return DEFAULT_READ_ENDPOINTS if endpoints is None else frozenset(endpoints)
+
+
+def _is_write(clause) -> bool:
+    if isinstance(clause, UpdateBase):
+        return True
+    # SQL en texto: solo las consultas de lectura (SELECT, WITH, EXPLAIN) van a la réplica
+    if isinstance(clause, TextClause):
+        return not clause.text.lstrip().upper().startswith(_READ_ONLY_SQL)
+    return False
+
+
+def _use_replica() -> bool:
+    return has_request_context() and g.get('db_use_replica', False) and not g.get('db_wrote', False)
+
+
+class RoutingSession(Session):
+    """Sesión que envía las lecturas de los endpoints de solo lectura a la réplica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _use_replica() and not _is_write(clause):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_write(db_session, flush_context):
+    """Una petición que escribe deja de leer de la réplica"""
+    if has_request_context():
+        g.db_wrote = True
+
+
+def _route_request():
+    g.db_wrote = False
+    g.db_use_replica = (
+        request.method in _READ_ONLY_METHODS
+        and request.endpoint in read_endpoints(current_app.config)
+        and session.get(PRIMARY_UNTIL_KEY, 0) <= time.time()
+    )
+
+
+def _remember_write(response):
+    if g.get('db_wrote') and current_user.is_authenticated:
+        window = current_app.config.get('REPLICA_READ_YOUR_WRITES_SECONDS', 10)
+        session[PRIMARY_UNTIL_KEY] = time.time() + window
+    return response
+
+
+def init_app(app):
+    """Registra la réplica como bind y las reglas de enrutado (llamar antes de db.init_app)"""
+    uri = app.config.get('SQLALCHEMY_REPLICA_URI')
+    if not uri:
+        return
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    binds[REPLICA_BIND] = uri
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+    app.before_request(_route_request)
+    app.after_request(_remember_write)
+
+
+def init_engines(app, db):
+    """La réplica no tiene tablas propias: create_all/drop_all no la tocan (llamar tras db.init_app)"""
+    if app.config.get('SQLALCHEMY_REPLICA_URI'):
+        db.metadatas.pop(REPLICA_BIND, None)
@@ -0,0 +1,273 @@
+"""
+Estadísticas baratas de tablas para el gestor de base de datos
+==============================================================
+
+``admin.database_manager`` ya no ejecuta ``COUNT(*)`` sobre cada tabla:
+
+- Los recuentos y tamaños salen del catálogo: ``information_schema.TABLES``
+  (y ``mysql.innodb_index_stats`` para el tamaño de cada índice) en MySQL;
+  ``sqlite_stat1`` (tras ``ANALYZE``) y la tabla virtual ``dbstat`` en SQLite.
+  Si una tabla SQLite no tiene estadísticas se estima con ``MAX(rowid)``, que
+  solo recorre el borde derecho del árbol. Los valores son aproximados y se
+  guardan ``DB_STATS_CACHE_SECONDS`` segundos.
+- El uso de índices viene de ``performance_schema`` en MySQL (si está activo y
+  hay permiso). SQLite no lleva contadores de uso; se muestra en su lugar las
+  filas por clave de ``sqlite_stat1``.
+- La reflexión (columnas e índices) se guarda en memoria hasta que cambia el
+  esquema: la huella combina la revisión de Alembic con ``PRAGMA
+  schema_version`` en SQLite o las fechas de creación de tablas en MySQL, de
+  modo que una migración lanzada desde otro proceso también la invalida.
+- El recuento exacto es opcional y se pide tabla a tabla (``exact_count``).
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import inspect
+from sqlalchemy.exc import DBAPIError
+from app.utils.sql_console import QueryTimeout, statement_timeout, _is_timeout
+
+_lock = threading.Lock()
+# url del motor -> (huella del esquema, reflexión)
+_schema_cache: Dict[str, Tuple[Any, Dict[str, Any]]] = {}
+# url del motor -> (instante, estadísticas)
+_stats_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+
+def _cache_key(engine) -> str:
+    return engine.url.render_as_string(hide_password=True)
+
+
+def clear_cache(engine=None) -> None:
+    """Olvida la reflexión y las estadísticas (de un motor o de todos)"""
+    with _lock:
+        if engine is None:
+            _schema_cache.clear()
+            _stats_cache.clear()
+        else:
+            _schema_cache.pop(_cache_key(engine), None)
+            _stats_cache.pop(_cache_key(engine), None)
+
+
+def _scalar_or_none(conn, sql: str):
+    try:
+        return conn.exec_driver_sql(sql).scalar()
+    except DBAPIError:
+        conn.rollback()
+        return None
+
+
+def schema_fingerprint(conn) -> Tuple:
+    """Valor que cambia cada vez que una migración modifica el esquema"""
+    revision = _scalar_or_none(conn, 'SELECT version_num FROM alembic_version')
+    if conn.dialect.name == 'sqlite':
+        return revision, conn.exec_driver_sql('PRAGMA schema_version').scalar()
+    if conn.dialect.name == 'mysql':
+        row = conn.exec_driver_sql(
+            'SELECT COUNT(*), MAX(CREATE_TIME) FROM information_schema.TABLES '
+            'WHERE TABLE_SCHEMA = DATABASE()').first()
+        return revision, tuple(row)
+    return revision, tuple(inspect(conn).get_table_names())
+
+
+def _reflect(conn) -> Dict[str, Any]:
+    inspector = inspect(conn)
+    tables = {}
+    for table_name in inspector.get_table_names():
+        columns = inspector.get_columns(table_name)
+        tables[table_name] = {
+            'columns': [
+                {
+                    'name': col['name'],
+                    'type': str(col['type']),
+                    'nullable': col['nullable'],
+                    'default': str(col.get('default', '')) if col.get('default') is not None else None
+                }
+                for col in columns
+            ],
+            'indexes': [
+                {'name': index['name'], 'columns': [name for name in index['column_names'] if name],
+                 'unique': bool(index.get('unique'))}
+                for index in inspector.get_indexes(table_name)
+            ],
+        }
+    return tables
+
+
+def reflect_schema(engine) -> Dict[str, Any]:
+    """Columnas e índices de cada tabla, reutilizados mientras no cambie el esquema"""
+    key = _cache_key(engine)
+    with engine.connect() as conn:
+        fingerprint = schema_fingerprint(conn)
+        with _lock:
+            cached = _schema_cache.get(key)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+        tables = _reflect(conn)
+
+    with _lock:
+        _schema_cache[key] = (fingerprint, tables)
+    return tables
+
+
+def _sqlite_stats(conn, tables: Dict[str, Any]) -> Dict[str, Any]:
+    stats: Dict[str, Dict[str, Any]] = {name: {'rows': None, 'data_bytes': None, 'index_bytes': None, 'indexes': {}}
+                                        for name in tables}
+    # Incluye los índices automáticos de UNIQUE/PRIMARY KEY, que la reflexión omite
+    index_table = dict(conn.exec_driver_sql("SELECT name, tbl_name FROM sqlite_master WHERE type = 'index'").all())
+
+    # sqlite_stat1: "filas filas_por_clave..." por índice (idx NULL = tabla sin índices)
+    has_stat1 = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'").first()
+    if has_stat1:
+        for table_name, index_name, stat in conn.exec_driver_sql('SELECT tbl, idx, stat FROM sqlite_stat1'):
+            if table_name not in stats or not stat:
+                continue
+            numbers = [int(part) for part in stat.split() if part.isdigit()]
+            if not numbers:
+                continue
+            stats[table_name]['rows'] = numbers[0]
+            if index_name:
+                stats[table_name]['indexes'].setdefault(index_name, {})['rows_per_key'] = \
+                    numbers[1] if len(numbers) > 1 else None
+
+    for table_name, table_stats in stats.items():
+        if table_stats['rows'] is not None:
+            continue
+        quoted = conn.dialect.identifier_preparer.quote(table_name)
+        # Sin estadísticas: MAX(rowid) es una cota superior que no recorre la tabla
+        try:
+            table_stats['rows'] = int(conn.exec_driver_sql(f'SELECT MAX(rowid) FROM {quoted}').scalar() or 0)
+        except DBAPIError:
+            # Tablas WITHOUT ROWID: solo el recuento exacto
+            conn.rollback()
+
+    # dbstat (si SQLite se compiló con él): tamaño por árbol, tabla o índice
+    try:
+        sizes = conn.exec_driver_sql("SELECT name, pgsize FROM dbstat WHERE aggregate = TRUE").all()
+    except DBAPIError:
+        conn.rollback()
+        sizes = []
+    for name, size in sizes:
+        if name in stats:
+            stats[name]['data_bytes'] = size
+        elif index_table.get(name) in stats:
+            table_stats = stats[index_table[name]]
+            table_stats['index_bytes'] = (table_stats['index_bytes'] or 0) + size
+            table_stats['indexes'].setdefault(name, {})['bytes'] = size
+    for table_stats in stats.values():
+        if table_stats['data_bytes'] is not None and table_stats['index_bytes'] is None:
+            table_stats['index_bytes'] = 0
+    return stats
+
+
+def _mysql_stats(conn, tables: Dict[str, Any]) -> Dict[str, Any]:
+    stats: Dict[str, Dict[str, Any]] = {name: {'rows': None, 'data_bytes': None, 'index_bytes': None, 'indexes': {}}
+                                        for name in tables}
+    rows = conn.exec_driver_sql(
+        'SELECT TABLE_NAME, TABLE_ROWS, DATA_LENGTH, INDEX_LENGTH FROM information_schema.TABLES '
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE'")
+    for table_name, row_count, data_length, index_length in rows:
+        if table_name in stats:
+            stats[table_name].update({'rows': row_count, 'data_bytes': data_length, 'index_bytes': index_length})
+
+    # Tamaño por índice (InnoDB); requiere permiso de lectura sobre la base mysql
+    try:
+        index_sizes = conn.exec_driver_sql(
+            'SELECT table_name, index_name, stat_value * @@innodb_page_size FROM mysql.innodb_index_stats '
+            "WHERE database_name = DATABASE() AND stat_name = 'size'").all()
+    except DBAPIError:
+        conn.rollback()
+        index_sizes = []
+    for table_name, index_name, size in index_sizes:
+        if table_name in stats:
+            stats[table_name]['indexes'].setdefault(index_name, {})['bytes'] = int(size)
+
+    # Uso de índices desde que arrancó el servidor (performance_schema)
+    try:
+        usage = conn.exec_driver_sql(
+            'SELECT OBJECT_NAME, INDEX_NAME, COUNT_READ FROM performance_schema.table_io_waits_summary_by_index_usage '
+            'WHERE OBJECT_SCHEMA = DATABASE() AND INDEX_NAME IS NOT NULL').all()
+    except DBAPIError:
+        conn.rollback()
+        usage = []
+    for table_name, index_name, reads in usage:
+        if table_name in stats:
+            stats[table_name]['indexes'].setdefault(index_name, {})['reads'] = int(reads)
+    return stats
+
+
+def catalog_stats(engine, tables: Dict[str, Any], max_age: float = 300, refresh: bool = False) -> Dict[str, Any]:
+    """Filas aproximadas, tamaños y uso de índices por tabla, desde el catálogo"""
+    key = _cache_key(engine)
+    with _lock:
+        cached = _stats_cache.get(key)
+    if cached and not refresh and time.monotonic() - cached[0] < max_age and set(cached[1]) == set(tables):
+        return cached[1]
+
+    with engine.connect() as conn:
+        if engine.dialect.name == 'sqlite':
+            stats = _sqlite_stats(conn, tables)
+        elif engine.dialect.name == 'mysql':
+            stats = _mysql_stats(conn, tables)
+        else:
+            stats = {name: {'rows': None, 'data_bytes': None, 'index_bytes': None, 'indexes': {}} for name in tables}
+
+    with _lock:
+        _stats_cache[key] = (time.monotonic(), stats)
+    return stats
+
+
+def table_overview(engine, max_age: float = 300, refresh: bool = False) -> List[Dict[str, Any]]:
+    """Filas de la tabla de ``database_manager``: reflexión cacheada + estadísticas del catálogo"""
+    tables = reflect_schema(engine)
+    stats = catalog_stats(engine, tables, max_age=max_age, refresh=refresh)
+
+    overview = []
+    for table_name in sorted(tables):
+        table = tables[table_name]
+        table_stats = stats.get(table_name, {})
+        index_stats = table_stats.get('indexes', {})
+        overview.append({
+            'name': table_name,
+            'columns': len(table['columns']),
+            'indexes': len(table['indexes']),
+            'records': table_stats.get('rows'),
+            'records_exact': False,
+            'data_bytes': table_stats.get('data_bytes'),
+            'index_bytes': table_stats.get('index_bytes'),
+            'column_details': table['columns'],
+            'index_details': [
+                {**index, 'bytes': index_stats.get(index['name'], {}).get('bytes'),
+                 'reads': index_stats.get(index['name'], {}).get('reads'),
+                 'rows_per_key': index_stats.get(index['name'], {}).get('rows_per_key')}
+                for index in table['indexes']
+            ],
+        })
+    return overview
+
+
+def exact_count(engine, table_name: str, timeout: float = 30) -> Optional[int]:
+    """``COUNT(*)`` de una tabla existente (None si no existe), con límite de tiempo"""
+    if table_name not in reflect_schema(engine):
+        return None
+    with engine.connect() as conn:
+        quoted = conn.dialect.identifier_preparer.quote(table_name)
+        try:
+            with statement_timeout(conn, timeout):
+                return conn.exec_driver_sql(f'SELECT COUNT(*) FROM {quoted}').scalar()
+        except DBAPIError as e:
+            if _is_timeout(e):
+                raise QueryTimeout(f'El recuento superó el límite de {timeout:g} s') from e
+            raise
+
+
+def format_bytes(size: Optional[int]) -> str:
+    if size is None:
+        return '—'
+    if size < 1024:
+        return f'{size} B'
+    for unit in ('KB', 'MB', 'GB'):
+        size /= 1024
+        if size < 1024 or unit == 'GB':
+            return f'{size:.1f} {unit}'
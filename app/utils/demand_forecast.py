@@ -0,0 +1,207 @@
+"""
+Previsión de demanda de productos
+=================================
+
+Proyecta las unidades de cada producto para los próximos días a partir del
+histórico de pedidos de WooCommerce (calendar_order_items). Las cantidades se
+agregan por día de entrega y producto con GROUP BY en la base de datos y con
+ellas se construyen dos perfiles por producto:
+
+- Día de la semana: media diaria de unidades en cada día de la semana del
+  periodo histórico (los días sin pedidos cuentan como cero).
+- Festivos de floristería (San Valentín, Sant Jordi, Día de la Madre, Todos
+  los Santos): media de las unidades de ese festivo en años anteriores, que
+  sustituye al perfil semanal cuando existe.
+
+El resultado se guarda en memoria mientras no cambie ningún pedido.
+"""
+
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import func, or_
+from app.models import db, CalendarOrder, CalendarOrderItem
+
+# Días de histórico para el perfil semanal y años para los festivos
+DEFAULT_HISTORY_DAYS = 365
+HOLIDAY_HISTORY_YEARS = 3
+
+# Días proyectados por defecto y máximo por consulta
+DEFAULT_FORECAST_DAYS = 14
+MAX_FORECAST_DAYS = 60
+
+# Cantidad mínima para incluir un producto en la previsión de un día
+MIN_FORECAST_QUANTITY = 0.5
+
+# Insignias por día en el calendario
+FORECAST_BADGES_PER_DAY = 3
+FORECAST_BADGE_ICON = 'fas fa-seedling'
+FORECAST_BADGE_COLOR = '#6f42c1'
+
+# Estados que no cuentan como demanda
+EXCLUDED_STATUSES = ('cancelled', 'refunded', 'failed')
+
+FORECAST_CACHE_SIZE = 16
+
+_cache: 'OrderedDict[tuple, Dict[str, Any]]' = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def florist_holidays(year: int) -> Dict[date, str]:
+    """Festivos con demanda especial del año"""
+    may_first = date(year, 5, 1)
+    mothers_day = may_first + timedelta(days=(6 - may_first.weekday()) % 7)  # Primer domingo de mayo
+    return {
+        date(year, 2, 14): 'san_valentin',
+        date(year, 4, 23): 'sant_jordi',
+        mothers_day: 'dia_madre',
+        date(year, 11, 1): 'todos_santos',
+    }
+
+
+def _weekday_counts(start: date, end: date, holidays) -> List[int]:
+    """Número de días de cada día de la semana en [start, end), sin festivos"""
+    total_days = (end - start).days
+    counts = [total_days // 7] * 7
+    for offset in range(total_days % 7):
+        counts[(start + timedelta(days=offset)).weekday()] += 1
+    for holiday in holidays:
+        if start <= holiday < end:
+            counts[holiday.weekday()] -= 1
+    return counts
+
+
+class DemandForecastService:
+    """Previsión de unidades por producto y día"""
+
+    @staticmethod
+    def _quantities_query():
+        return db.session.query(
+            CalendarOrder.delivery_date, CalendarOrderItem.product_name,
+            func.sum(CalendarOrderItem.quantity)
+        ).join(CalendarOrderItem, CalendarOrderItem.order_id == CalendarOrder.id) \
+            .filter(or_(CalendarOrder.status.is_(None), CalendarOrder.status.notin_(EXCLUDED_STATUSES))) \
+            .group_by(CalendarOrder.delivery_date, CalendarOrderItem.product_name)
+
+    @staticmethod
+    def daily_quantities(start: date, end: date) -> List[Tuple[date, str, int]]:
+        """Unidades por día de entrega y producto en [start, end)"""
+        query = DemandForecastService._quantities_query().filter(
+            CalendarOrder.delivery_date >= start, CalendarOrder.delivery_date < end
+        )
+        return [(day, name, int(quantity or 0)) for day, name, quantity in query]
+
+    @staticmethod
+    def holiday_quantities(dates: List[date]) -> List[Tuple[date, str, int]]:
+        """Unidades por producto en las fechas indicadas"""
+        if not dates:
+            return []
+        query = DemandForecastService._quantities_query().filter(CalendarOrder.delivery_date.in_(dates))
+        return [(day, name, int(quantity or 0)) for day, name, quantity in query]
+
+    @staticmethod
+    def signature() -> tuple:
+        """
+        Cambia con cualquier alta, baja o modificación de pedidos o de sus
+        productos: las líneas se sustituyen al actualizar el pedido (id nuevo)
+        y un cambio de cantidad sin tocar el pedido cambia la suma
+        """
+        orders = db.session.query(func.count(CalendarOrder.id), func.max(CalendarOrder.updated_at)).one()
+        items = db.session.query(func.count(CalendarOrderItem.id), func.max(CalendarOrderItem.id),
+                                 func.sum(CalendarOrderItem.quantity)).one()
+        return tuple(orders) + tuple(items)
+
+    @staticmethod
+    def forecast(start: Optional[date] = None, days: int = DEFAULT_FORECAST_DAYS,
+                 history_days: int = DEFAULT_HISTORY_DAYS) -> Dict[str, Dict[str, Any]]:
+        """Previsión por día (fecha ISO) de ``days`` días desde ``start``; se reutiliza mientras no cambien los pedidos"""
+        start = start or date.today()
+        days = max(1, min(days, MAX_FORECAST_DAYS))
+        key = (start, days, history_days, date.today(), DemandForecastService.signature())
+
+        with _cache_lock:
+            if key in _cache:
+                _cache.move_to_end(key)
+                return _cache[key]
+
+        result = DemandForecastService.compute(start, days, history_days)
+
+        with _cache_lock:
+            _cache[key] = result
+            while len(_cache) > FORECAST_CACHE_SIZE:
+                _cache.popitem(last=False)
+        return result
+
+    @staticmethod
+    def compute(start: date, days: int, history_days: int = DEFAULT_HISTORY_DAYS) -> Dict[str, Dict[str, Any]]:
+        """Calcula la previsión sin caché"""
+        # El histórico termina hoy (o en ``start`` si es anterior): nunca usa días futuros
+        history_end = min(start, date.today())
+        history_start = history_end - timedelta(days=history_days)
+        target_days = [start + timedelta(days=offset) for offset in range(days)]
+
+        years = range(history_start.year - HOLIDAY_HISTORY_YEARS, history_end.year + 1)
+        past_holidays = {day: name for year in years for day, name in florist_holidays(year).items()
+                         if day < history_end}
+        window_holidays = [day for day in past_holidays if day >= history_start]
+
+        # Perfil semanal: suma de unidades por producto y día de la semana / número de esos días
+        weekday_totals = defaultdict(lambda: [0] * 7)
+        for day, name, quantity in DemandForecastService.daily_quantities(history_start, history_end):
+            if day not in past_holidays:
+                weekday_totals[name][day.weekday()] += quantity
+        weekday_days = _weekday_counts(history_start, history_end, window_holidays)
+        weekday_profile = {
+            name: [totals[i] / weekday_days[i] if weekday_days[i] else 0.0 for i in range(7)]
+            for name, totals in weekday_totals.items()
+        }
+
+        # Perfil de festivos: media por producto de las ediciones anteriores de cada festivo
+        target_holidays = {}
+        for day in target_days:
+            target_holidays.update({d: n for d, n in florist_holidays(day.year).items() if d == day})
+        holiday_profile = defaultdict(dict)
+        wanted = set(target_holidays.values())
+        dates = [day for day, name in past_holidays.items() if name in wanted]
+        # Solo cuentan las ediciones con pedidos (años anteriores a la tienda online no)
+        editions = defaultdict(set)
+        for day, name, quantity in DemandForecastService.holiday_quantities(dates):
+            holiday = past_holidays[day]
+            editions[holiday].add(day)
+            holiday_profile[holiday][name] = holiday_profile[holiday].get(name, 0) + quantity
+        for holiday, products in holiday_profile.items():
+            for name in products:
+                products[name] /= len(editions[holiday])
+
+        forecast: Dict[str, Dict[str, Any]] = {}
+        for day in target_days:
+            holiday = target_holidays.get(day)
+            if holiday and holiday_profile.get(holiday):
+                expected = dict(holiday_profile[holiday])
+            else:
+                expected = {name: profile[day.weekday()] for name, profile in weekday_profile.items()}
+
+            products = sorted(
+                ({'name': name, 'quantity': round(quantity, 1)}
+                 for name, quantity in expected.items() if quantity >= MIN_FORECAST_QUANTITY),
+                key=lambda product: (-product['quantity'], product['name'])
+            )
+            if not products:
+                continue
+            forecast[day.isoformat()] = {
+                'holiday': holiday,
+                'total': round(sum(product['quantity'] for product in products), 1),
+                'products': products,
+                'badges': [{
+                    'title': f"Previsión: {product['name']} x{product['quantity']:g}",
+                    'icon': FORECAST_BADGE_ICON,
+                    'color': FORECAST_BADGE_COLOR,
+                } for product in products[:FORECAST_BADGES_PER_DAY]],
+            }
+        return forecast
+
+    @staticmethod
+    def clear_cache():
+        with _cache_lock:
+            _cache.clear()
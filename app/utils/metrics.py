@@ -0,0 +1,425 @@
+"""
+Métricas en formato Prometheus
+==============================
+
+Contadores, histogramas y gauges mínimos (sin dependencias) publicados en
+``/metrics`` con el formato de texto de exposición de Prometheus.
+
+Con varios workers de gunicorn cada proceso guarda sus valores en memoria y
+los vuelca, como mucho una vez por segundo, a ``METRICS_DIR/metrics_<pid>.json``.
+Un cambio que llega antes de cumplirse ese segundo programa un volcado
+diferido, así que los últimos valores de un worker que queda inactivo también
+llegan al fichero.
+El worker que atiende ``/metrics`` suma los ficheros de todos los procesos:
+contadores e histogramas de todos y gauges solo de los procesos vivos.
+
+Cuando un worker termina, el hook ``child_exit`` de gunicorn suma sus
+contadores e histogramas a ``metrics_archive.json`` y borra su fichero (ver
+archive_worker), de modo que los totales no retroceden al reciclar workers ni
+al reutilizarse un pid. Sin ``METRICS_DIR`` se exponen solo los valores del
+proceso actual.
+"""
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple
+from flask import Response, current_app, g, request
+
+# Límites de los histogramas de latencia (segundos)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SYNC_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Intervalo mínimo entre volcados a disco de un proceso
+FLUSH_INTERVAL = 1.0
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Fichero con los contadores acumulados de los workers terminados
+ARCHIVE_FILE = 'metrics_archive.json'
+# Procesos archivados que se recuerdan para no contarlos dos veces
+ARCHIVE_MAX_PROCESSES = 100
+
+_lock = threading.Lock()
+_metrics: Dict[str, '_Metric'] = {}
+_last_flush = 0.0
+_pending_flush: Optional[threading.Timer] = None
+_process = (None, None)  # (pid, identificador) del proceso que escribe el fichero
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], object] = {}
+        with _lock:
+            _metrics[name] = self
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    """Contador monótono"""
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        maybe_flush()
+
+
+class Gauge(_Metric):
+    """Valor instantáneo; entre procesos se suman los de los procesos vivos"""
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with _lock:
+            self.values[self._key(labels)] = value
+        maybe_flush()
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        maybe_flush()
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Histograma acumulado con límites fijos"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with _lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][index] += 1
+            state['sum'] += value
+            state['count'] += 1
+        maybe_flush()
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+# Métricas de la aplicación
+http_requests = Counter('http_requests_total', 'Peticiones HTTP atendidas', ('endpoint', 'method', 'status'))
+http_latency = Histogram('http_request_duration_seconds', 'Duración de las peticiones HTTP',
+                         ('endpoint', 'method'))
+db_pool_size = Gauge('db_pool_size', 'Conexiones permanentes configuradas en el pool')
+db_pool_checked_out = Gauge('db_pool_checked_out', 'Conexiones del pool en uso')
+db_pool_overflow = Gauge('db_pool_overflow', 'Conexiones abiertas por encima de pool_size')
+woocommerce_webhooks = Counter('woocommerce_webhooks_total', 'Webhooks de WooCommerce recibidos', ('outcome',))
+integration_sync_duration = Histogram('integration_sync_duration_seconds', 'Duración de las sincronizaciones de APIs',
+                                      ('api_type',), buckets=SYNC_BUCKETS)
+integration_sync_errors = Counter('integration_sync_errors_total', 'Sincronizaciones de APIs fallidas', ('api_type',))
+uploads_in_progress = Gauge('upload_processing_in_progress', 'Subidas de fotos en procesamiento')
+
+
+def _metrics_dir() -> Optional[str]:
+    try:
+        return current_app.config.get('METRICS_DIR')
+    except RuntimeError:
+        return os.environ.get('METRICS_DIR')
+
+
+def _snapshot() -> Dict[str, Dict[str, object]]:
+    with _lock:
+        return {name: {'kind': metric.kind,
+                       'values': [[list(key), value if not isinstance(value, dict) else dict(value, buckets=list(value['buckets']))]
+                                  for key, value in metric.values.items()]}
+                for name, metric in _metrics.items()}
+
+
+def _process_id() -> str:
+    """Identificador único del proceso (distinto aunque el pid se reutilice o tras un fork)"""
+    global _process
+    if _process[0] != os.getpid():
+        _process = (os.getpid(), f'{os.getpid()}-{uuid.uuid4().hex}')
+    return _process[1]
+
+
+def _write_json(directory: str, filename: str, data) -> None:
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_metrics_')
+    with os.fdopen(descriptor, 'w') as handle:
+        json.dump(data, handle)
+    os.replace(temp_path, os.path.join(directory, filename))
+
+
+def flush(force: bool = False, directory: Optional[str] = None) -> bool:
+    """Vuelca los valores del proceso a su fichero en METRICS_DIR; indica si se escribió"""
+    global _last_flush
+    directory = directory or _metrics_dir()
+    if not directory:
+        return False
+    now = time.monotonic()
+    if not force and now - _last_flush < FLUSH_INTERVAL:
+        return False
+    _last_flush = now
+
+    _write_json(directory, f'metrics_{os.getpid()}.json', {'process': _process_id(), 'metrics': _snapshot()})
+    return True
+
+
+def _deferred_flush(directory: str):
+    global _pending_flush
+    with _lock:
+        _pending_flush = None
+    try:
+        flush(force=True, directory=directory)
+    except OSError:
+        pass
+
+
+def maybe_flush():
+    """
+    Vuelca si pasó FLUSH_INTERVAL desde el último volcado; si no, programa uno
+    para cuando se cumpla (el temporizador no lleva contexto de la app, así que
+    recibe la carpeta)
+    """
+    global _pending_flush
+    directory = _metrics_dir()
+    if not directory:
+        return
+    try:
+        if flush(directory=directory):
+            return
+    except OSError:
+        return
+    with _lock:
+        # Tras un fork el temporizador del padre no existe en el hijo
+        if _pending_flush is not None and _pending_flush.is_alive():
+            return
+        delay = max(0.0, FLUSH_INTERVAL - (time.monotonic() - _last_flush))
+        _pending_flush = threading.Timer(delay, _deferred_flush, args=(directory,))
+        _pending_flush.daemon = True
+        _pending_flush.start()
+
+
+def _flush_at_exit():
+    try:
+        flush(force=True)
+    except (OSError, RuntimeError):
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_archive(directory: str) -> Dict[str, object]:
+    try:
+        with open(os.path.join(directory, ARCHIVE_FILE)) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {'processes': [], 'metrics': {}}
+
+
+def _merge(merged: Dict[str, Dict[Tuple[str, ...], object]], snapshot: Dict[str, Dict[str, object]],
+           gauges: bool = True):
+    """Suma los valores de ``snapshot`` a ``merged`` (nombre -> clave de etiquetas -> valor)"""
+    for name, data in snapshot.items():
+        if data['kind'] == 'gauge' and not gauges:
+            continue
+        target = merged.setdefault(name, {})
+        for key, value in data['values']:
+            key = tuple(key)
+            if isinstance(value, dict):
+                state = target.setdefault(key, {'buckets': [0] * len(value['buckets']), 'sum': 0.0, 'count': 0})
+                state['buckets'] = [a + b for a, b in zip(state['buckets'], value['buckets'])]
+                state['sum'] += value['sum']
+                state['count'] += value['count']
+            else:
+                target[key] = target.get(key, 0) + value
+
+
+def _collect_snapshots() -> List[Tuple[bool, Dict[str, Dict[str, object]]]]:
+    directory = _metrics_dir()
+    if not directory:
+        return [(True, _snapshot())]
+    flush(force=True)
+    workers = []
+    for filename in os.listdir(directory):
+        if not (filename.startswith('metrics_') and filename.endswith('.json')) or filename == ARCHIVE_FILE:
+            continue
+        try:
+            pid = int(filename[len('metrics_'):-len('.json')])
+            with open(os.path.join(directory, filename)) as handle:
+                data = json.load(handle)
+            workers.append((_pid_alive(pid), data))
+        except (ValueError, OSError):
+            continue
+    # El archivo se lee después: si ya incluye un worker leído arriba, se descarta
+    # su fichero (child_exit escribe el archivo antes de borrarlo)
+    archive = _read_archive(directory)
+    archived = set(archive['processes'])
+    snapshots = [(alive, data['metrics']) for alive, data in workers if data.get('process') not in archived]
+    snapshots.append((False, archive['metrics']))
+    return snapshots
+
+
+def archive_worker(pid: int, directory: Optional[str] = None) -> bool:
+    """
+    Suma los contadores e histogramas del worker ``pid`` (ya terminado) a
+    ARCHIVE_FILE y borra su fichero. Lo llama el proceso maestro de gunicorn
+    desde ``child_exit``; devuelve False si el worker no tenía fichero.
+    """
+    directory = directory or _metrics_dir()
+    if not directory:
+        return False
+    path = os.path.join(directory, f'metrics_{pid}.json')
+    try:
+        with open(path) as handle:
+            data = json.load(handle)
+    except (OSError, ValueError):
+        return False
+
+    archive = _read_archive(directory)
+    merged: Dict[str, Dict[Tuple[str, ...], object]] = {}
+    _merge(merged, archive['metrics'])
+    _merge(merged, data['metrics'], gauges=False)
+    kinds = {name: value['kind'] for snapshot in (archive['metrics'], data['metrics']) for name, value in snapshot.items()}
+    _write_json(directory, ARCHIVE_FILE, {
+        'processes': (archive['processes'] + [data.get('process')])[-ARCHIVE_MAX_PROCESSES:],
+        'metrics': {name: {'kind': kinds[name], 'values': [[list(key), value] for key, value in values.items()]}
+                    for name, values in merged.items()},
+    })
+    os.remove(path)
+    return True
+
+
+def update_pool_gauges(engine):
+    """Lee el estado del pool de conexiones (solo QueuePool expone estos contadores)"""
+    pool = engine.pool
+    if hasattr(pool, 'checkedout'):
+        db_pool_size.set(pool.size())
+        db_pool_checked_out.set(pool.checkedout())
+        db_pool_overflow.set(max(0, pool.overflow()))
+
+
+def render_latest() -> str:
+    """Texto de exposición con los valores agregados de todos los procesos"""
+    merged: Dict[str, Dict[Tuple[str, ...], object]] = {}
+    for alive, snapshot in _collect_snapshots():
+        _merge(merged, snapshot, gauges=alive)
+
+    lines = []
+    with _lock:
+        metrics = sorted(_metrics.values(), key=lambda metric: metric.name)
+    for metric in metrics:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for key, value in sorted(merged.get(metric.name, {}).items()):
+            if metric.kind == 'histogram':
+                for bound, count in zip(metric.buckets, value['buckets']):
+                    labels = _format_labels(metric.labelnames, key, ('le', _format_number(bound)))
+                    lines.append(f'{metric.name}_bucket{labels} {count}')
+                labels = _format_labels(metric.labelnames, key, ('le', '+Inf'))
+                lines.append(f'{metric.name}_bucket{labels} {value["count"]}')
+                labels = _format_labels(metric.labelnames, key)
+                lines.append(f'{metric.name}_sum{labels} {_format_number(value["sum"])}')
+                lines.append(f'{metric.name}_count{labels} {value["count"]}')
+            else:
+                lines.append(f'{metric.name}{_format_labels(metric.labelnames, key)} {_format_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _authorized() -> bool:
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        return request.headers.get('Authorization') == f'Bearer {token}'
+    # Sin token solo se permite el acceso local (Prometheus en la misma máquina o vía proxy)
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+
+def init_app(app):
+    """Registra la medición de peticiones y el endpoint /metrics"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    from app.models import db
+
+    @app.before_request
+    def start_metrics_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        start = g.pop('metrics_start', None)
+        endpoint = request.endpoint or 'sin_endpoint'
+        if start is not None and endpoint not in ('static', 'metrics'):
+            http_latency.observe(time.perf_counter() - start, endpoint=endpoint, method=request.method)
+            http_requests.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+            # Cada worker publica el estado de su propio pool
+            update_pool_gauges(db.engine)
+        return response
+
+    def metrics():
+        if not _authorized():
+            return Response('Forbidden\n', status=403, mimetype='text/plain')
+        update_pool_gauges(db.engine)
+        return Response(render_latest(), content_type=CONTENT_TYPE)
+
+    app.add_url_rule('/metrics', 'metrics', metrics)
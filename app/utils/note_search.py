@@ -0,0 +1,202 @@
+"""
+Búsqueda de texto completo en notas y pedidos
+=============================================
+
+Indexa título y contenido de calendar_notes junto con los datos del pedido de
+WooCommerce enlazado (cliente, teléfonos, destinatario, dirección, dedicatoria
+y productos de calendar_orders / calendar_order_items).
+
+- SQLite: tabla virtual FTS5 ``calendar_notes_fts`` con una fila por nota,
+  alimentada desde la vista ``calendar_notes_search`` y mantenida por triggers
+  en las tres tablas. Se ordena con bm25().
+- MySQL: índices FULLTEXT sobre calendar_notes (title, content) y
+  calendar_orders, que InnoDB mantiene solo, con MATCH ... AGAINST en modo
+  booleano; los productos se buscan con LIKE.
+- Otros motores, o SQLite sin FTS5: búsqueda LIKE como último recurso.
+
+El índice lo crea la migración ``c2f7a9d14e60``, única definición de su DDL;
+``flask search-index`` solo lo vuelve a llenar a partir de las notas
+existentes. Las búsquedas no ejecutan DDL: solo comprueban una vez por motor
+qué índice existe.
+"""
+
+import re
+import threading
+import weakref
+from datetime import date
+from typing import Any, Dict, List, Optional
+from sqlalchemy import text, func, literal_column, or_, exists, table, column
+from app.models import db, CalendarOrder, CalendarOrderItem
+from app.models.user import CalendarNote
+from app.utils.calendar_summary import CalendarSummaryService
+
+FTS_TABLE = 'calendar_notes_fts'
+FTS_VIEW = 'calendar_notes_search'
+FULLTEXT_INDEX = 'ft_calendar_notes_title_content'
+ORDERS_FULLTEXT_INDEX = 'ft_calendar_orders_search'
+
+# Columnas de calendar_orders que se indexan
+ORDER_SEARCH_COLUMNS = ('customer_name', 'customer_email', 'customer_phone', 'delivery_name',
+                        'delivery_phone', 'delivery_address', 'delivery_city', 'delivery_postcode',
+                        'dedication')
+
+# Resultados por defecto y máximo por consulta
+DEFAULT_SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 200
+
+# Peso del título frente al contenido en la relevancia de FTS5
+TITLE_WEIGHT = 5.0
+
+# Caracteres de contexto alrededor de la coincidencia en los fragmentos
+SNIPPET_CONTEXT = 60
+
+_fts_table = table(FTS_TABLE, column('rowid'))
+
+# Motores en los que ya se comprobó el índice y el modo resultante
+_index_modes = weakref.WeakKeyDictionary()
+_index_lock = threading.Lock()
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class NoteSearchService:
+    """Búsqueda ordenada por relevancia sobre notas y pedidos"""
+
+    @staticmethod
+    def tokens(query_text: str) -> List[str]:
+        """Palabras de la búsqueda; se descarta la sintaxis propia de cada motor"""
+        return _TOKEN_RE.findall(query_text or '')[:12]
+
+    @staticmethod
+    def index_mode() -> str:
+        """Modo de búsqueda según los índices existentes: 'fts5', 'fulltext' o 'like' (sin ejecutar DDL)"""
+        key = db.engine
+        mode = _index_modes.get(key)
+        if mode is not None:
+            return mode
+
+        dialect = key.dialect.name
+        mode = 'like'
+        if dialect == 'sqlite':
+            existing = db.session.execute(text(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"
+            ), {'name': FTS_TABLE}).scalar()
+            if existing and "content='calendar_notes'" not in existing:
+                mode = 'fts5'
+        elif dialect == 'mysql':
+            found = db.session.execute(text(
+                "SELECT COUNT(DISTINCT index_name) FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND index_name IN (:notes, :orders)"
+            ), {'notes': FULLTEXT_INDEX, 'orders': ORDERS_FULLTEXT_INDEX}).scalar()
+            if found == 2:
+                mode = 'fulltext'
+        _index_modes[key] = mode
+        return mode
+
+    @staticmethod
+    def rebuild_index() -> str:
+        """
+        Vuelve a llenar el índice FTS5 desde la vista calendar_notes_search y
+        devuelve el modo de búsqueda. No crea nada: la tabla, la vista y los
+        triggers solo los define la migración ``c2f7a9d14e60``. Los índices
+        FULLTEXT de MySQL los mantiene InnoDB y no hace falta reconstruirlos.
+        """
+        with _index_lock:
+            _index_modes.pop(db.engine, None)
+            mode = NoteSearchService.index_mode()
+            if mode == 'fts5':
+                db.session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+                db.session.execute(text(
+                    f"INSERT INTO {FTS_TABLE}(rowid, title, body) SELECT id, title, body FROM {FTS_VIEW}"
+                ))
+                db.session.commit()
+            return mode
+
+    @staticmethod
+    def search(query_text: str, user, start_date: Optional[date] = None, end_date: Optional[date] = None,
+               limit: int = DEFAULT_SEARCH_LIMIT, offset: int = 0) -> List[Dict[str, Any]]:
+        """Notas visibles para ``user`` que coinciden con todas las palabras, de más a menos relevantes"""
+        words = NoteSearchService.tokens(query_text)
+        if not words:
+            return []
+        limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+
+        mode = NoteSearchService.index_mode()
+        order_columns = [getattr(CalendarOrder, name) for name in ORDER_SEARCH_COLUMNS]
+        columns = [CalendarNote.id, CalendarNote.date_for, CalendarNote.title, CalendarNote.content,
+                   CalendarNote.priority, CalendarNote.color, CalendarNote.is_private] + order_columns
+
+        if mode == 'fts5':
+            match = ' '.join(f'"{word}"*' for word in words)
+            # bm25() es menor cuanto más relevante: se invierte para que más sea mejor.
+            # El título (cliente y destinatario del pedido) pesa más que el resto
+            rank = (-func.bm25(literal_column(FTS_TABLE), TITLE_WEIGHT, 1.0)).label('rank')
+            query = db.session.query(*columns, rank) \
+                .join(_fts_table, _fts_table.c.rowid == CalendarNote.id) \
+                .outerjoin(CalendarOrder, CalendarOrder.note_id == CalendarNote.id) \
+                .filter(literal_column(FTS_TABLE).op('MATCH')(match)) \
+                .order_by(rank.desc(), CalendarNote.date_for.desc())
+        elif mode == 'fulltext':
+            from sqlalchemy.dialects.mysql import match as mysql_match
+            against = ' '.join(f'+{word}*' for word in words)
+            note_score = mysql_match(CalendarNote.title, CalendarNote.content, against=against).in_boolean_mode()
+            order_score = func.coalesce(mysql_match(*order_columns, against=against).in_boolean_mode(), 0)
+            # Cada índice FULLTEXT cubre una tabla: basta con que una de ellas tenga todas las palabras
+            product_match = exists().where(
+                CalendarOrderItem.order_id == CalendarOrder.id,
+                *[CalendarOrderItem.product_name.ilike(f'%{word}%') for word in words]
+            )
+            score = (note_score + order_score).label('rank')
+            query = db.session.query(*columns, score) \
+                .outerjoin(CalendarOrder, CalendarOrder.note_id == CalendarNote.id) \
+                .filter(or_(note_score > 0, order_score > 0, product_match)) \
+                .order_by(score.desc(), CalendarNote.date_for.desc())
+        else:
+            query = db.session.query(*columns, literal_column('0').label('rank')) \
+                .outerjoin(CalendarOrder, CalendarOrder.note_id == CalendarNote.id)
+            for word in words:
+                pattern = f'%{word}%'
+                query = query.filter(or_(
+                    CalendarNote.title.ilike(pattern),
+                    CalendarNote.content.ilike(pattern),
+                    *[column.ilike(pattern) for column in order_columns],
+                    exists().where(CalendarOrderItem.order_id == CalendarOrder.id,
+                                   CalendarOrderItem.product_name.ilike(pattern))
+                ))
+            query = query.order_by(CalendarNote.date_for.desc())
+
+        if start_date:
+            query = query.filter(CalendarNote.date_for >= start_date)
+        if end_date:
+            query = query.filter(CalendarNote.date_for <= end_date)
+        query = CalendarSummaryService.visible_notes(query, user)
+
+        return [{
+            'id': row.id,
+            'date': row.date_for.isoformat(),
+            'title': row.title,
+            'snippet': NoteSearchService.snippet(
+                ' '.join(filter(None, [row.content] + [getattr(row, name) for name in ORDER_SEARCH_COLUMNS])),
+                words
+            ),
+            'priority': row.priority,
+            'color': row.color,
+            'is_private': row.is_private,
+            'rank': round(float(row.rank or 0), 4),
+        } for row in query.limit(limit).offset(offset)]
+
+    @staticmethod
+    def snippet(content: Optional[str], words: List[str]) -> str:
+        """Fragmento del contenido alrededor de la primera palabra encontrada"""
+        if not content:
+            return ''
+        flat = ' '.join(content.split())
+        lowered = flat.lower()
+        positions = [lowered.find(word.lower()) for word in words]
+        positions = [p for p in positions if p >= 0]
+        if not positions:
+            return flat[:SNIPPET_CONTEXT * 2] + ('…' if len(flat) > SNIPPET_CONTEXT * 2 else '')
+        first = min(positions)
+        start = max(0, first - SNIPPET_CONTEXT)
+        end = min(len(flat), first + SNIPPET_CONTEXT)
+        return ('…' if start > 0 else '') + flat[start:end] + ('…' if end < len(flat) else '')
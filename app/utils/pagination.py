@@ -0,0 +1,143 @@
+"""
+Paginación por clave (keyset)
+=============================
+
+Pagina listados ordenados de forma descendente por una o varias columnas (por
+ejemplo fecha de subida e id) usando el último valor visto como cursor en lugar
+de OFFSET. Cada página cuesta lo mismo sin importar lo lejos que esté del
+principio, y los cursores son estables aunque se inserten filas nuevas.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from sqlalchemy import and_, or_
+
+# Tamaño de página por defecto de los listados
+DEFAULT_PAGE_SIZE = 50
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        raise ValueError('Valor de cursor no reconocido')
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Codifica los valores de clave de una fila como cursor opaco para la URL"""
+    payload = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[List[Any]]:
+    """Decodifica un cursor; devuelve None si falta o no es válido"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(values, list) or len(values) != size:
+            return None
+        return [_decode_value(v) for v in values]
+    except (ValueError, TypeError):
+        return None
+
+
+class KeysetPage:
+    """Página de resultados con los cursores para avanzar y retroceder"""
+
+    def __init__(self, items: List[Any], per_page: int,
+                 next_cursor: Optional[str] = None, prev_cursor: Optional[str] = None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+    def to_dict(self, serialize: Callable[[Any], Dict[str, Any]]) -> Dict[str, Any]:
+        """Representación JSON de la página"""
+        return {
+            'items': [serialize(item) for item in self.items],
+            'per_page': self.per_page,
+            'next_cursor': self.next_cursor,
+            'prev_cursor': self.prev_cursor,
+        }
+
+
+def _after_condition(columns, values, descending: bool):
+    """Condición lexicográfica (c1, c2, ...) < (v1, v2, ...) o > según la dirección"""
+    clauses = []
+    for index, column in enumerate(columns):
+        equal_prefix = [columns[i] == values[i] for i in range(index)]
+        step = column < values[index] if descending else column > values[index]
+        clauses.append(and_(*equal_prefix, step))
+    return or_(*clauses)
+
+
+def keyset_paginate(query, order_columns: Sequence[Any], after: Optional[str] = None,
+                    before: Optional[str] = None, per_page: int = DEFAULT_PAGE_SIZE) -> KeysetPage:
+    """
+    Pagina ``query`` en orden descendente por ``order_columns``.
+
+    La última columna debe ser única (normalmente el id) para que el orden sea
+    total. ``after`` devuelve la página siguiente a ese cursor y ``before`` la
+    anterior. Las columnas no deben contener NULL.
+    """
+    columns = list(order_columns)
+    keys = [column.key for column in columns]
+    after_values = decode_cursor(after, len(columns))
+    before_values = decode_cursor(before, len(columns)) if after_values is None else None
+
+    def key_of(item):
+        return [getattr(item, key) for key in keys]
+
+    if before_values is not None:
+        # Retroceder: recorrer en orden ascendente desde el cursor y dar la vuelta
+        rows = query.filter(_after_condition(columns, before_values, descending=False)) \
+            .order_by(*[column.asc() for column in columns]).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        return KeysetPage(
+            items, per_page,
+            next_cursor=encode_cursor(key_of(items[-1])) if items else None,
+            prev_cursor=encode_cursor(key_of(items[0])) if items and has_more else None
+        )
+
+    if after_values is not None:
+        query = query.filter(_after_condition(columns, after_values, descending=True))
+    rows = query.order_by(*[column.desc() for column in columns]).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    return KeysetPage(
+        items, per_page,
+        next_cursor=encode_cursor(key_of(items[-1])) if items and has_more else None,
+        prev_cursor=encode_cursor(key_of(items[0])) if items and after_values is not None else None
+    )
+
+
+def wants_json(request) -> bool:
+    """Indica si el listado debe responder en JSON (?format=json o Accept)"""
+    if request.args.get('format') == 'json':
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', 'text/html'])
+    return best == 'application/json' and request.accept_mimetypes[best] > request.accept_mimetypes['text/html']
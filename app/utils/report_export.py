@@ -0,0 +1,93 @@
+"""
+Exportación de reportes en streaming
+====================================
+
+Escritores CSV y XLSX que consumen las filas de un iterador y las entregan
+por trozos a la respuesta HTTP, sin construir el archivo completo en memoria.
+"""
+
+import csv
+import tempfile
+from typing import Iterable, Iterator, Sequence
+
+# Filas de CSV acumuladas antes de entregar un trozo a la respuesta
+CSV_ROWS_PER_CHUNK = 200
+
+# Tamaño de lectura del archivo XLSX generado (64 KB)
+XLSX_CHUNK_SIZE = 64 * 1024
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class _CsvLineBuffer:
+    """Destino mínimo para csv.writer que acumula las líneas escritas"""
+
+    def __init__(self):
+        self.lines = []
+
+    def write(self, line):
+        self.lines.append(line)
+
+    def drain(self) -> str:
+        data = ''.join(self.lines)
+        self.lines = []
+        return data
+
+
+def stream_csv(header: Sequence, rows: Iterable[Sequence],
+               rows_per_chunk: int = CSV_ROWS_PER_CHUNK) -> Iterator[bytes]:
+    """Genera un CSV en UTF-8 por bloques de ``rows_per_chunk`` filas"""
+    buffer = _CsvLineBuffer()
+    writer = csv.writer(buffer)
+
+    writer.writerow(header)
+    pending = 1
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.drain().encode('utf-8')
+            pending = 0
+
+    data = buffer.drain()
+    if data:
+        yield data.encode('utf-8')
+
+
+def xlsx_available() -> bool:
+    """Indica si XlsxWriter está instalado"""
+    try:
+        import xlsxwriter  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def stream_xlsx(header: Sequence, rows: Iterable[Sequence], sheet_name: str = 'Reporte',
+                chunk_size: int = XLSX_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Genera un XLSX con XlsxWriter en modo ``constant_memory``.
+
+    Cada fila se vuelca a disco en cuanto se escribe, así que la memoria no
+    crece con el número de filas. El libro terminado se lee y se entrega por
+    trozos desde un archivo temporal que se elimina al acabar.
+    """
+    import xlsxwriter
+
+    with tempfile.TemporaryFile() as output:
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+        worksheet = workbook.add_worksheet(sheet_name[:31])
+        bold = workbook.add_format({'bold': True})
+
+        worksheet.write_row(0, 0, header, bold)
+        for row_index, row in enumerate(rows, start=1):
+            worksheet.write_row(row_index, 0, row)
+
+        workbook.close()
+
+        output.seek(0)
+        while True:
+            data = output.read(chunk_size)
+            if not data:
+                break
+            yield data
@@ -0,0 +1,152 @@
+"""
+Métricas de rendimiento por petición
+====================================
+
+Mide en cada petición el tiempo total, el número de sentencias SQL y su
+tiempo (eventos de cursor del Engine de SQLAlchemy) y el tiempo de render de
+plantillas (señales de Flask). Con ``SERVER_TIMING_HEADER`` los valores se
+devuelven a los administradores autenticados en la cabecera ``Server-Timing``
+(visible en las herramientas de desarrollo del navegador). Siempre se
+acumulan en una tabla en memoria por endpoint con las últimas peticiones,
+que se muestra en el panel de super administrador.
+
+Las estadísticas son por proceso: con varios workers de gunicorn cada uno
+muestra las peticiones que ha atendido.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Peticiones recientes que se conservan por endpoint
+ROLLING_WINDOW = 200
+
+
+class RequestStats:
+    """Tabla en memoria de las últimas peticiones por endpoint"""
+
+    def __init__(self, window: int = ROLLING_WINDOW):
+        self._window = window
+        self._samples: Dict[str, deque] = {}
+        self._totals: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, wall_ms: float, sql_count: int, sql_ms: float, template_ms: float):
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=self._window)
+            samples.append((wall_ms, sql_count, sql_ms, template_ms))
+            self._totals[endpoint] = self._totals.get(endpoint, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Resumen por endpoint, de mayor a menor tiempo medio"""
+        with self._lock:
+            data = {endpoint: list(samples) for endpoint, samples in self._samples.items()}
+            totals = dict(self._totals)
+
+        rows = []
+        for endpoint, samples in data.items():
+            walls = sorted(sample[0] for sample in samples)
+            count = len(samples)
+            rows.append({
+                'endpoint': endpoint,
+                'requests': totals[endpoint],
+                'window': count,
+                'avg_ms': round(sum(walls) / count, 1),
+                'p95_ms': round(walls[min(count - 1, int(count * 0.95))], 1),
+                'max_ms': round(walls[-1], 1),
+                'avg_queries': round(sum(sample[1] for sample in samples) / count, 1),
+                'max_queries': max(sample[1] for sample in samples),
+                'avg_sql_ms': round(sum(sample[2] for sample in samples) / count, 1),
+                'avg_template_ms': round(sum(sample[3] for sample in samples) / count, 1),
+            })
+        rows.sort(key=lambda row: row['avg_ms'], reverse=True)
+        return rows
+
+
+stats = RequestStats()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # En el contexto de la ejecución y no en conn.info, que sobrevive en el pool
+    context._request_metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_request_metrics_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    if has_request_context() and 'perf_start' in g:
+        g.perf_sql_count += 1
+        g.perf_sql_time += elapsed
+
+
+def _before_render(sender, template, context, **extra):
+    if has_request_context() and 'perf_start' in g:
+        g.perf_template_started = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    if has_request_context() and g.get('perf_template_started') is not None:
+        g.perf_template_time += time.perf_counter() - g.perf_template_started
+        g.perf_template_started = None
+
+
+def server_timing(wall: float, sql_count: int, sql_time: float, template_time: float) -> str:
+    """Valor de la cabecera Server-Timing (duraciones en milisegundos)"""
+    return (f'app;dur={wall * 1000:.1f}, '
+            f'db;dur={sql_time * 1000:.1f};desc="{sql_count} queries", '
+            f'tpl;dur={template_time * 1000:.1f}')
+
+
+def _timing_visible() -> bool:
+    """Los tiempos internos solo se muestran a administradores autenticados"""
+    return current_user.is_authenticated and (current_user.is_admin or current_user.is_super_admin)
+
+
+def init_app(app):
+    """Registra la medición de peticiones, SQL y plantillas"""
+    if not app.config.get('REQUEST_METRICS_ENABLED', True):
+        return
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.before_request
+    def start_request_metrics():
+        g.perf_start = time.perf_counter()
+        g.perf_sql_count = 0
+        g.perf_sql_time = 0.0
+        g.perf_template_time = 0.0
+        g.perf_template_started = None
+
+    @app.after_request
+    def record_request_metrics(response):
+        if 'perf_start' not in g:
+            return response
+        wall = time.perf_counter() - g.perf_start
+        endpoint = request.endpoint or 'sin_endpoint'
+
+        if endpoint != 'static':
+            stats.record(endpoint, wall * 1000, g.perf_sql_count, g.perf_sql_time * 1000,
+                         g.perf_template_time * 1000)
+        if app.config.get('SERVER_TIMING_HEADER', False) and _timing_visible():
+            response.headers['Server-Timing'] = server_timing(
+                wall, g.perf_sql_count, g.perf_sql_time, g.perf_template_time
+            )
+        return response
@@ -0,0 +1,135 @@
+"""
+Hoja de ruta de entregas
+========================
+
+Lista de entregas de un día agrupada por código postal y población, a partir
+de los pedidos de WooCommerce estructurados (calendar_orders). El día de
+reparto es la fecha de entrega del pedido o, si el cliente no eligió ninguna,
+la fecha de su nota (la misma en la que aparece en el calendario). Se calcula
+con una sola consulta y se guarda en memoria con la versión del mes como parte
+de la clave: cualquier cambio en un pedido o nota del mes incrementa la versión
+y la siguiente petición recalcula la hoja.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, List
+from sqlalchemy import func, or_
+from app.models import db, CalendarOrder, CalendarOrderItem
+from app.models.user import CalendarNote
+from app.utils.calendar_versions import month_version
+
+# Estados de pedido que no se reparten
+EXCLUDED_STATUSES = ('cancelled', 'refunded', 'failed')
+
+# Columnas de la exportación CSV
+CSV_HEADER = ['Código postal', 'Población', 'Pedido', 'Destinatario', 'Teléfono', 'Dirección',
+              'Productos', 'Dedicatoria', 'Cliente']
+
+# Hojas calculadas que se conservan por proceso
+ROUTE_SHEET_CACHE_SIZE = 64
+
+_cache: 'OrderedDict[tuple, Dict[str, Any]]' = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class RouteSheetService:
+    """Hoja de ruta diaria agrupada por zona de entrega"""
+
+    @staticmethod
+    def cache_key(day: date) -> tuple:
+        return (day, month_version(day.year, day.month))
+
+    @staticmethod
+    def route_sheet(day: date) -> Dict[str, Any]:
+        """Hoja del día; se reutiliza mientras no cambie ningún pedido del mes"""
+        key = RouteSheetService.cache_key(day)
+        with _cache_lock:
+            if key in _cache:
+                _cache.move_to_end(key)
+                return _cache[key]
+
+        sheet = RouteSheetService.build(day)
+        sheet['version'] = key[1]
+
+        with _cache_lock:
+            _cache[key] = sheet
+            # Las versiones anteriores del mismo día ya no se pueden pedir
+            for stale in [k for k in _cache if k[0] == day and k != key]:
+                del _cache[stale]
+            while len(_cache) > ROUTE_SHEET_CACHE_SIZE:
+                _cache.popitem(last=False)
+        return sheet
+
+    @staticmethod
+    def build(day: date) -> Dict[str, Any]:
+        """Calcula la hoja con una consulta ordenada por código postal, población y pedido"""
+        rows = db.session.query(
+            CalendarOrder.id, CalendarOrder.wc_order_id, CalendarOrder.status, CalendarOrder.total,
+            CalendarOrder.currency, CalendarOrder.customer_name, CalendarOrder.customer_phone,
+            CalendarOrder.delivery_name, CalendarOrder.delivery_phone, CalendarOrder.delivery_address,
+            CalendarOrder.delivery_city, CalendarOrder.delivery_postcode, CalendarOrder.dedication,
+            CalendarOrder.note_id, CalendarNote.content.label('notes'),
+            CalendarOrderItem.product_name, CalendarOrderItem.quantity, CalendarOrderItem.options
+        ).join(CalendarNote, CalendarNote.id == CalendarOrder.note_id) \
+            .outerjoin(CalendarOrderItem, CalendarOrderItem.order_id == CalendarOrder.id) \
+            .filter(func.coalesce(CalendarOrder.delivery_date, CalendarNote.date_for) == day,
+                    or_(CalendarOrder.status.is_(None), CalendarOrder.status.notin_(EXCLUDED_STATUSES))) \
+            .order_by(CalendarOrder.delivery_postcode, CalendarOrder.delivery_city,
+                      CalendarOrder.wc_order_id, CalendarOrderItem.id)
+
+        groups: List[Dict[str, Any]] = []
+        deliveries: Dict[int, Dict[str, Any]] = {}
+        for row in rows:
+            delivery = deliveries.get(row.id)
+            if delivery is None:
+                postcode, city = row.delivery_postcode or '', row.delivery_city or ''
+                if not groups or (groups[-1]['postcode'], groups[-1]['city']) != (postcode, city):
+                    groups.append({'postcode': postcode, 'city': city, 'deliveries': []})
+                delivery = {
+                    'order_id': row.wc_order_id,
+                    'note_id': row.note_id,
+                    'status': row.status,
+                    'total': str(row.total) if row.total is not None else None,
+                    'currency': row.currency,
+                    'customer': row.customer_name,
+                    'customer_phone': row.customer_phone,
+                    'recipient': row.delivery_name or row.customer_name,
+                    'phone': row.delivery_phone or row.customer_phone,
+                    'address': row.delivery_address,
+                    'dedication': row.dedication,
+                    'notes': row.notes,
+                    'products': [],
+                }
+                deliveries[row.id] = delivery
+                groups[-1]['deliveries'].append(delivery)
+            if row.product_name is not None:
+                delivery['products'].append({
+                    'name': row.product_name,
+                    'quantity': row.quantity,
+                    'options': row.options,
+                })
+
+        return {
+            'date': day.isoformat(),
+            'total_deliveries': len(deliveries),
+            'groups': groups,
+        }
+
+    @staticmethod
+    def csv_rows(sheet: Dict[str, Any]):
+        """Filas planas (una por entrega) para la exportación CSV"""
+        for group in sheet['groups']:
+            for delivery in group['deliveries']:
+                yield [
+                    group['postcode'], group['city'], delivery['order_id'], delivery['recipient'],
+                    delivery['phone'] or '', delivery['address'] or '',
+                    '; '.join(f"{p['quantity']}x {p['name']}" for p in delivery['products']),
+                    delivery['dedication'] or '', delivery['customer'],
+                ]
+
+    @staticmethod
+    def clear_cache():
+        with _cache_lock:
+            _cache.clear()
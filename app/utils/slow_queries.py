@@ -0,0 +1,342 @@
+"""
+Registro de consultas lentas y asesor de índices
+================================================
+
+Los eventos de cursor del Engine de SQLAlchemy miden cada sentencia; las que
+superan ``SLOW_QUERY_THRESHOLD_MS`` se guardan agrupadas por huella: la
+consulta normalizada (literales, parámetros y listas ``IN`` sustituidos por
+``?``). Por cada huella se acumulan ejecuciones, tiempos, endpoints y la
+*forma* de los parámetros (tipos, nunca valores).
+
+En el gestor de base de datos se muestran las huellas de mayor tiempo total,
+con el plan de ``EXPLAIN`` de las peores (ejecutado con los parámetros de su
+ejecución más lenta) y una propuesta de índice cuando las columnas de
+``WHERE``/``JOIN``/``ORDER BY`` no encabezan ningún índice de los modelos
+(``db.metadata``) y el plan confirma un recorrido completo de la tabla.
+
+Como ``request_metrics``, el registro es por proceso y solo se mide dentro de
+un contexto de aplicación.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import UniqueConstraint, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from app.utils.sql_console import EXPLAIN_MAX_ROWS, format_cell, statement_kind
+
+# Huellas distintas que se conservan (se descarta la de menor tiempo total)
+MAX_FINGERPRINTS = 500
+# Endpoints y formas de parámetros distintos por huella
+MAX_VARIANTS = 10
+MAX_SHAPE_ITEMS = 12
+EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+# Columnas como máximo en un índice propuesto
+MAX_INDEX_COLUMNS = 3
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|(?<![\w:]):\w+|\?')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_VALUES_LIST = re.compile(r'\bVALUES\s*\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(statement: str) -> str:
+    """Consulta sin valores concretos: sirve de huella para agrupar ejecuciones"""
+    sql = _STRING.sub('?', statement)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _VALUES_LIST.sub('VALUES (...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+
+
+def _type_name(value: Any) -> str:
+    return 'NULL' if value is None else type(value).__name__
+
+
+def parameter_shape(parameters: Any, executemany: bool = False) -> str:
+    """Tipos de los parámetros, p. ej. ``(int, str, NULL)`` o ``50× (int, str)``"""
+    if executemany:
+        rows = list(parameters or [])
+        return f'{len(rows)}× {parameter_shape(rows[0])}' if rows else 'executemany'
+    if isinstance(parameters, dict):
+        items = [f'{key}: {_type_name(value)}' for key, value in list(parameters.items())[:MAX_SHAPE_ITEMS]]
+        more = ', …' if len(parameters) > MAX_SHAPE_ITEMS else ''
+        return '{' + ', '.join(items) + more + '}'
+    if isinstance(parameters, (list, tuple)):
+        items = [_type_name(value) for value in parameters[:MAX_SHAPE_ITEMS]]
+        more = ', …' if len(parameters) > MAX_SHAPE_ITEMS else ''
+        return '(' + ', '.join(items) + more + ')'
+    return '()'
+
+
+class SlowQueryLog:
+    """Huellas de consultas lentas con sus tiempos acumulados"""
+
+    def __init__(self, max_fingerprints: int = MAX_FINGERPRINTS):
+        self._max = max_fingerprints
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, parameters: Any, executemany: bool, elapsed_ms: float,
+               endpoint: str, dialect: str):
+        normalized = normalize(statement)
+        key = fingerprint(normalized)
+        shape = parameter_shape(parameters, executemany)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self._max:
+                    cheapest = min(self._entries, key=lambda name: self._entries[name]['total_ms'])
+                    del self._entries[cheapest]
+                entry = self._entries[key] = {
+                    'fingerprint': key, 'sql': normalized, 'dialect': dialect,
+                    'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'endpoints': {}, 'shapes': {}, 'executemany': executemany,
+                }
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['last_seen'] = time.time()
+            if elapsed_ms >= entry['max_ms']:
+                # La ejecución más lenta se guarda para poder pedir su plan
+                entry['max_ms'] = elapsed_ms
+                entry['statement'] = statement
+                entry['parameters'] = None if executemany else parameters
+            for variants, value in ((entry['endpoints'], endpoint), (entry['shapes'], shape)):
+                if value in variants or len(variants) < MAX_VARIANTS:
+                    variants[value] = variants.get(value, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Copia de las huellas, de mayor a menor tiempo total"""
+        with self._lock:
+            rows = [{**entry, 'endpoints': dict(entry['endpoints']), 'shapes': dict(entry['shapes'])}
+                    for entry in self._entries.values()]
+        rows.sort(key=lambda row: row['total_ms'], reverse=True)
+        return rows
+
+
+log = SlowQueryLog()
+
+
+def _settings() -> Optional[Dict[str, Any]]:
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('slow_queries')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # El inicio va en el contexto de la ejecución, que se descarta con ella aunque
+    # la sentencia falle (conn.info vive mientras la conexión siga en el pool)
+    context._slow_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_slow_query_start', None)
+    if start is None:
+        return
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    settings = _settings()
+    if settings is None or elapsed_ms < settings['threshold_ms'] or conn.info.get('slow_query_explaining'):
+        return
+    endpoint = (request.endpoint or 'sin_endpoint') if has_request_context() else 'sin_petición'
+    log.record(statement, parameters, executemany, elapsed_ms, endpoint, conn.dialect.name)
+
+
+# --- EXPLAIN -----------------------------------------------------------------
+
+_SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?:\s+AS\s+\w+)?$')
+
+
+def explain(conn, statement: str, parameters: Any) -> Dict[str, Any]:
+    """Plan de la sentencia con sus parámetros y tablas recorridas enteras"""
+    sqlite = conn.dialect.name == 'sqlite'
+    prefix = 'EXPLAIN QUERY PLAN ' if sqlite else 'EXPLAIN '
+    conn.info['slow_query_explaining'] = True
+    try:
+        if parameters:
+            result = conn.exec_driver_sql(prefix + statement, parameters)
+        else:
+            result = conn.exec_driver_sql(prefix + statement, execution_options={'no_parameters': True})
+        columns = list(result.keys())
+        rows = result.fetchmany(EXPLAIN_MAX_ROWS)
+    finally:
+        conn.info.pop('slow_query_explaining', None)
+
+    full_scans = []
+    for row in rows:
+        values = dict(zip(columns, row))
+        if sqlite:
+            match = _SQLITE_SCAN.match(str(values.get('detail', '')))
+            if match:
+                full_scans.append(match.group(1))
+        elif str(values.get('type', '')).upper() == 'ALL' and values.get('table'):
+            full_scans.append(str(values['table']))
+    return {
+        'columns': columns,
+        'rows': [[format_cell(value) for value in row] for row in rows],
+        'full_scans': full_scans,
+    }
+
+
+# --- Asesor de índices -------------------------------------------------------
+
+_KEYWORDS = {'ON', 'WHERE', 'JOIN', 'LEFT', 'RIGHT', 'INNER', 'OUTER', 'CROSS', 'GROUP', 'ORDER', 'LIMIT',
+             'HAVING', 'UNION', 'SET', 'USING', 'AS', 'NATURAL', 'FULL', 'OFFSET', 'FOR'}
+_TABLE_REF = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+_CLAUSE = re.compile(r'\b(WHERE|ON)\b(.*?)(?=\b(?:JOIN|LEFT|RIGHT|INNER|CROSS|WHERE|GROUP BY|ORDER BY|LIMIT|HAVING|'
+                     r'UNION)\b|\)\s*AS\b|$)', re.IGNORECASE | re.DOTALL)
+_ORDER_BY = re.compile(r'\bORDER BY\b(.*?)(?=\bLIMIT\b|\bOFFSET\b|\)|$)', re.IGNORECASE | re.DOTALL)
+_PREDICATE = re.compile(r'(?:(\w+)\.)?(\w+)\s*(=|<=|>=|<>|!=|<|>|\bIN\b|\bBETWEEN\b|\bIS\b)', re.IGNORECASE)
+_COLUMN_REF = re.compile(r'^\s*(?:(\w+)\.)?(\w+)(?:\s+(?:ASC|DESC))?\s*$', re.IGNORECASE)
+_EQUALITY = ('=', 'IN', 'IS')
+
+
+def _aliases(sql: str, tables: Dict[str, Any]) -> Dict[str, str]:
+    aliases = {}
+    for table_name, alias in _TABLE_REF.findall(sql):
+        if table_name not in tables:
+            continue
+        aliases[table_name] = table_name
+        if alias and alias.upper() not in _KEYWORDS:
+            aliases[alias] = table_name
+    return aliases
+
+
+def _leading_columns(table) -> set:
+    """Columnas que encabezan algún índice (clave primaria, UNIQUE o Index)"""
+    leading = set()
+    if table.primary_key.columns:
+        leading.add(list(table.primary_key.columns)[0].name)
+    for index in table.indexes:
+        if index.columns:
+            leading.add(list(index.columns)[0].name)
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint) and len(constraint.columns):
+            leading.add(list(constraint.columns)[0].name)
+    return leading
+
+
+def _model_names(metadata) -> Dict[str, str]:
+    from app.models.user import db
+
+    return {mapper.local_table.name: mapper.class_.__name__ for mapper in db.Model.registry.mappers
+            if mapper.local_table is not None and mapper.local_table.metadata is metadata}
+
+
+def predicate_columns(sql: str, tables: Dict[str, Any]) -> Dict[str, Dict[str, List[str]]]:
+    """Columnas por tabla usadas en igualdades, rangos y ORDER BY"""
+    sql = sql.replace('`', '').replace('"', '')
+    aliases = _aliases(sql, tables)
+    default = next(iter(set(aliases.values()))) if len(set(aliases.values())) == 1 else None
+    used: Dict[str, Dict[str, List[str]]] = {}
+
+    def add(qualifier, column, kind):
+        table_name = aliases.get(qualifier) if qualifier else default
+        if not table_name or column not in tables[table_name].columns:
+            return
+        bucket = used.setdefault(table_name, {'equality': [], 'range': [], 'order': []})[kind]
+        if column not in bucket:
+            bucket.append(column)
+
+    for _, body in _CLAUSE.findall(sql):
+        for qualifier, column, operator in _PREDICATE.findall(body):
+            add(qualifier, column, 'equality' if operator.upper() in _EQUALITY else 'range')
+    for body in _ORDER_BY.findall(sql):
+        for part in body.split(','):
+            match = _COLUMN_REF.match(part)
+            if match:
+                add(match.group(1), match.group(2), 'order')
+    return used
+
+
+def suggest_indexes(sql: str, metadata, full_scans: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Índices propuestos para ``sql`` según los modelos.
+
+    Solo se propone un índice en una tabla cuando ninguna de sus columnas
+    filtradas encabeza un índice existente; si hay plan (``full_scans`` no es
+    None), además tiene que recorrerse la tabla entera.
+    """
+    tables = metadata.tables
+    models = _model_names(metadata)
+    normalized = sql.replace('`', '').replace('"', '')
+    aliases = _aliases(normalized, tables)
+    scanned = None if full_scans is None else {aliases.get(name, name) for name in full_scans}
+
+    suggestions = []
+    for table_name, columns in predicate_columns(sql, tables).items():
+        if scanned is not None and table_name not in scanned:
+            continue
+        filtered = columns['equality'] + columns['range']
+        leading = _leading_columns(tables[table_name])
+        if not filtered or leading.intersection(filtered):
+            continue
+        # Igualdades primero y después un único rango (o la columna de orden)
+        index_columns = columns['equality'] + (columns['range'][:1] or
+                                               [col for col in columns['order'] if col not in columns['equality']][:1])
+        index_columns = index_columns[:MAX_INDEX_COLUMNS]
+        name = f"ix_{table_name}_{'_'.join(index_columns)}"
+        suggestions.append({
+            'table': table_name,
+            'columns': index_columns,
+            'name': name,
+            'ddl': f"CREATE INDEX {name} ON {table_name} ({', '.join(index_columns)})",
+            'model': models.get(table_name),
+            'model_hint': f"db.Index('{name}', " + ', '.join(f"'{col}'" for col in index_columns) + ')',
+        })
+    return suggestions
+
+
+def report(engine, metadata, top: int = 20, explain_top: int = 5) -> List[Dict[str, Any]]:
+    """Huellas de mayor tiempo total con plan (las ``explain_top`` peores) e índices propuestos"""
+    rows = []
+    entries = [entry for entry in log.entries() if entry['dialect'] == engine.dialect.name][:top]
+    with engine.connect() as conn:
+        for position, entry in enumerate(entries):
+            plan = None
+            if position < explain_top and not entry['executemany'] and \
+                    statement_kind(entry['statement']) in EXPLAINABLE:
+                try:
+                    plan = explain(conn, entry['statement'], entry['parameters'])
+                except DBAPIError as e:
+                    conn.rollback()
+                    plan = {'error': str(e.orig)}
+            full_scans = plan.get('full_scans') if plan and 'error' not in plan else None
+            rows.append({
+                'fingerprint': entry['fingerprint'],
+                'sql': entry['sql'],
+                'count': entry['count'],
+                'total_ms': round(entry['total_ms'], 1),
+                'avg_ms': round(entry['total_ms'] / entry['count'], 1),
+                'max_ms': round(entry['max_ms'], 1),
+                'endpoints': sorted(entry['endpoints'].items(), key=lambda item: item[1], reverse=True),
+                'shapes': sorted(entry['shapes'].items(), key=lambda item: item[1], reverse=True),
+                'explain': plan,
+                'suggestions': suggest_indexes(entry['sql'], metadata, full_scans),
+            })
+    return rows
+
+
+def init_app(app):
+    """Registra la captura de consultas lentas"""
+    if not app.config.get('SLOW_QUERY_LOG_ENABLED', True):
+        return
+
+    app.extensions['slow_queries'] = {'threshold_ms': float(app.config.get('SLOW_QUERY_THRESHOLD_MS', 200))}
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
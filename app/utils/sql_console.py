@@ -0,0 +1,239 @@
+"""
+Consola SQL del panel de administración
+=======================================
+
+Ejecuta las consultas de ``admin.execute_sql`` sin cargar el resultado
+completo en memoria:
+
+- Todas las sentencias que devuelven filas se leen con un cursor de servidor
+  (``stream_results``) por bloques: se descartan las filas anteriores al
+  ``offset`` y se leen las de la página. "Cargar más" vuelve a ejecutar la
+  consulta con el siguiente ``offset``; así funciona con varios workers sin
+  guardar cursores abiertos entre peticiones.
+- En SQLite las consultas SELECT/WITH se envuelven además en
+  ``SELECT * FROM (...) LIMIT/OFFSET`` para que la base de datos deje de
+  producir filas al llegar a la página. En MySQL/MariaDB no se envuelven (una
+  subconsulta derivada no admite columnas repetidas, error 1060, y MariaDB
+  ignora su ORDER BY): si la consulta no tiene LIMIT propio se le añade
+  ``LIMIT/OFFSET`` al final. Sin él, cerrar el cursor sin búfer de pymysql
+  leería del servidor el resto del resultado.
+- Nunca se devuelven más de ``SQL_CONSOLE_MAX_ROWS`` filas en total.
+- Cada sentencia tiene un límite de tiempo: un manejador de progreso en
+  SQLite y ``max_statement_time`` en MariaDB. En MySQL ``max_execution_time``
+  solo se aplica a los SELECT de solo lectura, así que además un temporizador
+  cancela con ``KILL QUERY`` desde otra conexión la sentencia que lo supere
+  (UPDATE, DELETE, ALTER...).
+- Opcionalmente se incluye el plan de ``EXPLAIN`` (``EXPLAIN QUERY PLAN`` en
+  SQLite), que no ejecuta la sentencia.
+"""
+
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List
+from sqlalchemy.exc import DBAPIError
+
+# Sentencias que se confirman al terminar (el resto se deshace)
+MODIFYING_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CREATE', 'DROP', 'ALTER', 'TRUNCATE', 'RENAME')
+# Sentencias que se pueden paginar envolviéndolas en una subconsulta
+PAGEABLE_STATEMENTS = ('SELECT', 'WITH')
+# Motores en los que la subconsulta conserva columnas repetidas y el orden
+PAGEABLE_DIALECTS = ('sqlite',)
+EXPLAINABLE_STATEMENTS = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+# Caracteres máximos por celda en la respuesta
+MAX_CELL_CHARS = 2000
+EXPLAIN_MAX_ROWS = 200
+# Filas descartadas por lectura al saltar hasta el offset
+SKIP_BATCH_ROWS = 1000
+# Instrucciones de la VM de SQLite entre comprobaciones del límite de tiempo
+SQLITE_PROGRESS_STEPS = 10000
+
+# Sin parámetros: el driver no interpreta los % de la consulta (pymysql)
+_RAW_SQL = {'no_parameters': True}
+
+_LEADING_COMMENTS = re.compile(r'^\s*(?:(?:--[^\n]*\n)|(?:/\*.*?\*/)|\s)*', re.DOTALL)
+# Comentarios y literales (cadenas e identificadores entre comillas)
+_COMMENTS_AND_LITERALS = re.compile(
+    r"--[^\n]*|#[^\n]*|/\*.*?\*/|'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"|`[^`]*`", re.DOTALL
+)
+_INNERMOST_PARENTHESES = re.compile(r'\([^()]*\)')
+# Cláusulas del nivel superior tras las que no se puede añadir LIMIT
+_NO_APPENDED_LIMIT = re.compile(r'\b(?:LIMIT|INTO|FOR\s+UPDATE|FOR\s+SHARE|LOCK\s+IN)\b', re.IGNORECASE)
+
+
+class QueryTimeout(Exception):
+    """La consulta superó el límite de tiempo de la consola"""
+
+
+def normalize(sql: str) -> str:
+    """Consulta sin espacios ni ``;`` finales"""
+    return sql.strip().rstrip(';').rstrip()
+
+
+def statement_kind(sql: str) -> str:
+    """Primera palabra clave de la consulta (SELECT, INSERT, PRAGMA...)"""
+    body = _LEADING_COMMENTS.sub('', sql, count=1).lstrip('(')
+    match = re.match(r'[A-Za-z]+', body)
+    return match.group(0).upper() if match else ''
+
+
+def format_cell(value: Any) -> str:
+    if value is None:
+        return 'NULL'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        value = '0x' + bytes(value[:MAX_CELL_CHARS // 2]).hex()
+    text = str(value)
+    if len(text) > MAX_CELL_CHARS:
+        text = text[:MAX_CELL_CHARS] + '…'
+    return text
+
+
+def _is_timeout(error: DBAPIError) -> bool:
+    # SQLite: "interrupted"; MySQL 3024 y MariaDB 1969: "Query execution was interrupted..."
+    return 'interrupted' in str(error.orig).lower()
+
+
+@contextmanager
+def statement_timeout(conn, seconds: float):
+    """Limita la duración de las sentencias ejecutadas en ``conn`` dentro del bloque"""
+    dialect = conn.dialect.name
+    if not seconds or dialect not in ('sqlite', 'mysql', 'mariadb'):
+        yield
+        return
+
+    if dialect == 'sqlite':
+        raw = conn.connection.dbapi_connection
+        deadline = time.monotonic() + seconds
+        raw.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, SQLITE_PROGRESS_STEPS)
+        try:
+            yield
+        finally:
+            raw.set_progress_handler(None, 0)
+        return
+
+    watchdog = None
+    try:
+        conn.exec_driver_sql(f'SET SESSION max_execution_time = {int(seconds * 1000)}')
+        reset = 'SET SESSION max_execution_time = 0'
+    except DBAPIError:
+        # MariaDB: la variable se llama max_statement_time, va en segundos y vale para todas las sentencias
+        conn.exec_driver_sql(f'SET SESSION max_statement_time = {float(seconds)}')
+        reset = 'SET SESSION max_statement_time = 0'
+    else:
+        # MySQL solo la aplica a los SELECT de solo lectura: el resto se cancela desde otra conexión
+        connection_id = conn.exec_driver_sql('SELECT CONNECTION_ID()').scalar()
+        watchdog = threading.Timer(seconds, _kill_query, args=(conn.engine, connection_id))
+        watchdog.daemon = True
+        watchdog.start()
+    try:
+        yield
+    finally:
+        if watchdog:
+            watchdog.cancel()
+        conn.exec_driver_sql(reset)
+
+
+def _kill_query(engine, connection_id: int) -> None:
+    """Cancela la sentencia en curso de la conexión (falla con "Query execution was interrupted")"""
+    try:
+        with engine.connect() as killer:
+            killer.exec_driver_sql(f'KILL QUERY {int(connection_id)}')
+    except DBAPIError:
+        pass
+
+
+def top_level(sql: str) -> str:
+    """Consulta sin comentarios, literales ni el contenido de los paréntesis"""
+    text = _COMMENTS_AND_LITERALS.sub(' ', sql)
+    while True:
+        text, replaced = _INNERMOST_PARENTHESES.subn(' ', text)
+        if not replaced:
+            return text
+
+
+def paged_statement(dialect: str, kind: str, sql: str, limit: int, offset: int):
+    """
+    Sentencia a ejecutar para una página y filas a descartar antes de leerla.
+
+    El salto de línea antes del ``)`` o del ``LIMIT`` evita que un comentario
+    ``--`` final de la consulta se los trague.
+    """
+    if kind not in PAGEABLE_STATEMENTS:
+        return sql, offset
+    if dialect in PAGEABLE_DIALECTS:
+        return f'SELECT * FROM ({sql}\n) AS console_query LIMIT {limit + 1} OFFSET {offset}', 0
+    if dialect in ('mysql', 'mariadb') and not _NO_APPENDED_LIMIT.search(top_level(sql)):
+        return f'{sql}\nLIMIT {limit + 1} OFFSET {offset}', 0
+    return sql, offset
+
+
+def explain(conn, sql: str) -> Dict[str, Any]:
+    """Plan de ejecución de la consulta (sin ejecutarla)"""
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    result = conn.exec_driver_sql(prefix + sql, execution_options=_RAW_SQL)
+    return {
+        'columns': list(result.keys()),
+        'rows': [[format_cell(value) for value in row] for row in result.fetchmany(EXPLAIN_MAX_ROWS)],
+    }
+
+
+def run_query(engine, sql: str, offset: int = 0, page_size: int = 500, max_rows: int = 5000,
+              timeout: float = 30, with_explain: bool = False) -> Dict[str, Any]:
+    """
+    Ejecuta ``sql`` y devuelve una página de filas de como mucho ``page_size``.
+
+    ``next_offset`` indica el offset de la página siguiente (None si no hay más
+    o si se alcanzó ``max_rows``); ``truncated`` indica que quedaban filas por
+    encima del límite.
+    """
+    sql = normalize(sql)
+    kind = statement_kind(sql)
+    offset = max(0, offset)
+    limit = max(0, min(page_size, max_rows - offset))
+    response: Dict[str, Any] = {'query': sql, 'statement': kind, 'offset': offset}
+
+    with engine.connect() as conn:
+        try:
+            with statement_timeout(conn, timeout):
+                if with_explain and kind in EXPLAINABLE_STATEMENTS:
+                    response['explain'] = explain(conn, sql)
+
+                started = time.perf_counter()
+                statement, skip = paged_statement(conn.dialect.name, kind, sql, limit, offset)
+                result = conn.exec_driver_sql(statement, execution_options={**_RAW_SQL, 'stream_results': True})
+
+                if result.returns_rows:
+                    while skip > 0 and result.fetchmany(min(skip, SKIP_BATCH_ROWS)):
+                        skip -= SKIP_BATCH_ROWS
+                    rows: List = result.fetchmany(limit + 1) if limit else []
+                    columns = list(result.keys())
+                    result.close()
+                else:
+                    rows, columns = None, None
+                    response['affected_rows'] = max(result.rowcount, 0)
+
+                if kind in MODIFYING_STATEMENTS:
+                    conn.commit()
+                response['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        except DBAPIError as e:
+            if _is_timeout(e):
+                raise QueryTimeout(f'La consulta superó el límite de {timeout:g} s') from e
+            raise
+
+    if rows is None:
+        return response
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    end = offset + len(rows)
+    response.update({
+        'columns': columns,
+        'rows': [[format_cell(value) for value in row] for row in rows],
+        'row_count': len(rows),
+        'next_offset': end if has_more and end < max_rows else None,
+        'truncated': (has_more and end >= max_rows) or limit == 0,
+        'max_rows': max_rows,
+    })
+    return response
@@ -0,0 +1,121 @@
+"""
+Perfil de SQLite para producción
+================================
+
+Cuando la base de datos es SQLite (``DevelopmentConfig`` o instalaciones
+pequeñas con ``instance/floristeria.db``) cada conexión nueva se configura con:
+
+- ``journal_mode=WAL``: los lectores no se bloquean mientras otro proceso
+  escribe y las escrituras no esperan a que terminen las lecturas.
+- ``busy_timeout``: un escritor espera a que se libere el bloqueo en lugar de
+  fallar al instante con "database is locked".
+- ``synchronous=NORMAL``: seguro con WAL (solo se puede perder la última
+  transacción ante un corte de luz) y mucho más rápido que FULL.
+- ``mmap_size`` y ``cache_size``: lecturas desde memoria en lugar de read().
+
+Las opciones del pool propias de MySQL (``pool_recycle``, ``pool_pre_ping``)
+no tienen sentido con un fichero local y se sustituyen por las de SQLite. Con
+SQLite en memoria (pruebas) Flask-SQLAlchemy usa ``StaticPool``, que no admite
+opciones de pool, así que solo se conservan las comunes.
+"""
+
+from functools import partial
+from typing import Any, Dict, List, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Opciones de create_engine que solo entiende QueuePool
+QUEUE_POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping')
+
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+
+
+def is_sqlite(uri: str) -> bool:
+    return bool(uri) and make_url(uri).get_backend_name() == 'sqlite'
+
+
+def is_memory(uri: str) -> bool:
+    url = make_url(uri)
+    return url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+
+
+def engine_options(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Opciones de create_engine para SQLite a partir de la configuración de la app"""
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    options = {key: value for key, value in dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}).items()
+               if key not in QUEUE_POOL_OPTIONS}
+
+    connect_args = dict(options.get('connect_args') or {})
+    # El timeout de sqlite3 es el busy timeout del driver (segundos)
+    connect_args.setdefault('timeout', config.get('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000)
+    connect_args.setdefault('check_same_thread', False)
+    options['connect_args'] = connect_args
+
+    if not is_memory(uri):
+        options['pool_size'] = config.get('SQLITE_POOL_SIZE', 5)
+        options['max_overflow'] = config.get('SQLITE_MAX_OVERFLOW', 10)
+        options['pool_timeout'] = config.get('SQLITE_POOL_TIMEOUT', 30)
+    return options
+
+
+def pragmas(config: Dict[str, Any], memory: bool = False) -> List[Tuple[str, Any]]:
+    """PRAGMA que se ejecutan en cada conexión nueva"""
+    synchronous = str(config.get('SQLITE_SYNCHRONOUS', 'NORMAL')).upper()
+    if synchronous not in SYNCHRONOUS_MODES:
+        raise ValueError(f'SQLITE_SYNCHRONOUS no válido: {synchronous}')
+
+    result = [
+        ('busy_timeout', int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))),
+        # Valor negativo: tamaño en KiB en lugar de páginas
+        ('cache_size', -abs(int(config.get('SQLITE_CACHE_SIZE_KB', 64 * 1024)))),
+        ('temp_store', 'MEMORY'),
+    ]
+    if not memory:
+        journal_mode = str(config.get('SQLITE_JOURNAL_MODE', 'WAL')).upper()
+        if journal_mode not in JOURNAL_MODES:
+            raise ValueError(f'SQLITE_JOURNAL_MODE no válido: {journal_mode}')
+        result = [('journal_mode', journal_mode), ('synchronous', synchronous),
+                  ('mmap_size', int(config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)))] + result
+    return result
+
+
+def _apply_pragmas(settings: List[Tuple[str, Any]], dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in settings:
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def register_engine(engine, config: Dict[str, Any]):
+    """Aplica los PRAGMA del perfil en cada conexión nueva del engine"""
+    if engine.dialect.name != 'sqlite':
+        return
+    settings = pragmas(config, memory=is_memory(str(engine.url)))
+    event.listen(engine, 'connect', partial(_apply_pragmas, settings))
+
+
+def current_settings(engine) -> Dict[str, Any]:
+    """Valores efectivos de los PRAGMA del perfil en una conexión del engine"""
+    names = ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store')
+    with engine.connect() as conn:
+        return {name: conn.exec_driver_sql(f'PRAGMA {name}').scalar() for name in names}
+
+
+def init_app(app):
+    """Ajusta las opciones del engine de SQLite (llamar antes de db.init_app)"""
+    if not app.config.get('SQLITE_PROFILE_ENABLED', True):
+        return
+    if is_sqlite(app.config.get('SQLALCHEMY_DATABASE_URI', '')):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+
+def init_engines(app, db):
+    """Registra los PRAGMA en los engines SQLite ya creados (llamar tras db.init_app)"""
+    if not app.config.get('SQLITE_PROFILE_ENABLED', True):
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            register_engine(engine, app.config)
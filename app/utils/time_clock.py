@@ -0,0 +1,175 @@
+"""
+Fichajes atómicos
+=================
+
+Cada transición del fichaje (entrada, salida, inicio y fin de descanso) se
+ejecuta como una única sentencia INSERT/UPDATE condicional sobre la clave única
+(user_id, date). La condición WHERE codifica la máquina de estados, así que dos
+peticiones simultáneas (un doble toque con mala conexión) no pueden duplicar el
+registro del día ni pisarse: la segunda simplemente no afecta a ninguna fila.
+"""
+
+from datetime import date, datetime
+from typing import Optional
+from sqlalchemy import func, case, insert, update, literal, literal_column
+from app.models import db, TimeEntry
+
+# Resultados de una transición
+CLOCK_OK = 'ok'
+CLOCK_ALREADY_DONE = 'already_done'
+CLOCK_NOT_CLOCKED_IN = 'not_clocked_in'
+CLOCK_NO_BREAK = 'no_break'
+CLOCK_CLOCKED_OUT = 'clocked_out'
+
+
+class TimeClockService:
+    """Transiciones de fichaje como sentencias condicionales de una sola ida y vuelta"""
+
+    @staticmethod
+    def _now_param(now: datetime):
+        return literal(now, db.DateTime)
+
+    @staticmethod
+    def _hours_between(start, end):
+        """Expresión SQL con las horas transcurridas entre dos columnas DateTime"""
+        dialect = db.engine.dialect.name
+
+        if dialect == 'sqlite':
+            return (func.julianday(end) - func.julianday(start)) * 24.0
+        if dialect == 'mysql':
+            return func.timestampdiff(literal_column('SECOND'), start, end) / 3600.0
+        # PostgreSQL y otros dialectos con intervalos
+        return func.extract('epoch', end - start) / 3600.0
+
+    @staticmethod
+    def _insert_ignore(values: dict):
+        """INSERT que no falla si ya existe la fila (user_id, date)"""
+        dialect = db.engine.dialect.name
+
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+            return sqlite_insert(TimeEntry).values(**values).on_conflict_do_nothing(
+                index_elements=['user_id', 'date']
+            )
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as pg_insert
+            return pg_insert(TimeEntry).values(**values).on_conflict_do_nothing(
+                index_elements=['user_id', 'date']
+            )
+        stmt = insert(TimeEntry).values(**values)
+        if dialect == 'mysql':
+            return stmt.prefix_with('IGNORE')
+        return stmt
+
+    @staticmethod
+    def _execute(stmt) -> int:
+        return db.session.execute(stmt, execution_options={'synchronize_session': False}).rowcount
+
+    @staticmethod
+    def _diagnose(user_id: int, day: date) -> Optional[TimeEntry]:
+        """Lee el registro del día solo cuando la transición no se aplicó, para elegir el mensaje"""
+        return TimeEntry.query.filter_by(user_id=user_id, date=day).first()
+
+    @staticmethod
+    def clock_in(user_id: int, day: date, now: Optional[datetime] = None) -> str:
+        """Entrada: inserta el registro del día o completa uno creado sin hora de entrada"""
+        now = now or datetime.now()
+        values = {
+            'user_id': user_id,
+            'date': day,
+            'entry_time': now,
+            'status': 'active',
+            'total_hours': 0.0,
+            'break_hours': 0.0,
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
+        }
+        if TimeClockService._execute(TimeClockService._insert_ignore(values)):
+            return CLOCK_OK
+
+        # Ya había fila: solo se completa si aún no tiene entrada
+        updated = TimeClockService._execute(
+            update(TimeEntry)
+            .where(TimeEntry.user_id == user_id, TimeEntry.date == day, TimeEntry.entry_time.is_(None))
+            .values(entry_time=now, status='active', updated_at=datetime.utcnow())
+        )
+        return CLOCK_OK if updated else CLOCK_ALREADY_DONE
+
+    @staticmethod
+    def clock_out(user_id: int, day: date, now: Optional[datetime] = None) -> str:
+        """Salida: registra la hora y calcula las horas en la misma sentencia"""
+        now = now or datetime.now()
+        exit_time = TimeClockService._now_param(now)
+        hours = TimeClockService._hours_between
+
+        has_break = TimeEntry.break_start.isnot(None) & TimeEntry.break_end.isnot(None)
+        break_hours = case((has_break, hours(TimeEntry.break_start, TimeEntry.break_end)),
+                           else_=TimeEntry.break_hours)
+        worked = hours(TimeEntry.entry_time, exit_time) - case((has_break, break_hours), else_=0.0)
+
+        updated = TimeClockService._execute(
+            update(TimeEntry)
+            .where(TimeEntry.user_id == user_id, TimeEntry.date == day,
+                   TimeEntry.entry_time.isnot(None), TimeEntry.exit_time.is_(None))
+            .values(exit_time=now, status='completed', break_hours=break_hours,
+                    total_hours=func.round(worked, 2), updated_at=datetime.utcnow())
+        )
+        if updated:
+            return CLOCK_OK
+
+        entry = TimeClockService._diagnose(user_id, day)
+        if not entry or not entry.entry_time:
+            return CLOCK_NOT_CLOCKED_IN
+        return CLOCK_ALREADY_DONE
+
+    @staticmethod
+    def break_start(user_id: int, day: date, now: Optional[datetime] = None) -> str:
+        """Inicio de descanso: solo con la jornada abierta y sin otro descanso en curso"""
+        now = now or datetime.now()
+        updated = TimeClockService._execute(
+            update(TimeEntry)
+            .where(TimeEntry.user_id == user_id, TimeEntry.date == day,
+                   TimeEntry.entry_time.isnot(None), TimeEntry.exit_time.is_(None),
+                   (TimeEntry.break_start.is_(None) | TimeEntry.break_end.isnot(None)))
+            .values(break_start=now, break_end=None, updated_at=datetime.utcnow())
+        )
+        if updated:
+            return CLOCK_OK
+
+        entry = TimeClockService._diagnose(user_id, day)
+        if not entry or not entry.entry_time:
+            return CLOCK_NOT_CLOCKED_IN
+        if entry.exit_time:
+            return CLOCK_CLOCKED_OUT
+        return CLOCK_ALREADY_DONE
+
+    @staticmethod
+    def break_end(user_id: int, day: date, now: Optional[datetime] = None) -> str:
+        """Fin de descanso: cierra el descanso abierto y recalcula las horas si ya hay salida"""
+        now = now or datetime.now()
+        break_end_time = TimeClockService._now_param(now)
+        hours = TimeClockService._hours_between
+        break_hours = hours(TimeEntry.break_start, break_end_time)
+
+        updated = TimeClockService._execute(
+            update(TimeEntry)
+            .where(TimeEntry.user_id == user_id, TimeEntry.date == day,
+                   TimeEntry.break_start.isnot(None), TimeEntry.break_end.is_(None))
+            .values(
+                break_end=now,
+                break_hours=break_hours,
+                total_hours=case(
+                    ((TimeEntry.entry_time.isnot(None) & TimeEntry.exit_time.isnot(None)),
+                     func.round(hours(TimeEntry.entry_time, TimeEntry.exit_time) - break_hours, 2)),
+                    else_=TimeEntry.total_hours
+                ),
+                updated_at=datetime.utcnow()
+            )
+        )
+        if updated:
+            return CLOCK_OK
+
+        entry = TimeClockService._diagnose(user_id, day)
+        if not entry or not entry.break_start:
+            return CLOCK_NO_BREAK
+        return CLOCK_ALREADY_DONE
@@ -0,0 +1,204 @@
+"""
+Motor de reportes de horarios
+=============================
+
+Calcula los totales de los reportes de horarios (horas trabajadas, descansos,
+días presentes y horas extra) con agregados agrupados en SQL, sin cargar en
+memoria cada registro de TimeEntry. Los registros se suman primero por usuario
+y día, de modo que las horas extra se miden sobre la jornada y los días son
+jornadas trabajadas.
+"""
+
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional
+from sqlalchemy import func, case, literal_column
+from sqlalchemy.orm import joinedload
+from app.models import db, TimeEntry, User
+from app.utils.pagination import KeysetPage, keyset_paginate
+
+# Agrupaciones soportadas por period_totals
+REPORT_PERIODS = ('day', 'week', 'month')
+
+# Jornada objetivo por defecto para calcular horas extra
+DEFAULT_DAILY_TARGET_HOURS = 8.0
+
+
+class TimeReportService:
+    """Servicio de agregados para los reportes de horarios"""
+
+    @staticmethod
+    def base_query(query, start_date: date, end_date: date, user_id: Optional[int] = None):
+        """Aplica los filtros comunes de rango de fechas y usuario"""
+        query = query.filter(TimeEntry.date >= start_date, TimeEntry.date <= end_date)
+        if user_id:
+            query = query.filter(TimeEntry.user_id == user_id)
+        return query
+
+    @staticmethod
+    def day_columns(daily_target_hours: float) -> Dict[str, Any]:
+        """
+        Totales de una jornada a partir de sus registros, para consultas agrupadas
+        por usuario y día. Los usan los reportes y los totales materializados
+        (time_rollups), así que ambos miden igual las horas extra.
+        """
+        worked = func.coalesce(func.sum(func.coalesce(TimeEntry.total_hours, 0.0)), 0.0)
+        return {
+            'worked': worked,
+            'break_hours': func.coalesce(func.sum(func.coalesce(TimeEntry.break_hours, 0.0)), 0.0),
+            'overtime': case((worked > daily_target_hours, worked - daily_target_hours), else_=0.0),
+            'present': func.max(case((TimeEntry.entry_time.isnot(None), 1), else_=0)),
+            'entries': func.count(TimeEntry.id),
+        }
+
+    @staticmethod
+    def _daily_totals(start_date: date, end_date: date, user_id: Optional[int] = None,
+                      daily_target_hours: float = DEFAULT_DAILY_TARGET_HOURS):
+        """
+        Subconsulta con una fila por usuario y día: las horas extra y los días
+        trabajados se calculan sobre la jornada completa aunque tenga varios registros.
+        """
+        columns = TimeReportService.day_columns(daily_target_hours)
+        query = db.session.query(
+            TimeEntry.user_id.label('user_id'),
+            TimeEntry.date.label('date'),
+            *[column.label(name) for name, column in columns.items()]
+        )
+        query = TimeReportService.base_query(query, start_date, end_date, user_id)
+        return query.group_by(TimeEntry.user_id, TimeEntry.date).subquery('daily')
+
+    @staticmethod
+    def _aggregate_columns(daily):
+        """Columnas agregadas comunes a todos los reportes, sobre los totales diarios"""
+        return [
+            func.coalesce(func.sum(daily.c.worked), 0.0).label('total_hours'),
+            func.coalesce(func.sum(daily.c.break_hours), 0.0).label('break_hours'),
+            func.coalesce(func.sum(daily.c.present), 0).label('total_days'),
+            func.coalesce(func.sum(daily.c.overtime), 0.0).label('overtime_hours'),
+            func.coalesce(func.sum(daily.c.entries), 0).label('entries'),
+        ]
+
+    @staticmethod
+    def _row_totals(row) -> Dict[str, Any]:
+        return {
+            'total_hours': round(float(row.total_hours or 0), 2),
+            'break_hours': round(float(row.break_hours or 0), 2),
+            'total_days': int(row.total_days or 0),
+            'overtime_hours': round(float(row.overtime_hours or 0), 2),
+            'entries': int(row.entries or 0),
+        }
+
+    @staticmethod
+    def user_totals(start_date: date, end_date: date, user_id: Optional[int] = None,
+                    daily_target_hours: float = DEFAULT_DAILY_TARGET_HOURS) -> List[Dict[str, Any]]:
+        """Totales por usuario en el rango (una fila por usuario)"""
+        daily = TimeReportService._daily_totals(start_date, end_date, user_id, daily_target_hours)
+        query = db.session.query(
+            User.id.label('user_id'),
+            User.username,
+            User.full_name,
+            *TimeReportService._aggregate_columns(daily)
+        ).select_from(daily).join(User, daily.c.user_id == User.id)
+        query = query.group_by(User.id, User.username, User.full_name).order_by(User.username)
+
+        summary = []
+        for row in query:
+            totals = TimeReportService._row_totals(row)
+            totals.update({
+                'user_id': row.user_id,
+                'username': row.username,
+                'full_name': row.full_name,
+            })
+            summary.append(totals)
+        return summary
+
+    @staticmethod
+    def period_totals(start_date: date, end_date: date, period: str = 'day',
+                      user_id: Optional[int] = None,
+                      daily_target_hours: float = DEFAULT_DAILY_TARGET_HOURS) -> List[Dict[str, Any]]:
+        """Totales agrupados por día, semana (lunes de inicio) o mes"""
+        if period not in REPORT_PERIODS:
+            raise ValueError(f'Periodo no soportado: {period}')
+
+        daily = TimeReportService._daily_totals(start_date, end_date, user_id, daily_target_hours)
+        period_key = TimeReportService._period_expression(period, daily.c.date).label('period')
+        query = db.session.query(
+            period_key,
+            *TimeReportService._aggregate_columns(daily)
+        ).select_from(daily)
+        query = query.group_by(literal_column('period')).order_by(literal_column('period').desc())
+
+        totals_by_period = []
+        for row in query:
+            totals = TimeReportService._row_totals(row)
+            totals['period'] = TimeReportService._format_period(row.period)
+            totals_by_period.append(totals)
+        return totals_by_period
+
+    @staticmethod
+    def grand_totals(summary: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Suma los totales por usuario (ya agregados en SQL) para el resumen general"""
+        return {
+            'total_hours': round(sum(s['total_hours'] for s in summary), 2),
+            'break_hours': round(sum(s['break_hours'] for s in summary), 2),
+            'total_days': sum(s['total_days'] for s in summary),
+            'overtime_hours': round(sum(s['overtime_hours'] for s in summary), 2),
+            'entries': sum(s['entries'] for s in summary),
+        }
+
+    @staticmethod
+    def detail_page(start_date: date, end_date: date, user_id: Optional[int] = None,
+                    after: Optional[str] = None, before: Optional[str] = None,
+                    per_page: int = 50) -> KeysetPage:
+        """Registros detallados paginados por cursor, con el usuario cargado en la misma consulta"""
+        query = TimeReportService.base_query(
+            TimeEntry.query.options(joinedload(TimeEntry.user)),
+            start_date, end_date, user_id
+        )
+        return keyset_paginate(query, [TimeEntry.date, TimeEntry.id],
+                               after=after, before=before, per_page=per_page)
+
+    @staticmethod
+    def export_rows(start_date: date, end_date: date, user_id: Optional[int] = None,
+                    batch_size: int = 500) -> Iterator[Any]:
+        """Filas para exportar, leídas por lotes con el nombre de usuario ya unido"""
+        query = db.session.query(
+            User.username,
+            TimeEntry.date,
+            TimeEntry.entry_time,
+            TimeEntry.exit_time,
+            TimeEntry.total_hours,
+            TimeEntry.status
+        ).join(User, TimeEntry.user_id == User.id)
+        query = TimeReportService.base_query(query, start_date, end_date, user_id)
+        query = query.order_by(TimeEntry.date.desc(), TimeEntry.id.desc())
+        return iter(query.execution_options(yield_per=batch_size))
+
+    @staticmethod
+    def _period_expression(period: str, column=TimeEntry.date):
+        """Expresión SQL de agrupación según el dialecto de la base de datos"""
+        dialect = db.engine.dialect.name
+
+        if period == 'day':
+            return column
+
+        if dialect == 'sqlite':
+            if period == 'week':
+                # Lunes de la semana: siguiente domingo (o el mismo) menos 6 días
+                return func.date(column, 'weekday 0', '-6 days')
+            return func.strftime('%Y-%m', column)
+
+        if dialect == 'mysql':
+            if period == 'week':
+                return func.subdate(column, func.weekday(column))
+            return func.date_format(column, '%Y-%m')
+
+        # PostgreSQL y otros dialectos con date_trunc
+        if period == 'week':
+            return func.date(func.date_trunc('week', column))
+        return func.to_char(column, 'YYYY-MM')
+
+    @staticmethod
+    def _format_period(value) -> str:
+        if isinstance(value, date):
+            return value.isoformat()
+        return str(value)
@@ -0,0 +1,186 @@
+"""
+Totales materializados de control horario
+=========================================
+
+Mantiene las tablas time_rollup_daily y time_rollup_monthly. Cada cambio en un
+TimeEntry recalcula solo la fila diaria (usuario, fecha) y la fila mensual
+(usuario, año, mes) afectadas, de modo que los resúmenes mensuales se leen con
+una sola fila sin importar cuántos años de registros se conserven.
+"""
+
+import calendar
+from datetime import date
+from typing import Any, Dict, Optional
+from flask import current_app
+from sqlalchemy import func, extract, insert, select
+from app.models import db, TimeEntry, TimeEntryDailyRollup, TimeEntryMonthlyRollup
+from app.utils.time_reports import DEFAULT_DAILY_TARGET_HOURS, TimeReportService
+
+
+class TimeRollupService:
+    """Servicio para mantener y consultar los totales materializados de horas"""
+
+    @staticmethod
+    def _daily_target(daily_target_hours: Optional[float] = None) -> float:
+        if daily_target_hours is not None:
+            return daily_target_hours
+        return current_app.config.get('TIME_REPORT_DAILY_TARGET_HOURS', DEFAULT_DAILY_TARGET_HOURS)
+
+    @staticmethod
+    def _entry_aggregates(daily_target_hours: float):
+        """Agregados de TimeEntry por usuario y día: los mismos de la jornada del motor de reportes"""
+        columns = TimeReportService.day_columns(daily_target_hours)
+        return [
+            columns['worked'].label('total_hours'),
+            columns['break_hours'].label('break_hours'),
+            columns['overtime'].label('overtime_hours'),
+            columns['present'].label('days_present'),
+            columns['entries'].label('entries'),
+        ]
+
+    @staticmethod
+    def _daily_aggregates():
+        """Agregados de las filas diarias para construir la fila mensual"""
+        return [
+            func.coalesce(func.sum(TimeEntryDailyRollup.total_hours), 0.0).label('total_hours'),
+            func.coalesce(func.sum(TimeEntryDailyRollup.break_hours), 0.0).label('break_hours'),
+            func.coalesce(func.sum(TimeEntryDailyRollup.overtime_hours), 0.0).label('overtime_hours'),
+            func.coalesce(func.sum(TimeEntryDailyRollup.days_present), 0).label('days_present'),
+            func.coalesce(func.sum(TimeEntryDailyRollup.entries), 0).label('entries'),
+        ]
+
+    @staticmethod
+    def _apply_totals(rollup, row):
+        rollup.total_hours = round(float(row.total_hours or 0), 2)
+        rollup.break_hours = round(float(row.break_hours or 0), 2)
+        rollup.overtime_hours = round(float(row.overtime_hours or 0), 2)
+        rollup.days_present = int(row.days_present or 0)
+        rollup.entries = int(row.entries or 0)
+
+    @staticmethod
+    def refresh(user_id: int, day: date, daily_target_hours: Optional[float] = None):
+        """
+        Recalcula la fila diaria y la mensual de un usuario tras modificar sus registros.
+
+        Se llama antes del commit de la operación, así que los totales se guardan en
+        la misma transacción que el cambio del TimeEntry.
+        """
+        target = TimeRollupService._daily_target(daily_target_hours)
+
+        # Fila diaria: agregados de los registros del día (normalmente uno)
+        day_row = db.session.query(*TimeRollupService._entry_aggregates(target)).filter(
+            TimeEntry.user_id == user_id,
+            TimeEntry.date == day
+        ).one()
+
+        daily = db.session.get(TimeEntryDailyRollup, (user_id, day))
+        if day_row.entries:
+            if daily is None:
+                daily = TimeEntryDailyRollup(user_id=user_id, date=day, year=day.year, month=day.month)
+                db.session.add(daily)
+            TimeRollupService._apply_totals(daily, day_row)
+        elif daily is not None:
+            db.session.delete(daily)
+        db.session.flush()
+
+        # Fila mensual: suma de como mucho 31 filas diarias
+        month_row = db.session.query(*TimeRollupService._daily_aggregates()).filter(
+            TimeEntryDailyRollup.user_id == user_id,
+            TimeEntryDailyRollup.year == day.year,
+            TimeEntryDailyRollup.month == day.month
+        ).one()
+
+        monthly = db.session.get(TimeEntryMonthlyRollup, (user_id, day.year, day.month))
+        if month_row.entries:
+            if monthly is None:
+                monthly = TimeEntryMonthlyRollup(user_id=user_id, year=day.year, month=day.month)
+                db.session.add(monthly)
+            TimeRollupService._apply_totals(monthly, month_row)
+        elif monthly is not None:
+            db.session.delete(monthly)
+
+    @staticmethod
+    def backfill(start_date: Optional[date] = None, end_date: Optional[date] = None,
+                 daily_target_hours: Optional[float] = None) -> Dict[str, int]:
+        """
+        Reconstruye los totales a partir de los registros históricos.
+
+        El rango se amplía a meses completos para que las filas mensuales queden
+        consistentes. Sin rango se reconstruye todo. Todo se hace con
+        INSERT ... SELECT agrupados, sin cargar registros en Python.
+        """
+        target = TimeRollupService._daily_target(daily_target_hours)
+
+        if start_date:
+            start_date = start_date.replace(day=1)
+        if end_date:
+            end_date = end_date.replace(day=calendar.monthrange(end_date.year, end_date.month)[1])
+
+        # Limpiar las filas del rango
+        daily_delete = TimeEntryDailyRollup.query
+        monthly_delete = TimeEntryMonthlyRollup.query
+        month_key = TimeEntryMonthlyRollup.year * 100 + TimeEntryMonthlyRollup.month
+        if start_date:
+            daily_delete = daily_delete.filter(TimeEntryDailyRollup.date >= start_date)
+            monthly_delete = monthly_delete.filter(month_key >= start_date.year * 100 + start_date.month)
+        if end_date:
+            daily_delete = daily_delete.filter(TimeEntryDailyRollup.date <= end_date)
+            monthly_delete = monthly_delete.filter(month_key <= end_date.year * 100 + end_date.month)
+        daily_delete.delete(synchronize_session=False)
+        monthly_delete.delete(synchronize_session=False)
+
+        # Totales diarios desde time_entries
+        daily_select = select(
+            TimeEntry.user_id,
+            TimeEntry.date,
+            extract('year', TimeEntry.date),
+            extract('month', TimeEntry.date),
+            *TimeRollupService._entry_aggregates(target),
+            func.current_timestamp()
+        ).group_by(TimeEntry.user_id, TimeEntry.date)
+        if start_date:
+            daily_select = daily_select.where(TimeEntry.date >= start_date)
+        if end_date:
+            daily_select = daily_select.where(TimeEntry.date <= end_date)
+
+        daily_result = db.session.execute(insert(TimeEntryDailyRollup).from_select(
+            ['user_id', 'date', 'year', 'month', 'total_hours', 'break_hours',
+             'overtime_hours', 'days_present', 'entries', 'updated_at'],
+            daily_select
+        ))
+
+        # Totales mensuales desde las filas diarias recién creadas
+        monthly_select = select(
+            TimeEntryDailyRollup.user_id,
+            TimeEntryDailyRollup.year,
+            TimeEntryDailyRollup.month,
+            *TimeRollupService._daily_aggregates(),
+            func.current_timestamp()
+        ).group_by(TimeEntryDailyRollup.user_id, TimeEntryDailyRollup.year, TimeEntryDailyRollup.month)
+        if start_date:
+            monthly_select = monthly_select.where(TimeEntryDailyRollup.date >= start_date)
+        if end_date:
+            monthly_select = monthly_select.where(TimeEntryDailyRollup.date <= end_date)
+
+        monthly_result = db.session.execute(insert(TimeEntryMonthlyRollup).from_select(
+            ['user_id', 'year', 'month', 'total_hours', 'break_hours',
+             'overtime_hours', 'days_present', 'entries', 'updated_at'],
+            monthly_select
+        ))
+
+        db.session.commit()
+        return {'daily': daily_result.rowcount, 'monthly': monthly_result.rowcount}
+
+    @staticmethod
+    def monthly_summary(user_id: int, year: int, month: int) -> Dict[str, Any]:
+        """Resumen mensual de un usuario (lectura de una sola fila)"""
+        rollup = db.session.get(TimeEntryMonthlyRollup, (user_id, year, month))
+        return {
+            'year': year,
+            'month': month,
+            'total_hours': rollup.total_hours if rollup else 0.0,
+            'break_hours': rollup.break_hours if rollup else 0.0,
+            'overtime_hours': rollup.overtime_hours if rollup else 0.0,
+            'days_present': rollup.days_present if rollup else 0,
+            'entries': rollup.entries if rollup else 0,
+        }
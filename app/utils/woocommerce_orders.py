@@ -0,0 +1,341 @@
+"""
+Pedidos de WooCommerce en el calendario
+=======================================
+
+Convierte el JSON de un pedido en filas de calendar_orders y
+calendar_order_items enlazadas a su nota. La nota solo guarda título, color y
+prioridad; el texto detallado se genera al mostrarla (CalendarOrder.render_content),
+de modo que los informes de rutas de reparto o volumen de productos son
+consultas SQL sobre columnas indexadas en lugar de analizar texto.
+"""
+
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional
+from sqlalchemy.exc import IntegrityError
+from app.models import db, User, CalendarOrder, CalendarOrderItem
+from app.models.user import CalendarNote
+
+# Clave de meta_data con la fecha de entrega elegida por el cliente
+DELIVERY_DATE_META_KEY = 'ywcdd_order_delivery_date'
+
+# Paginación de la API REST de WooCommerce en la sincronización manual
+SYNC_PAGE_SIZE = 100  # Máximo que admite WooCommerce por página
+SYNC_MAX_PAGES = 50
+
+# Color y prioridad de la nota según el estado del pedido
+STATUS_CONFIG = {
+    'pending': {'color': '#ffc107', 'priority': 'normal'},
+    'processing': {'color': '#007bff', 'priority': 'high'},
+    'on-hold': {'color': '#fd7e14', 'priority': 'high'},
+    'completed': {'color': '#28a745', 'priority': 'normal'},
+    'cancelled': {'color': '#dc3545', 'priority': 'low'},
+    'refunded': {'color': '#6c757d', 'priority': 'low'},
+    'failed': {'color': '#dc3545', 'priority': 'normal'}
+}
+DEFAULT_STATUS_CONFIG = {'color': '#ffc107', 'priority': 'normal'}
+
+# Formato de las notas anteriores a los datos estructurados (título y contenido renderizado)
+LEGACY_TITLE = re.compile(r'Pedido #(\d+) - (.+?)(?: → (.+))?$')
+LEGACY_ITEM = re.compile(r'^(?P<name>.+) \(x(?P<quantity>\d+)\) - (?P<total>[^€]*)€(?: \((?P<options>.*)\))?$')
+LEGACY_SECTIONS = {'👤 CLIENTE:': 'customer', '🚚 ENTREGA:': 'delivery', '🌺 PRODUCTOS:': 'items',
+                   '💌 DEDICATORIA:': 'dedication'}
+
+
+def _amount(value) -> Optional[Decimal]:
+    try:
+        return Decimal(str(value)).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError, TypeError):
+        return None
+
+
+def _int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _parse_datetime(value) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        if 'T' in value:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (ValueError, TypeError):
+        return None
+
+
+def _full_name(data: Dict[str, Any]) -> str:
+    return f"{data.get('first_name', '')} {data.get('last_name', '')}".strip()
+
+
+class WooOrderService:
+    """Guarda los pedidos de WooCommerce como datos estructurados"""
+
+    @staticmethod
+    def parse(order_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Extrae del JSON del pedido los campos del pedido, sus líneas y la fecha del calendario"""
+        billing = order_data.get('billing') or {}
+        shipping = order_data.get('shipping') or {}
+
+        customer_name = _full_name(billing) or billing.get('email') or 'Cliente sin nombre'
+        address = ', '.join(part for part in (shipping.get('address_1'), shipping.get('address_2')) if part)
+
+        delivery_date = None
+        for meta in order_data.get('meta_data') or []:
+            if meta.get('key') == DELIVERY_DATE_META_KEY:
+                try:
+                    delivery_date = datetime.strptime(meta.get('value') or '', '%Y-%m-%d').date()
+                except ValueError:
+                    pass
+                break
+
+        items: List[Dict[str, Any]] = []
+        dedications: List[str] = []
+        for item in order_data.get('line_items') or []:
+            options = []
+            for meta in item.get('meta_data') or []:
+                key = meta.get('display_key', meta.get('key', ''))
+                value = meta.get('display_value', meta.get('value', ''))
+
+                if 'dedicatoria' in key.lower() and isinstance(value, str) and len(value) > 10:
+                    # Limpiar saltos de línea de Windows
+                    dedication = value.replace('\r\n', '\n').replace('\r', '\n').strip()
+                    if dedication not in dedications:
+                        dedications.append(dedication)
+                elif key and value and key != 'Dedicatoria' and not key.startswith('_'):
+                    if isinstance(value, str) and 'Dedicatoria' not in value:
+                        options.append(f"{key}: {value}")
+
+            items.append({
+                'product_id': _int(item.get('product_id')),
+                'product_name': (item.get('name') or 'Producto')[:200],
+                'quantity': _int(item.get('quantity')) or 1,
+                'total': _amount(item.get('total', '0')),
+                'options': ', '.join(options) or None,
+            })
+
+        ordered_at = _parse_datetime(order_data.get('date_created'))
+        calendar_date = delivery_date or (ordered_at.date() if ordered_at else date.today())
+
+        order = {
+            'wc_order_id': _int(order_data.get('id')),
+            'status': order_data.get('status'),
+            'total': _amount(order_data.get('total', '0')),
+            'currency': order_data.get('currency', 'EUR'),
+            'ordered_at': ordered_at,
+            'customer_name': customer_name[:200],
+            'customer_email': billing.get('email') or None,
+            'customer_phone': billing.get('phone') or None,
+            'delivery_name': _full_name(shipping)[:200] or None,
+            'delivery_phone': shipping.get('phone') or None,
+            'delivery_address': address[:300] or None,
+            'delivery_city': shipping.get('city') or None,
+            'delivery_postcode': (shipping.get('postcode') or '').strip()[:10] or None,
+            'delivery_date': delivery_date,
+            'dedication': '\n\n'.join(dedications) or None,
+        }
+        return {'order': order, 'items': items, 'calendar_date': calendar_date}
+
+    @staticmethod
+    def note_title(order: Dict[str, Any]) -> str:
+        """Título de la nota: número de pedido, cliente y destinatario"""
+        title = f"🌹 Pedido #{order['wc_order_id']} - {order['customer_name']}"
+        if order['delivery_name'] and order['delivery_name'] != order['customer_name']:
+            title += f" → {order['delivery_name']}"
+        return title[:200]
+
+    @staticmethod
+    def find_note(wc_order_id: int) -> Optional[CalendarNote]:
+        """Nota del pedido; las notas anteriores a los datos estructurados se buscan por título"""
+        order = CalendarOrder.query.filter_by(wc_order_id=wc_order_id).first()
+        if order is not None:
+            return order.note
+        return CalendarNote.query.filter(
+            CalendarNote.title.contains(f"Pedido #{wc_order_id} ")
+        ).order_by(CalendarNote.id).first()
+
+    @staticmethod
+    def default_owner_id() -> Optional[int]:
+        """Usuario al que se asignan las notas nuevas: el primer administrador o, si no hay, un usuario activo"""
+        owner = User.query.filter_by(is_admin=True).first() or User.query.filter_by(active=True).first()
+        return owner.id if owner else None
+
+    @staticmethod
+    def save(order_data: Dict[str, Any], owner_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Crea o actualiza la nota y los datos estructurados del pedido (sin confirmar).
+
+        ``owner_id`` solo se usa si hay que crear la nota; por defecto se busca
+        con default_owner_id. Devuelve la nota, la fecha del calendario y la
+        acción realizada ('creado' o 'actualizado').
+        """
+        parsed = WooOrderService.parse(order_data)
+        fields = parsed['order']
+        if fields['wc_order_id'] is None:
+            raise ValueError('El pedido no tiene id')
+        config = STATUS_CONFIG.get(fields['status'], DEFAULT_STATUS_CONFIG)
+
+        note = WooOrderService.find_note(fields['wc_order_id'])
+        action = 'actualizado'
+        if note is None:
+            if owner_id is None:
+                owner_id = WooOrderService.default_owner_id()
+            if owner_id is None:
+                raise ValueError('No se encontró usuario para asignar la nota')
+            note = CalendarNote(is_private=False, is_reminder=False, created_by=owner_id)
+            db.session.add(note)
+            action = 'creado'
+        elif note.order is None:
+            # Nota antigua con el pedido renderizado en el contenido: pasa a datos estructurados
+            note.content = None
+
+        note.date_for = parsed['calendar_date']
+        note.title = WooOrderService.note_title(fields)
+        note.color = config['color']
+        note.priority = config['priority']
+        note.updated_at = datetime.utcnow()
+
+        order = note.order
+        if order is None:
+            order = CalendarOrder()
+            note.order = order
+        for key, value in fields.items():
+            setattr(order, key, value)
+        order.items = [CalendarOrderItem(**item) for item in parsed['items']]
+
+        return {'note': note, 'date': parsed['calendar_date'], 'action': action}
+
+    @staticmethod
+    def store(order_data: Dict[str, Any], owner_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Guarda el pedido y confirma la transacción.
+
+        Dos entregas simultáneas del mismo pedido nuevo pueden intentar crearlo a
+        la vez; la que pierde choca con el UNIQUE de wc_order_id y se repite una
+        vez como actualización del pedido que ya existe.
+        """
+        try:
+            result = WooOrderService.save(order_data, owner_id)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            result = WooOrderService.save(order_data, owner_id)
+            db.session.commit()
+        return result
+
+    @staticmethod
+    def parse_legacy_note(note: CalendarNote) -> Optional[Dict[str, Any]]:
+        """
+        Reconstruye los datos del pedido a partir del título y el contenido
+        renderizado de una nota antigua. Devuelve None si no es una nota de pedido.
+        """
+        match = LEGACY_TITLE.search(note.title or '')
+        if match is None:
+            return None
+
+        order: Dict[str, Any] = {
+            'wc_order_id': int(match.group(1)), 'status': None, 'total': None, 'currency': None,
+            'ordered_at': note.created_at, 'customer_name': match.group(2)[:200], 'customer_email': None,
+            'customer_phone': None, 'delivery_name': (match.group(3) or '')[:200] or None, 'delivery_phone': None,
+            'delivery_address': None, 'delivery_city': None, 'delivery_postcode': None, 'delivery_date': None,
+            'dedication': None,
+        }
+        statuses = {CalendarOrder(status=key).get_status_display(): key for key in STATUS_CONFIG}
+        items: List[Dict[str, Any]] = []
+        dedications: List[List[str]] = []
+        section = None
+
+        for line in (note.content or '').splitlines():
+            text = line.strip()
+            if text in LEGACY_SECTIONS:
+                section = LEGACY_SECTIONS[text]
+                if section == 'dedication':
+                    dedications.append([])
+                continue
+            if text.startswith('📋 ESTADO:'):
+                label = text.split(':', 1)[1].strip()
+                order['status'] = statuses.get(label, label.lower())
+            elif text.startswith('💰 TOTAL:'):
+                amount, _, currency = text.split(':', 1)[1].strip().partition(' ')
+                order['total'] = _amount(amount)
+                order['currency'] = currency.strip()[:3] or None
+            elif section == 'dedication':
+                if text.startswith('📝'):
+                    dedications[-1].append(text[1:].strip())
+                elif not text and dedications[-1]:
+                    dedications.append([])
+            elif text.startswith('• '):
+                key, _, value = text[2:].partition(': ')
+                if section == 'customer' and key == 'Nombre':
+                    order['customer_name'] = value[:200]
+                elif section == 'customer' and key == 'Email':
+                    order['customer_email'] = value or None
+                elif section == 'customer' and key == 'Teléfono':
+                    order['customer_phone'] = value or None
+                elif section == 'delivery' and key == 'Destinatario':
+                    order['delivery_name'] = value[:200] or None
+                elif section == 'delivery' and key == 'Teléfono entrega':
+                    order['delivery_phone'] = value or None
+                elif section == 'delivery' and key == 'Dirección':
+                    # address_1, address_2, ciudad y código postal unidos por comas
+                    parts = [part.strip() for part in value.split(',') if part.strip()]
+                    if parts and re.fullmatch(r'\d{4,5}', parts[-1]):
+                        order['delivery_postcode'] = parts.pop()
+                    if len(parts) > 1:
+                        order['delivery_city'] = parts.pop()[:100]
+                    order['delivery_address'] = ', '.join(parts)[:300] or None
+                elif section == 'delivery' and key == 'Fecha entrega':
+                    try:
+                        order['delivery_date'] = datetime.strptime(value, '%Y-%m-%d').date()
+                    except ValueError:
+                        pass
+                elif section == 'items':
+                    item = LEGACY_ITEM.match(text[2:])
+                    if item:
+                        items.append({
+                            'product_id': None,
+                            'product_name': item.group('name')[:200],
+                            'quantity': int(item.group('quantity')),
+                            'total': _amount(item.group('total')),
+                            'options': item.group('options'),
+                        })
+
+        order['dedication'] = '\n\n'.join('\n'.join(lines) for lines in dedications if lines) or None
+        return {'order': order, 'items': items, 'calendar_date': note.date_for}
+
+    @staticmethod
+    def backfill_legacy_notes() -> Dict[str, int]:
+        """
+        Crea los datos estructurados de las notas de pedidos anteriores, para
+        que la hoja de ruta y la previsión de productos incluyan el histórico.
+
+        Si un pedido tiene varias notas (cambios de fecha con la versión
+        anterior) se usa la más reciente. El contenido que no sea el texto
+        renderizado del pedido se conserva como nota manual.
+        """
+        known = {wc_order_id for (wc_order_id,) in db.session.query(CalendarOrder.wc_order_id)}
+        notes = CalendarNote.query.outerjoin(CalendarOrder, CalendarOrder.note_id == CalendarNote.id).filter(
+            CalendarOrder.id.is_(None), CalendarNote.title.contains('Pedido #')
+        ).order_by(CalendarNote.id.desc()).all()
+
+        created = skipped = 0
+        for note in notes:
+            parsed = WooOrderService.parse_legacy_note(note)
+            if parsed is None or parsed['order']['wc_order_id'] in known:
+                skipped += 1
+                continue
+            order = CalendarOrder(**parsed['order'])
+            order.items = [CalendarOrderItem(**item) for item in parsed['items']]
+            note.order = order
+            rendered = order.render_content()
+            if note.content and note.content.startswith(rendered):
+                note.content = note.content[len(rendered):].strip() or None
+            known.add(order.wc_order_id)
+            created += 1
+
+        db.session.commit()
+        return {'created': created, 'skipped': skipped}
@@ -0,0 +1,100 @@
+"""
+Generación de archivos ZIP en streaming
+=======================================
+
+Construye un ZIP de forma incremental y lo entrega por trozos, sin cargar
+los archivos en memoria ni escribir ficheros temporales en disco.
+"""
+
+import os
+import zipfile
+from datetime import datetime
+from typing import Iterable, Iterator, Optional, Tuple
+
+# Tamaño de lectura de cada archivo origen (64 KB)
+ZIP_CHUNK_SIZE = 64 * 1024
+
+
+class _ZipChunkBuffer:
+    """Destino de escritura no posicionable que acumula bytes hasta que se consumen"""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        if data:
+            self._chunks.append(bytes(data))
+            self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        """Devuelve y descarta los bytes acumulados desde la última llamada"""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(entries: Iterable[Tuple[str, Optional[str]]],
+               chunk_size: int = ZIP_CHUNK_SIZE,
+               missing_manifest: Optional[str] = 'ARCHIVOS_NO_ENCONTRADOS.txt') -> Iterator[bytes]:
+    """
+    Genera un ZIP por trozos a partir de pares (nombre_en_zip, ruta_en_disco).
+
+    La memoria usada es constante: cada archivo se lee en bloques de
+    ``chunk_size`` y los bytes comprimidos se entregan en cuanto se producen.
+    Los archivos que no existen se omiten y se listan en ``missing_manifest``.
+    """
+    buffer = _ZipChunkBuffer()
+    missing = []
+
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for arcname, file_path in entries:
+            try:
+                source = open(file_path, 'rb')
+            except (OSError, TypeError):
+                missing.append(arcname)
+                continue
+
+            with source:
+                info = zipfile.ZipInfo(arcname, date_time=_file_date_time(file_path))
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with zf.open(info, mode='w', force_zip64=True) as dest:
+                    while True:
+                        block = source.read(chunk_size)
+                        if not block:
+                            break
+                        dest.write(block)
+                        data = buffer.drain()
+                        if data:
+                            yield data
+
+            data = buffer.drain()
+            if data:
+                yield data
+
+        if missing and missing_manifest:
+            zf.writestr(missing_manifest, '\n'.join(missing) + '\n')
+
+    # Directorio central del ZIP (se escribe al cerrar)
+    data = buffer.drain()
+    if data:
+        yield data
+
+
+def _file_date_time(file_path):
+    """Fecha de modificación del archivo en el formato que espera ZipInfo"""
+    try:
+        timestamp = datetime.fromtimestamp(os.path.getmtime(file_path))
+    except OSError:
+        timestamp = datetime.now()
+    # ZIP no admite fechas anteriores a 1980
+    if timestamp.year < 1980:
+        timestamp = datetime(1980, 1, 1)
+    return timestamp.timetuple()[:6]
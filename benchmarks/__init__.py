@@ -0,0 +1,3 @@
+"""
+Benchmarks de rendimiento con datos sintéticos (python -m benchmarks.run)
+"""
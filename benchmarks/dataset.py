@@ -0,0 +1,292 @@
+"""
+Generador de datos sintéticos de la floristería
+===============================================
+
+Crea en la base de datos de la app un conjunto de datos realista y
+reproducible (misma semilla, mismos datos): usuarios, años de fichajes,
+pedidos de WooCommerce con la forma de ``api_all.json`` (facturación, envío,
+fecha de entrega en ``meta_data``, líneas con opciones y dedicatoria), fotos
+y notas manuales del calendario.
+
+Los pedidos se guardan con ``WooOrderService.save`` (el mismo camino que el
+webhook), los fichajes se insertan por lotes y sus totales se reconstruyen
+al final con ``TimeRollupService.backfill``.
+"""
+
+import random
+from dataclasses import dataclass, asdict
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List
+from sqlalchemy import insert
+from app.models import db, User, TimeEntry, Photo
+from app.models.user import CalendarNote
+from app.utils.time_rollups import TimeRollupService
+from app.utils.woocommerce_orders import WooOrderService, DELIVERY_DATE_META_KEY
+
+# Último día del histórico generado: fijo para que los datos no dependan de hoy
+DEFAULT_END_DATE = date(2025, 6, 30)
+
+# Pedidos que se confirman en cada transacción al generar
+ORDER_BATCH_SIZE = 500
+
+BENCHMARK_PASSWORD = 'benchmark'
+
+PRODUCTS = [
+    (1855, 'Ramo de claveles', '32.90'),
+    (1861, 'Ramo de rosas rojas', '45.00'),
+    (1872, 'Centro de flores variadas', '39.50'),
+    (1880, 'Orquídea Phalaenopsis', '29.90'),
+    (1893, 'Corona fúnebre', '120.00'),
+    (1901, 'Ramo de novia clásico', '85.00'),
+    (1914, 'Caja de rosas preservadas', '55.00'),
+    (1922, 'Planta de interior', '24.50'),
+]
+SIZES = ['Pequeño', 'Medio', 'Grande']
+FIRST_NAMES = ['Carla', 'Estefanía', 'María', 'Jordi', 'Laura', 'Pau', 'Núria', 'Sergio', 'Marta', 'David']
+LAST_NAMES = ['Torrandell', 'Maldonado', 'González', 'Puig', 'Martínez', 'Vidal', 'Serra', 'López', 'Ferrer']
+CITIES = [
+    ('Viladecans', '08840'), ('Gavà', '08850'), ('Castelldefels', '08860'),
+    ('Sant Boi de Llobregat', '08830'), ('El Prat de Llobregat', '08820'), ('Barcelona', '08014'),
+]
+STREETS = ['Avinguda Molí', 'Carrer Major', 'Rambla Catalunya', 'Carrer de la Pau', 'Passeig Marítim']
+DEDICATIONS = [
+    '¡Feliz cumpleaños! Que pases un día precioso. Con cariño,',
+    'Sentimos mucho vuestra pérdida. Os acompañamos en el sentimiento.',
+    'Gracias por estar siempre ahí. Te queremos mucho.',
+    '¡Enhorabuena por el nuevo trabajo! Un abrazo enorme.',
+]
+# Peso relativo de cada estado en los pedidos generados
+STATUSES = [('completed', 70), ('processing', 15), ('on-hold', 5), ('pending', 4),
+            ('cancelled', 4), ('refunded', 2)]
+NOTE_TITLES = ['Llamar a proveedor', 'Preparar boda', 'Recoger pedido en mercado',
+               'Revisar cámara frigorífica', 'Decoración de iglesia', 'Inventario']
+
+
+@dataclass(frozen=True)
+class DatasetScale:
+    """Tamaño del conjunto de datos"""
+    users: int
+    years: int
+    orders: int
+    photos: int
+    notes: int
+
+
+SCALES = {
+    'tiny': DatasetScale(users=2, years=1, orders=150, photos=60, notes=40),
+    'small': DatasetScale(users=5, years=1, orders=2000, photos=600, notes=300),
+    'medium': DatasetScale(users=10, years=3, orders=10000, photos=3000, notes=1500),
+    'large': DatasetScale(users=20, years=5, orders=40000, photos=12000, notes=6000),
+}
+
+
+class FloristDataset:
+    """Genera pedidos, fichajes, fotos y notas deterministas a partir de una semilla"""
+
+    def __init__(self, scale: DatasetScale, seed: int = 42, end_date: date = DEFAULT_END_DATE):
+        self.scale = scale
+        self.seed = seed
+        self.end_date = end_date
+        self.start_date = end_date - timedelta(days=365 * scale.years - 1)
+        self.rng = random.Random(seed)
+        self._status_population = [status for status, _ in STATUSES]
+        self._status_weights = [weight for _, weight in STATUSES]
+
+    # ------------------------------------------------------------------
+    # Pedidos con la forma de la API de WooCommerce
+    # ------------------------------------------------------------------
+
+    def random_day(self) -> date:
+        """Día del histórico; viernes, sábados y festivos de floristería pesan más"""
+        span = (self.end_date - self.start_date).days
+        while True:
+            day = self.start_date + timedelta(days=self.rng.randint(0, span))
+            weight = 3 if day.weekday() in (4, 5) else 1
+            if (day.month, day.day) in ((2, 14), (4, 23), (11, 1)) or (day.month == 5 and day.day <= 7):
+                weight = 6
+            if self.rng.random() < weight / 6:
+                return day
+
+    def order_payload(self, order_id: int, delivery_day: date = None, status: str = None) -> Dict[str, Any]:
+        """JSON de un pedido como lo envía el webhook de WooCommerce"""
+        rng = self.rng
+        delivery_day = delivery_day or self.random_day()
+        created = datetime.combine(delivery_day - timedelta(days=rng.randint(0, 5)),
+                                   time(rng.randint(8, 21), rng.randint(0, 59), rng.randint(0, 59)))
+        city, postcode = rng.choice(CITIES)
+        customer = (rng.choice(FIRST_NAMES), f'{rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}')
+        recipient = (rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES))
+
+        line_items = []
+        for index in range(rng.choice((1, 1, 1, 2, 3))):
+            product_id, name, price = rng.choice(PRODUCTS)
+            quantity = rng.choice((1, 1, 1, 2))
+            size = rng.choice(SIZES)
+            meta = [{'id': order_id * 10 + index, 'key': 'Configura tu ramo',
+                     'display_key': 'Configura tu ramo', 'value': size, 'display_value': size}]
+            if rng.random() < 0.6:
+                text = f'{rng.choice(DEDICATIONS)} {customer[0]}'
+                meta.append({'id': order_id * 10 + 5, 'key': 'Dedicatoria', 'display_key': 'Dedicatoria',
+                             'value': 'Dedicatoria (+1,00 €)', 'display_value': 'Dedicatoria (+1,00 €)'})
+                meta.append({'id': order_id * 10 + 6, 'key': 'Dedicatoria', 'display_key': 'Dedicatoria',
+                             'value': text.replace('. ', '. \r\n\r\n'), 'display_value': text})
+            line_items.append({
+                'id': order_id * 10 + index,
+                'name': name,
+                'product_id': product_id,
+                'quantity': quantity,
+                'price': float(price),
+                'subtotal': f'{float(price) * quantity:.2f}',
+                'total': f'{float(price) * quantity:.2f}',
+                'meta_data': meta,
+            })
+        total = sum(float(item['total']) for item in line_items) + 6.0
+
+        return {
+            'id': order_id,
+            'number': str(order_id),
+            'status': status or rng.choices(self._status_population, self._status_weights)[0],
+            'currency': 'EUR',
+            'currency_symbol': '€',
+            'created_via': 'checkout',
+            'date_created': created.isoformat(),
+            'date_modified': (created + timedelta(minutes=4)).isoformat(),
+            'total': f'{total:.2f}',
+            'shipping_total': '6.00',
+            'payment_method': rng.choice(('stripe', 'bizum', 'bacs')),
+            'customer_note': '',
+            'billing': {
+                'first_name': customer[0], 'last_name': customer[1],
+                'email': f'{customer[0].lower()}.{order_id}@example.com',
+                'phone': f'6{rng.randint(10000000, 99999999)}',
+                'address_1': '', 'address_2': '', 'city': '', 'postcode': '', 'country': 'ES', 'state': 'B',
+            },
+            'shipping': {
+                'first_name': recipient[0], 'last_name': recipient[1],
+                'phone': f'6{rng.randint(10000000, 99999999)}',
+                'address_1': f'{rng.choice(STREETS)}, {rng.randint(1, 150)}',
+                'address_2': rng.choice(('', '', '2n 2a', 'Bajos')),
+                'city': city, 'postcode': postcode, 'country': 'ES', 'state': 'B',
+            },
+            'meta_data': [
+                {'id': order_id * 100 + 1, 'key': '_billing_bill', 'value': '1'},
+                {'id': order_id * 100 + 2, 'key': DELIVERY_DATE_META_KEY, 'value': delivery_day.isoformat()},
+                {'id': order_id * 100 + 3, 'key': 'ywcdd_order_carrier', 'value': 'local'},
+            ],
+            'line_items': line_items,
+            'shipping_lines': [{'id': order_id, 'method_id': 'local_delivery', 'total': '6.00'}],
+        }
+
+    # ------------------------------------------------------------------
+    # Carga en la base de datos
+    # ------------------------------------------------------------------
+
+    def create_users(self) -> List[User]:
+        """Administrador del benchmark y empleados"""
+        users = []
+        for index in range(self.scale.users):
+            is_admin = index == 0
+            user = User(username='bench_admin' if is_admin else f'bench_user{index}',
+                        email=f'bench{index}@example.com', full_name=f'Empleado {index}',
+                        is_admin=is_admin, is_super_admin=is_admin, must_change_password=False,
+                        can_view_all_reports=is_admin, can_export_data=is_admin)
+            user.set_password(BENCHMARK_PASSWORD)
+            users.append(user)
+        db.session.add_all(users)
+        db.session.commit()
+        return users
+
+    def create_time_entries(self, users: List[User]) -> int:
+        """Un fichaje por empleado y día laborable, con descanso y alguna ausencia"""
+        rng = self.rng
+        rows = []
+        day = self.start_date
+        while day <= self.end_date:
+            if day.weekday() < 6:
+                for user in users:
+                    if rng.random() < 0.04:
+                        rows.append({'user_id': user.id, 'date': day, 'status': 'absent',
+                                     'total_hours': 0.0, 'break_hours': 0.0})
+                        continue
+                    entry = datetime.combine(day, time(8, rng.randint(0, 30)))
+                    exit_ = entry + timedelta(hours=rng.choice((6, 8, 8, 8, 9)), minutes=rng.randint(0, 59))
+                    break_start = entry + timedelta(hours=4)
+                    break_end = break_start + timedelta(minutes=rng.choice((15, 30, 30, 60)))
+                    break_hours = (break_end - break_start).total_seconds() / 3600
+                    rows.append({
+                        'user_id': user.id, 'date': day, 'status': 'completed',
+                        'entry_time': entry, 'exit_time': exit_,
+                        'break_start': break_start, 'break_end': break_end,
+                        'break_hours': round(break_hours, 2),
+                        'total_hours': round((exit_ - entry).total_seconds() / 3600 - break_hours, 2),
+                    })
+            day += timedelta(days=1)
+
+        for index in range(0, len(rows), 5000):
+            db.session.execute(insert(TimeEntry), rows[index:index + 5000])
+        db.session.commit()
+        TimeRollupService.backfill()
+        db.session.commit()
+        return len(rows)
+
+    def create_orders(self, owner_id: int, first_order_id: int = 10000) -> int:
+        """Pedidos guardados con el mismo servicio que usa el webhook"""
+        for index in range(self.scale.orders):
+            WooOrderService.save(self.order_payload(first_order_id + index), owner_id=owner_id)
+            if (index + 1) % ORDER_BATCH_SIZE == 0:
+                db.session.commit()
+        db.session.commit()
+        return self.scale.orders
+
+    def create_photos(self, users: List[User]) -> int:
+        rng = self.rng
+        span = (self.end_date - self.start_date).days
+        rows = []
+        for index in range(self.scale.photos):
+            day = self.start_date + timedelta(days=rng.randint(0, span))
+            filename = f'{day.strftime("%Y%m%d")}_{index:06d}.jpg'
+            rows.append({
+                'filename': filename, 'original_filename': f'IMG_{index:05d}.jpg',
+                'file_path': f'uploads/{filename}', 'date_taken': day,
+                'uploaded_by': rng.choice(users).username,
+                'uploaded_at': datetime.combine(day, time(rng.randint(8, 20))),
+                'status': rng.choice(('pendiente', 'hecho', 'entregado')),
+            })
+        db.session.execute(insert(Photo), rows)
+        db.session.commit()
+        return len(rows)
+
+    def create_notes(self, users: List[User]) -> int:
+        rng = self.rng
+        span = (self.end_date - self.start_date).days
+        notes = []
+        for index in range(self.scale.notes):
+            notes.append(CalendarNote(
+                date_for=self.start_date + timedelta(days=rng.randint(0, span)),
+                title=rng.choice(NOTE_TITLES),
+                content=f'Nota {index}: {rng.choice(DEDICATIONS)}',
+                priority=rng.choice(('low', 'normal', 'normal', 'high', 'urgent')),
+                is_private=rng.random() < 0.1,
+                created_by=rng.choice(users).id,
+            ))
+        db.session.add_all(notes)
+        db.session.commit()
+        return len(notes)
+
+    def populate(self) -> Dict[str, Any]:
+        """Carga todo el conjunto de datos y devuelve su descripción"""
+        users = self.create_users()
+        counts = {
+            'users': len(users),
+            'time_entries': self.create_time_entries(users),
+            'orders': self.create_orders(users[0].id),
+            'photos': self.create_photos(users),
+            'notes': self.create_notes(users),
+        }
+        return {
+            'scale': asdict(self.scale),
+            'seed': self.seed,
+            'start_date': self.start_date.isoformat(),
+            'end_date': self.end_date.isoformat(),
+            'counts': counts,
+        }
@@ -0,0 +1,177 @@
+"""
+Servidor WooCommerce de pruebas
+===============================
+
+Imita el endpoint ``GET /wp-json/wc/v3/orders`` de la API REST de
+WooCommerce con pedidos sintéticos, para medir la sincronización manual sin
+red. Admite los parámetros que usa la app (``after``, ``before``, ``page``,
+``per_page``, ``status``) y devuelve las cabeceras de paginación
+``X-WP-Total`` y ``X-WP-TotalPages``.
+
+Uso::
+
+    python -m benchmarks.fake_woocommerce --orders 5000 --port 8765
+
+o dentro de un proceso::
+
+    with FakeWooCommerceServer(orders) as server:
+        integration.url = server.orders_url
+"""
+
+import argparse
+import json
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.dataset import FloristDataset, SCALES
+
+ORDERS_PATH = '/wp-json/wc/v3/orders'
+DEFAULT_PER_PAGE = 10
+MAX_PER_PAGE = 100
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+class FakeWooCommerceServer:
+    """Servidor HTTP en un hilo que sirve una lista fija de pedidos"""
+
+    def __init__(self, orders: List[Dict[str, Any]], host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0):
+        # WooCommerce ordena por fecha de creación descendente
+        self.orders = sorted(orders, key=lambda order: order['date_created'], reverse=True)
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def orders_url(self) -> str:
+        return self.base_url + ORDERS_PATH
+
+    def select(self, query: Dict[str, List[str]]) -> Dict[str, Any]:
+        """Página de pedidos filtrada como la devolvería WooCommerce"""
+        after = _parse_datetime((query.get('after') or [None])[0])
+        before = _parse_datetime((query.get('before') or [None])[0])
+        status = (query.get('status') or ['any'])[0]
+        try:
+            page = max(1, int((query.get('page') or ['1'])[0]))
+            per_page = min(MAX_PER_PAGE, max(1, int((query.get('per_page') or [DEFAULT_PER_PAGE])[0])))
+        except ValueError:
+            return {'error': 'rest_invalid_param'}
+
+        matching = []
+        for order in self.orders:
+            created = _parse_datetime(order['date_created'])
+            if after and created <= after:
+                continue
+            if before and created >= before:
+                continue
+            if status != 'any' and order['status'] not in status.split(','):
+                continue
+            matching.append(order)
+
+        total_pages = max(1, -(-len(matching) // per_page))
+        return {
+            'orders': matching[(page - 1) * per_page:page * per_page],
+            'total': len(matching),
+            'total_pages': total_pages,
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path.rstrip('/') != ORDERS_PATH:
+                    self._send(404, {'code': 'rest_no_route'})
+                    return
+                with server._lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+
+                result = server.select(parse_qs(parsed.query))
+                if 'error' in result:
+                    self._send(400, {'code': result['error']})
+                    return
+                self._send(200, result['orders'], {
+                    'X-WP-Total': str(result['total']),
+                    'X-WP-TotalPages': str(result['total_pages']),
+                })
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=UTF-8')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> 'FakeWooCommerceServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Servidor local que imita la API de pedidos de WooCommerce')
+    parser.add_argument('--orders', type=int, default=SCALES['small'].orders, help='Número de pedidos')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla del generador de pedidos')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Retardo por petición en segundos')
+    args = parser.parse_args(argv)
+
+    dataset = FloristDataset(SCALES['small'], seed=args.seed)
+    orders = [dataset.order_payload(10000 + index) for index in range(args.orders)]
+    server = FakeWooCommerceServer(orders, args.host, args.port, args.latency)
+    print(f'Sirviendo {len(orders)} pedidos en {server.orders_url} (Ctrl+C para salir)')
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,364 @@
+"""
+Suite de benchmarks de la floristería
+=====================================
+
+Genera un conjunto de datos sintético en una base SQLite nueva, mide los
+caminos principales de la aplicación con el cliente de pruebas de Flask
+(sin red, para que solo cuente el tiempo de la app) y guarda los resultados
+en JSON para comparar ejecuciones.
+
+Uso::
+
+    python -m benchmarks.run --scale small --output resultados.json
+    python -m benchmarks.run --scale small --compare resultados.json
+
+Con ``--compare`` se muestra la variación de la mediana de cada escenario
+respecto a un resultado anterior y el proceso termina con código 1 si alguno
+empeora más que ``--threshold`` (por defecto un 10 %).
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from importlib.metadata import version
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import func
+
+from app import create_app, db
+from app.models import CalendarOrder
+from app.models.user import ApiIntegration, CalendarNote, User
+from app.blueprints.calendar.routes import process_woocommerce_order
+from benchmarks.dataset import FloristDataset, SCALES, BENCHMARK_PASSWORD
+from benchmarks.fake_woocommerce import FakeWooCommerceServer
+from config.settings import TestingConfig
+
+RESULTS_VERSION = 1
+
+# Pedidos nuevos enviados al webhook en cada repetición
+WEBHOOK_BATCH = 50
+# Pedidos existentes actualizados en cada repetición de la sincronización masiva
+SYNC_BATCH = 200
+# Días del informe de horarios
+TIME_REPORT_DAYS = 90
+# Pedidos que sirve el WooCommerce de pruebas a la sincronización manual
+FAKE_STORE_ORDERS = 500
+FAKE_STORE_FIRST_ID = 900000
+
+
+class BenchmarkConfig(TestingConfig):
+    """Configuración de la app para los benchmarks (SQLite en fichero)"""
+    TESTING = False
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    METRICS_DIR = None
+
+
+class BenchmarkContext:
+    """Estado compartido por los escenarios: app, cliente autenticado y fechas de referencia"""
+
+    def __init__(self, app, dataset: FloristDataset):
+        self.app = app
+        self.dataset = dataset
+        self.client = app.test_client()
+        response = self.client.post('/auth/login', data={'username': 'bench_admin',
+                                                         'password': BENCHMARK_PASSWORD})
+        if response.status_code != 302:
+            raise RuntimeError('No se pudo iniciar sesión con el usuario del benchmark')
+
+        with app.app_context():
+            self.busiest_day = db.session.query(CalendarNote.date_for).group_by(CalendarNote.date_for) \
+                .order_by(func.count(CalendarNote.id).desc(), CalendarNote.date_for).limit(1).scalar()
+            self.max_order_id = db.session.query(func.max(CalendarOrder.wc_order_id)).scalar() or 0
+            self.existing_order_ids = [row[0] for row in db.session.query(CalendarOrder.wc_order_id)
+                                       .order_by(CalendarOrder.wc_order_id).all()]
+        self.next_order_id = self.max_order_id + 1
+        self.sync_offset = 0
+        self.fake_store: Optional[FakeWooCommerceServer] = None
+
+    def start_fake_store(self):
+        """Arranca el WooCommerce de pruebas y apunta a él la integración activa"""
+        if self.fake_store:
+            return
+        orders = [self.dataset.order_payload(FAKE_STORE_FIRST_ID + index) for index in range(FAKE_STORE_ORDERS)]
+        self.fake_store = FakeWooCommerceServer(orders).start()
+        with self.app.app_context():
+            admin = User.query.filter_by(username='bench_admin').first()
+            db.session.add(ApiIntegration(name='WooCommerce (benchmark)', api_type='woocommerce',
+                                          url=self.fake_store.orders_url, mapping_config='{}',
+                                          is_active=True, created_by=admin.id))
+            db.session.commit()
+
+    def close(self):
+        if self.fake_store:
+            self.fake_store.stop()
+            self.fake_store = None
+
+    def get(self, url: str) -> int:
+        """GET que consume toda la respuesta (incluidas las respuestas en streaming)"""
+        response = self.client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} respondió {response.status_code}')
+        return len(response.get_data())
+
+
+# ----------------------------------------------------------------------
+# Escenarios: cada uno devuelve el número de elementos procesados
+# ----------------------------------------------------------------------
+
+def bench_month_view(ctx: BenchmarkContext) -> int:
+    day = ctx.busiest_day
+    ctx.get(f'/?year={day.year}&month={day.month}')
+    return 1
+
+
+def bench_month_api(ctx: BenchmarkContext) -> int:
+    day = ctx.busiest_day
+    ctx.get(f'/api/calendar/{day.year}/{day.month}')
+    return 1
+
+
+def bench_day_view(ctx: BenchmarkContext) -> int:
+    ctx.get(f'/day/{ctx.busiest_day.isoformat()}')
+    return 1
+
+
+def bench_notes_api(ctx: BenchmarkContext) -> int:
+    start = ctx.busiest_day.replace(day=1)
+    end = start + timedelta(days=30)
+    ctx.get(f'/api/notes?from={start.isoformat()}&to={end.isoformat()}')
+    return 1
+
+
+def bench_webhook_ingest(ctx: BenchmarkContext) -> int:
+    for _ in range(WEBHOOK_BATCH):
+        payload = ctx.dataset.order_payload(ctx.next_order_id)
+        ctx.next_order_id += 1
+        response = ctx.client.post('/webhook/woocommerce', json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f'El webhook respondió {response.status_code}')
+    return WEBHOOK_BATCH
+
+
+def bench_bulk_sync(ctx: BenchmarkContext) -> int:
+    """Actualización de pedidos existentes con el bucle de la sincronización manual"""
+    ids = ctx.existing_order_ids
+    batch = [ids[(ctx.sync_offset + index) % len(ids)] for index in range(min(SYNC_BATCH, len(ids)))]
+    ctx.sync_offset += len(batch)
+    with ctx.app.app_context():
+        for order_id in batch:
+            result = process_woocommerce_order(ctx.dataset.order_payload(order_id, status='completed'))
+            if not result['success']:
+                raise RuntimeError(result['error'])
+    return len(batch)
+
+
+def bench_manual_sync(ctx: BenchmarkContext) -> int:
+    """Sincronización manual paginada contra el WooCommerce de pruebas (sin red)"""
+    ctx.start_fake_store()
+    response = ctx.client.post('/api/woocommerce/manual-sync', json={
+        'start_date': ctx.dataset.start_date.isoformat(),
+        'end_date': ctx.dataset.end_date.isoformat(),
+    })
+    details = (response.get_json() or {}).get('details', {})
+    if response.status_code != 200 or details.get('errors'):
+        raise RuntimeError(f'La sincronización manual falló: {response.get_data(as_text=True)[:200]}')
+    return details['total_processed']
+
+
+def bench_time_report(ctx: BenchmarkContext) -> int:
+    end = ctx.dataset.end_date
+    start = end - timedelta(days=TIME_REPORT_DAYS - 1)
+    ctx.get(f'/time/time_reports?start_date={start.isoformat()}&end_date={end.isoformat()}')
+    return 1
+
+
+def bench_csv_export(ctx: BenchmarkContext) -> int:
+    """Exportación CSV de todo el histórico de fichajes"""
+    ctx.get(f'/time/export_time_report?start_date={ctx.dataset.start_date.isoformat()}'
+            f'&end_date={ctx.dataset.end_date.isoformat()}')
+    return 1
+
+
+SCENARIOS: Dict[str, Callable[[BenchmarkContext], int]] = {
+    'month_view': bench_month_view,
+    'month_api': bench_month_api,
+    'day_view': bench_day_view,
+    'notes_api': bench_notes_api,
+    'time_report': bench_time_report,
+    'csv_export': bench_csv_export,
+    'webhook_ingest': bench_webhook_ingest,
+    'bulk_sync': bench_bulk_sync,
+    'manual_sync': bench_manual_sync,
+}
+
+
+def measure(scenario: Callable[[BenchmarkContext], int], ctx: BenchmarkContext,
+            repeat: int, warmup: int) -> Dict[str, Any]:
+    """Ejecuta un escenario y resume sus tiempos en milisegundos"""
+    for _ in range(warmup):
+        scenario(ctx)
+
+    durations = []
+    items = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        items += scenario(ctx)
+        durations.append((time.perf_counter() - started) * 1000)
+
+    ordered = sorted(durations)
+    result = {
+        'runs': repeat,
+        'min_ms': round(ordered[0], 2),
+        'median_ms': round(statistics.median(ordered), 2),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        'mean_ms': round(statistics.fmean(ordered), 2),
+        'max_ms': round(ordered[-1], 2),
+        'stdev_ms': round(statistics.stdev(ordered), 2) if len(ordered) > 1 else 0.0,
+    }
+    if items > repeat:
+        result['items'] = items
+        result['items_per_second'] = round(items / (sum(durations) / 1000), 1)
+    return result
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+                              ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(scale: str = 'small', seed: int = 42, repeat: int = 10, warmup: int = 1,
+              scenarios: Optional[List[str]] = None, database: Optional[str] = None) -> Dict[str, Any]:
+    """Genera los datos, ejecuta los escenarios y devuelve el documento de resultados"""
+    selected = scenarios or list(SCENARIOS)
+    unknown = [name for name in selected if name not in SCENARIOS]
+    if unknown:
+        raise ValueError(f'Escenarios desconocidos: {", ".join(unknown)}')
+
+    with tempfile.TemporaryDirectory(prefix='floristeria_bench_') as workdir:
+        path = database or os.path.join(workdir, 'benchmark.db')
+        if os.path.exists(path):
+            os.remove(path)
+        config = type('BenchmarkRunConfig', (BenchmarkConfig,), {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(path)}',
+            'UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+            'DOCUMENTS_FOLDER': os.path.join(workdir, 'documents'),
+        })
+        app = create_app(config)
+        dataset = FloristDataset(SCALES[scale], seed=seed)
+
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            description = dataset.populate()
+            description['generation_seconds'] = round(time.perf_counter() - started, 2)
+
+        ctx = BenchmarkContext(app, dataset)
+        results = {}
+        try:
+            for name in selected:
+                results[name] = measure(SCENARIOS[name], ctx, repeat, warmup)
+        finally:
+            ctx.close()
+
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+    return {
+        'version': RESULTS_VERSION,
+        'created_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'environment': {
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'flask': version('flask'),
+            'sqlalchemy': version('sqlalchemy'),
+            'sqlite': sqlite3.sqlite_version,
+        },
+        'dataset': dict(description, name=scale),
+        'settings': {'repeat': repeat, 'warmup': warmup, 'webhook_batch': WEBHOOK_BATCH,
+                     'sync_batch': SYNC_BATCH},
+        'results': results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Variación de la mediana por escenario; ``regression`` si empeora más que el umbral"""
+    rows = []
+    for name, result in current['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous or not previous.get('median_ms'):
+            continue
+        change = (result['median_ms'] - previous['median_ms']) / previous['median_ms']
+        rows.append({
+            'scenario': name,
+            'baseline_ms': previous['median_ms'],
+            'current_ms': result['median_ms'],
+            'change': round(change, 4),
+            'regression': change > threshold,
+        })
+    return rows
+
+
+def format_results(document: Dict[str, Any], comparison: Optional[List[Dict[str, Any]]] = None) -> str:
+    lines = [f"Dataset '{document['dataset']['name']}': {document['dataset']['counts']} "
+             f"(generado en {document['dataset']['generation_seconds']} s)",
+             f"{'escenario':<16}{'mediana':>10}{'p95':>10}{'máx':>10}{'elem/s':>10}"]
+    for name, result in document['results'].items():
+        lines.append(f"{name:<16}{result['median_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['max_ms']:>10.1f}"
+                     f"{result.get('items_per_second', ''):>10}")
+    if comparison:
+        lines.append('')
+        lines.append(f"{'escenario':<16}{'antes':>10}{'ahora':>10}{'cambio':>10}")
+        for row in comparison:
+            flag = '  <-- regresión' if row['regression'] else ''
+            lines.append(f"{row['scenario']:<16}{row['baseline_ms']:>10.1f}{row['current_ms']:>10.1f}"
+                         f"{row['change'] * 100:>+9.1f}%{flag}")
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks de la aplicación con datos sintéticos')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small', help='Tamaño del conjunto de datos')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla del generador de datos')
+    parser.add_argument('--repeat', type=int, default=10, help='Repeticiones medidas por escenario')
+    parser.add_argument('--warmup', type=int, default=1, help='Repeticiones de calentamiento sin medir')
+    parser.add_argument('--scenario', action='append', dest='scenarios', choices=list(SCENARIOS),
+                        help='Escenario a ejecutar (se puede repetir; por defecto todos)')
+    parser.add_argument('--database', help='Ruta del fichero SQLite a generar (se sobrescribe)')
+    parser.add_argument('--output', help='Fichero JSON donde guardar los resultados')
+    parser.add_argument('--compare', help='Resultados JSON anteriores con los que comparar')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Empeoramiento relativo de la mediana que se considera regresión')
+    args = parser.parse_args(argv)
+
+    document = run_suite(args.scale, args.seed, args.repeat, args.warmup, args.scenarios, args.database)
+
+    comparison = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as handle:
+            comparison = compare(document, json.load(handle), args.threshold)
+        document['comparison'] = {'baseline': args.compare, 'threshold': args.threshold, 'rows': comparison}
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(document, handle, indent=2, ensure_ascii=False)
+
+    print(format_results(document, comparison))
+    return 1 if comparison and any(row['regression'] for row in comparison) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
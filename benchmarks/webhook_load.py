@@ -0,0 +1,307 @@
+"""
+Prueba de carga del webhook de WooCommerce
+==========================================
+
+Reenvía pedidos sintéticos a ``/webhook/woocommerce`` con la concurrencia y
+el ritmo indicados, incluyendo entregas duplicadas y fuera de orden (la
+actualización a ``completed`` llega antes que la de ``processing``), como
+hace WooCommerce cuando reintenta o cuando varios cambios de estado se
+disparan casi a la vez.
+
+Al terminar informa del rendimiento, las latencias p50/p95/p99, los códigos
+de respuesta y el estado final de la base de datos: notas duplicadas por
+pedido, pedidos que faltan y pedidos cuyo estado guardado no es el último.
+
+Por defecto levanta la app en este proceso (servidor WSGI multihilo sobre
+una base SQLite temporal)::
+
+    python -m benchmarks.webhook_load --orders 500 --concurrency 8 --rate 200
+
+Contra un servidor ya arrancado, con la base para verificar el resultado::
+
+    python -m benchmarks.webhook_load --url http://localhost:5000 \\
+        --database-url sqlite:///instance/floristeria.db
+"""
+
+import argparse
+import copy
+import json
+import os
+import random
+import re
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from sqlalchemy import create_engine, text
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from app import create_app, db
+from benchmarks.dataset import FloristDataset, SCALES
+from benchmarks.run import BenchmarkConfig
+
+WEBHOOK_PATH = '/webhook/woocommerce'
+# Estados por los que pasa cada pedido, en orden
+STATUS_SEQUENCE = ('processing', 'completed')
+FIRST_ORDER_ID = 500000
+
+_ORDER_TITLE = re.compile(r'Pedido #(\d+)\b')
+
+
+@dataclass
+class Delivery:
+    """Una entrega del webhook"""
+    order_id: int
+    version: int
+    payload: Dict[str, Any]
+    duplicate: bool = False
+
+
+def plan_deliveries(dataset: FloristDataset, orders: int, duplicate_ratio: float = 0.1,
+                    out_of_order_ratio: float = 0.1, first_order_id: int = FIRST_ORDER_ID,
+                    seed: int = 42) -> Tuple[List[Delivery], Dict[int, str]]:
+    """
+    Entregas a enviar y estado final esperado de cada pedido.
+
+    Cada pedido pasa por los estados de STATUS_SEQUENCE con ``date_modified``
+    creciente. En una fracción de pedidos las versiones se invierten y una
+    fracción de las entregas se repite. Los pedidos se entrelazan al azar
+    conservando el orden de entrega de cada uno.
+    """
+    rng = random.Random(seed)
+    sequences = []
+    expected = {}
+    for index in range(orders):
+        order_id = first_order_id + index
+        base = dataset.order_payload(order_id, status=STATUS_SEQUENCE[0])
+        modified = datetime.fromisoformat(base['date_modified'])
+        versions = []
+        for version, status in enumerate(STATUS_SEQUENCE):
+            payload = copy.deepcopy(base)
+            payload['status'] = status
+            payload['date_modified'] = (modified + timedelta(hours=version)).isoformat()
+            versions.append(Delivery(order_id, version, payload))
+        expected[order_id] = STATUS_SEQUENCE[-1]
+
+        if rng.random() < out_of_order_ratio:
+            versions.reverse()
+        sequence = []
+        for delivery in versions:
+            sequence.append(delivery)
+            if rng.random() < duplicate_ratio:
+                sequence.append(Delivery(delivery.order_id, delivery.version, delivery.payload, duplicate=True))
+        sequences.append(sequence)
+
+    deliveries = []
+    pending = [sequence for sequence in sequences if sequence]
+    while pending:
+        index = rng.randrange(len(pending))
+        deliveries.append(pending[index].pop(0))
+        if not pending[index]:
+            pending[index] = pending[-1]
+            pending.pop()
+    return deliveries, expected
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def send_deliveries(base_url: str, deliveries: List[Delivery], concurrency: int = 8,
+                    rate: float = 0.0, timeout: float = 30.0) -> Dict[str, Any]:
+    """
+    Envía las entregas con ``concurrency`` hilos. Con ``rate`` > 0 la entrega
+    i no sale antes de ``i / rate`` segundos desde el inicio.
+    """
+    url = base_url.rstrip('/') + WEBHOOK_PATH
+    local = threading.local()
+    latencies: List[float] = []
+    status_codes: Dict[str, int] = {}
+    errors: List[str] = []
+    lock = threading.Lock()
+    started = time.perf_counter()
+
+    def send(index: int, delivery: Delivery):
+        if rate:
+            delay = started + index / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        request_started = time.perf_counter()
+        try:
+            response = session.post(url, json=delivery.payload, timeout=timeout)
+            code = str(response.status_code)
+        except requests.RequestException as e:
+            code = 'error'
+            with lock:
+                errors.append(str(e))
+        elapsed = (time.perf_counter() - request_started) * 1000
+        with lock:
+            latencies.append(elapsed)
+            status_codes[code] = status_codes.get(code, 0) + 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for index, delivery in enumerate(deliveries):
+            pool.submit(send, index, delivery)
+    duration = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        'deliveries': len(deliveries),
+        'duplicates_sent': sum(1 for delivery in deliveries if delivery.duplicate),
+        'duration_s': round(duration, 3),
+        'throughput_rps': round(len(deliveries) / duration, 1) if duration else 0.0,
+        'latency_ms': {
+            'p50': round(_percentile(ordered, 0.50), 2),
+            'p95': round(_percentile(ordered, 0.95), 2),
+            'p99': round(_percentile(ordered, 0.99), 2),
+            'max': round(ordered[-1], 2) if ordered else 0.0,
+            'mean': round(statistics.fmean(ordered), 2) if ordered else 0.0,
+        },
+        'status_codes': status_codes,
+        'errors': errors[:10],
+    }
+
+
+def verify_database(database_url: str, expected: Dict[int, str]) -> Dict[str, int]:
+    """Notas duplicadas, pedidos sin nota y pedidos con un estado anterior al último"""
+    engine = create_engine(database_url)
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(text(
+                'SELECT n.id, n.title, o.wc_order_id, o.status FROM calendar_notes n '
+                'LEFT JOIN calendar_orders o ON o.note_id = n.id'
+            )).all()
+    finally:
+        engine.dispose()
+
+    notes_per_order: Dict[int, int] = {}
+    stored_status: Dict[int, str] = {}
+    for _, title, wc_order_id, status in rows:
+        if wc_order_id is None:
+            match = _ORDER_TITLE.search(title or '')
+            if not match:
+                continue
+            wc_order_id = int(match.group(1))
+        if wc_order_id not in expected:
+            continue
+        notes_per_order[wc_order_id] = notes_per_order.get(wc_order_id, 0) + 1
+        if status:
+            stored_status[wc_order_id] = status
+
+    return {
+        'orders': len(expected),
+        'duplicate_notes': sum(count - 1 for count in notes_per_order.values() if count > 1),
+        'missing_orders': sum(1 for order_id in expected if order_id not in notes_per_order),
+        'stale_orders': sum(1 for order_id, status in expected.items()
+                            if order_id in stored_status and stored_status[order_id] != status),
+    }
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class LocalAppServer:
+    """La app servida por un servidor WSGI multihilo sobre una base SQLite temporal"""
+
+    def __init__(self, scale: Optional[str] = None, seed: int = 42):
+        self._workdir = tempfile.TemporaryDirectory(prefix='floristeria_load_')
+        path = os.path.join(self._workdir.name, 'load.db')
+        self.database_url = f'sqlite:///{path}'
+        config = type('LoadTestConfig', (BenchmarkConfig,), {
+            'SQLALCHEMY_DATABASE_URI': self.database_url,
+            'UPLOAD_FOLDER': os.path.join(self._workdir.name, 'uploads'),
+            'DOCUMENTS_FOLDER': os.path.join(self._workdir.name, 'documents'),
+        })
+        self.app = create_app(config)
+        with self.app.app_context():
+            db.create_all()
+            dataset = FloristDataset(SCALES[scale or 'tiny'], seed=seed)
+            if scale:
+                dataset.populate()
+            else:
+                dataset.create_users()
+        self._server = make_server('127.0.0.1', 0, self.app, threaded=True,
+                                   request_handler=_QuietRequestHandler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_port}'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._thread.join()
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        self._workdir.cleanup()
+        return False
+
+
+def run_load_test(orders: int = 200, concurrency: int = 8, rate: float = 0.0, duplicate_ratio: float = 0.1,
+                  out_of_order_ratio: float = 0.1, seed: int = 42, url: Optional[str] = None,
+                  database_url: Optional[str] = None, scale: Optional[str] = None) -> Dict[str, Any]:
+    """Ejecuta la prueba de carga y devuelve el informe"""
+    dataset = FloristDataset(SCALES['small'], seed=seed)
+    deliveries, expected = plan_deliveries(dataset, orders, duplicate_ratio, out_of_order_ratio, seed=seed)
+    settings = {'orders': orders, 'concurrency': concurrency, 'rate': rate, 'duplicate_ratio': duplicate_ratio,
+                'out_of_order_ratio': out_of_order_ratio, 'seed': seed}
+
+    if url:
+        report = send_deliveries(url, deliveries, concurrency, rate)
+        report['database'] = verify_database(database_url, expected) if database_url else None
+    else:
+        with LocalAppServer(scale, seed) as server:
+            report = send_deliveries(server.base_url, deliveries, concurrency, rate)
+            report['database'] = verify_database(server.database_url, expected)
+    report['settings'] = settings
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Prueba de carga del webhook de WooCommerce')
+    parser.add_argument('--orders', type=int, default=200, help='Pedidos distintos a enviar')
+    parser.add_argument('--concurrency', type=int, default=8, help='Peticiones simultáneas')
+    parser.add_argument('--rate', type=float, default=0.0, help='Entregas por segundo (0 = sin límite)')
+    parser.add_argument('--duplicates', type=float, default=0.1, help='Fracción de entregas repetidas')
+    parser.add_argument('--out-of-order', type=float, default=0.1,
+                        help='Fracción de pedidos cuyas versiones llegan en orden inverso')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--url', help='URL base de un servidor ya arrancado (por defecto, app local)')
+    parser.add_argument('--database-url', help='Base de datos del servidor para verificar el resultado')
+    parser.add_argument('--scale', choices=sorted(SCALES),
+                        help='Precargar la app local con un conjunto de datos sintético')
+    parser.add_argument('--output', help='Fichero JSON donde guardar el informe')
+    args = parser.parse_args(argv)
+
+    report = run_load_test(args.orders, args.concurrency, args.rate, args.duplicates, args.out_of_order,
+                           args.seed, args.url, args.database_url, args.scale)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, indent=2, ensure_ascii=False)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    failed = sum(count for code, count in report['status_codes'].items() if code != '200')
+    database = report['database'] or {}
+    return 1 if failed or database.get('duplicate_notes') or database.get('missing_orders') else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -34,6 +34,46 @@ class Config:
         'echo': os.environ.get('SQLALCHEMY_ECHO', 'False').lower() == 'true'
     }
     
+    # Perfil de SQLite (solo se aplica si SQLALCHEMY_DATABASE_URI es sqlite)
+    SQLITE_PROFILE_ENABLED = os.environ.get('SQLITE_PROFILE_ENABLED', 'True').lower() == 'true'
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')  # Lectores sin bloquear al escritor
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')  # Seguro con WAL
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))  # Espera ante un bloqueo de escritura
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # Bytes mapeados en memoria
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024))  # Caché de páginas por conexión
+    SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 5))
+    SQLITE_MAX_OVERFLOW = int(os.environ.get('SQLITE_MAX_OVERFLOW', 10))
+    SQLITE_POOL_TIMEOUT = int(os.environ.get('SQLITE_POOL_TIMEOUT', 30))
+    
+    # Backups de la base de datos (app/utils/db_backup.py)
+    BACKUP_FOLDER = os.environ.get('BACKUP_FOLDER') or 'backups'
+    BACKUP_COMPRESSION = os.environ.get('BACKUP_COMPRESSION', 'gzip')  # gzip, zstd (requiere zstandard) o none
+    BACKUP_COMPRESSION_LEVEL = int(os.environ.get('BACKUP_COMPRESSION_LEVEL', 6))
+    BACKUP_PAGES_PER_STEP = int(os.environ.get('BACKUP_PAGES_PER_STEP', 256))  # Páginas de SQLite copiadas por paso
+    BACKUP_STEP_PAUSE_MS = int(os.environ.get('BACKUP_STEP_PAUSE_MS', 5))  # Pausa entre pasos para los escritores
+    BACKUP_MAX_RESTARTS = int(os.environ.get('BACKUP_MAX_RESTARTS', 3))  # Reinicios antes de copiar en un solo paso
+    BACKUP_KEEP_LAST = int(os.environ.get('BACKUP_KEEP_LAST', 14))  # Backups que se conservan siempre
+    BACKUP_MAX_AGE_DAYS = int(os.environ.get('BACKUP_MAX_AGE_DAYS', 30))  # 0 = sin límite de antigüedad
+    BACKUP_DUMP_CHUNK_ROWS = int(os.environ.get('BACKUP_DUMP_CHUNK_ROWS', 1000))  # Filas por INSERT sin mysqldump
+    MYSQLDUMP_PATH = os.environ.get('MYSQLDUMP_PATH')  # None = mysqldump del PATH (si no está, volcado en Python)
+    BACKUP_SCHEDULE_HOURS = float(os.environ.get('BACKUP_SCHEDULE_HOURS', 0))  # 0 = sin backups programados
+    
+    # Exportación/importación por bloques entre motores (flask export-data / import-data)
+    DATA_TRANSFER_CHUNK_ROWS = int(os.environ.get('DATA_TRANSFER_CHUNK_ROWS', 5000))  # Filas por fichero NDJSON
+    DATA_TRANSFER_BATCH_ROWS = int(os.environ.get('DATA_TRANSFER_BATCH_ROWS', 1000))  # Filas por executemany
+    
+    # Consola SQL del panel de administración
+    SQL_CONSOLE_PAGE_SIZE = int(os.environ.get('SQL_CONSOLE_PAGE_SIZE', 500))  # Filas por página ("cargar más")
+    SQL_CONSOLE_MAX_ROWS = int(os.environ.get('SQL_CONSOLE_MAX_ROWS', 5000))  # Tope de filas por consulta
+    SQL_CONSOLE_TIMEOUT_SECONDS = float(os.environ.get('SQL_CONSOLE_TIMEOUT_SECONDS', 30))  # 0 = sin límite
+    # Estadísticas del gestor de base de datos (catálogo, aproximadas)
+    DB_STATS_CACHE_SECONDS = int(os.environ.get('DB_STATS_CACHE_SECONDS', 300))
+    
+    # Réplica de solo lectura (opcional): los endpoints de consulta leen de ella
+    SQLALCHEMY_REPLICA_URI = os.environ.get('DATABASE_REPLICA_URL')
+    REPLICA_READ_YOUR_WRITES_SECONDS = int(os.environ.get('REPLICA_READ_YOUR_WRITES_SECONDS', 10))  # Lecturas a la principal tras escribir
+    REPLICA_READ_ENDPOINTS = None  # None = app.utils.db_routing.DEFAULT_READ_ENDPOINTS
+    
     # Configuración específica de MySQL
     MYSQL_CHARSET = os.environ.get('MYSQL_CHARSET', 'utf8mb4')
     MYSQL_COLLATION = os.environ.get('MYSQL_COLLATION', 'utf8mb4_unicode_ci')
@@ -44,6 +84,33 @@ class Config:
     HOST = os.environ.get('FLASK_HOST') or '0.0.0.0'
     PORT = int(os.environ.get('FLASK_PORT', 5000))
     
+    # Reportes de horarios
+    TIME_REPORT_DAILY_TARGET_HOURS = float(os.environ.get('TIME_REPORT_DAILY_TARGET_HOURS', 8))  # Jornada para horas extra
+    TIME_REPORT_PAGE_SIZE = int(os.environ.get('TIME_REPORT_PAGE_SIZE', 50))  # Registros detallados por página
+    
+    # Listados paginados (usuarios, documentos)
+    LIST_PAGE_SIZE = int(os.environ.get('LIST_PAGE_SIZE', 50))  # Filas por página
+    
+    # Eventos en vivo del calendario (SSE)
+    CALENDAR_EVENTS_STREAM_SECONDS = int(os.environ.get('CALENDAR_EVENTS_STREAM_SECONDS', 55))  # Duración de cada conexión
+    CALENDAR_EVENTS_POLL_SECONDS = float(os.environ.get('CALENDAR_EVENTS_POLL_SECONDS', 2))  # Consulta del registro compartido
+    CALENDAR_EVENTS_RETENTION_HOURS = int(os.environ.get('CALENDAR_EVENTS_RETENTION_HOURS', 24))  # Antigüedad máxima del registro
+    
+    # Métricas de rendimiento por petición
+    REQUEST_METRICS_ENABLED = os.environ.get('REQUEST_METRICS_ENABLED', 'True').lower() == 'true'  # Tabla por endpoint
+    SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', 'False').lower() == 'true'  # Server-Timing (solo administradores)
+    
+    # Registro de consultas lentas y asesor de índices (gestor de base de datos)
+    SLOW_QUERY_LOG_ENABLED = os.environ.get('SLOW_QUERY_LOG_ENABLED', 'True').lower() == 'true'
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200))  # Umbral por sentencia
+    SLOW_QUERY_REPORT_TOP = int(os.environ.get('SLOW_QUERY_REPORT_TOP', 20))  # Huellas mostradas
+    SLOW_QUERY_EXPLAIN_TOP = int(os.environ.get('SLOW_QUERY_EXPLAIN_TOP', 5))  # Huellas con EXPLAIN
+    
+    # Métricas Prometheus (/metrics)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+    METRICS_DIR = os.environ.get('METRICS_DIR')  # Carpeta compartida entre workers de gunicorn (None = solo este proceso)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # Bearer token exigido; sin él solo se permite acceso local
+    
     # Usuarios por defecto
     DEFAULT_ADMIN_USER = os.environ.get('DEFAULT_ADMIN_USER') or 'admin'
     DEFAULT_ADMIN_PASS = os.environ.get('DEFAULT_ADMIN_PASS') or 'admin123'
@@ -89,13 +156,8 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
     
-    # Pool mínimo para testing
+    # Sin opciones de pool: SQLite en memoria usa StaticPool (una sola conexión compartida)
     SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_pre_ping': False,
-        'pool_recycle': -1,
-        'pool_timeout': 10,
-        'pool_size': 1,
-        'max_overflow': 0,
         'echo': False
     }
 
@@ -0,0 +1,38 @@
+"""add_calendar_changes
+
+Revision ID: a5c7e3f81b24
+Revises: f4b6d19e2c83
+Create Date: 2026-10-19 15:48:31.270964
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5c7e3f81b24'
+down_revision = 'f4b6d19e2c83'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('calendar_changes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('date_for', sa.Date(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('object_id', sa.Integer(), nullable=True),
+    sa.Column('action', sa.String(length=10), nullable=False),
+    sa.Column('visible_to', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('calendar_changes', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_calendar_changes_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('calendar_changes', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_calendar_changes_created_at'))
+
+    op.drop_table('calendar_changes')
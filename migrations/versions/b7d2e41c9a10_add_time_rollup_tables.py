@@ -0,0 +1,58 @@
+"""add_time_rollup_tables
+
+Revision ID: b7d2e41c9a10
+Revises: c46770066e3e
+Create Date: 2026-10-19 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2e41c9a10'
+down_revision = 'c46770066e3e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('time_rollup_daily',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('total_hours', sa.Float(), nullable=True),
+    sa.Column('break_hours', sa.Float(), nullable=True),
+    sa.Column('overtime_hours', sa.Float(), nullable=True),
+    sa.Column('days_present', sa.Integer(), nullable=True),
+    sa.Column('entries', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'date')
+    )
+    with op.batch_alter_table('time_rollup_daily', schema=None) as batch_op:
+        batch_op.create_index('ix_time_rollup_daily_user_month', ['user_id', 'year', 'month'], unique=False)
+
+    op.create_table('time_rollup_monthly',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('total_hours', sa.Float(), nullable=True),
+    sa.Column('break_hours', sa.Float(), nullable=True),
+    sa.Column('overtime_hours', sa.Float(), nullable=True),
+    sa.Column('days_present', sa.Integer(), nullable=True),
+    sa.Column('entries', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'year', 'month')
+    )
+    # Rellenar con el histórico: flask backfill-time-rollups
+
+
+def downgrade():
+    op.drop_table('time_rollup_monthly')
+    with op.batch_alter_table('time_rollup_daily', schema=None) as batch_op:
+        batch_op.drop_index('ix_time_rollup_daily_user_month')
+
+    op.drop_table('time_rollup_daily')
@@ -0,0 +1,75 @@
+"""add_calendar_orders
+
+Revision ID: b8e2f6a4c913
+Revises: a5c7e3f81b24
+Create Date: 2026-10-19 17:12:05.481327
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e2f6a4c913'
+down_revision = 'a5c7e3f81b24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('calendar_orders',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('note_id', sa.Integer(), nullable=False),
+    sa.Column('wc_order_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('total', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('currency', sa.String(length=3), nullable=True),
+    sa.Column('ordered_at', sa.DateTime(), nullable=True),
+    sa.Column('customer_name', sa.String(length=200), nullable=True),
+    sa.Column('customer_email', sa.String(length=120), nullable=True),
+    sa.Column('customer_phone', sa.String(length=30), nullable=True),
+    sa.Column('delivery_name', sa.String(length=200), nullable=True),
+    sa.Column('delivery_phone', sa.String(length=30), nullable=True),
+    sa.Column('delivery_address', sa.String(length=300), nullable=True),
+    sa.Column('delivery_city', sa.String(length=100), nullable=True),
+    sa.Column('delivery_postcode', sa.String(length=10), nullable=True),
+    sa.Column('delivery_date', sa.Date(), nullable=True),
+    sa.Column('dedication', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['note_id'], ['calendar_notes.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('note_id'),
+    sa.UniqueConstraint('wc_order_id')
+    )
+    with op.batch_alter_table('calendar_orders', schema=None) as batch_op:
+        batch_op.create_index('ix_calendar_orders_delivery', ['delivery_date', 'delivery_postcode', 'delivery_city'], unique=False)
+        batch_op.create_index(batch_op.f('ix_calendar_orders_status'), ['status'], unique=False)
+
+    op.create_table('calendar_order_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=True),
+    sa.Column('product_name', sa.String(length=200), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('options', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['calendar_orders.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('calendar_order_items', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_calendar_order_items_order_id'), ['order_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_calendar_order_items_product_name'), ['product_name'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('calendar_order_items', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_calendar_order_items_product_name'))
+        batch_op.drop_index(batch_op.f('ix_calendar_order_items_order_id'))
+
+    op.drop_table('calendar_order_items')
+    with op.batch_alter_table('calendar_orders', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_calendar_orders_status'))
+        batch_op.drop_index('ix_calendar_orders_delivery')
+
+    op.drop_table('calendar_orders')
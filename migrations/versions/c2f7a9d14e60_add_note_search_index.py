@@ -0,0 +1,118 @@
+"""add_note_search_index
+
+Revision ID: c2f7a9d14e60
+Revises: b8e2f6a4c913
+Create Date: 2026-10-19 19:05:41.227310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2f7a9d14e60'
+down_revision = 'b8e2f6a4c913'
+branch_labels = None
+depends_on = None
+
+
+# DDL congelado: es la única definición del índice (app/utils/note_search.py
+# solo lo consulta y lo vuelve a llenar). Un cambio va en una migración nueva
+FTS_TABLE = 'calendar_notes_fts'
+FTS_VIEW = 'calendar_notes_search'
+ORDER_SEARCH_COLUMNS = ('customer_name', 'customer_email', 'customer_phone', 'delivery_name',
+                        'delivery_phone', 'delivery_address', 'delivery_city', 'delivery_postcode',
+                        'dedication')
+
+ORDER_TEXT = " || ' ' || ".join(f"coalesce(o.{name}, '')" for name in ORDER_SEARCH_COLUMNS)
+ITEMS_TEXT = ("coalesce((SELECT group_concat(i.product_name, ' ') FROM calendar_order_items i "
+              "WHERE i.order_id = o.id), '')")
+ORDER_OF_ITEM = "(SELECT note_id FROM calendar_orders WHERE id = {}.order_id)"
+
+# Disparadores que mantienen la tabla FTS5: (nombre, evento, nota afectada)
+SQLITE_TRIGGERS = [
+    ('calendar_notes_fts_ai', 'INSERT ON calendar_notes', 'new.id'),
+    ('calendar_notes_fts_au', 'UPDATE OF title, content ON calendar_notes', 'new.id'),
+    ('calendar_orders_fts_ai', 'INSERT ON calendar_orders', 'new.note_id'),
+    ('calendar_orders_fts_au', 'UPDATE ON calendar_orders', 'new.note_id'),
+    ('calendar_orders_fts_ad', 'DELETE ON calendar_orders', 'old.note_id'),
+    ('calendar_order_items_fts_ai', 'INSERT ON calendar_order_items', ORDER_OF_ITEM.format('new')),
+    ('calendar_order_items_fts_au', 'UPDATE OF product_name ON calendar_order_items', ORDER_OF_ITEM.format('new')),
+    ('calendar_order_items_fts_ad', 'DELETE ON calendar_order_items', ORDER_OF_ITEM.format('old')),
+]
+
+MYSQL_FULLTEXT = [
+    ('calendar_notes', 'ft_calendar_notes_title_content', 'title, content'),
+    ('calendar_orders', 'ft_calendar_orders_search', ', '.join(ORDER_SEARCH_COLUMNS)),
+]
+
+
+def _refresh_note(note_id):
+    return (f"DELETE FROM {FTS_TABLE} WHERE rowid = {note_id}; "
+            f"INSERT INTO {FTS_TABLE}(rowid, title, body) SELECT id, title, body FROM {FTS_VIEW} WHERE id = {note_id};")
+
+
+def _upgrade_sqlite(bind):
+    existing = bind.execute(sa.text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}).scalar()
+    if existing and "content='calendar_notes'" in existing:
+        # Índice anterior de contenido externo creado por la aplicación: se sustituye
+        for trigger in ('calendar_notes_fts_ai', 'calendar_notes_fts_ad', 'calendar_notes_fts_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute(f"DROP TABLE {FTS_TABLE}")
+        existing = None
+
+    try:
+        with bind.begin_nested():
+            bind.execute(sa.text(f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+                title, body,
+                tokenize='unicode61 remove_diacritics 2'
+            )"""))
+    except sa.exc.OperationalError:
+        # SQLite compilado sin FTS5: la búsqueda usa LIKE
+        return
+
+    op.execute(f"""CREATE VIEW IF NOT EXISTS {FTS_VIEW} AS
+        SELECT n.id AS id, n.title AS title,
+               coalesce(n.content, '') || ' ' || {ORDER_TEXT} || ' ' || {ITEMS_TEXT} AS body
+        FROM calendar_notes n LEFT JOIN calendar_orders o ON o.note_id = n.id""")
+    op.execute(f"""CREATE TRIGGER IF NOT EXISTS calendar_notes_fts_ad AFTER DELETE ON calendar_notes BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""")
+    for name, event, note_id in SQLITE_TRIGGERS:
+        op.execute(f"""CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} BEGIN
+        {_refresh_note(note_id)}
+    END""")
+    if not existing:
+        op.execute(f"INSERT INTO {FTS_TABLE}(rowid, title, body) SELECT id, title, body FROM {FTS_VIEW}")
+
+
+def _upgrade_mysql(bind):
+    for table_name, index_name, columns in MYSQL_FULLTEXT:
+        found = bind.execute(sa.text(
+            "SELECT 1 FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = :table AND index_name = :name"
+        ), {'table': table_name, 'name': index_name}).first()
+        if found is None:
+            op.execute(f"ALTER TABLE {table_name} ADD FULLTEXT INDEX {index_name} ({columns})")
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        _upgrade_sqlite(bind)
+    elif bind.dialect.name == 'mysql':
+        _upgrade_mysql(bind)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS calendar_notes_fts_ad")
+        for name, _, _ in SQLITE_TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        op.execute(f"DROP VIEW IF EXISTS {FTS_VIEW}")
+        op.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif bind.dialect.name == 'mysql':
+        for table_name, index_name, _ in MYSQL_FULLTEXT:
+            op.execute(f"ALTER TABLE {table_name} DROP INDEX {index_name}")
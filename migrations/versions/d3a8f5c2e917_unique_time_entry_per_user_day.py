@@ -0,0 +1,35 @@
+"""unique_time_entry_per_user_day
+
+Revision ID: d3a8f5c2e917
+Revises: b7d2e41c9a10
+Create Date: 2026-10-19 11:40:02.553190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a8f5c2e917'
+down_revision = 'b7d2e41c9a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Los registros duplicados del mismo día deben unificarse antes (edit_time_entry)
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT user_id, date, COUNT(*) FROM time_entries "
+        "GROUP BY user_id, date HAVING COUNT(*) > 1"
+    )).fetchall()
+    if duplicates:
+        listing = ', '.join(f'usuario {row[0]} el {row[1]} ({row[2]} registros)' for row in duplicates)
+        raise RuntimeError(f'Hay registros de horario duplicados que deben revisarse antes de migrar: {listing}')
+
+    with op.batch_alter_table('time_entries', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_time_entries_user_date', ['user_id', 'date'])
+
+
+def downgrade():
+    with op.batch_alter_table('time_entries', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_time_entries_user_date', type_='unique')
@@ -0,0 +1,34 @@
+"""user_documents_uploaded_at_not_null
+
+Revision ID: e7b3c5a92d18
+Revises: c2f7a9d14e60
+Create Date: 2026-10-19 21:12:37.408115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b3c5a92d18'
+down_revision = 'c2f7a9d14e60'
+branch_labels = None
+depends_on = None
+
+
+# Fecha para los documentos antiguos sin fecha de subida: quedan al final del listado
+UNKNOWN_UPLOAD = '1970-01-01 00:00:00'
+
+
+def upgrade():
+    # La paginación por cursor (uploaded_at, id) no admite NULL en la clave
+    op.execute(sa.text("UPDATE user_documents SET uploaded_at = :unknown WHERE uploaded_at IS NULL")
+               .bindparams(unknown=UNKNOWN_UPLOAD))
+
+    with op.batch_alter_table('user_documents', schema=None) as batch_op:
+        batch_op.alter_column('uploaded_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_documents', schema=None) as batch_op:
+        batch_op.alter_column('uploaded_at', existing_type=sa.DateTime(), nullable=True)
@@ -0,0 +1,32 @@
+"""add_keyset_pagination_indexes
+
+Revision ID: e91c04b7a5d2
+Revises: d3a8f5c2e917
+Create Date: 2026-10-19 13:05:47.902311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e91c04b7a5d2'
+down_revision = 'd3a8f5c2e917'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('time_entries', schema=None) as batch_op:
+        batch_op.create_index('ix_time_entries_date_id', ['date', 'id'], unique=False)
+
+    with op.batch_alter_table('user_documents', schema=None) as batch_op:
+        batch_op.create_index('ix_user_documents_uploaded_at_id', ['uploaded_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_documents', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_documents_uploaded_at_id')
+
+    with op.batch_alter_table('time_entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_time_entries_date_id')
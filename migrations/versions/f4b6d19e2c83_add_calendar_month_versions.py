@@ -0,0 +1,30 @@
+"""add_calendar_month_versions
+
+Revision ID: f4b6d19e2c83
+Revises: e91c04b7a5d2
+Create Date: 2026-10-19 14:22:10.417825
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b6d19e2c83'
+down_revision = 'e91c04b7a5d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('calendar_month_versions',
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('year', 'month')
+    )
+
+
+def downgrade():
+    op.drop_table('calendar_month_versions')
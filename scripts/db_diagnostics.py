@@ -153,6 +153,12 @@ def test_database_write():
             user_count = User.query.count()
             print(f"✅ Lectura exitosa: {user_count} usuarios encontrados")
             
+            # PRAGMA efectivos del perfil SQLite (WAL, busy_timeout...)
+            if db.engine.dialect.name == 'sqlite':
+                from app.utils.sqlite_profile import current_settings
+                for name, value in current_settings(db.engine).items():
+                    print(f"   {name}: {value}")
+            
             # Limpiar cualquier transacción pendiente
             try:
                 db.session.rollback()
@@ -4,7 +4,9 @@
 # Configuración del servidor
 bind = "0.0.0.0:5000"
 workers = 2
-worker_class = "sync"
+# Hilos por worker: los streams SSE del calendario mantienen una conexión abierta
+worker_class = "gthread"
+threads = 8
 worker_connections = 1000
 timeout = 30
 keepalive = 2
@@ -26,7 +28,23 @@ preload_app = True
 max_requests = 1000
 max_requests_jitter = 50
 
+# Cada worker vuelca aquí sus métricas y /metrics las suma
+METRICS_DIR = '/tmp/floristeria_metrics'
+
 # Variables de entorno
 raw_env = [
     'FLASK_ENV=production',
+    f'METRICS_DIR={METRICS_DIR}',
 ]
+
+
+def on_starting(server):
+    """Vaciar las métricas de la ejecución anterior (los contadores empiezan de cero)"""
+    import shutil
+    shutil.rmtree(METRICS_DIR, ignore_errors=True)
+
+
+def child_exit(server, worker):
+    """Sumar las métricas del worker terminado al archivo y borrar su fichero"""
+    from app.utils import metrics
+    metrics.archive_worker(worker.pid, METRICS_DIR)
@@ -24,11 +24,13 @@ echo.
 echo 5. ¿Importar datos exportados? (solo si exportaste en paso 3)
 set /p import="Importar datos (s/N): "
 if /i "%import%" equ "s" (
-    if exist "data_export\import_to_mysql.py" (
+    if exist "data_export\floristeria\manifest.json" (
         echo Importando datos...
-        python data_export\import_to_mysql.py
+        flask import-data data_export\floristeria
+        echo Reconstruyendo el indice de busqueda...
+        flask search-index
     ) else (
-        echo No se encontro script de importacion.
+        echo No se encontro la exportacion en data_export\floristeria.
     )
 )
 
@@ -0,0 +1,52 @@
+"""
+Pruebas para la suite de benchmarks y el generador de datos sintéticos
+"""
+
+from benchmarks.dataset import FloristDataset, SCALES
+from benchmarks.run import compare, run_suite
+from app.utils.woocommerce_orders import WooOrderService
+
+
+class TestFloristDataset:
+    """Pruebas para el generador de datos"""
+
+    def test_same_seed_same_orders(self):
+        """La misma semilla genera exactamente los mismos pedidos"""
+        first = FloristDataset(SCALES['tiny'], seed=7)
+        second = FloristDataset(SCALES['tiny'], seed=7)
+
+        assert [first.order_payload(i) for i in range(20)] == [second.order_payload(i) for i in range(20)]
+
+    def test_orders_parse_like_woocommerce(self):
+        """Los pedidos generados tienen fecha de entrega, dirección y líneas como los reales"""
+        dataset = FloristDataset(SCALES['tiny'])
+        parsed = WooOrderService.parse(dataset.order_payload(123))
+
+        assert parsed['order']['wc_order_id'] == 123
+        assert parsed['order']['delivery_date'] == parsed['calendar_date']
+        assert dataset.start_date <= parsed['calendar_date'] <= dataset.end_date
+        assert parsed['order']['delivery_postcode']
+        assert parsed['items']
+
+
+class TestBenchmarkRun:
+    """Pruebas para la ejecución y la comparación de resultados"""
+
+    def test_run_suite_writes_results(self):
+        """Cada escenario produce tiempos y los de ingesta también su rendimiento"""
+        document = run_suite('tiny', repeat=2, warmup=0, scenarios=['day_view', 'webhook_ingest'])
+
+        assert document['dataset']['counts']['orders'] == SCALES['tiny'].orders
+        assert set(document['results']) == {'day_view', 'webhook_ingest'}
+        assert document['results']['day_view']['runs'] == 2
+        assert document['results']['webhook_ingest']['items_per_second'] > 0
+
+    def test_compare_flags_regressions(self):
+        """Se marca como regresión un empeoramiento de la mediana por encima del umbral"""
+        baseline = {'results': {'day_view': {'median_ms': 10.0}, 'notes_api': {'median_ms': 10.0}}}
+        current = {'results': {'day_view': {'median_ms': 12.0}, 'notes_api': {'median_ms': 10.5}}}
+
+        rows = {row['scenario']: row for row in compare(current, baseline, threshold=0.10)}
+
+        assert rows['day_view']['regression'] is True
+        assert rows['notes_api']['regression'] is False
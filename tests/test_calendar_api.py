@@ -0,0 +1,176 @@
+"""
+Pruebas para la API mensual del calendario
+"""
+
+import pytest
+from datetime import date
+from app import create_app, db
+from app.models import User, Photo
+from app.models.user import ApiData, ApiIntegration, CalendarNote
+from app.utils.calendar_versions import month_version
+from config.settings import TestingConfig
+
+
+class CalendarApiTestConfig(TestingConfig):
+    """Configuración de pruebas con SQLite en memoria"""
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+
+
+@pytest.fixture
+def app():
+    """Crear instancia de la app con datos de un mes"""
+    app = create_app(CalendarApiTestConfig)
+
+    with app.app_context():
+        db.create_all()
+
+        admin = User(username='admin_test', email='admin@example.com', is_admin=True,
+                     must_change_password=False)
+        admin.set_password('test_password')
+        ana = User(username='ana', email='ana@example.com', must_change_password=False,
+                   can_view_calendar=True)
+        ana.set_password('test_password')
+        db.session.add_all([admin, ana])
+        db.session.commit()
+
+        integration = ApiIntegration(name='Tienda', api_type='custom', url='http://x', mapping_config='{}',
+                                     created_by=admin.id)
+        db.session.add(integration)
+        db.session.commit()
+
+        day = date(2025, 3, 3)
+        db.session.add_all([
+            CalendarNote(date_for=day, title='Pública', priority='high', created_by=admin.id),
+            CalendarNote(date_for=day, title='Privada', priority='normal', is_private=True,
+                         created_by=admin.id),
+            Photo(filename='a.jpg', original_filename='a.jpg', file_path='a.jpg', date_taken=day,
+                  uploaded_by='admin_test', status='hecho'),
+            ApiData(integration_id=integration.id, date_for=date(2025, 3, 8), title='Pedido #1',
+                    icon='fas fa-box', color='#28a745'),
+        ])
+        db.session.commit()
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+
+
+def login(client, username):
+    client.post('/auth/login', data={'username': username, 'password': 'test_password'})
+
+
+class TestCalendarMonthApi:
+    """Pruebas del resumen mensual y la revalidación por ETag"""
+
+    def test_month_summary(self, app):
+        """El resumen agrupa notas, fotos e insignias por día"""
+        client = app.test_client()
+        login(client, 'admin_test')
+
+        data = client.get('/api/calendar/2025/3').get_json()
+
+        assert data['days']['2025-03-03']['notes'] == {'high': 1, 'normal': 1}
+        assert data['days']['2025-03-03']['photos'] == {'hecho': 1}
+        assert data['days']['2025-03-08']['api']['count'] == 1
+        assert data['days']['2025-03-08']['api']['badges'][0]['title'] == 'Pedido #1'
+        assert '2025-03-04' not in data['days']
+
+    def test_private_notes_hidden(self, app):
+        """Los usuarios normales no cuentan las notas privadas ajenas"""
+        client = app.test_client()
+        login(client, 'ana')
+
+        data = client.get('/api/calendar/2025/3').get_json()
+
+        assert data['days']['2025-03-03']['notes'] == {'high': 1}
+
+    def test_etag_and_304(self, app):
+        """Sin cambios se responde 304; un cambio en el mes cambia el ETag"""
+        client = app.test_client()
+        login(client, 'admin_test')
+
+        first = client.get('/api/calendar/2025/3')
+        etag = first.headers['ETag']
+        assert not etag.startswith('W/')
+
+        cached = client.get('/api/calendar/2025/3', headers={'If-None-Match': etag})
+        assert cached.status_code == 304
+
+        with app.app_context():
+            note = CalendarNote.query.filter_by(title='Pública').first()
+            note.priority = 'urgent'
+            db.session.commit()
+
+        changed = client.get('/api/calendar/2025/3', headers={'If-None-Match': etag})
+        assert changed.status_code == 200
+        assert changed.headers['ETag'] != etag
+
+    def test_invalid_month(self, app):
+        """Un mes fuera de rango devuelve 400"""
+        client = app.test_client()
+        login(client, 'admin_test')
+
+        assert client.get('/api/calendar/2025/13').status_code == 400
+
+
+class TestMonthVersions:
+    """Pruebas del contador de versión por mes"""
+
+    def test_moving_note_bumps_both_months(self, app):
+        """Mover una nota de mes invalida el mes de origen y el de destino"""
+        with app.app_context():
+            march, april = month_version(2025, 3), month_version(2025, 4)
+
+            note = CalendarNote.query.filter_by(title='Pública').first()
+            note.date_for = date(2025, 4, 2)
+            db.session.commit()
+
+            assert month_version(2025, 3) == march + 1
+            assert month_version(2025, 4) == april + 1
+
+    def test_unrelated_change_keeps_version(self, app):
+        """Los cambios en otros modelos no tocan el contador"""
+        with app.app_context():
+            before = month_version(2025, 3)
+            user = User.query.filter_by(username='ana').first()
+            user.full_name = 'Ana'
+            db.session.commit()
+
+            assert month_version(2025, 3) == before
+
+
+class TestNotesRangeApi:
+    """Pruebas del endpoint de notas por rango"""
+
+    def test_notes_grouped_by_date(self, app):
+        """Las notas del rango se agrupan por fecha con los campos por defecto"""
+        client = app.test_client()
+        login(client, 'admin_test')
+
+        data = client.get('/api/notes?from=2025-03-01&to=2025-03-31').get_json()
+
+        notes = data['notes']['2025-03-03']
+        assert {note['title'] for note in notes} == {'Pública', 'Privada'}
+        assert notes[0]['creator'] == 'admin_test'
+        assert 'content' in notes[0]
+
+    def test_field_selection_and_privacy(self, app):
+        """Se pueden omitir columnas pesadas y se respetan las notas privadas"""
+        client = app.test_client()
+        login(client, 'ana')
+
+        data = client.get('/api/notes?from=2025-03-01&to=2025-03-31&fields=title,priority').get_json()
+
+        assert data['notes'] == {'2025-03-03': [
+            {'id': data['notes']['2025-03-03'][0]['id'], 'title': 'Pública', 'priority': 'high'}
+        ]}
+
+    def test_invalid_parameters(self, app):
+        """Rangos o campos inválidos devuelven 400"""
+        client = app.test_client()
+        login(client, 'admin_test')
+
+        assert client.get('/api/notes?from=2025-03-31&to=2025-03-01').status_code == 400
+        assert client.get('/api/notes?from=2025-03-01').status_code == 400
+        assert client.get('/api/notes?from=2025-03-01&to=2025-03-02&fields=secret').status_code == 400
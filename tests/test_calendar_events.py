@@ -0,0 +1,189 @@
+"""
+Pruebas para el stream de eventos del calendario
+"""
+
+import json
+import threading
+import pytest
+from datetime import date, datetime, timedelta
+from app import create_app, db
+from app.models import User, Photo, CalendarChange, CalendarOrder
+from app.models.user import CalendarNote
+from app.utils.calendar_events import ChangeBroker, changes_since, event_stream, latest_change_id
+from config.settings import TestingConfig
+
+
+class CalendarEventsTestConfig(TestingConfig):
+    """Configuración de pruebas con SQLite en memoria y streams cortos"""
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    CALENDAR_EVENTS_STREAM_SECONDS = 0
+
+
+@pytest.fixture
+def app():
+    """Crear instancia de la app con un admin y un empleado"""
+    app = create_app(CalendarEventsTestConfig)
+
+    with app.app_context():
+        db.create_all()
+
+        admin = User(username='admin_test', email='admin@example.com', is_admin=True,
+                     must_change_password=False)
+        admin.set_password('test_password')
+        ana = User(username='ana', email='ana@example.com', must_change_password=False,
+                   can_view_calendar=True)
+        ana.set_password('test_password')
+        db.session.add_all([admin, ana])
+        db.session.commit()
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+
+
+def login(client, username):
+    client.post('/auth/login', data={'username': username, 'password': 'test_password'})
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if fields.get('event') == 'change':
+            events.append(json.loads(fields['data']))
+    return events
+
+
+class TestChangeLog:
+    """Pruebas del registro de cambios"""
+
+    def test_note_api_records_change(self, app):
+        """Crear una nota por la API deja un cambio con fecha, tipo e id"""
+        client = app.test_client()
+        login(client, 'admin_test')
+
+        response = client.post('/api/notes', json={'date_for': '2025-03-03', 'title': 'Recoger flores'})
+        note_id = response.get_json()['note']['id']
+
+        with app.app_context():
+            change = CalendarChange.query.one()
+            assert change.to_event() == {'change': change.id, 'date': '2025-03-03', 'kind': 'note',
+                                         'id': note_id, 'action': 'created'}
+
+    def test_photo_status_and_order_kinds(self, app):
+        """Fotos y pedidos de WooCommerce se distinguen por tipo"""
+        with app.app_context():
+            admin = User.query.filter_by(username='admin_test').first()
+            photo = Photo(filename='a.jpg', original_filename='a.jpg', file_path='a.jpg',
+                          date_taken=date(2025, 3, 4), uploaded_by='admin_test')
+            order = CalendarNote(date_for=date(2025, 3, 5), title='🌹 Pedido #12 - Ana', created_by=admin.id,
+                                 order=CalendarOrder(wc_order_id=12, customer_name='Ana'))
+            # Una nota normal que menciona un pedido sigue siendo una nota
+            note = CalendarNote(date_for=date(2025, 3, 6), title='Llamar por el Pedido #12', created_by=admin.id)
+            db.session.add_all([photo, order, note])
+            db.session.commit()
+
+            photo.status = 'hecho'
+            db.session.commit()
+
+            kinds = [(c.kind, c.action) for c in CalendarChange.query.order_by(CalendarChange.id)]
+            assert sorted(kinds[:3]) == [('note', 'created'), ('order', 'created'), ('photo', 'created')]
+            assert kinds[3] == ('photo', 'updated')
+
+    def test_rollback_records_nothing(self, app):
+        """Un cambio deshecho no deja rastro en el registro"""
+        with app.app_context():
+            admin = User.query.filter_by(username='admin_test').first()
+            db.session.add(CalendarNote(date_for=date(2025, 3, 3), title='Borrador', created_by=admin.id))
+            db.session.flush()
+            db.session.rollback()
+
+            assert latest_change_id() == 0
+
+    def test_private_notes_only_for_owner(self, app):
+        """Los cambios de notas privadas solo los ve su autor"""
+        with app.app_context():
+            admin = User.query.filter_by(username='admin_test').first()
+            ana = User.query.filter_by(username='ana').first()
+            db.session.add(CalendarNote(date_for=date(2025, 3, 3), title='Privada', is_private=True,
+                                        created_by=admin.id))
+            db.session.commit()
+
+            assert changes_since(0, ana.id, see_all=False) == []
+            assert len(changes_since(0, admin.id, see_all=False)) == 1
+
+
+class TestEventStream:
+    """Pruebas del endpoint SSE"""
+
+    def test_stream_resumes_from_last_event_id(self, app):
+        """El stream envía los cambios posteriores al Last-Event-ID"""
+        with app.app_context():
+            admin = User.query.filter_by(username='admin_test').first()
+            db.session.add(CalendarNote(date_for=date(2025, 3, 3), title='Primera', created_by=admin.id))
+            db.session.commit()
+            first_id = latest_change_id()
+            db.session.add(CalendarNote(date_for=date(2025, 3, 9), title='Segunda', created_by=admin.id))
+            db.session.commit()
+            # Cambios ya asentados: fuera de la ventana que se relee al reconectar
+            CalendarChange.query.update({'created_at': datetime.utcnow() - timedelta(minutes=5)})
+            db.session.commit()
+
+        client = app.test_client()
+        login(client, 'ana')
+        response = client.get('/api/calendar/events', headers={'Last-Event-ID': str(first_id)})
+
+        assert response.mimetype == 'text/event-stream'
+        events = parse_events(response.get_data(as_text=True))
+        assert [event['date'] for event in events] == ['2025-03-09']
+
+    def test_change_committed_with_lower_id_is_sent(self, app):
+        """Un cambio con id menor que otro ya enviado (confirmado después) también se envía"""
+        def add_change(change_id, day):
+            db.session.add(CalendarChange(id=change_id, date_for=day, kind='note', object_id=change_id))
+            db.session.commit()
+
+        with app.app_context():
+            admin = User.query.filter_by(username='admin_test').first()
+            stream = event_stream(admin.id, see_all=True, last_id=0, duration=30, poll_interval=0.01)
+            next(stream)
+
+            add_change(11, date(2025, 3, 11))
+            later = next(stream)
+            add_change(10, date(2025, 3, 10))
+            earlier = next(stream)
+            stream.close()
+
+        assert later.startswith('id: 11\n') and '"change": 11' in later
+        # El Last-Event-ID sigue siendo el mayor id enviado
+        assert earlier.startswith('id: 11\n') and '"change": 10' in earlier
+
+    def test_reconnect_resends_recent_window(self, app):
+        """Al reconectar se reenvían los cambios recientes por si había ids menores pendientes"""
+        with app.app_context():
+            admin = User.query.filter_by(username='admin_test').first()
+            db.session.add(CalendarNote(date_for=date(2025, 3, 3), title='Primera', created_by=admin.id))
+            db.session.commit()
+            first_id = latest_change_id()
+            db.session.add(CalendarNote(date_for=date(2025, 3, 9), title='Segunda', created_by=admin.id))
+            db.session.commit()
+
+        client = app.test_client()
+        login(client, 'ana')
+        response = client.get('/api/calendar/events', headers={'Last-Event-ID': str(first_id)})
+
+        events = parse_events(response.get_data(as_text=True))
+        assert [event['date'] for event in events] == ['2025-03-03', '2025-03-09']
+
+    def test_broker_wakes_waiting_streams(self):
+        """Publicar despierta a los streams que esperan en el mismo proceso"""
+        broker = ChangeBroker()
+        woken = []
+
+        waiter = threading.Thread(target=lambda: woken.append(broker.wait(0, timeout=5)))
+        waiter.start()
+        broker.publish()
+        waiter.join(timeout=5)
+
+        assert woken == [1]
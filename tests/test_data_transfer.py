@@ -0,0 +1,230 @@
+"""
+Pruebas para la exportación/importación de datos por bloques
+"""
+
+import json
+import os
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, text
+from app import create_app, db
+from app.models import User
+from app.models.user import CalendarNote, TimeEntryDailyRollup
+from app.utils import data_transfer
+from config.settings import TestingConfig
+
+NOTES = 1200
+DAYS = 90
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App de origen sobre un fichero SQLite con notas y totales diarios"""
+    config = type('DataTransferTestConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "origen.db"}',
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+    })
+    app = create_app(config)
+
+    with app.app_context():
+        db.create_all()
+
+        admin = User(username='admin_test', email='admin@example.com', is_admin=True, must_change_password=False)
+        admin.set_password('test_password')
+        db.session.add(admin)
+        db.session.commit()
+        db.session.bulk_save_objects([
+            CalendarNote(date_for=date(2025, 5, 1 + index % 28), title=f'Nota {index} — ñ',
+                         content=None if index % 2 else 'Ramo "especial"\nsegunda línea', created_by=admin.id,
+                         created_at=datetime(2025, 4, 1, 9, 30) + timedelta(minutes=index))
+            for index in range(NOTES)
+        ])
+        db.session.bulk_save_objects([
+            TimeEntryDailyRollup(user_id=admin.id, date=date(2025, 1, 1) + timedelta(days=day), year=2025,
+                                 month=(date(2025, 1, 1) + timedelta(days=day)).month, total_hours=7.5 + day / 100)
+            for day in range(DAYS)
+        ])
+        db.session.commit()
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def target(tmp_path):
+    """Base de destino vacía con las tablas de los modelos"""
+    engine = create_engine(f'sqlite:///{tmp_path / "destino.db"}')
+    db.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def export(app, folder, **options):
+    with app.app_context():
+        return data_transfer.export_tables(db.engine, str(folder), **options)
+
+
+def count(engine, table):
+    with engine.connect() as conn:
+        return conn.execute(text(f'SELECT COUNT(*) FROM {table}')).scalar()
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt_after(table_name, chunks):
+    seen = []
+
+    def progress(table, rows):
+        if table == table_name:
+            seen.append(rows)
+            if len(seen) == chunks:
+                raise Interrupted()
+    return progress
+
+
+class TestExport:
+    """Pruebas de la exportación por bloques"""
+
+    def test_tables_are_written_in_ndjson_chunks(self, app, tmp_path):
+        """Cada tabla se escribe en bloques NDJSON comprimidos y el manifiesto registra el progreso"""
+        manifest = export(app, tmp_path / 'export', chunk_rows=500)
+
+        notes = next(table for table in manifest['tables'] if table['name'] == 'calendar_notes')
+        assert manifest['status'] == 'done'
+        assert notes['rows'] == NOTES and notes['chunks'] == 3
+        assert sorted(os.listdir(tmp_path / 'export' / 'calendar_notes')) == \
+            ['000001.ndjson.gz', '000002.ndjson.gz', '000003.ndjson.gz']
+
+        first = next(data_transfer.read_chunk(str(tmp_path / 'export' / 'calendar_notes' / '000001.ndjson.gz')))
+        row = dict(zip(notes['columns'], first))
+        assert row['title'] == 'Nota 0 — ñ' and row['created_at'] == '2025-04-01T09:30:00'
+
+    def test_interrupted_export_resumes(self, app, tmp_path):
+        """Una exportación cortada continúa desde el último bloque, también con clave compuesta de fecha"""
+        folder = tmp_path / 'export'
+        with pytest.raises(Interrupted):
+            export(app, folder, chunk_rows=40, progress=interrupt_after('time_rollup_daily', 1))
+        assert data_transfer.read_manifest(str(folder))['status'] == 'running'
+
+        manifest = export(app, folder, chunk_rows=500)
+
+        rollups = next(table for table in manifest['tables'] if table['name'] == 'time_rollup_daily')
+        assert manifest['chunk_rows'] == 40
+        assert rollups['rows'] == DAYS and rollups['chunks'] == 3
+        assert sum(1 for number in range(1, 4) for _ in data_transfer.read_chunk(
+            str(folder / 'time_rollup_daily' / f'{number:06d}.ndjson.gz'))) == DAYS
+
+        with pytest.raises(data_transfer.TransferError):
+            export(app, folder)
+
+    def test_search_index_is_not_exported(self, app, tmp_path, target):
+        """La tabla virtual FTS5 y sus tablas internas no se exportan y la importación no las exige"""
+        with app.app_context():
+            try:
+                db.session.execute(text('CREATE VIRTUAL TABLE calendar_notes_fts USING fts5(title, body)'))
+                db.session.execute(text('INSERT INTO calendar_notes_fts(rowid, title, body) '
+                                        'SELECT id, title, content FROM calendar_notes'))
+                db.session.commit()
+            except Exception:
+                pytest.skip('SQLite sin FTS5')
+        folder = tmp_path / 'export'
+
+        manifest = export(app, folder)
+        checkpoint = data_transfer.import_tables(target, str(folder))
+
+        names = [table['name'] for table in manifest['tables']]
+        assert not [name for name in names if name.startswith('calendar_notes_fts')]
+        assert 'calendar_notes' in names
+        assert checkpoint['status'] == 'done'
+        assert count(target, 'calendar_notes') == NOTES
+
+
+class TestImport:
+    """Pruebas de la importación por lotes"""
+
+    def test_round_trip(self, app, tmp_path, target):
+        """Los datos llegan completos y con sus tipos (fechas, decimales, texto)"""
+        export(app, tmp_path / 'export', chunk_rows=500)
+
+        checkpoint = data_transfer.import_tables(target, str(tmp_path / 'export'), batch_rows=200)
+
+        assert checkpoint['status'] == 'done'
+        assert count(target, 'calendar_notes') == NOTES and count(target, 'time_rollup_daily') == DAYS
+        with target.connect() as conn:
+            note = conn.execute(text('SELECT title, content, created_at FROM calendar_notes WHERE id = 1')).one()
+            rollup = conn.execute(text("SELECT total_hours FROM time_rollup_daily WHERE date = '2025-01-11'")).one()
+        assert note == ('Nota 0 — ñ', 'Ramo "especial"\nsegunda línea', '2025-04-01 09:30:00.000000')
+        assert rollup[0] == pytest.approx(7.6)
+
+    def test_interrupted_import_resumes_without_duplicates(self, app, tmp_path, target):
+        """Tras un corte se continúa; el bloque confirmado sin punto de control se vuelve a cargar"""
+        folder = tmp_path / 'export'
+        export(app, folder, chunk_rows=500)
+        with pytest.raises(Interrupted):
+            data_transfer.import_tables(target, str(folder), progress=interrupt_after('calendar_notes', 2))
+        assert count(target, 'calendar_notes') == 1000
+
+        # Simular que el segundo bloque se confirmó pero el punto de control no llegó a guardarse
+        checkpoint_path = folder / data_transfer.IMPORT_CHECKPOINT
+        checkpoint = json.loads(checkpoint_path.read_text(encoding='utf-8'))
+        checkpoint['tables']['calendar_notes'].update({'chunks': 1, 'rows': 500})
+        checkpoint_path.write_text(json.dumps(checkpoint), encoding='utf-8')
+
+        data_transfer.import_tables(target, str(folder))
+
+        assert count(target, 'calendar_notes') == NOTES
+
+    def test_crash_before_first_checkpoint_of_table(self, app, tmp_path, target, monkeypatch):
+        """Un corte entre conn.commit() y el punto de control del primer bloque de una tabla no duplica filas"""
+        folder = tmp_path / 'export'
+        export(app, folder, chunk_rows=500)
+        write_json = data_transfer._write_json
+
+        def crash_on_first_notes_chunk(path, data):
+            if data.get('tables', {}).get('calendar_notes', {}).get('chunks') == 1:
+                raise Interrupted()
+            write_json(path, data)
+
+        monkeypatch.setattr(data_transfer, '_write_json', crash_on_first_notes_chunk)
+        with pytest.raises(Interrupted):
+            data_transfer.import_tables(target, str(folder))
+        monkeypatch.setattr(data_transfer, '_write_json', write_json)
+        assert count(target, 'calendar_notes') == 500
+
+        data_transfer.import_tables(target, str(folder))
+
+        assert count(target, 'calendar_notes') == NOTES
+
+    def test_non_empty_target_requires_truncate(self, app, tmp_path, target):
+        """No se importa sobre datos existentes salvo con truncate"""
+        folder = tmp_path / 'export'
+        export(app, folder)
+        data_transfer.import_tables(target, str(folder))
+        os.remove(folder / data_transfer.IMPORT_CHECKPOINT)
+
+        with pytest.raises(data_transfer.TransferError, match='no está vacía'):
+            data_transfer.import_tables(target, str(folder))
+        data_transfer.import_tables(target, str(folder), truncate=True)
+
+        assert count(target, 'calendar_notes') == NOTES and count(target, 'users') == 1
+
+
+class TestCommands:
+    """Pruebas de los comandos flask export-data / import-data"""
+
+    def test_export_and_import_commands(self, app, tmp_path, target):
+        """Se exporta la base de la app y se importa en otra indicada por URL"""
+        runner = app.test_cli_runner()
+        folder = str(tmp_path / 'export')
+
+        exported = runner.invoke(args=['export-data', folder, '--chunk-rows', '300'])
+        imported = runner.invoke(args=['import-data', folder, '--database-url', str(target.url)])
+
+        assert exported.exit_code == 0 and f'({NOTES + DAYS + 1} filas)' in exported.output
+        assert imported.exit_code == 0 and f'Importadas {NOTES + DAYS + 1} filas' in imported.output
+        assert count(target, 'calendar_notes') == NOTES
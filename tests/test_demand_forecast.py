@@ -0,0 +1,128 @@
+"""
+Pruebas para la previsión de demanda de productos
+"""
+
+import pytest
+from datetime import date, timedelta
+from app import create_app, db
+from sqlalchemy import update
+from app.models import User, CalendarOrderItem
+from app.blueprints.calendar.routes import process_woocommerce_order
+from app.utils.demand_forecast import DemandForecastService, florist_holidays
+from config.settings import TestingConfig
+
+
+class ForecastTestConfig(TestingConfig):
+    """Configuración de pruebas con SQLite en memoria"""
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+
+
+_next_id = [1000]
+
+
+def add_order(day, items, status='completed'):
+    _next_id[0] += 1
+    assert process_woocommerce_order({
+        'id': _next_id[0],
+        'status': status,
+        'date_created': f'{day.isoformat()}T09:00:00',
+        'billing': {'first_name': 'Cliente'},
+        'meta_data': [{'key': 'ywcdd_order_delivery_date', 'value': day.isoformat()}],
+        'line_items': [{'name': name, 'quantity': quantity, 'total': '10', 'meta_data': []}
+                       for name, quantity in items],
+    })['success']
+
+
+@pytest.fixture
+def app():
+    """Crear instancia de la app con cuatro semanas de pedidos"""
+    app = create_app(ForecastTestConfig)
+    DemandForecastService.clear_cache()
+
+    with app.app_context():
+        db.create_all()
+
+        admin = User(username='admin_test', email='admin@example.com', is_admin=True,
+                     must_change_password=False)
+        admin.set_password('test_password')
+        db.session.add(admin)
+        db.session.commit()
+
+        # Lunes del 7 al 28 de abril de 2025: 2 ramos; los viernes 1 centro
+        for week in range(4):
+            monday = date(2025, 4, 7) + timedelta(weeks=week)
+            add_order(monday, [('Ramo', 2)])
+            add_order(monday + timedelta(days=4), [('Centro', 1)])
+        add_order(date(2025, 4, 14), [('Ramo', 50)], status='cancelled')
+        # Día de la Madre del año anterior
+        add_order(date(2024, 5, 5), [('Centro', 10), ('Ramo', 4)])
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+
+
+class TestDemandForecastService:
+    """Pruebas para los perfiles semanal y de festivos"""
+
+    def test_mothers_day_is_first_sunday_of_may(self):
+        """El Día de la Madre es el primer domingo de mayo"""
+        holidays = {name: day for day, name in florist_holidays(2025).items()}
+        assert holidays['dia_madre'] == date(2025, 5, 4)
+
+    def test_weekday_profile(self, app):
+        """La previsión del lunes es la media de los lunes del histórico"""
+        with app.app_context():
+            forecast = DemandForecastService.compute(date(2025, 5, 5), 7, history_days=28)
+
+            assert forecast['2025-05-05']['products'] == [{'name': 'Ramo', 'quantity': 2.0}]
+            assert forecast['2025-05-09']['products'] == [{'name': 'Centro', 'quantity': 1.0}]
+            assert '2025-05-06' not in forecast
+
+    def test_holiday_profile(self, app):
+        """Los festivos usan las unidades de ediciones anteriores"""
+        with app.app_context():
+            forecast = DemandForecastService.compute(date(2025, 5, 1), 7, history_days=28)
+
+            mothers_day = forecast['2025-05-04']
+            assert mothers_day['holiday'] == 'dia_madre'
+            assert [p['name'] for p in mothers_day['products']] == ['Centro', 'Ramo']
+            assert mothers_day['badges'][0]['title'] == 'Previsión: Centro x10'
+
+    def test_cached_until_orders_change(self, app):
+        """El resultado se reutiliza hasta que cambia un pedido"""
+        with app.app_context():
+            first = DemandForecastService.forecast(date(2025, 5, 5), 7)
+            assert DemandForecastService.forecast(date(2025, 5, 5), 7) is first
+
+            add_order(date(2025, 4, 30), [('Ramo', 1)])
+            assert DemandForecastService.forecast(date(2025, 5, 5), 7) is not first
+
+    def test_item_change_invalidates_cache(self, app):
+        """Cambiar solo las líneas de un pedido (sin tocar el pedido) invalida la previsión"""
+        with app.app_context():
+            first = DemandForecastService.forecast(date(2025, 5, 5), 7, history_days=28)
+            db.session.execute(update(CalendarOrderItem).where(CalendarOrderItem.product_name == 'Ramo')
+                               .values(quantity=CalendarOrderItem.quantity + 3))
+            db.session.commit()
+
+            second = DemandForecastService.forecast(date(2025, 5, 5), 7, history_days=28)
+            assert second is not first
+            assert second['2025-05-05']['products'] == [{'name': 'Ramo', 'quantity': 5.0}]
+
+
+class TestDemandForecastApi:
+    """Pruebas para el endpoint de previsión"""
+
+    def test_forecast_endpoint(self, app):
+        """El endpoint devuelve la previsión y valida los parámetros"""
+        client = app.test_client()
+        client.post('/auth/login', data={'username': 'admin_test', 'password': 'test_password'})
+
+        data = client.get('/api/forecast?start=2025-05-01&days=7').get_json()
+        bad = client.get('/api/forecast?days=500')
+
+        assert data['days'] == 7
+        assert '2025-05-04' in data['forecast']
+        assert bad.status_code == 400
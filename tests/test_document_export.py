@@ -0,0 +1,206 @@
+"""
+Pruebas para la exportación masiva de documentos en ZIP
+"""
+
+import importlib.util
+import io
+import os
+import zipfile
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy.exc import IntegrityError
+from app import create_app, db
+from app.models import User, UserDocument
+from app.utils.zip_stream import stream_zip
+from config.settings import TestingConfig
+
+
+class DocumentExportTestConfig(TestingConfig):
+    """Configuración de pruebas con SQLite en memoria"""
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+
+
+@pytest.fixture
+def app():
+    """Crear instancia de la app para pruebas"""
+    app = create_app(DocumentExportTestConfig)
+
+    with app.app_context():
+        db.create_all()
+
+        admin = User(username='admin_test', email='admin@example.com', is_admin=True,
+                     must_change_password=False)
+        admin.set_password('test_password')
+        employee = User(username='empleado', email='empleado@example.com', is_admin=False,
+                        must_change_password=False)
+        employee.set_password('test_password')
+        db.session.add_all([admin, employee])
+        db.session.commit()
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de prueba"""
+    return app.test_client()
+
+
+def login(client, username):
+    return client.post('/auth/login', data={'username': username, 'password': 'test_password'})
+
+
+def run_migration(direction):
+    """Ejecuta upgrade() o downgrade() de la migración de uploaded_at sobre la base de la app"""
+    path = os.path.join(os.path.dirname(__file__), '..', 'migrations', 'versions',
+                        'e7b3c5a92d18_user_documents_uploaded_at_not_null.py')
+    spec = importlib.util.spec_from_file_location('uploaded_at_migration', path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    with db.engine.begin() as conn, Operations.context(MigrationContext.configure(conn)):
+        getattr(migration, direction)()
+
+
+def add_document(user, path, document_type='nomina'):
+    document = UserDocument(
+        user_id=user.id,
+        filename=path.name,
+        original_filename=path.name,
+        file_path=str(path),
+        file_type=path.suffix[1:],
+        document_type=document_type,
+        uploaded_by=user.username
+    )
+    db.session.add(document)
+    db.session.commit()
+    return document
+
+
+class TestStreamZip:
+    """Pruebas para el generador de ZIP en streaming"""
+
+    def test_stream_zip_round_trip(self, tmp_path):
+        """El ZIP generado por trozos contiene los archivos originales"""
+        first = tmp_path / 'a.txt'
+        first.write_bytes(b'hola' * 50000)
+        second = tmp_path / 'b.pdf'
+        second.write_bytes(b'%PDF-1.4 contenido')
+
+        chunks = list(stream_zip([('u1/a.txt', str(first)), ('u2/b.pdf', str(second))], chunk_size=1024))
+
+        assert len(chunks) > 2
+        with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as zf:
+            assert zf.read('u1/a.txt') == b'hola' * 50000
+            assert zf.read('u2/b.pdf') == b'%PDF-1.4 contenido'
+
+    def test_missing_files_are_listed(self, tmp_path):
+        """Los archivos inexistentes se omiten y se listan en el manifiesto"""
+        data = b''.join(stream_zip([('u1/no_existe.pdf', str(tmp_path / 'no_existe.pdf'))]))
+
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            assert zf.namelist() == ['ARCHIVOS_NO_ENCONTRADOS.txt']
+            assert b'u1/no_existe.pdf' in zf.read('ARCHIVOS_NO_ENCONTRADOS.txt')
+
+
+class TestAdminExportDocuments:
+    """Pruebas para la ruta de exportación de documentos"""
+
+    def test_export_respects_filters(self, app, client, tmp_path):
+        """Solo se incluyen los documentos que cumplen los filtros"""
+        with app.app_context():
+            employee = User.query.filter_by(username='empleado').first()
+            nomina = tmp_path / 'nomina.pdf'
+            nomina.write_bytes(b'nomina')
+            contrato = tmp_path / 'contrato.pdf'
+            contrato.write_bytes(b'contrato')
+            add_document(employee, nomina, 'nomina')
+            add_document(employee, contrato, 'contrato')
+
+        login(client, 'admin_test')
+        response = client.get('/admin/admin_export_documents?document_type=nomina')
+
+        assert response.status_code == 200
+        assert response.mimetype == 'application/zip'
+        with zipfile.ZipFile(io.BytesIO(response.get_data())) as zf:
+            assert zf.namelist() == ['empleado/nomina.pdf']
+
+    def test_export_requires_admin(self, client):
+        """Los usuarios sin permisos de admin no pueden exportar"""
+        login(client, 'empleado')
+        response = client.get('/admin/admin_export_documents')
+
+        assert response.status_code == 302
+        assert '/documents/my_documents' in response.headers['Location']
+
+
+class TestAdminDocumentsListing:
+    """Pruebas para el listado paginado de documentos"""
+
+    def test_cursor_pagination_json(self, app, client, tmp_path):
+        """El listado JSON se recorre con cursores sin repetir documentos"""
+        app.config['LIST_PAGE_SIZE'] = 2
+        with app.app_context():
+            employee = User.query.filter_by(username='empleado').first()
+            for index in range(5):
+                path = tmp_path / f'doc{index}.pdf'
+                path.write_bytes(b'x')
+                add_document(employee, path)
+
+        login(client, 'admin_test')
+        seen = []
+        cursor = ''
+        while True:
+            data = client.get(f'/admin/admin_documents?format=json&after={cursor}').get_json()
+            seen.extend(item['filename'] for item in data['items'])
+            if not data['next_cursor']:
+                break
+            cursor = data['next_cursor']
+
+        assert seen == [f'doc{index}.pdf' for index in reversed(range(5))]
+
+    def test_counts_cover_whole_filter(self, app, client, tmp_path):
+        """Las estadísticas cuentan todos los documentos, no solo la página"""
+        app.config['LIST_PAGE_SIZE'] = 1
+        with app.app_context():
+            employee = User.query.filter_by(username='empleado').first()
+            for index in range(3):
+                path = tmp_path / f'nomina{index}.pdf'
+                path.write_bytes(b'x')
+                add_document(employee, path)
+
+        login(client, 'admin_test')
+        response = client.get('/admin/admin_documents')
+
+        assert b'3 documento(s)' in response.data
+        assert b'Siguiente' in response.data
+
+    def test_legacy_documents_without_date_are_listed_last(self, app, client, tmp_path):
+        """La migración rellena uploaded_at de los documentos antiguos y el cursor los alcanza"""
+        app.config['LIST_PAGE_SIZE'] = 1
+        with app.app_context():
+            employee = User.query.filter_by(username='empleado').first()
+            run_migration('downgrade')
+            db.session.execute(db.text(
+                "INSERT INTO user_documents (user_id, filename, original_filename, file_path, file_type, "
+                "document_type, uploaded_by) VALUES (:user, 'antiguo.pdf', 'antiguo.pdf', 'antiguo.pdf', "
+                "'pdf', 'nomina', 'empleado')"), {'user': employee.id})
+            db.session.commit()
+            path = tmp_path / 'nuevo.pdf'
+            path.write_bytes(b'x')
+            add_document(employee, path)
+
+            run_migration('upgrade')
+            with pytest.raises(IntegrityError):
+                db.session.execute(db.text("UPDATE user_documents SET uploaded_at = NULL"))
+            db.session.rollback()
+
+        login(client, 'admin_test')
+        first = client.get('/admin/admin_documents?format=json').get_json()
+        second = client.get(f"/admin/admin_documents?format=json&after={first['next_cursor']}").get_json()
+
+        assert [item['filename'] for item in first['items'] + second['items']] == ['nuevo.pdf', 'antiguo.pdf']
+        assert second['items'][0]['uploaded_at'].startswith('1970-01-01')
@@ -0,0 +1,181 @@
+"""
+Pruebas para el endpoint de métricas Prometheus
+"""
+
+import json
+import os
+import re
+import time
+import pytest
+from app import create_app, db
+from app.models import User
+from app.utils import metrics
+from config.settings import TestingConfig
+
+
+class MetricsTestConfig(TestingConfig):
+    """Configuración de pruebas con SQLite en memoria"""
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+
+
+@pytest.fixture
+def app():
+    """Crear instancia de la app con un administrador"""
+    app = create_app(MetricsTestConfig)
+
+    with app.app_context():
+        db.create_all()
+
+        admin = User(username='admin_test', email='admin@example.com', is_admin=True,
+                     must_change_password=False)
+        admin.set_password('test_password')
+        db.session.add(admin)
+        db.session.commit()
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+
+
+def sample(text, name, **labels):
+    """Valor de una serie en el texto de exposición (0 si no aparece)"""
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    pattern = re.escape(name + ('{' + label_text + '}' if labels else '')) + r' ([0-9.e+-]+)$'
+    match = re.search(pattern, text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+class TestMetricsEndpoint:
+    """Pruebas del endpoint /metrics"""
+
+    def test_request_counters_and_histogram(self, app):
+        """Las peticiones se cuentan por endpoint y estado con su histograma de latencia"""
+        client = app.test_client()
+        before = sample(client.get('/metrics').get_data(as_text=True),
+                        'http_requests_total', endpoint='auth.login', method='GET', status='200')
+
+        client.get('/auth/login')
+        response = client.get('/metrics')
+        text = response.get_data(as_text=True)
+
+        assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+        assert sample(text, 'http_requests_total', endpoint='auth.login', method='GET', status='200') == before + 1
+        assert '# TYPE http_request_duration_seconds histogram' in text
+        assert 'http_request_duration_seconds_bucket{endpoint="auth.login",method="GET",le="+Inf"}' in text
+        assert 'endpoint="metrics"' not in text
+
+    def test_webhook_outcomes(self, app):
+        """Los webhooks de WooCommerce se cuentan por resultado"""
+        client = app.test_client()
+        text = client.get('/metrics').get_data(as_text=True)
+        invalid = sample(text, 'woocommerce_webhooks_total', outcome='invalid')
+        processed = sample(text, 'woocommerce_webhooks_total', outcome='processed')
+
+        client.post('/webhook/woocommerce', json={'id': 7})
+        client.post('/webhook/woocommerce', json={'id': 7, 'status': 'processing',
+                                                  'billing': {'first_name': 'Ana'}})
+        text = client.get('/metrics').get_data(as_text=True)
+
+        assert sample(text, 'woocommerce_webhooks_total', outcome='invalid') == invalid + 1
+        assert sample(text, 'woocommerce_webhooks_total', outcome='processed') == processed + 1
+
+    def test_remote_access_requires_token(self, app):
+        """Sin token solo se permite el acceso local; con token se exige en la cabecera"""
+        client = app.test_client()
+
+        assert client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.5'}).status_code == 403
+
+        app.config['METRICS_TOKEN'] = 'secreto'
+        assert client.get('/metrics').status_code == 403
+        assert client.get('/metrics', headers={'Authorization': 'Bearer secreto'}).status_code == 200
+
+
+def write_worker(folder, pid, snapshot, process=None):
+    (folder / f'metrics_{pid}.json').write_text(json.dumps({'process': process or f'{pid}-test', 'metrics': snapshot}))
+
+
+def webhook_errors(count):
+    return {'woocommerce_webhooks_total': {'kind': 'counter', 'values': [[['error'], count]]},
+            'upload_processing_in_progress': {'kind': 'gauge', 'values': [[[], 7]]}}
+
+
+class TestMultiprocessAggregation:
+    """Pruebas de la suma entre workers"""
+
+    def test_files_from_other_workers_are_merged(self, app, tmp_path):
+        """Contadores de todos los procesos; gauges solo de los vivos"""
+        app.config['METRICS_DIR'] = str(tmp_path)
+        other_worker = {
+            'woocommerce_webhooks_total': {'kind': 'counter', 'values': [[['error'], 1000]]},
+            'upload_processing_in_progress': {'kind': 'gauge', 'values': [[[], 5]]},
+        }
+        dead_worker = {
+            'woocommerce_webhooks_total': {'kind': 'counter', 'values': [[['error'], 200]]},
+            'upload_processing_in_progress': {'kind': 'gauge', 'values': [[[], 50]]},
+        }
+        write_worker(tmp_path, os.getppid(), other_worker)
+        write_worker(tmp_path, 999999999, dead_worker)
+
+        with app.test_request_context():
+            local = metrics.woocommerce_webhooks.values.get(('error',), 0)
+            uploads = metrics.uploads_in_progress.values.get((), 0)
+            text = metrics.render_latest()
+
+        assert sample(text, 'woocommerce_webhooks_total', outcome='error') == local + 1200
+        assert sample(text, 'upload_processing_in_progress') == uploads + 5
+        assert (tmp_path / f'metrics_{os.getpid()}.json').exists()
+
+    def test_idle_worker_flushes_its_last_changes(self, app, tmp_path, monkeypatch):
+        """Un cambio dentro del intervalo se vuelca después aunque el worker no reciba más peticiones"""
+        monkeypatch.setattr(metrics, 'FLUSH_INTERVAL', 0.2)
+        app.config['METRICS_DIR'] = str(tmp_path)
+        path = tmp_path / f'metrics_{os.getpid()}.json'
+
+        def flushed_value():
+            data = json.loads(path.read_text())['metrics']['woocommerce_webhooks_total']['values']
+            return dict((tuple(key), value) for key, value in data).get(('idle',), 0)
+
+        with app.app_context():
+            metrics.flush(force=True)
+            metrics.woocommerce_webhooks.inc(outcome='idle')
+            assert flushed_value() == 0
+
+            time.sleep(0.6)
+            assert flushed_value() == 1
+
+    def test_dead_worker_is_archived(self, app, tmp_path):
+        """child_exit suma el worker al archivo y borra su fichero; un pid reutilizado empieza de cero"""
+        app.config['METRICS_DIR'] = str(tmp_path)
+        write_worker(tmp_path, 999999999, webhook_errors(200), process='primero')
+
+        with app.test_request_context():
+            before = sample(metrics.render_latest(), 'woocommerce_webhooks_total', outcome='error')
+
+            assert metrics.archive_worker(999999999)
+            assert not (tmp_path / 'metrics_999999999.json').exists()
+            assert sample(metrics.render_latest(), 'woocommerce_webhooks_total', outcome='error') == before
+
+            # Un worker nuevo con el mismo pid no sustituye al archivado
+            write_worker(tmp_path, 999999999, webhook_errors(3), process='segundo')
+            after_reuse = sample(metrics.render_latest(), 'woocommerce_webhooks_total', outcome='error')
+            metrics.archive_worker(999999999)
+            archived = json.loads((tmp_path / metrics.ARCHIVE_FILE).read_text())
+
+        assert after_reuse == before + 3
+        assert archived['processes'] == ['primero', 'segundo']
+        assert archived['metrics']['woocommerce_webhooks_total']['values'] == [[['error'], 203]]
+        assert 'upload_processing_in_progress' not in archived['metrics']
+
+    def test_archived_file_still_on_disk_is_not_counted_twice(self, app, tmp_path):
+        """Si /metrics lee el fichero del worker justo antes de que se borre, no se suma dos veces"""
+        app.config['METRICS_DIR'] = str(tmp_path)
+        write_worker(tmp_path, 999999999, webhook_errors(200), process='terminado')
+        (tmp_path / metrics.ARCHIVE_FILE).write_text(json.dumps({
+            'processes': ['terminado'], 'metrics': webhook_errors(200)}))
+
+        with app.test_request_context():
+            local = metrics.woocommerce_webhooks.values.get(('error',), 0)
+            text = metrics.render_latest()
+
+        assert sample(text, 'woocommerce_webhooks_total', outcome='error') == local + 200
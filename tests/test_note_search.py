@@ -0,0 +1,204 @@
+"""
+Pruebas para la búsqueda de texto completo en notas y pedidos
+"""
+
+import importlib.util
+import os
+import pytest
+from datetime import date
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from app import create_app, db
+from app.models import User
+from app.models.user import CalendarNote
+from app.utils import note_search
+from app.utils.note_search import NoteSearchService
+from config.settings import TestingConfig
+
+
+class NoteSearchTestConfig(TestingConfig):
+    """Configuración de pruebas con SQLite en memoria"""
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+
+
+@pytest.fixture
+def app():
+    """Crear instancia de la app con pedidos y notas"""
+    app = create_app(NoteSearchTestConfig)
+
+    with app.app_context():
+        db.create_all()
+
+        admin = User(username='admin_test', email='admin@example.com', is_admin=True,
+                     must_change_password=False)
+        admin.set_password('test_password')
+        ana = User(username='ana', email='ana@example.com', must_change_password=False,
+                   can_view_calendar=True)
+        ana.set_password('test_password')
+        db.session.add_all([admin, ana])
+        db.session.commit()
+
+        db.session.add_all([
+            CalendarNote(date_for=date(2025, 2, 14), title='🌹 Pedido #101 - Lucía Gómez',
+                         content='Teléfono: 600123456\nDestinatario: Marta\nDedicatoria: Feliz San Valentín',
+                         created_by=admin.id),
+            CalendarNote(date_for=date(2025, 3, 8), title='🌹 Pedido #102 - Pedro Ruiz',
+                         content='Destinatario: Lucía\nDedicatoria: Para la mejor madre',
+                         created_by=admin.id),
+            CalendarNote(date_for=date(2025, 3, 9), title='Nota privada', content='Llamar a Lucía',
+                         is_private=True, created_by=admin.id),
+        ])
+        db.session.commit()
+        # Las tablas salen de create_all: el índice lo crea la migración
+        run_migration('upgrade')
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+
+
+def run_migration(direction):
+    """Ejecuta upgrade() o downgrade() de la migración del índice sobre la base de la app"""
+    path = os.path.join(os.path.dirname(__file__), '..', 'migrations', 'versions', 'c2f7a9d14e60_add_note_search_index.py')
+    spec = importlib.util.spec_from_file_location('note_search_migration', path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    with db.engine.begin() as conn, Operations.context(MigrationContext.configure(conn)):
+        getattr(migration, direction)()
+
+
+def fts_table_exists():
+    return db.session.execute(db.text(
+        "SELECT 1 FROM sqlite_master WHERE name = 'calendar_notes_fts'")).first() is not None
+
+
+def login(client, username):
+    client.post('/auth/login', data={'username': username, 'password': 'test_password'})
+
+
+class TestNoteSearchService:
+    """Pruebas del servicio de búsqueda"""
+
+    def test_uses_fts5_on_sqlite(self, app):
+        """En SQLite se usa el índice FTS5"""
+        with app.app_context():
+            assert NoteSearchService.index_mode() == 'fts5'
+
+    def test_search_ignores_accents_and_ranks(self, app):
+        """Se encuentra por nombre sin tildes y el título pesa más que el contenido"""
+        with app.app_context():
+            admin = User.query.filter_by(username='admin_test').first()
+            results = NoteSearchService.search('lucia', admin)
+
+            assert [r['title'] for r in results][0] == '🌹 Pedido #101 - Lucía Gómez'
+            assert len(results) == 3
+
+    def test_phone_prefix_and_date_filter(self, app):
+        """Los teléfonos se buscan por prefijo y se respetan las fechas"""
+        with app.app_context():
+            admin = User.query.filter_by(username='admin_test').first()
+
+            assert [r['title'] for r in NoteSearchService.search('600123', admin)] == ['🌹 Pedido #101 - Lucía Gómez']
+            assert NoteSearchService.search('lucía', admin, start_date=date(2025, 3, 1),
+                                            end_date=date(2025, 3, 8))[0]['title'] == '🌹 Pedido #102 - Pedro Ruiz'
+
+    def test_index_follows_updates_and_deletes(self, app):
+        """El índice se mantiene al editar y borrar notas"""
+        with app.app_context():
+            admin = User.query.filter_by(username='admin_test').first()
+
+            note = CalendarNote.query.filter_by(title='🌹 Pedido #102 - Pedro Ruiz').first()
+            note.content = 'Dedicatoria: Enhorabuena'
+            db.session.commit()
+            assert [r['id'] for r in NoteSearchService.search('enhorabuena', admin)] == [note.id]
+            assert NoteSearchService.search('madre', admin) == []
+
+            db.session.delete(note)
+            db.session.commit()
+            assert NoteSearchService.search('enhorabuena', admin) == []
+
+    def test_search_syntax_is_neutralized(self, app):
+        """Los operadores de FTS en la búsqueda no provocan errores"""
+        with app.app_context():
+            admin = User.query.filter_by(username='admin_test').first()
+            assert len(NoteSearchService.search('pedido" (*', admin)) == 2
+
+
+class TestIndexMigration:
+    """Pruebas de la creación del índice fuera de las peticiones"""
+
+    def test_search_does_not_create_index(self, app):
+        """Sin índice la búsqueda usa LIKE y no ejecuta DDL"""
+        with app.app_context():
+            run_migration('downgrade')
+            note_search._index_modes.clear()
+            admin = User.query.filter_by(username='admin_test').first()
+
+            assert [r['title'] for r in NoteSearchService.search('Pedro', admin)] == ['🌹 Pedido #102 - Pedro Ruiz']
+            assert NoteSearchService.index_mode() == 'like'
+            assert not fts_table_exists()
+
+    def test_migration_creates_and_fills_index(self, app):
+        """La migración crea la tabla FTS5 con las notas existentes y sus triggers"""
+        with app.app_context():
+            run_migration('downgrade')
+            run_migration('upgrade')
+            note_search._index_modes.clear()
+            admin = User.query.filter_by(username='admin_test').first()
+
+            assert NoteSearchService.index_mode() == 'fts5'
+            assert [r['title'] for r in NoteSearchService.search('valentin', admin)] == ['🌹 Pedido #101 - Lucía Gómez']
+            db.session.add(CalendarNote(date_for=date(2025, 4, 1), title='Boda en Girona', created_by=admin.id))
+            db.session.commit()
+            assert len(NoteSearchService.search('girona', admin)) == 1
+
+
+    def test_command_only_rebuilds(self, app):
+        """flask search-index vuelve a llenar el índice existente y no lo crea si falta"""
+        runner = app.test_cli_runner()
+        with app.app_context():
+            db.session.execute(db.text('DELETE FROM calendar_notes_fts'))
+            db.session.commit()
+
+            rebuilt = runner.invoke(args=['search-index'])
+            admin = User.query.filter_by(username='admin_test').first()
+            assert 'modo: fts5' in rebuilt.output
+            assert len(NoteSearchService.search('lucia', admin)) == 3
+
+            run_migration('downgrade')
+            missing = runner.invoke(args=['search-index'])
+            assert 'flask db upgrade' in missing.output
+            assert not fts_table_exists()
+
+
+class TestSearchRoutes:
+    """Pruebas de la página y la API de búsqueda"""
+
+    def test_privacy_rules(self, app):
+        """Las notas privadas ajenas no aparecen en la búsqueda"""
+        client = app.test_client()
+        login(client, 'ana')
+
+        data = client.get('/api/search/notes?q=lucia').get_json()
+
+        assert 'Nota privada' not in [r['title'] for r in data['results']]
+        assert len(data['results']) == 2
+
+    def test_search_page(self, app):
+        """La página de búsqueda muestra los resultados con su fragmento"""
+        client = app.test_client()
+        login(client, 'admin_test')
+
+        response = client.get('/search?q=valentin')
+
+        assert response.status_code == 200
+        assert 'Pedido #101'.encode() in response.data
+        assert 'San Valentín'.encode() in response.data
+
+    def test_missing_query(self, app):
+        """La API exige el parámetro q"""
+        client = app.test_client()
+        login(client, 'admin_test')
+
+        assert client.get('/api/search/notes').status_code == 400
@@ -0,0 +1,126 @@
+"""
+Pruebas para el enrutado de lecturas a la réplica (dos ficheros SQLite)
+"""
+
+from datetime import date
+import shutil
+import pytest
+from app import create_app, db
+from app.models import User, MaintenanceMode
+from app.models.user import CalendarNote
+from app.utils import db_routing
+from config.settings import TestingConfig
+
+NOTE_DAY = date(2025, 3, 14)
+NOTES_URL = '/api/notes?from=2025-03-01&to=2025-03-31'
+
+
+def add_user():
+    user = User(username='admin_test', email='admin@example.com', is_admin=True, can_manage_notes=True,
+                must_change_password=False)
+    user.set_password('test_password')
+    db.session.add(user)
+    db.session.commit()
+
+
+def add_note(title):
+    db.session.add(CalendarNote(date_for=NOTE_DAY, title=title, created_by=1))
+    db.session.commit()
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App con una base principal y una réplica en ficheros distintos"""
+    config = type('ReplicaTestConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "principal.db"}',
+        'SQLALCHEMY_REPLICA_URI': f'sqlite:///{tmp_path / "replica.db"}',
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'REPLICA_READ_YOUR_WRITES_SECONDS': 60,
+    })
+    app = create_app(config)
+
+    with app.app_context():
+        db.create_all()
+        add_user()
+        MaintenanceMode.get_current()
+
+        # La réplica parte de una copia de la principal y luego va "por detrás"
+        db.session.remove()
+        db.engine.dispose()
+        shutil.copy(tmp_path / 'principal.db', tmp_path / 'replica.db')
+        replica = db.engines[db_routing.REPLICA_BIND]
+
+        add_note('Nota en la principal')
+        with replica.begin() as conn:
+            conn.execute(CalendarNote.__table__.insert().values(
+                date_for=NOTE_DAY, title='Nota en la réplica', created_by=1))
+
+        yield app
+
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'admin_test', 'password': 'test_password'})
+    # El inicio de sesión puede escribir: empezar sin plazo de lectura de lo propio
+    with client.session_transaction() as sess:
+        sess.pop(db_routing.PRIMARY_UNTIL_KEY, None)
+    return client
+
+
+def note_titles(response):
+    return sorted(note['title'] for notes in response.get_json()['notes'].values() for note in notes)
+
+
+class TestReadReplica:
+    """Pruebas para la sesión que enruta lecturas y escrituras"""
+
+    def test_read_endpoint_uses_replica(self, client):
+        """Un endpoint de solo lectura consulta la réplica"""
+        response = client.get(NOTES_URL)
+
+        assert response.status_code == 200
+        assert note_titles(response) == ['Nota en la réplica']
+
+    def test_writes_go_to_primary(self, app, client):
+        """Las escrituras van siempre a la base principal"""
+        response = client.post('/api/notes', json={'date_for': '2025-03-14', 'title': 'Nueva'})
+        assert response.status_code in (200, 201)
+
+        with app.app_context():
+            assert CalendarNote.query.filter_by(title='Nueva').count() == 1
+            with db.engines[db_routing.REPLICA_BIND].connect() as conn:
+                titles = conn.execute(db.text('SELECT title FROM calendar_notes')).scalars().all()
+        assert titles == ['Nota en la réplica']
+
+    def test_user_reads_own_writes_from_primary(self, client):
+        """Tras escribir, el usuario lee de la principal hasta que vence el plazo"""
+        client.post('/api/notes', json={'date_for': '2025-03-14', 'title': 'Nueva'})
+
+        assert note_titles(client.get(NOTES_URL)) == ['Nota en la principal', 'Nueva']
+
+        with client.session_transaction() as sess:
+            sess[db_routing.PRIMARY_UNTIL_KEY] = 0
+        assert note_titles(client.get(NOTES_URL)) == ['Nota en la réplica']
+
+    def test_other_users_keep_reading_replica(self, app, client):
+        """El plazo de lectura de lo propio es por usuario (sesión)"""
+        client.post('/api/notes', json={'date_for': '2025-03-14', 'title': 'Nueva'})
+
+        other = app.test_client()
+        other.post('/auth/login', data={'username': 'admin_test', 'password': 'test_password'})
+        with other.session_transaction() as sess:
+            sess.pop(db_routing.PRIMARY_UNTIL_KEY, None)
+
+        assert note_titles(other.get(NOTES_URL)) == ['Nota en la réplica']
+
+    def test_without_replica_everything_uses_primary(self):
+        """Sin réplica configurada no se registra el bind ni se cambia el enrutado"""
+        app = create_app(type('NoReplicaConfig', (TestingConfig,), {'SQLALCHEMY_ENGINE_OPTIONS': {}}))
+
+        with app.app_context():
+            assert db_routing.REPLICA_BIND not in db.engines
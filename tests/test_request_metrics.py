@@ -0,0 +1,116 @@
+"""
+Pruebas para las métricas de rendimiento por petición
+"""
+
+import re
+import pytest
+from app import create_app, db
+from app.models import User
+from app.utils import request_metrics
+from app.utils.request_metrics import RequestStats
+from config.settings import TestingConfig
+
+
+class RequestMetricsTestConfig(TestingConfig):
+    """Configuración de pruebas con SQLite en memoria"""
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SERVER_TIMING_HEADER = True
+
+
+@pytest.fixture
+def app():
+    """Crear instancia de la app con un super administrador"""
+    app = create_app(RequestMetricsTestConfig)
+    request_metrics.stats.reset()
+
+    with app.app_context():
+        db.create_all()
+
+        root = User(username='root_test', email='root@example.com', is_admin=True, is_super_admin=True,
+                    must_change_password=False)
+        root.set_password('test_password')
+        db.session.add(root)
+        db.session.commit()
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+
+
+def login(client):
+    client.post('/auth/login', data={'username': 'root_test', 'password': 'test_password'})
+
+
+class TestRequestStats:
+    """Pruebas para la tabla en memoria"""
+
+    def test_snapshot_keeps_rolling_window(self):
+        """Solo se conservan las últimas peticiones, pero se cuentan todas"""
+        stats = RequestStats(window=3)
+        for wall in (100, 1, 2, 3):
+            stats.record('calendar.index', wall, 4, 1.0, 0.5)
+
+        row = stats.snapshot()[0]
+
+        assert row['requests'] == 4
+        assert row['window'] == 3
+        assert row['max_ms'] == 3
+        assert row['avg_queries'] == 4
+
+
+class TestRequestInstrumentation:
+    """Pruebas del middleware"""
+
+    def test_server_timing_header(self, app):
+        """Cada respuesta lleva el tiempo total, de SQL y de plantillas"""
+        client = app.test_client()
+        login(client)
+
+        response = client.get('/api/calendar/2025/3')
+        timing = response.headers['Server-Timing']
+
+        assert re.match(r'app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+', timing)
+        assert int(re.search(r'"(\d+) queries"', timing).group(1)) > 0
+
+    def test_server_timing_only_for_admins(self, app):
+        """Sin sesión de administrador no se envían tiempos; por defecto la cabecera está desactivada"""
+        client = app.test_client()
+        assert 'Server-Timing' not in client.get('/auth/login').headers
+
+        with app.app_context():
+            user = User(username='ana', email='ana@example.com', must_change_password=False)
+            user.set_password('test_password')
+            db.session.add(user)
+            db.session.commit()
+        client.post('/auth/login', data={'username': 'ana', 'password': 'test_password'})
+        assert 'Server-Timing' not in client.get('/').headers
+
+        assert TestingConfig.SERVER_TIMING_HEADER is False
+
+    def test_stats_by_endpoint(self, app):
+        """Las peticiones se agregan por endpoint con consultas y tiempo de plantillas"""
+        client = app.test_client()
+        login(client)
+
+        client.get('/')
+        client.get('/')
+        rows = {row['endpoint']: row for row in request_metrics.stats.snapshot()}
+
+        assert rows['calendar.index']['requests'] == 2
+        assert rows['calendar.index']['avg_queries'] > 0
+        assert rows['calendar.index']['avg_template_ms'] > 0
+
+    def test_super_admin_panel_shows_stats(self, app):
+        """El panel de super administrador muestra la tabla y se puede reiniciar"""
+        client = app.test_client()
+        login(client)
+        client.get('/api/calendar/2025/3')
+
+        page = client.get('/admin/super_admin_panel')
+        assert page.status_code == 200
+        assert b'calendar.api_calendar_month' in page.data
+
+        client.post('/admin/request_stats/reset')
+        endpoints = [row['endpoint'] for row in client.get('/admin/request_stats').get_json()['endpoints']]
+        assert endpoints == ['admin.reset_request_stats']
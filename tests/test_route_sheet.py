@@ -0,0 +1,138 @@
+"""
+Pruebas para la hoja de ruta de entregas
+"""
+
+import pytest
+from datetime import date
+from app import create_app, db
+from app.models import User
+from app.blueprints.calendar.routes import process_woocommerce_order
+from app.utils.route_sheet import RouteSheetService
+from config.settings import TestingConfig
+
+
+class RouteSheetTestConfig(TestingConfig):
+    """Configuración de pruebas con SQLite en memoria"""
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+
+
+def order_payload(order_id, postcode, city, recipient, status='processing', delivery='2025-05-04'):
+    return {
+        'id': order_id,
+        'status': status,
+        'date_created': '2025-05-01T10:00:00',
+        'total': '30.00',
+        'billing': {'first_name': 'Cliente', 'last_name': str(order_id), 'phone': '600000000'},
+        'shipping': {'first_name': recipient, 'address_1': f'Calle {order_id}', 'city': city,
+                     'postcode': postcode},
+        'meta_data': [{'key': 'ywcdd_order_delivery_date', 'value': delivery}],
+        'line_items': [{'name': 'Ramo', 'quantity': 1, 'total': '30.00', 'meta_data': []},
+                       {'name': 'Jarrón', 'quantity': 2, 'total': '0', 'meta_data': []}],
+    }
+
+
+@pytest.fixture
+def app():
+    """Crear instancia de la app con pedidos de varias zonas"""
+    app = create_app(RouteSheetTestConfig)
+    RouteSheetService.clear_cache()
+
+    with app.app_context():
+        db.create_all()
+
+        admin = User(username='admin_test', email='admin@example.com', is_admin=True,
+                     must_change_password=False)
+        admin.set_password('test_password')
+        db.session.add(admin)
+        db.session.commit()
+
+        for payload in (
+            order_payload(3, '17002', 'Girona', 'Clara'),
+            order_payload(1, '17001', 'Girona', 'Ana'),
+            order_payload(2, '17001', 'Girona', 'Berta'),
+            order_payload(4, '17001', 'Girona', 'Dora', status='cancelled'),
+            order_payload(5, '08001', 'Barcelona', 'Eva', delivery='2025-05-05'),
+        ):
+            assert process_woocommerce_order(payload)['success']
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+
+
+class TestRouteSheetService:
+    """Pruebas para el cálculo de la hoja"""
+
+    def test_grouped_by_postcode_and_city(self, app):
+        """Entregas del día agrupadas y ordenadas, sin pedidos cancelados"""
+        with app.app_context():
+            sheet = RouteSheetService.route_sheet(date(2025, 5, 4))
+
+            assert sheet['total_deliveries'] == 3
+            assert [(g['postcode'], [d['recipient'] for d in g['deliveries']]) for g in sheet['groups']] == [
+                ('17001', ['Ana', 'Berta']), ('17002', ['Clara'])
+            ]
+            assert [p['name'] for p in sheet['groups'][0]['deliveries'][0]['products']] == ['Ramo', 'Jarrón']
+
+    def test_order_without_delivery_date_uses_note_date(self, app):
+        """Un pedido sin fecha de entrega se reparte el día de su nota en el calendario"""
+        with app.app_context():
+            payload = order_payload(6, '17003', 'Salt', 'Fina')
+            payload['meta_data'] = []
+            assert process_woocommerce_order(payload)['success']
+
+            sheet = RouteSheetService.route_sheet(date(2025, 5, 1))
+
+            assert [d['recipient'] for g in sheet['groups'] for d in g['deliveries']] == ['Fina']
+
+    def test_cached_until_order_changes(self, app):
+        """La hoja se reutiliza hasta que cambia un pedido del mes"""
+        with app.app_context():
+            first = RouteSheetService.route_sheet(date(2025, 5, 4))
+            assert RouteSheetService.route_sheet(date(2025, 5, 4)) is first
+
+            process_woocommerce_order(order_payload(6, '17003', 'Salt', 'Fina'))
+            updated = RouteSheetService.route_sheet(date(2025, 5, 4))
+
+            assert updated is not first
+            assert updated['total_deliveries'] == 4
+
+
+class TestRouteSheetRoute:
+    """Pruebas para la vista de la hoja de ruta"""
+
+    def test_printable_page(self, app):
+        """La vista HTML muestra las zonas y los destinatarios"""
+        client = app.test_client()
+        client.post('/auth/login', data={'username': 'admin_test', 'password': 'test_password'})
+
+        response = client.get('/day/2025-05-04/deliveries')
+
+        assert response.status_code == 200
+        assert b'17001' in response.data
+        assert b'Berta' in response.data
+        assert b'Dora' not in response.data
+
+    def test_csv_export(self, app):
+        """El CSV tiene una fila por entrega en el orden de la ruta"""
+        client = app.test_client()
+        client.post('/auth/login', data={'username': 'admin_test', 'password': 'test_password'})
+
+        lines = client.get('/day/2025-05-04/deliveries?format=csv').get_data(as_text=True).strip().splitlines()
+
+        assert lines[0].startswith('Código postal,Población,Pedido')
+        assert [line.split(',')[3] for line in lines[1:]] == ['Ana', 'Berta', 'Clara']
+        assert '1x Ramo; 2x Jarrón' in lines[1]
+
+    def test_json_etag(self, app):
+        """La variante JSON responde 304 mientras no cambien los pedidos"""
+        client = app.test_client()
+        client.post('/auth/login', data={'username': 'admin_test', 'password': 'test_password'})
+
+        first = client.get('/day/2025-05-05/deliveries?format=json')
+        again = client.get('/day/2025-05-05/deliveries?format=json',
+                           headers={'If-None-Match': first.headers['ETag']})
+
+        assert first.get_json()['total_deliveries'] == 1
+        assert again.status_code == 304
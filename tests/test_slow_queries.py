@@ -0,0 +1,150 @@
+"""
+Pruebas para el registro de consultas lentas y el asesor de índices
+"""
+
+from datetime import date
+import pytest
+from app import create_app, db
+from app.models import User
+from app.models.user import CalendarNote, TimeEntry
+from app.utils import slow_queries
+from config.settings import TestingConfig
+
+
+class SlowQueryTestConfig(TestingConfig):
+    """Configuración de pruebas que registra todas las sentencias"""
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SLOW_QUERY_THRESHOLD_MS = 0
+
+
+@pytest.fixture
+def app():
+    """Crear instancia de la app con un super administrador y algunas notas"""
+    app = create_app(SlowQueryTestConfig)
+
+    with app.app_context():
+        db.create_all()
+
+        admin = User(username='admin_test', email='admin@example.com', is_admin=True, is_super_admin=True,
+                     can_manage_notes=True, must_change_password=False)
+        admin.set_password('test_password')
+        db.session.add(admin)
+        db.session.commit()
+        db.session.bulk_save_objects([
+            CalendarNote(date_for=date(2025, 5, 1 + index % 28), title=f'Nota {index}', created_by=admin.id)
+            for index in range(50)
+        ])
+        db.session.commit()
+        slow_queries.log.reset()
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+    slow_queries.log.reset()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'admin_test', 'password': 'test_password'})
+    return client
+
+
+def find_entry(rows, fragment):
+    return next(row for row in rows if fragment in row['sql'])
+
+
+class TestFingerprints:
+    """Pruebas de la normalización de consultas"""
+
+    def test_literals_and_lists_are_normalized(self):
+        """Literales, parámetros y listas IN/VALUES no cambian la huella"""
+        first = slow_queries.normalize("SELECT * FROM t WHERE t.a = 'x''y' AND t.b IN (1, 2, 3) LIMIT 10")
+        second = slow_queries.normalize("SELECT *  FROM t\n WHERE t.a = ? AND t.b IN (?) LIMIT ?")
+
+        assert first == second == 'SELECT * FROM t WHERE t.a = ? AND t.b IN (...) LIMIT ?'
+        assert slow_queries.normalize('INSERT INTO t (a) VALUES (%s), (%s)') == 'INSERT INTO t (a) VALUES (...)'
+        assert slow_queries.normalize('SELECT col_1 FROM t_2') == 'SELECT col_1 FROM t_2'
+
+    def test_parameter_shape_has_types_not_values(self):
+        """Se guardan los tipos de los parámetros, nunca sus valores"""
+        assert slow_queries.parameter_shape(('secreto', 3, None)) == '(str, int, NULL)'
+        assert slow_queries.parameter_shape({'clave': 'secreto'}) == '{clave: str}'
+        assert slow_queries.parameter_shape([(1, 'a'), (2, 'b')], executemany=True) == '2× (int, str)'
+
+
+class TestSlowQueryLog:
+    """Pruebas de la captura por eventos de SQLAlchemy"""
+
+    def test_requests_are_grouped_by_fingerprint(self, app, client):
+        """Dos peticiones con valores distintos comparten huella y endpoint"""
+        client.get('/api/notes?from=2025-05-01&to=2025-05-10')
+        client.get('/api/notes?from=2025-05-11&to=2025-05-20')
+
+        entry = find_entry(slow_queries.log.entries(), 'FROM calendar_notes')
+        assert entry['count'] == 2
+        assert entry['endpoints'] == {'calendar.api_get_notes_range': 2}
+        assert entry['shapes'] and not [shape for shape in entry['shapes'] if '2025' in shape]
+
+    def test_statements_below_threshold_are_ignored(self, app):
+        """Con un umbral alto no se registra nada"""
+        app.extensions['slow_queries']['threshold_ms'] = 10_000
+
+        with app.app_context():
+            CalendarNote.query.filter_by(title='Nota 1').all()
+
+        assert slow_queries.log.entries() == []
+
+
+    def test_failed_statements_leave_nothing_on_connection(self, app):
+        """Las sentencias que fallan no acumulan datos en la conexión del pool"""
+        with app.app_context():
+            with db.engine.connect() as conn:
+                for _ in range(3):
+                    with pytest.raises(Exception):
+                        conn.exec_driver_sql('SELECT * FROM tabla_inexistente')
+                    conn.rollback()
+                conn.exec_driver_sql('SELECT 1')
+
+                assert not [key for key in conn.info if key.startswith('slow_query')]
+
+
+class TestIndexAdvisor:
+    """Pruebas del plan y de los índices propuestos"""
+
+    def test_full_scan_on_unindexed_column_gets_suggestion(self, app):
+        """Un filtro sobre una columna sin índice recorre la tabla y se propone un índice"""
+        with app.app_context():
+            CalendarNote.query.filter_by(title='Nota 1').order_by(CalendarNote.date_for).all()
+            rows = slow_queries.report(db.engine, db.metadata)
+
+        entry = find_entry(rows, 'calendar_notes.title = ?')
+        assert 'calendar_notes' in entry['explain']['full_scans']
+        suggestion = entry['suggestions'][0]
+        assert suggestion['columns'] == ['title', 'date_for']
+        assert suggestion['ddl'] == 'CREATE INDEX ix_calendar_notes_title_date_for ON calendar_notes (title, date_for)'
+        assert suggestion['model'] == 'CalendarNote'
+
+    def test_indexed_columns_get_no_suggestion(self, app):
+        """La clave primaria y los índices de los modelos cubren sus filtros"""
+        with app.app_context():
+            db.session.get(User, 1)
+            TimeEntry.query.filter(TimeEntry.date >= date(2025, 5, 1)).all()
+            rows = slow_queries.report(db.engine, db.metadata)
+
+        assert find_entry(rows, 'users.id = ?')['suggestions'] == []
+        assert find_entry(rows, 'time_entries.date >= ?')['suggestions'] == []
+
+    def test_page_shows_report_and_reset(self, app, client):
+        """El gestor muestra las consultas lentas y se pueden reiniciar"""
+        with app.app_context():
+            CalendarNote.query.filter_by(title='Nota 1').all()
+
+        response = client.get('/admin/database_manager')
+        assert b'CREATE INDEX ix_calendar_notes_title ON calendar_notes (title)' in response.data
+
+        client.post('/admin/slow_queries/reset')
+        data = client.get('/admin/slow_queries').get_json()
+        assert data['threshold_ms'] == 0
+        assert not [row for row in data['queries'] if 'calendar_notes.title' in row['sql']]
@@ -0,0 +1,160 @@
+"""
+Pruebas para la consola SQL paginada del panel de administración
+"""
+
+from datetime import date
+import pytest
+from app import create_app, db
+from app.models import User
+from app.models.user import CalendarNote
+from app.utils import sql_console
+from config.settings import TestingConfig
+
+NOTES = 1200
+
+
+class SqlConsoleTestConfig(TestingConfig):
+    """Configuración de pruebas con SQLite en memoria"""
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SQL_CONSOLE_PAGE_SIZE = 500
+    SQL_CONSOLE_MAX_ROWS = 1000
+
+
+@pytest.fixture
+def app():
+    """Crear instancia de la app con un super administrador y muchas notas"""
+    app = create_app(SqlConsoleTestConfig)
+
+    with app.app_context():
+        db.create_all()
+
+        admin = User(username='admin_test', email='admin@example.com', is_admin=True, is_super_admin=True,
+                     must_change_password=False)
+        admin.set_password('test_password')
+        db.session.add(admin)
+        db.session.commit()
+        db.session.bulk_save_objects([
+            CalendarNote(date_for=date(2025, 5, 1 + index % 28), title=f'Nota {index}',
+                         content='Ramo de rosas' if index % 3 == 0 else 'Centro de mesa', created_by=admin.id)
+            for index in range(NOTES)
+        ])
+        db.session.commit()
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'admin_test', 'password': 'test_password'})
+    return client
+
+
+def run_sql(client, query, **extra):
+    return client.post('/admin/execute_sql', data={'sql_query': query, **extra}).get_json()
+
+
+class TestSqlConsole:
+    """Pruebas de la ruta execute_sql"""
+
+    def test_select_is_paged_and_capped(self, client):
+        """Las filas llegan por páginas y nunca se supera el tope de la consola"""
+        first = run_sql(client, 'SELECT * FROM calendar_notes ORDER BY id;')
+
+        assert first['success'] and first['row_count'] == 500
+        assert first['next_offset'] == 500 and not first['truncated']
+        assert first['rows'][0][first['columns'].index('title')] == 'Nota 0'
+        assert first['elapsed_ms'] >= 0
+
+        second = run_sql(client, 'SELECT * FROM calendar_notes ORDER BY id;', offset=500)
+        assert second['rows'][0][second['columns'].index('title')] == 'Nota 500'
+        assert second['next_offset'] is None and second['truncated']
+
+    def test_small_result_has_no_next_page(self, client):
+        """Una consulta pequeña cabe en una página; los % no se confunden con parámetros"""
+        data = run_sql(client, "SELECT COUNT(*) AS total FROM calendar_notes WHERE content LIKE '%rosas%'")
+
+        assert data['rows'] == [['400']]
+        assert data['next_offset'] is None and not data['truncated']
+
+    def test_non_pageable_statement_skips_offset(self, client):
+        """PRAGMA y similares se leen por bloques saltando hasta el offset"""
+        all_columns = run_sql(client, 'PRAGMA table_info(users)')
+        page = run_sql(client, 'PRAGMA table_info(users)', offset=2)
+
+        assert page['rows'] == all_columns['rows'][2:]
+
+    def test_trailing_comment_and_repeated_columns(self, client):
+        """Un comentario -- final no rompe la paginación y las columnas repetidas se conservan"""
+        data = run_sql(client, 'SELECT id, id FROM calendar_notes ORDER BY id DESC -- últimas primero')
+
+        # SQLite renombra la segunda columna de la subconsulta (id:1) en lugar de fallar como MySQL
+        assert data['success'] and len(data['columns']) == 2
+        assert data['rows'][0] == [str(NOTES), str(NOTES)] and data['next_offset'] == 500
+
+    def test_explain_is_included(self, client):
+        """Con explain=1 se devuelve el plan de ejecución junto a los resultados"""
+        data = run_sql(client, 'SELECT * FROM calendar_notes WHERE id = 5', explain='1')
+
+        assert 'detail' in data['explain']['columns']
+        assert 'calendar_notes' in data['explain']['rows'][0][-1]
+        assert data['row_count'] == 1
+
+    def test_modifying_statement_is_committed(self, app, client):
+        """Las sentencias de modificación se confirman e informan de las filas afectadas"""
+        data = run_sql(client, "UPDATE calendar_notes SET color = '#000000' WHERE id <= 10")
+
+        assert data['success'] and data['affected_rows'] == 10
+        with app.app_context():
+            assert CalendarNote.query.filter_by(color='#000000').count() == 10
+
+    def test_statement_timeout(self, app, client):
+        """Una consulta que supera el límite de tiempo se interrumpe"""
+        app.config['SQL_CONSOLE_TIMEOUT_SECONDS'] = 0.2
+        endless = ('WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) '
+                   'SELECT COUNT(*) FROM n')
+
+        data = run_sql(client, endless)
+
+        assert 'límite de 0.2 s' in data['error']
+        assert run_sql(client, 'SELECT 1')['rows'] == [['1']]
+
+
+class TestStatementKind:
+    """Pruebas de la detección del tipo de sentencia"""
+
+    def test_comments_and_parentheses_are_skipped(self):
+        assert sql_console.statement_kind('-- informe\n/* notas */ (select 1)') == 'SELECT'
+        assert sql_console.statement_kind('  with x as (select 1) select * from x') == 'WITH'
+        assert sql_console.statement_kind('pragma table_info(users)') == 'PRAGMA'
+
+
+class TestPagedStatement:
+    """Pruebas de la sentencia ejecutada para cada página"""
+
+    def test_sqlite_wraps_select(self):
+        statement, skip = sql_console.paged_statement('sqlite', 'SELECT', 'SELECT 1 -- uno', 10, 20)
+
+        assert statement == 'SELECT * FROM (SELECT 1 -- uno\n) AS console_query LIMIT 11 OFFSET 20'
+        assert skip == 0
+
+    def test_mysql_appends_limit_instead_of_wrapping(self):
+        """En MySQL/MariaDB se añade LIMIT/OFFSET al final en lugar de una subconsulta derivada"""
+        sql = 'SELECT a.id, b.id FROM a JOIN b ON b.a_id = a.id ORDER BY a.id -- fin'
+
+        assert sql_console.paged_statement('mysql', 'SELECT', sql, 10, 20) == (sql + '\nLIMIT 11 OFFSET 20', 0)
+        assert sql_console.paged_statement('sqlite', 'PRAGMA', 'PRAGMA table_info(users)', 10, 20) == \
+            ('PRAGMA table_info(users)', 20)
+
+    def test_mysql_keeps_own_limit_and_locking_clauses(self):
+        """Con LIMIT, INTO o FOR UPDATE en el nivel superior la consulta se lee tal cual saltando filas"""
+        for sql in ('SELECT * FROM notes LIMIT 5', 'SELECT id FROM notes FOR UPDATE',
+                    'SELECT COUNT(*) INTO @total FROM notes'):
+            assert sql_console.paged_statement('mysql', 'SELECT', sql, 10, 20) == (sql, 20)
+
+        # LIMIT dentro de subconsultas, cadenas o comentarios no cuenta
+        sql = "WITH x AS (SELECT id FROM notes LIMIT 3) SELECT 'limit' FROM x /* limit */"
+        assert sql_console.paged_statement('mysql', 'WITH', sql, 10, 0) == (sql + '\nLIMIT 11 OFFSET 0', 0)
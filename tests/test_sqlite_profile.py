@@ -0,0 +1,107 @@
+"""
+Pruebas para el perfil de SQLite (WAL, busy_timeout y PRAGMA por conexión)
+"""
+
+import threading
+import time
+import pytest
+from sqlalchemy.pool import QueuePool, StaticPool
+from app import create_app, db
+from app.models import User, MaintenanceMode
+from app.utils import sqlite_profile
+from config.settings import TestingConfig, DevelopmentConfig
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    """App sobre un fichero SQLite con el perfil por defecto"""
+    config = type('SqliteFileConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "perfil.db"}',
+        'SQLALCHEMY_ENGINE_OPTIONS': dict(DevelopmentConfig.SQLALCHEMY_ENGINE_OPTIONS),
+    })
+    app = create_app(config)
+
+    with app.app_context():
+        db.create_all()
+
+        admin = User(username='admin_test', email='admin@example.com', is_admin=True,
+                     must_change_password=False)
+        admin.set_password('test_password')
+        db.session.add(admin)
+        db.session.commit()
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+
+
+class TestEngineOptions:
+    """Pruebas de las opciones del engine"""
+
+    def test_file_database_uses_sqlite_pool(self):
+        """Las opciones de MySQL se sustituyen por las del pool de SQLite"""
+        options = sqlite_profile.engine_options({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///floristeria.db',
+            'SQLALCHEMY_ENGINE_OPTIONS': DevelopmentConfig.SQLALCHEMY_ENGINE_OPTIONS,
+            'SQLITE_BUSY_TIMEOUT_MS': 2000,
+        })
+
+        assert 'pool_recycle' not in options and 'pool_pre_ping' not in options
+        assert options['pool_size'] == 5
+        assert options['connect_args'] == {'timeout': 2.0, 'check_same_thread': False}
+
+    def test_testing_config_works_without_overrides(self):
+        """TestingConfig crea la app en memoria sin opciones de pool incompatibles"""
+        app = create_app(TestingConfig)
+
+        with app.app_context():
+            db.create_all()
+            assert isinstance(db.engine.pool, StaticPool)
+            assert db.session.execute(db.text('PRAGMA busy_timeout')).scalar() == 5000
+            db.drop_all()
+
+
+class TestFileDatabase:
+    """Pruebas sobre un fichero SQLite"""
+
+    def test_pragmas_applied_on_connect(self, file_app):
+        """Cada conexión usa WAL, synchronous=NORMAL y el busy_timeout configurado"""
+        with file_app.app_context():
+            settings = sqlite_profile.current_settings(db.engine)
+
+            assert isinstance(db.engine.pool, QueuePool)
+            assert settings['journal_mode'] == 'wal'
+            assert settings['synchronous'] == 1
+            assert settings['busy_timeout'] == 5000
+            assert settings['cache_size'] == -64 * 1024
+
+    def test_writer_waits_instead_of_failing(self, file_app):
+        """Con otro escritor activo el commit espera y los lectores no se bloquean"""
+        holding = threading.Event()
+
+        def hold_write_lock():
+            with file_app.app_context():
+                with db.engine.connect() as conn:
+                    conn.exec_driver_sql('BEGIN IMMEDIATE')
+                    conn.exec_driver_sql("UPDATE users SET full_name = 'Bloqueo' WHERE username = 'admin_test'")
+                    holding.set()
+                    time.sleep(0.5)
+                    conn.exec_driver_sql('COMMIT')
+
+        writer = threading.Thread(target=hold_write_lock)
+        writer.start()
+        holding.wait(5)
+
+        with file_app.app_context():
+            # Lectura durante la escritura: WAL devuelve la última versión confirmada
+            assert User.query.filter_by(username='admin_test').first().full_name is None
+            started = time.perf_counter()
+            MaintenanceMode.get_current().activate(User.query.first(), 'Prueba', 5)
+            waited = time.perf_counter() - started
+
+        writer.join()
+        with file_app.app_context():
+            assert MaintenanceMode.query.first().is_active
+        assert waited > 0.1
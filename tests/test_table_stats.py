@@ -0,0 +1,158 @@
+"""
+Pruebas para las estadísticas de tablas del gestor de base de datos
+"""
+
+from datetime import date
+import pytest
+from sqlalchemy import event
+from app import create_app, db
+from app.models import User
+from app.models.user import CalendarNote
+from app.utils import db_stats
+from config.settings import TestingConfig
+
+NOTES = 600
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App sobre un fichero SQLite con un super administrador y notas"""
+    config = type('TableStatsTestConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "floristeria.db"}',
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+    })
+    app = create_app(config)
+    db_stats.clear_cache()
+
+    with app.app_context():
+        db.create_all()
+
+        admin = User(username='admin_test', email='admin@example.com', is_admin=True, is_super_admin=True,
+                     must_change_password=False)
+        admin.set_password('test_password')
+        db.session.add(admin)
+        db.session.commit()
+        db.session.bulk_save_objects([
+            CalendarNote(date_for=date(2025, 5, 1 + index % 28), title=f'Nota {index}', created_by=admin.id)
+            for index in range(NOTES)
+        ])
+        db.session.commit()
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+    db_stats.clear_cache()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'admin_test', 'password': 'test_password'})
+    return client
+
+
+def add_date_index():
+    db.session.execute(db.text('CREATE INDEX ix_calendar_notes_date_for ON calendar_notes (date_for)'))
+    db.session.commit()
+
+
+def table_row(app, name):
+    with app.app_context():
+        return next(table for table in db_stats.table_overview(db.engine, refresh=True) if table['name'] == name)
+
+
+class TestTableStats:
+    """Pruebas de los recuentos y tamaños tomados del catálogo"""
+
+    def test_page_does_not_count_rows(self, app, client):
+        """La página del gestor no ejecuta COUNT(*) sobre las tablas"""
+        statements = []
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute',
+                         lambda conn, cursor, statement, *args: statements.append(statement))
+
+        response = client.get('/admin/database_manager')
+
+        assert response.status_code == 200
+        assert b'calendar_notes' in response.data
+        assert statements and not [sql for sql in statements if 'COUNT(' in sql.upper()]
+
+    def test_estimate_without_and_with_analyze(self, app):
+        """Sin estadísticas se estima con MAX(rowid); tras ANALYZE se usa sqlite_stat1"""
+        with app.app_context():
+            add_date_index()
+            db.session.execute(db.text('DELETE FROM calendar_notes WHERE id <= 100'))
+            db.session.commit()
+
+        assert table_row(app, 'calendar_notes')['records'] == NOTES
+
+        with app.app_context():
+            db.session.execute(db.text('ANALYZE'))
+            db.session.commit()
+        notes = table_row(app, 'calendar_notes')
+
+        assert notes['records'] == NOTES - 100
+        assert notes['data_bytes'] > 0 and notes['index_bytes'] > 0
+        assert notes['index_details'][0]['rows_per_key'] == -(-(NOTES - 100) // 28)
+
+    def test_index_details_include_sizes(self, app):
+        """Cada índice lleva sus columnas y su tamaño; los automáticos cuentan en la tabla"""
+        with app.app_context():
+            add_date_index()
+        notes = table_row(app, 'calendar_notes')
+        users = table_row(app, 'users')
+
+        index = notes['index_details'][0]
+        assert index['name'] == 'ix_calendar_notes_date_for' and index['columns'] == ['date_for']
+        assert index['bytes'] > 0 and notes['index_bytes'] == index['bytes']
+        # UNIQUE de username/email: índices sqlite_autoindex_* que la reflexión no lista
+        assert users['index_bytes'] > 0
+
+
+class TestSchemaCache:
+    """Pruebas de la reflexión cacheada hasta la próxima migración"""
+
+    def test_reflection_is_reused_until_schema_changes(self, app):
+        """La reflexión se reutiliza y se rehace cuando cambia el esquema"""
+        with app.app_context():
+            first = db_stats.reflect_schema(db.engine)
+            assert db_stats.reflect_schema(db.engine) is first
+
+            db.session.execute(db.text('CREATE TABLE pedidos_extra (id INTEGER PRIMARY KEY)'))
+            db.session.commit()
+            second = db_stats.reflect_schema(db.engine)
+
+        assert second is not first and 'pedidos_extra' in second
+
+    def test_alembic_revision_is_part_of_fingerprint(self, app):
+        """Una nueva revisión de Alembic cambia la huella del esquema"""
+        with app.app_context():
+            db.session.execute(db.text('CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)'))
+            db.session.execute(db.text("INSERT INTO alembic_version VALUES ('abc123')"))
+            db.session.commit()
+            with db.engine.connect() as conn:
+                before = db_stats.schema_fingerprint(conn)
+            db.session.execute(db.text("UPDATE alembic_version SET version_num = 'def456'"))
+            db.session.commit()
+            with db.engine.connect() as conn:
+                after = db_stats.schema_fingerprint(conn)
+
+        assert before[0] == 'abc123' and after[0] == 'def456'
+
+
+class TestExactCount:
+    """Pruebas del recuento exacto a petición"""
+
+    def test_exact_count(self, client):
+        """El recuento exacto se pide tabla a tabla"""
+        response = client.post('/admin/database_manager/count', data={'table': 'calendar_notes'})
+
+        assert response.get_json() == {'table': 'calendar_notes', 'records': NOTES}
+
+    def test_unknown_table_is_rejected(self, client):
+        """Solo se cuentan tablas existentes (el nombre no se interpola sin validar)"""
+        response = client.post('/admin/database_manager/count', data={'table': 'users; DROP TABLE users'})
+
+        assert response.status_code == 404
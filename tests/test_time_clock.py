@@ -0,0 +1,160 @@
+"""
+Pruebas para los fichajes atómicos
+"""
+
+import threading
+import pytest
+from datetime import date, datetime
+from app import create_app, db
+from app.models import User, TimeEntry
+from app.utils.time_clock import (
+    TimeClockService, CLOCK_OK, CLOCK_ALREADY_DONE, CLOCK_NOT_CLOCKED_IN, CLOCK_NO_BREAK, CLOCK_CLOCKED_OUT
+)
+from config.settings import TestingConfig
+
+DAY = date(2025, 3, 3)
+
+
+class TimeClockTestConfig(TestingConfig):
+    """Configuración de pruebas con SQLite en memoria"""
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+
+
+@pytest.fixture
+def app():
+    """Crear instancia de la app con un empleado"""
+    app = create_app(TimeClockTestConfig)
+
+    with app.app_context():
+        db.create_all()
+
+        ana = User(username='ana', email='ana@example.com', must_change_password=False,
+                   can_time_tracking=True)
+        ana.set_password('test_password')
+        db.session.add(ana)
+        db.session.commit()
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+
+
+def at(hour, minute=0):
+    return datetime(DAY.year, DAY.month, DAY.day, hour, minute)
+
+
+def ana_id():
+    return User.query.filter_by(username='ana').first().id
+
+
+class TestTimeClockService:
+    """Pruebas de la máquina de estados del fichaje"""
+
+    def test_full_day(self, app):
+        """Entrada, descanso y salida calculan las horas en SQL"""
+        with app.app_context():
+            user_id = ana_id()
+            assert TimeClockService.clock_in(user_id, DAY, at(9)) == CLOCK_OK
+            assert TimeClockService.break_start(user_id, DAY, at(13)) == CLOCK_OK
+            assert TimeClockService.break_end(user_id, DAY, at(13, 30)) == CLOCK_OK
+            assert TimeClockService.clock_out(user_id, DAY, at(18)) == CLOCK_OK
+            db.session.commit()
+
+            entry = TimeEntry.query.filter_by(user_id=user_id, date=DAY).one()
+            assert entry.status == 'completed'
+            assert entry.break_hours == pytest.approx(0.5)
+            assert entry.total_hours == 8.5
+
+    def test_repeated_transitions_do_nothing(self, app):
+        """Un doble toque no duplica el registro ni cambia las horas"""
+        with app.app_context():
+            user_id = ana_id()
+            TimeClockService.clock_in(user_id, DAY, at(9))
+            assert TimeClockService.clock_in(user_id, DAY, at(9, 1)) == CLOCK_ALREADY_DONE
+            TimeClockService.clock_out(user_id, DAY, at(17))
+            assert TimeClockService.clock_out(user_id, DAY, at(17, 1)) == CLOCK_ALREADY_DONE
+            assert TimeClockService.break_start(user_id, DAY, at(17, 2)) == CLOCK_CLOCKED_OUT
+            db.session.commit()
+
+            entries = TimeEntry.query.filter_by(user_id=user_id, date=DAY).all()
+            assert len(entries) == 1
+            assert entries[0].entry_time == at(9)
+            assert entries[0].total_hours == 8.0
+
+    def test_transitions_require_previous_state(self, app):
+        """Sin entrada no se puede salir ni descansar"""
+        with app.app_context():
+            user_id = ana_id()
+            assert TimeClockService.clock_out(user_id, DAY, at(17)) == CLOCK_NOT_CLOCKED_IN
+            assert TimeClockService.break_start(user_id, DAY, at(12)) == CLOCK_NOT_CLOCKED_IN
+            assert TimeClockService.break_end(user_id, DAY, at(12)) == CLOCK_NO_BREAK
+            assert TimeEntry.query.count() == 0
+
+    def test_clock_in_completes_blank_entry(self, app):
+        """Un registro creado sin hora de entrada se completa en lugar de duplicarse"""
+        with app.app_context():
+            user_id = ana_id()
+            db.session.add(TimeEntry(user_id=user_id, date=DAY, status='absent'))
+            db.session.commit()
+
+            assert TimeClockService.clock_in(user_id, DAY, at(9)) == CLOCK_OK
+            db.session.commit()
+
+            entry = TimeEntry.query.filter_by(user_id=user_id, date=DAY).one()
+            assert entry.entry_time == at(9)
+            assert entry.status == 'active'
+
+
+class TestConcurrentClockIn:
+    """Pruebas de concurrencia con una base de datos en archivo"""
+
+    def test_parallel_clock_in_creates_one_entry(self, tmp_path):
+        """Varias peticiones simultáneas solo registran una entrada"""
+        class FileConfig(TimeClockTestConfig):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'clock.db'}"
+            SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}}
+
+        app = create_app(FileConfig)
+        with app.app_context():
+            db.create_all()
+            ana = User(username='ana', email='ana@example.com', must_change_password=False)
+            ana.set_password('test_password')
+            db.session.add(ana)
+            db.session.commit()
+            user_id = ana.id
+
+        results = []
+
+        def worker(minute):
+            with app.app_context():
+                results.append(TimeClockService.clock_in(user_id, DAY, at(9, minute)))
+                db.session.commit()
+                db.session.remove()
+
+        threads = [threading.Thread(target=worker, args=(minute,)) for minute in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with app.app_context():
+            assert results.count(CLOCK_OK) == 1
+            assert TimeEntry.query.filter_by(user_id=user_id, date=DAY).count() == 1
+            db.engine.dispose()
+
+
+class TestClockRoutes:
+    """Pruebas de las rutas de fichaje"""
+
+    def test_double_clock_in_flashes_warning(self, app):
+        """La segunda entrada del día avisa en lugar de crear otro registro"""
+        client = app.test_client()
+        client.post('/auth/login', data={'username': 'ana', 'password': 'test_password'})
+
+        client.get('/time/clock_in')
+        response = client.get('/time/clock_in', follow_redirects=True)
+
+        assert 'Ya has fichado la entrada hoy'.encode() in response.data
+        with app.app_context():
+            assert TimeEntry.query.count() == 1
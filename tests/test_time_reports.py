@@ -0,0 +1,168 @@
+"""
+Pruebas para el motor de reportes de horarios
+"""
+
+import pytest
+from datetime import date, datetime
+from app import create_app, db
+from app.models import User, TimeEntry
+from app.utils.time_reports import TimeReportService
+from config.settings import TestingConfig
+
+
+class TimeReportsTestConfig(TestingConfig):
+    """Configuración de pruebas con SQLite en memoria"""
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    TIME_REPORT_PAGE_SIZE = 2
+
+
+def add_entry(user, day, start_hour, end_hour, break_minutes=0):
+    entry = TimeEntry(
+        user_id=user.id,
+        date=day,
+        entry_time=datetime(day.year, day.month, day.day, start_hour),
+        exit_time=datetime(day.year, day.month, day.day, end_hour),
+        status='completed'
+    )
+    if break_minutes:
+        entry.break_start = datetime(day.year, day.month, day.day, 12)
+        entry.break_end = datetime(day.year, day.month, day.day, 12, break_minutes)
+    entry.calculate_total_hours()
+    db.session.add(entry)
+    return entry
+
+
+@pytest.fixture
+def app():
+    """Crear instancia de la app con registros de prueba"""
+    app = create_app(TimeReportsTestConfig)
+
+    with app.app_context():
+        db.create_all()
+
+        admin = User(username='admin_test', email='admin@example.com', is_admin=True,
+                     must_change_password=False)
+        admin.set_password('test_password')
+        ana = User(username='ana', email='ana@example.com', must_change_password=False)
+        ana.set_password('test_password')
+        db.session.add_all([admin, ana])
+        db.session.commit()
+
+        # Semana del lunes 2025-03-03 y un día de abril
+        add_entry(ana, date(2025, 3, 3), 9, 19, break_minutes=30)  # 9.5h
+        add_entry(ana, date(2025, 3, 4), 9, 17)                     # 8h
+        add_entry(ana, date(2025, 3, 10), 9, 13)                    # 4h
+        add_entry(admin, date(2025, 4, 1), 8, 18)                   # 10h
+        db.session.commit()
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+
+
+class TestTimeReportService:
+    """Pruebas para los agregados SQL"""
+
+    def test_user_totals(self, app):
+        """Totales por usuario con horas extra sobre la jornada objetivo"""
+        with app.app_context():
+            summary = TimeReportService.user_totals(date(2025, 3, 1), date(2025, 4, 30), daily_target_hours=8)
+            by_user = {row['username']: row for row in summary}
+
+            assert by_user['ana']['total_hours'] == 21.5
+            assert by_user['ana']['break_hours'] == 0.5
+            assert by_user['ana']['total_days'] == 3
+            assert by_user['ana']['overtime_hours'] == 1.5
+            assert by_user['admin_test']['overtime_hours'] == 2.0
+
+    def test_period_totals_by_week_and_month(self, app):
+        """Agrupación por semana (lunes) y por mes"""
+        with app.app_context():
+            weeks = TimeReportService.period_totals(date(2025, 3, 1), date(2025, 4, 30), 'week')
+            months = TimeReportService.period_totals(date(2025, 3, 1), date(2025, 4, 30), 'month')
+
+            assert [(w['period'], w['total_hours']) for w in weeks] == [
+                ('2025-03-31', 10.0), ('2025-03-10', 4.0), ('2025-03-03', 17.5)
+            ]
+            assert [(m['period'], m['total_days']) for m in months] == [('2025-04', 1), ('2025-03', 3)]
+
+    def test_period_days_count_each_user(self, app):
+        """Los días del periodo son jornadas trabajadas (usuario y día), no fechas distintas"""
+        with app.app_context():
+            admin = User.query.filter_by(username='admin_test').first()
+            add_entry(admin, date(2025, 3, 3), 8, 18)  # 10h, el mismo día que ana
+            db.session.commit()
+
+            week = TimeReportService.period_totals(date(2025, 3, 3), date(2025, 3, 9), 'week', daily_target_hours=8)[0]
+            day = TimeReportService.period_totals(date(2025, 3, 3), date(2025, 3, 3), 'day', daily_target_hours=8)[0]
+
+            assert week['total_days'] == 3 and week['overtime_hours'] == 3.5
+            assert (day['period'], day['total_days'], day['total_hours']) == ('2025-03-03', 2, 19.5)
+
+    def test_invalid_period(self, app):
+        """Los periodos desconocidos se rechazan"""
+        with app.app_context():
+            with pytest.raises(ValueError):
+                TimeReportService.period_totals(date(2025, 3, 1), date(2025, 3, 31), 'year')
+
+
+class TestTimeReportsRoute:
+    """Pruebas para la vista de reportes"""
+
+    def test_report_page_is_paginated(self, app):
+        """La vista muestra el resumen y pagina los registros detallados"""
+        client = app.test_client()
+        client.post('/auth/login', data={'username': 'admin_test', 'password': 'test_password'})
+
+        response = client.get('/time/time_reports?start_date=2025-03-01&end_date=2025-04-30&group_by=month')
+
+        assert response.status_code == 200
+        assert b'2025-03' in response.data
+        assert '2 de 4 registros'.encode() in response.data
+        assert b'after=' in response.data
+
+    def test_report_json_cursor_pages(self, app):
+        """La variante JSON recorre todos los registros con cursores estables"""
+        client = app.test_client()
+        client.post('/auth/login', data={'username': 'admin_test', 'password': 'test_password'})
+        url = '/time/time_reports?start_date=2025-03-01&end_date=2025-04-30&format=json'
+
+        first = client.get(url).get_json()
+        second = client.get(f"{url}&after={first['next_cursor']}").get_json()
+        back = client.get(f"{url}&before={second['prev_cursor']}").get_json()
+
+        assert [e['date'] for e in first['items']] == ['2025-04-01', '2025-03-10']
+        assert [e['date'] for e in second['items']] == ['2025-03-04', '2025-03-03']
+        assert second['next_cursor'] is None
+        assert back['items'] == first['items']
+        assert back['prev_cursor'] is None
+
+
+class TestExportTimeReport:
+    """Pruebas para la exportación en streaming"""
+
+    def test_csv_export_streams_rows(self, app):
+        """El CSV se entrega en streaming con una fila por registro"""
+        client = app.test_client()
+        client.post('/auth/login', data={'username': 'admin_test', 'password': 'test_password'})
+
+        response = client.get('/time/export_time_report?start_date=2025-03-01&end_date=2025-04-30')
+
+        assert response.status_code == 200
+        assert response.is_streamed
+        lines = response.get_data(as_text=True).strip().splitlines()
+        assert lines[0] == 'Usuario,Fecha,Entrada,Salida,Horas Totales,Estado'
+        assert len(lines) == 5
+        assert lines[1] == 'admin_test,01/04/2025,08:00,18:00,10.00h,Completed'
+
+    def test_xlsx_export(self, app):
+        """El XLSX se genera si XlsxWriter está disponible"""
+        pytest.importorskip('xlsxwriter')
+        client = app.test_client()
+        client.post('/auth/login', data={'username': 'admin_test', 'password': 'test_password'})
+
+        response = client.get('/time/export_time_report?start_date=2025-03-01&end_date=2025-04-30&format=xlsx')
+
+        assert response.status_code == 200
+        assert response.get_data()[:2] == b'PK'
@@ -0,0 +1,160 @@
+"""
+Pruebas para los totales materializados de horas
+"""
+
+import pytest
+from datetime import date, datetime
+from app import create_app, db
+from app.models import User, TimeEntry, TimeEntryDailyRollup, TimeEntryMonthlyRollup
+from app.utils.time_reports import TimeReportService
+from app.utils.time_rollups import TimeRollupService
+from config.settings import TestingConfig
+
+
+class TimeRollupsTestConfig(TestingConfig):
+    """Configuración de pruebas con SQLite en memoria"""
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+
+
+@pytest.fixture
+def app():
+    """Crear instancia de la app con usuarios de prueba"""
+    app = create_app(TimeRollupsTestConfig)
+
+    with app.app_context():
+        db.create_all()
+
+        admin = User(username='admin_test', email='admin@example.com', is_admin=True,
+                     must_change_password=False)
+        admin.set_password('test_password')
+        ana = User(username='ana', email='ana@example.com', must_change_password=False)
+        ana.set_password('test_password')
+        db.session.add_all([admin, ana])
+        db.session.commit()
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de prueba con sesión de administrador"""
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'admin_test', 'password': 'test_password'})
+    return client
+
+
+def add_entry(user, day, start_hour, end_hour, break_minutes=0):
+    entry = TimeEntry(
+        user_id=user.id,
+        date=day,
+        entry_time=datetime(day.year, day.month, day.day, start_hour),
+        exit_time=datetime(day.year, day.month, day.day, end_hour),
+        status='completed'
+    )
+    if break_minutes:
+        entry.break_start = datetime(day.year, day.month, day.day, 12)
+        entry.break_end = datetime(day.year, day.month, day.day, 12, break_minutes)
+    entry.calculate_total_hours()
+    db.session.add(entry)
+    return entry
+
+
+def ana_id():
+    return User.query.filter_by(username='ana').first().id
+
+
+class TestTimeRollupService:
+    """Pruebas para el cálculo de los totales"""
+
+    def test_backfill_builds_daily_and_monthly_rows(self, app):
+        """El backfill reconstruye los totales desde el histórico"""
+        with app.app_context():
+            ana = User.query.filter_by(username='ana').first()
+            add_entry(ana, date(2025, 3, 3), 9, 19, break_minutes=30)  # 9.5h
+            add_entry(ana, date(2025, 3, 4), 9, 17)                     # 8h
+            add_entry(ana, date(2025, 4, 1), 9, 13)                     # 4h
+            db.session.commit()
+
+            result = TimeRollupService.backfill(daily_target_hours=8)
+
+            assert result == {'daily': 3, 'monthly': 2}
+            march = TimeRollupService.monthly_summary(ana.id, 2025, 3)
+            assert march['total_hours'] == 17.5
+            assert march['break_hours'] == 0.5
+            assert march['overtime_hours'] == 1.5
+            assert march['days_present'] == 2
+            assert TimeRollupService.monthly_summary(ana.id, 2025, 4)['total_hours'] == 4.0
+
+    def test_backfill_range_only_touches_its_months(self, app):
+        """Un backfill con rango no borra los totales de otros meses"""
+        with app.app_context():
+            ana = User.query.filter_by(username='ana').first()
+            add_entry(ana, date(2025, 3, 3), 9, 17)
+            add_entry(ana, date(2025, 4, 1), 9, 13)
+            db.session.commit()
+            TimeRollupService.backfill()
+
+            result = TimeRollupService.backfill(date(2025, 4, 15), date(2025, 4, 20))
+
+            assert result == {'daily': 1, 'monthly': 1}
+            assert db.session.get(TimeEntryMonthlyRollup, (ana.id, 2025, 3)) is not None
+
+    def test_rollups_match_reports(self, app):
+        """El resumen mensual materializado coincide con los totales del motor de reportes"""
+        with app.app_context():
+            ana = User.query.filter_by(username='ana').first()
+            add_entry(ana, date(2025, 3, 3), 9, 19, break_minutes=30)  # 9.5h
+            add_entry(ana, date(2025, 3, 4), 9, 15)                     # 6h
+            add_entry(ana, date(2025, 3, 5), 8, 18)                     # 10h
+            db.session.commit()
+            TimeRollupService.backfill(daily_target_hours=8)
+
+            march = TimeRollupService.monthly_summary(ana.id, 2025, 3)
+            report = TimeReportService.user_totals(date(2025, 3, 1), date(2025, 3, 31), ana.id,
+                                                   daily_target_hours=8)[0]
+
+            assert (march['total_hours'], march['break_hours'], march['overtime_hours'],
+                    march['days_present'], march['entries']) == \
+                (report['total_hours'], report['break_hours'], report['overtime_hours'],
+                 report['total_days'], report['entries'])
+            assert march['overtime_hours'] == 3.5
+
+    def test_empty_month_summary(self, app):
+        """Un mes sin registros devuelve ceros"""
+        with app.app_context():
+            summary = TimeRollupService.monthly_summary(ana_id(), 2025, 1)
+            assert summary['total_hours'] == 0.0
+            assert summary['entries'] == 0
+
+
+class TestRollupsFollowTimeEntries:
+    """Los totales se actualizan con cada cambio de registro"""
+
+    def test_create_edit_and_delete(self, app, client):
+        """Crear, editar y eliminar un registro recalcula día y mes"""
+        with app.app_context():
+            user_id = ana_id()
+
+        client.post('/time/create_time_entry', data={
+            'user_id': user_id, 'date': '2025-05-06',
+            'entry_time': '09:00', 'exit_time': '19:00', 'status': 'completed'
+        })
+        with app.app_context():
+            assert TimeRollupService.monthly_summary(user_id, 2025, 5)['overtime_hours'] == 2.0
+            entry_id = TimeEntry.query.filter_by(user_id=user_id).first().id
+
+        client.post(f'/time/edit_time_entry/{entry_id}', data={
+            'entry_time': '09:00', 'exit_time': '15:00', 'status': 'completed'
+        })
+        with app.app_context():
+            daily = db.session.get(TimeEntryDailyRollup, (user_id, date(2025, 5, 6)))
+            assert daily.total_hours == 6.0
+            assert TimeRollupService.monthly_summary(user_id, 2025, 5)['overtime_hours'] == 0.0
+
+        client.post(f'/time/delete_time_entry/{entry_id}')
+        with app.app_context():
+            assert db.session.get(TimeEntryDailyRollup, (user_id, date(2025, 5, 6))) is None
+            assert db.session.get(TimeEntryMonthlyRollup, (user_id, 2025, 5)) is None
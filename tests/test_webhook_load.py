@@ -0,0 +1,110 @@
+"""
+Pruebas para la prueba de carga del webhook y el WooCommerce de pruebas
+"""
+
+import pytest
+import requests
+from app import create_app, db
+from app.models import User, CalendarOrder
+from app.models.user import ApiIntegration
+from benchmarks.dataset import FloristDataset, SCALES
+from benchmarks.fake_woocommerce import FakeWooCommerceServer
+from benchmarks.webhook_load import plan_deliveries, run_load_test
+from config.settings import TestingConfig
+
+
+class WebhookLoadTestConfig(TestingConfig):
+    """Configuración de pruebas con SQLite en memoria"""
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+
+
+@pytest.fixture
+def store_orders():
+    dataset = FloristDataset(SCALES['tiny'], seed=3)
+    return [dataset.order_payload(70000 + index) for index in range(250)]
+
+
+@pytest.fixture
+def app():
+    """Crear instancia de la app con un administrador"""
+    app = create_app(WebhookLoadTestConfig)
+
+    with app.app_context():
+        db.create_all()
+
+        admin = User(username='admin_test', email='admin@example.com', is_admin=True,
+                     must_change_password=False)
+        admin.set_password('test_password')
+        db.session.add(admin)
+        db.session.commit()
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+
+
+class TestFakeWooCommerce:
+    """Pruebas para el servidor que imita la API REST de WooCommerce"""
+
+    def test_pagination_headers(self, store_orders):
+        """Las páginas respetan per_page y las cabeceras indican el total"""
+        with FakeWooCommerceServer(store_orders) as server:
+            response = requests.get(server.orders_url, params={'per_page': 100, 'page': 3}, timeout=5)
+
+        assert response.headers['X-WP-Total'] == '250'
+        assert response.headers['X-WP-TotalPages'] == '3'
+        assert len(response.json()) == 50
+
+    def test_manual_sync_reads_every_page(self, app, store_orders):
+        """La sincronización manual recorre todas las páginas del rango"""
+        client = app.test_client()
+        client.post('/auth/login', data={'username': 'admin_test', 'password': 'test_password'})
+
+        with FakeWooCommerceServer(store_orders) as server:
+            with app.app_context():
+                db.session.add(ApiIntegration(name='Tienda', api_type='woocommerce', url=server.orders_url,
+                                              mapping_config='{}', is_active=True, created_by=1))
+                db.session.commit()
+
+            response = client.post('/api/woocommerce/manual-sync',
+                                   json={'start_date': '2020-01-01', 'end_date': '2030-12-31'})
+            requests_made = server.requests
+
+        assert response.get_json()['details']['synced_orders'] == 250
+        assert requests_made == 3
+        with app.app_context():
+            assert CalendarOrder.query.count() == 250
+
+
+class TestWebhookLoad:
+    """Pruebas para el plan de entregas y la verificación de la base de datos"""
+
+    def test_plan_keeps_order_per_order(self):
+        """Cada pedido conserva su orden de entrega; los duplicados repiten la versión anterior"""
+        dataset = FloristDataset(SCALES['tiny'])
+        deliveries, expected = plan_deliveries(dataset, 50, duplicate_ratio=0.5, out_of_order_ratio=0.0)
+
+        assert len(expected) == 50
+        assert any(delivery.duplicate for delivery in deliveries)
+        last_version = {}
+        for delivery in deliveries:
+            assert delivery.version >= last_version.get(delivery.order_id, 0)
+            last_version[delivery.order_id] = delivery.version
+
+    def test_out_of_order_deliveries_are_reported_as_stale(self):
+        """Sin concurrencia, los pedidos con versiones invertidas quedan en un estado anterior"""
+        dataset = FloristDataset(SCALES['small'], seed=42)
+        deliveries, _ = plan_deliveries(dataset, 20, duplicate_ratio=0.0, out_of_order_ratio=0.3, seed=42)
+        first_version = {}
+        for delivery in deliveries:
+            first_version.setdefault(delivery.order_id, delivery.version)
+        reversed_orders = [order_id for order_id, version in first_version.items() if version == 1]
+
+        report = run_load_test(orders=20, concurrency=1, duplicate_ratio=0.0, out_of_order_ratio=0.3, seed=42)
+
+        assert report['status_codes'] == {'200': 40}
+        assert report['database']['duplicate_notes'] == 0
+        assert report['database']['missing_orders'] == 0
+        assert report['database']['stale_orders'] == len(reversed_orders)
+        assert report['latency_ms']['p99'] >= report['latency_ms']['p50'] > 0
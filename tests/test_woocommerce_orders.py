@@ -0,0 +1,350 @@
+"""
+Pruebas para los pedidos de WooCommerce guardados como datos estructurados
+"""
+
+import importlib.util
+import os
+import pytest
+from datetime import date
+from unittest.mock import patch, Mock
+from decimal import Decimal
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from app import create_app, db
+from app.models import User, CalendarOrder, CalendarOrderItem
+from app.models.user import CalendarNote, ApiIntegration
+from app.blueprints.calendar.routes import process_woocommerce_order
+from app.utils import metrics
+from app.utils.note_search import NoteSearchService
+from app.utils.woocommerce_orders import WooOrderService
+from config.settings import TestingConfig
+
+
+class WooOrdersTestConfig(TestingConfig):
+    """Configuración de pruebas con SQLite en memoria"""
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+
+
+def order_payload(order_id=501, status='processing', delivery='2025-05-04', items=None):
+    return {
+        'id': order_id,
+        'status': status,
+        'date_created': '2025-05-01T10:30:00',
+        'total': '59.90',
+        'currency': 'EUR',
+        'billing': {'first_name': 'Lucía', 'last_name': 'Gómez', 'email': 'lucia@example.com',
+                    'phone': '600123456'},
+        'shipping': {'first_name': 'Marta', 'last_name': 'Sanz', 'address_1': 'Calle Mayor 3',
+                     'address_2': '2º B', 'city': 'Girona', 'postcode': '17001', 'phone': '611222333'},
+        'meta_data': [{'key': 'ywcdd_order_delivery_date', 'value': delivery}],
+        'line_items': items if items is not None else [
+            {'name': 'Ramo de rosas', 'product_id': 77, 'quantity': 2, 'total': '49.90',
+             'meta_data': [
+                 {'display_key': 'Color', 'display_value': 'Rojo'},
+                 {'display_key': 'Dedicatoria', 'display_value': 'Feliz día de la madre\r\nTe queremos'},
+             ]},
+            {'name': 'Tarjeta', 'quantity': 1, 'total': '10.00', 'meta_data': []},
+        ],
+    }
+
+
+@pytest.fixture
+def app():
+    """Crear instancia de la app con un administrador"""
+    app = create_app(WooOrdersTestConfig)
+
+    with app.app_context():
+        db.create_all()
+
+        admin = User(username='admin_test', email='admin@example.com', is_admin=True,
+                     must_change_password=False)
+        admin.set_password('test_password')
+        db.session.add(admin)
+        db.session.commit()
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+
+
+class TestWooOrderService:
+    """Pruebas para la conversión de pedidos"""
+
+    def test_order_is_stored_in_columns(self, app):
+        """Cliente, entrega, líneas y dedicatoria quedan en columnas propias"""
+        with app.app_context():
+            result = process_woocommerce_order(order_payload())
+
+            assert result['success'] and result['action'] == 'creado'
+            order = CalendarOrder.query.filter_by(wc_order_id=501).one()
+            assert order.note.date_for == date(2025, 5, 4)
+            assert order.note.title == '🌹 Pedido #501 - Lucía Gómez → Marta Sanz'
+            assert order.note.content is None
+            assert order.delivery_postcode == '17001'
+            assert order.delivery_city == 'Girona'
+            assert order.delivery_address == 'Calle Mayor 3, 2º B'
+            assert order.total == Decimal('59.90')
+            assert order.dedication == 'Feliz día de la madre\nTe queremos'
+            assert [(i.product_name, i.quantity, i.options) for i in order.items] == [
+                ('Ramo de rosas', 2, 'Color: Rojo'), ('Tarjeta', 1, None)
+            ]
+
+    def test_display_content_is_rendered(self, app):
+        """El texto detallado se genera al mostrar la nota"""
+        with app.app_context():
+            process_woocommerce_order(order_payload())
+            note = CalendarNote.query.one()
+
+            text = note.display_content
+            assert '📋 ESTADO: Procesando' in text
+            assert '   • Dirección: Calle Mayor 3, 2º B, Girona, 17001' in text
+            assert '   • Ramo de rosas (x2) - 49.90€ (Color: Rojo)' in text
+            assert '   📝 Te queremos' in text
+
+            note.content = 'Entregar antes de las 12'
+            assert note.display_content.endswith('\n\nEntregar antes de las 12')
+
+    def test_update_moves_date_and_replaces_items(self, app):
+        """Una actualización del pedido reutiliza la nota aunque cambie la fecha de entrega"""
+        with app.app_context():
+            process_woocommerce_order(order_payload())
+            result = process_woocommerce_order(order_payload(
+                status='completed', delivery='2025-05-05',
+                items=[{'name': 'Centro de mesa', 'quantity': 1, 'total': '59.90', 'meta_data': []}]
+            ))
+
+            assert result['action'] == 'actualizado'
+            note = CalendarNote.query.one()
+            assert note.date_for == date(2025, 5, 5)
+            assert note.color == '#28a745'
+            assert [i.product_name for i in note.order.items] == ['Centro de mesa']
+            assert CalendarOrderItem.query.count() == 1
+
+    def test_legacy_note_is_converted(self, app):
+        """Las notas con el pedido renderizado en el contenido pasan a datos estructurados"""
+        with app.app_context():
+            admin = User.query.first()
+            db.session.add(CalendarNote(date_for=date(2025, 5, 4), title='🌹 Pedido #501 - Lucía Gómez',
+                                        content='📋 ESTADO: Pendiente', created_by=admin.id))
+            db.session.commit()
+
+            process_woocommerce_order(order_payload())
+
+            note = CalendarNote.query.one()
+            assert note.content is None
+            assert note.order.wc_order_id == 501
+
+    def test_concurrent_creation_becomes_update(self, app, monkeypatch):
+        """Si otra entrega crea el pedido entre la búsqueda y el commit, se reintenta como actualización"""
+        with app.app_context():
+            process_woocommerce_order(order_payload())
+            find_note = WooOrderService.find_note
+            calls = []
+
+            def find_note_racing(wc_order_id):
+                calls.append(wc_order_id)
+                return None if len(calls) == 1 else find_note(wc_order_id)
+
+            monkeypatch.setattr(WooOrderService, 'find_note', staticmethod(find_note_racing))
+            result = process_woocommerce_order(order_payload(status='completed'))
+
+            assert result['success'] and result['action'] == 'actualizado'
+            assert CalendarNote.query.count() == 1
+            assert CalendarOrder.query.one().status == 'completed'
+
+    def test_owner_is_looked_up_only_for_new_notes(self, app, monkeypatch):
+        """Actualizar un pedido existente no consulta el usuario propietario"""
+        with app.app_context():
+            process_woocommerce_order(order_payload())
+
+            def no_lookup():
+                raise AssertionError('No debe buscarse propietario')
+
+            monkeypatch.setattr(WooOrderService, 'default_owner_id', staticmethod(no_lookup))
+            assert process_woocommerce_order(order_payload(status='completed'))['success']
+
+    def test_order_without_id_fails(self, app):
+        """Un pedido sin id no se guarda"""
+        with app.app_context():
+            payload = order_payload()
+            del payload['id']
+
+            assert process_woocommerce_order(payload)['success'] is False
+            assert CalendarNote.query.count() == 0
+
+    def test_deleting_note_removes_order(self, app):
+        """Al borrar la nota se borran el pedido y sus líneas"""
+        with app.app_context():
+            process_woocommerce_order(order_payload())
+            db.session.delete(CalendarNote.query.one())
+            db.session.commit()
+
+            assert CalendarOrder.query.count() == 0
+            assert CalendarOrderItem.query.count() == 0
+
+
+class TestLegacyBackfill:
+    """Pruebas del relleno de datos estructurados para las notas antiguas"""
+
+    def legacy_note(self, payload, extra=''):
+        """Convierte un pedido en nota antigua: el texto renderizado en el contenido y sin filas de pedido"""
+        process_woocommerce_order(payload)
+        order = CalendarOrder.query.filter_by(wc_order_id=payload['id']).one()
+        note = order.note
+        note.content = order.render_content() + extra
+        db.session.delete(order)
+        db.session.commit()
+        return note
+
+    def test_legacy_notes_get_order_rows(self, app):
+        """Las notas antiguas recuperan pedido, líneas y dedicatoria; las notas manuales se conservan"""
+        with app.app_context():
+            self.legacy_note(order_payload(), extra='\n\nEntregar antes de las 12')
+
+            assert WooOrderService.backfill_legacy_notes() == {'created': 1, 'skipped': 0}
+
+            order = CalendarOrder.query.one()
+            assert order.note.content == 'Entregar antes de las 12'
+            assert (order.status, order.total, order.currency) == ('processing', Decimal('59.90'), 'EUR')
+            assert (order.customer_name, order.customer_phone) == ('Lucía Gómez', '600123456')
+            assert (order.delivery_name, order.delivery_address) == ('Marta Sanz', 'Calle Mayor 3, 2º B')
+            assert (order.delivery_city, order.delivery_postcode) == ('Girona', '17001')
+            assert order.delivery_date == date(2025, 5, 4)
+            assert order.dedication == 'Feliz día de la madre\nTe queremos'
+            assert [(item.product_name, item.quantity, item.total, item.options) for item in order.items] == [
+                ('Ramo de rosas', 2, Decimal('49.90'), 'Color: Rojo'), ('Tarjeta', 1, Decimal('10.00'), None)]
+
+    def test_command_skips_duplicates_and_converted_notes(self, app):
+        """El comando usa la nota más reciente de cada pedido y no repite los ya convertidos"""
+        with app.app_context():
+            self.legacy_note(order_payload(501))
+            admin = User.query.first()
+            db.session.add(CalendarNote(date_for=date(2025, 5, 6), title='🌹 Pedido #501 - Lucía Gómez',
+                                        content='📋 ESTADO: Completado', created_by=admin.id))
+            db.session.commit()
+            process_woocommerce_order(order_payload(502))
+
+        output = app.test_cli_runner().invoke(args=['backfill-orders']).output
+
+        assert 'Pedidos creados: 1 (notas omitidas: 1)' in output
+        with app.app_context():
+            order = CalendarOrder.query.filter_by(wc_order_id=501).one()
+            assert order.status == 'completed' and order.note.date_for == date(2025, 5, 6)
+            assert CalendarOrder.query.count() == 2
+
+
+class TestOrderSearchAndApi:
+    """Pruebas de la búsqueda y la API sobre pedidos estructurados"""
+
+    def test_search_index_follows_order_tables(self, app):
+        """Los triggers indexan los datos del pedido guardados después de crear el índice"""
+        with app.app_context():
+            path = os.path.join(os.path.dirname(__file__), '..', 'migrations', 'versions',
+                                'c2f7a9d14e60_add_note_search_index.py')
+            spec = importlib.util.spec_from_file_location('note_search_migration', path)
+            migration = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(migration)
+            with db.engine.begin() as conn, Operations.context(MigrationContext.configure(conn)):
+                migration.upgrade()
+            assert NoteSearchService.rebuild_index() == 'fts5'
+            process_woocommerce_order(order_payload())
+            admin = User.query.first()
+
+            for query in ('611222', 'queremos', 'rosas', '17001'):
+                assert [r['title'] for r in NoteSearchService.search(query, admin)] == \
+                    ['🌹 Pedido #501 - Lucía Gómez → Marta Sanz']
+
+            process_woocommerce_order(order_payload(
+                items=[{'name': 'Centro de mesa', 'quantity': 1, 'total': '59.90', 'meta_data': []}]
+            ))
+            assert NoteSearchService.search('rosas', admin) == []
+            assert len(NoteSearchService.search('centro', admin)) == 1
+
+    def test_range_api_renders_order_content(self, app):
+        """La API por rango devuelve el contenido renderizado de los pedidos"""
+        with app.app_context():
+            process_woocommerce_order(order_payload())
+
+        client = app.test_client()
+        client.post('/auth/login', data={'username': 'admin_test', 'password': 'test_password'})
+        data = client.get('/api/notes?from=2025-05-01&to=2025-05-31&fields=title,content').get_json()
+
+        content = data['notes']['2025-05-04'][0]['content']
+        assert '🚚 ENTREGA:' in content
+        assert 'Ramo de rosas' in content
+
+    def test_note_endpoints_return_the_same_content(self, app):
+        """Editar una nota de pedido devuelve el mismo contenido que la lectura: pedido y texto manual"""
+        with app.app_context():
+            process_woocommerce_order(order_payload())
+            note_id = CalendarNote.query.one().id
+
+        client = app.test_client()
+        client.post('/auth/login', data={'username': 'admin_test', 'password': 'test_password'})
+        updated = client.put(f'/api/notes/{note_id}', json={'content': 'Llamar antes'}).get_json()
+        listed = client.get('/api/notes/2025-05-04').get_json()
+
+        content = updated['note']['content']
+        assert '🚚 ENTREGA:' in content and content.endswith('\n\nLlamar antes')
+        assert listed['notes'][0]['content'] == content
+
+    def test_parse_falls_back_to_order_date(self, app):
+        """Sin fecha de entrega se usa la fecha del pedido"""
+        with app.app_context():
+            payload = order_payload()
+            payload['meta_data'] = []
+
+            parsed = WooOrderService.parse(payload)
+
+            assert parsed['calendar_date'] == date(2025, 5, 1)
+            assert parsed['order']['delivery_date'] is None
+
+
+def api_page(orders, total_pages=2, status_code=200):
+    return Mock(status_code=status_code, text='Service Unavailable', headers={'X-WP-TotalPages': str(total_pages)},
+                json=Mock(return_value=orders))
+
+
+class TestManualSync:
+    """Pruebas de la sincronización manual contra la API de WooCommerce"""
+
+    def sync(self, app, pages):
+        with app.app_context():
+            db.session.add(ApiIntegration(name='Tienda', api_type='woocommerce', url='https://tienda.example.com/orders',
+                                          mapping_config='{}', created_by=User.query.first().id))
+            db.session.commit()
+
+        client = app.test_client()
+        client.post('/auth/login', data={'username': 'admin_test', 'password': 'test_password'})
+        with patch('requests.get', side_effect=pages):
+            return client.post('/api/woocommerce/manual-sync',
+                               json={'start_date': '2025-05-01', 'end_date': '2025-05-31'})
+
+    def test_failed_page_keeps_orders_already_read(self, app):
+        """Si falla una página posterior se guardan los pedidos leídos y la sincronización es parcial"""
+        response = self.sync(app, [api_page([order_payload(501), order_payload(502)]),
+                                   api_page([], status_code=503)])
+
+        data = response.get_json()
+        assert response.status_code == 200 and data['partial'] is True
+        assert data['details']['synced_orders'] == 2 and data['details']['pages_fetched'] == 1
+        with app.app_context():
+            assert sorted(order.wc_order_id for order in CalendarOrder.query.all()) == [501, 502]
+            assert CalendarNote.query.filter(CalendarNote.title.contains('Simulado')).count() == 0
+            assert ApiIntegration.query.one().last_sync_status == 'partial'
+
+    def test_failed_first_page_saves_nothing(self, app):
+        """Si la API no responde no se guarda ningún pedido (tampoco datos simulados)"""
+        errors = metrics.integration_sync_errors.values.get(('woocommerce',), 0)
+        timings = metrics.integration_sync_duration.values.get(('woocommerce',), {}).get('count', 0)
+
+        response = self.sync(app, [api_page([], status_code=401)])
+
+        assert response.status_code == 502
+        assert metrics.integration_sync_errors.values[('woocommerce',)] == errors + 1
+        assert metrics.integration_sync_duration.values[('woocommerce',)]['count'] == timings + 1
+        with app.app_context():
+            assert CalendarNote.query.count() == 0
+            integration = ApiIntegration.query.one()
+            assert integration.last_sync_status == 'error' and '401' in integration.last_error